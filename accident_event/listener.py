@@ -3,12 +3,16 @@ import random
 from datetime import datetime
 from typing import Dict, Tuple, Optional
 
+from structured_log import obtener_logger
+
+log = obtener_logger("LISTENER")
+
 def wait_for_accident_event(timeout_segundos: int = None) -> Optional[Dict]:
     """
     Simula la escucha de un evento de accidente.
     Devuelve un diccionario con ID de intersección, timestamp y coordenadas.
     """
-    print("[LISTENER] Esperando evento de accidente...")
+    log.info("Esperando evento de accidente...")
     
     if timeout_segundos:
         inicio = time.time()
@@ -26,5 +30,51 @@ def wait_for_accident_event(timeout_segundos: int = None) -> Optional[Dict]:
         "severidad": random.choice(["baja", "media", "alta"])
     }
     
-    print(f"[LISTENER] Accidente detectado: {evento}")
+    log.info("Accidente detectado: %s", evento)
+    return evento
+
+def _campos_trigger(contenido: str) -> Dict[str, str]:
+    """Pares clave=valor del archivo bandera ("timestamp=...|tipo=grave|ubicacion=x,y")."""
+    campos = {}
+    for campo in contenido.strip().split("|"):
+        clave, _, valor = campo.partition("=")
+        if clave:
+            campos[clave] = valor
+    return campos
+
+def leer_ubicacion_trigger(contenido: str) -> Optional[Tuple[float, float]]:
+    """
+    Extrae las coordenadas del archivo bandera ("...|ubicacion=x,y").
+    Retorna None si la ubicación es "manual" o no es válida.
+    """
+    valor = _campos_trigger(contenido).get("ubicacion", "")
+    if "," not in valor:
+        return None
+    try:
+        x, y = valor.split(",", 1)
+        return float(x), float(y)
+    except ValueError:
+        return None
+
+def leer_severidad_trigger(contenido: str) -> Optional[str]:
+    """Severidad textual del archivo bandera ("...|tipo=grave|..."), None si no viene."""
+    return _campos_trigger(contenido).get("tipo") or None
+
+def asignar_ubicacion(evento: Dict, indice_espacial) -> Dict:
+    """
+    Completa el evento con el junction y el edge (con offset) más cercanos a sus
+    coordenadas usando el índice espacial de la red.
+    """
+    coordenadas = evento.get("coordenadas")
+    if not coordenadas or indice_espacial is None:
+        return evento
+
+    junction = indice_espacial.junction_cercano(*coordenadas)
+    if junction:
+        evento["id_interseccion"] = junction[0]
+    edge = indice_espacial.edge_cercano(*coordenadas)
+    if edge:
+        evento["edge"], evento["lane"], evento["offset"], _ = edge
+    log.info("Ubicación %s -> junction %s | edge %s @ %.1fm",
+             coordenadas, evento.get("id_interseccion"), evento.get("edge"), evento.get("offset", 0))
     return evento
@@ -0,0 +1,218 @@
+"""
+Post-procesado en streaming de la salida edgeData de SUMO (edgeData_output.xml).
+
+Uso:
+    python -m analysis.edgedata ESCENARIO.xml BASE.xml [--mision misiones.jsonl --id N]
+                                [--desde T --hasta T] [--corredor e1,e2,...]
+"""
+import argparse
+import json
+import sys
+import xml.etree.ElementTree as ET
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+# Atributos numéricos de <edge> que se cargan como columnas
+COLUMNAS = {
+    "sampledSeconds": "muestreo",
+    "traveltime": "tiempo_viaje",
+    "speed": "velocidad",
+    "waitingTime": "espera",
+    "timeLoss": "perdida",
+    "entered": "entradas",
+}
+
+
+class DatosEdge:
+    """
+    Datos de intervalo en formato columnar: una fila por (intervalo, edge) y un
+    arreglo NumPy por atributo. Los ids de edge se guardan una sola vez.
+    """
+
+    def __init__(self, edges: List[str], columnas: Dict[str, np.ndarray]):
+        self.edges = edges
+        self.indice_edges = {e: i for i, e in enumerate(edges)}
+        self.inicio = columnas["inicio"]
+        self.fin = columnas["fin"]
+        self.edge = columnas["edge"]
+        for atributo in COLUMNAS.values():
+            setattr(self, atributo, columnas[atributo])
+
+    def __len__(self) -> int:
+        return len(self.edge)
+
+    def mascara_edges(self, edges: Iterable[str]) -> np.ndarray:
+        """Máscara booleana (por id de edge) para un subconjunto de calles."""
+        mascara = np.zeros(len(self.edges), dtype=bool)
+        for e in edges:
+            i = self.indice_edges.get(e)
+            if i is not None:
+                mascara[i] = True
+        return mascara
+
+    def agregar_por_edge(self) -> Dict[str, np.ndarray]:
+        """
+        Totales por edge de todas las filas cargadas: segundos muestreados,
+        velocidad media ponderada por muestreo, espera y pérdida de tiempo.
+        """
+        n = len(self.edges)
+        muestreo = np.bincount(self.edge, weights=self.muestreo, minlength=n)
+        dist = np.bincount(self.edge, weights=self.muestreo * self.velocidad, minlength=n)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            velocidad = np.where(muestreo > 0, dist / muestreo, np.nan)
+        return {
+            "muestreo": muestreo,
+            "velocidad": velocidad,
+            "espera": np.bincount(self.edge, weights=self.espera, minlength=n),
+            "perdida": np.bincount(self.edge, weights=self.perdida, minlength=n),
+        }
+
+
+def cargar_edgedata(ruta_xml: Path, desde: Optional[float] = None, hasta: Optional[float] = None,
+                    edges: Optional[Set[str]] = None) -> DatosEdge:
+    """
+    Lee edgeData con iterparse, liberando cada elemento tras procesarlo, de modo
+    que la memoria depende solo de las filas retenidas y no del tamaño del XML.
+    desde/hasta filtran intervalos (solapados con la ventana) y edges limita las calles.
+    """
+    ids: List[str] = []
+    indice: Dict[str, int] = {}
+    cols = {"inicio": array("d"), "fin": array("d"), "edge": array("q")}
+    for atributo in COLUMNAS.values():
+        cols[atributo] = array("d")
+
+    inicio = fin = 0.0
+    dentro = False
+    contexto = ET.iterparse(str(ruta_xml), events=("start", "end"))
+    _, raiz = next(contexto)
+
+    for evento, elem in contexto:
+        if evento == "start":
+            if elem.tag == "interval":
+                inicio = float(elem.get("begin", 0))
+                fin = float(elem.get("end", 0))
+                dentro = (desde is None or fin > desde) and (hasta is None or inicio < hasta)
+            continue
+
+        if elem.tag == "edge":
+            if dentro:
+                edge_id = elem.get("id")
+                if edges is None or edge_id in edges:
+                    i = indice.get(edge_id)
+                    if i is None:
+                        i = indice[edge_id] = len(ids)
+                        ids.append(edge_id)
+                    cols["inicio"].append(inicio)
+                    cols["fin"].append(fin)
+                    cols["edge"].append(i)
+                    for xml_attr, atributo in COLUMNAS.items():
+                        cols[atributo].append(float(elem.get(xml_attr, 0.0)))
+            elem.clear()
+        elif elem.tag == "interval":
+            elem.clear()
+            raiz.clear()
+
+    columnas = {k: np.frombuffer(v, dtype=np.float64 if v.typecode == "d" else np.int64).copy()
+                for k, v in cols.items()}
+    return DatosEdge(ids, columnas)
+
+
+def impacto_corredor(escenario: DatosEdge, base: DatosEdge,
+                     corredor: Optional[Iterable[str]] = None) -> Dict[str, dict]:
+    """
+    Compara un escenario (con overrides de semáforos) contra una corrida base,
+    edge a edge, dentro de la ventana con la que se cargaron ambos.
+
+    - retraso: diferencia de timeLoss (s)
+    - caida_velocidad: 1 - v_escenario / v_base, ponderada por tiempo muestreado
+    - veh_horas_perdidas: muestreo * (1 - v_escenario / v_base) / 3600
+    """
+    agg_esc = escenario.agregar_por_edge()
+    agg_base = base.agregar_por_edge()
+
+    # Alinear las calles del escenario con las de la base por id
+    idx_base = np.array([base.indice_edges.get(e, -1) for e in escenario.edges], dtype=np.int64)
+    valido = idx_base >= 0
+    idx_seguro = np.where(valido, idx_base, 0)
+
+    s_esc = agg_esc["muestreo"]
+    v_esc = agg_esc["velocidad"]
+    v_base = np.where(valido, agg_base["velocidad"][idx_seguro], np.nan)
+    perdida_base = np.where(valido, agg_base["perdida"][idx_seguro], 0.0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        relacion = np.where((v_base > 0) & (s_esc > 0), v_esc / v_base, 1.0)
+    relacion = np.nan_to_num(relacion, nan=1.0)
+    veh_h = s_esc * (1.0 - relacion) / 3600.0
+    retraso = agg_esc["perdida"] - perdida_base
+
+    def resumir(mascara: np.ndarray) -> dict:
+        m = mascara & valido
+        peso = s_esc[m].sum()
+        return {
+            "edges": int(m.sum()),
+            "veh_horas": float(peso / 3600.0),
+            "retraso_s": float(retraso[m].sum()),
+            "caida_velocidad": float(((1.0 - relacion[m]) * s_esc[m]).sum() / peso) if peso > 0 else 0.0,
+            "veh_horas_perdidas": float(veh_h[m].sum()),
+        }
+
+    resultado = {"red": resumir(np.ones(len(escenario.edges), dtype=bool))}
+    if corredor is not None:
+        resultado["corredor"] = resumir(escenario.mascara_edges(corredor))
+    return resultado
+
+
+def leer_mision(ruta_misiones: Path, id_mision: Optional[str] = None) -> Optional[dict]:
+    """Lee un registro de misiones.jsonl (la última si no se indica id)."""
+    mision = None
+    with open(ruta_misiones, "r") as f:
+        for linea in f:
+            if not linea.strip():
+                continue
+            registro = json.loads(linea)
+            if id_mision is None or str(registro.get("id_mision")) == str(id_mision):
+                mision = registro
+    return mision
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Impacto del corredor verde sobre el tráfico (edgeData)")
+    parser.add_argument("escenario", help="edgeData de la corrida con corredor verde")
+    parser.add_argument("base", help="edgeData de la corrida base (sin overrides)")
+    parser.add_argument("--mision", help="misiones.jsonl para tomar ventana y corredor")
+    parser.add_argument("--id", help="id de la misión dentro de --mision")
+    parser.add_argument("--desde", type=float)
+    parser.add_argument("--hasta", type=float)
+    parser.add_argument("--corredor", help="edges separados por coma")
+    args = parser.parse_args(argv)
+
+    desde, hasta = args.desde, args.hasta
+    corredor = args.corredor.split(",") if args.corredor else None
+    if args.mision:
+        mision = leer_mision(Path(args.mision), args.id)
+        if not mision:
+            print(f"[EDGEDATA] No se encontró la misión {args.id}")
+            return 1
+        ventanas = mision.get("ventanas_override") or []
+        if ventanas:
+            desde = min(v["t_inicio"] for v in ventanas) if desde is None else desde
+            hasta = max(v["t_fin"] for v in ventanas) if hasta is None else hasta
+        corredor = corredor or mision.get("ruta")
+
+    escenario = cargar_edgedata(Path(args.escenario), desde, hasta)
+    base = cargar_edgedata(Path(args.base), desde, hasta)
+    print(f"[EDGEDATA] Ventana [{desde}, {hasta}] | filas: {len(escenario)} escenario, {len(base)} base")
+
+    for ambito, r in impacto_corredor(escenario, base, corredor).items():
+        print(f"[EDGEDATA] {ambito.upper():9s} edges={r['edges']:4d} | veh·h={r['veh_horas']:.2f} | "
+              f"retraso={r['retraso_s']:+.0f}s | caída vel.={r['caida_velocidad'] * 100:+.1f}% | "
+              f"veh·h perdidas={r['veh_horas_perdidas']:+.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
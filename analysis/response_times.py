@@ -0,0 +1,298 @@
+"""
+Métricas de tiempo de respuesta sobre muchas corridas (misiones.jsonl + trayectorias .npz).
+
+Todas las corridas se concatenan en columnas NumPy con un id de corrida por
+muestra; las métricas se calculan con bincount sobre esas columnas, sin bucles
+por corrida. Los intervalos de confianza se obtienen por bootstrap entre corridas
+(semillas) de un mismo escenario (estrategia de ruta, corredor verde, plan predictivo).
+
+Uso:
+    python -m analysis.response_times [--misiones misiones.jsonl] [--base "LARGA|onda|plan"]
+                                      [--bins 10] [--top-tls 5] [--json reporte.json]
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from analysis.trajectory import cargar_trayectoria
+
+UMBRAL_DETENIDO = 0.1   # m/s
+METRICAS = ("t_respuesta", "t_viaje", "t_total", "t_detenido", "t_detenido_tls",
+            "retraso_edges", "indice_flujo_libre")
+
+
+class Corridas:
+    """
+    Trayectorias de varias misiones en formato columnar. Las columnas por
+    muestra llevan `corrida`; las columnas por calle de ruta se indexan con
+    `slot` = desplazamiento de la corrida + índice de ruta.
+    """
+
+    def __init__(self, misiones: List[dict], trayectorias: List[Dict[str, np.ndarray]],
+                 factor_velocidad: float = 1.0):
+        if not trayectorias:
+            raise ValueError("se necesita al menos una corrida")
+        self.misiones = misiones
+        self.n = len(misiones)
+        muestras = np.array([len(tr["t"]) for tr in trayectorias], dtype=np.int64)
+        calles = np.array([len(tr["longitudes"]) for tr in trayectorias], dtype=np.int64)
+
+        def unir(clave):
+            return np.concatenate([tr[clave] for tr in trayectorias])
+
+        # Columnas por muestra
+        self.corrida = np.repeat(np.arange(self.n), muestras)
+        self.t = unir("t")
+        self.velocidad = unir("velocidad")
+        self.pos_en_edge = unir("pos_en_edge")
+        # dt de cada muestra hasta la siguiente; la última de cada corrida no suma
+        self.dt = np.maximum(np.diff(self.t, append=self.t[-1]), 0.0)
+        self.dt[np.cumsum(muestras) - 1] = 0.0
+
+        # Columnas por calle de ruta
+        self.corrida_slot = np.repeat(np.arange(self.n), calles)
+        inicio_corrida = np.concatenate(([0], np.cumsum(calles)[:-1]))
+        self.longitudes = np.nan_to_num(unir("longitudes"))
+        self.v_libre = unir("vmax") * factor_velocidad
+        self.es_tls = unir("es_tls").astype(bool)
+        # Semáforo de cada calle como código en tls_ids (-1 = ninguno). Las
+        # trayectorias anteriores a la columna "tls" solo aportan al total.
+        nombres = np.concatenate([tr["tls"].astype(str) if "tls" in tr else np.full(len(tr["longitudes"]), "")
+                                  for tr in trayectorias])
+        self.tls_ids, codigos = np.unique(nombres, return_inverse=True)
+        if len(self.tls_ids) and self.tls_ids[0] == "":
+            self.tls_ids, codigos = self.tls_ids[1:], codigos - 1
+        self.tls_slot = np.where(self.es_tls, codigos, -1)
+
+        indice = np.clip(unir("indice_ruta").astype(np.int64), 0, np.maximum(calles[self.corrida] - 1, 0))
+        self.slot = inicio_corrida[self.corrida] + indice
+
+        # Distancia desde el origen de la ruta hasta el inicio de cada calle
+        acumulada = np.cumsum(self.longitudes)
+        base = np.concatenate(([0.0], acumulada))[inicio_corrida]
+        self.inicio_edge = acumulada - self.longitudes - base[self.corrida_slot]
+        self.largo_ruta = np.bincount(self.corrida_slot, weights=self.longitudes, minlength=self.n)
+
+    def escenarios(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(etiquetas únicas, índice de escenario por corrida)."""
+        etiquetas = np.array([etiqueta_escenario(m) for m in self.misiones])
+        return np.unique(etiquetas, return_inverse=True)
+
+
+def etiqueta_escenario(mision: dict) -> str:
+    partes = [
+        str(mision.get("estrategia", "?")),
+        "onda" if mision.get("corredor_verde", True) else "sin_onda",
+        "plan" if mision.get("plan_predictivo", False) else "reactivo",
+    ]
+    # Corridas meso/híbridas aparte (las micro conservan la etiqueta de siempre)
+    if mision.get("modo_simulacion", "MICRO") != "MICRO":
+        partes.append(str(mision["modo_simulacion"]).lower())
+    return "|".join(partes)
+
+
+def cargar_corridas(ruta_misiones: Path, factor_velocidad: Optional[float] = None) -> Optional[Corridas]:
+    """
+    Lee misiones.jsonl y las trayectorias .npz que referencia (las que falten se
+    omiten). Retorna None si ninguna misión tiene trayectoria.
+    """
+    if factor_velocidad is None:
+        from config import FACTOR_VELOCIDAD_AMBULANCIA
+        factor_velocidad = FACTOR_VELOCIDAD_AMBULANCIA
+
+    misiones, trayectorias = [], []
+    with open(ruta_misiones, "r") as f:
+        for linea in f:
+            if not linea.strip():
+                continue
+            mision = json.loads(linea)
+            ruta_npz = mision.get("trayectoria")
+            if not ruta_npz:
+                continue
+            ruta_npz = Path(ruta_npz)
+            if not ruta_npz.is_absolute():
+                ruta_npz = Path(ruta_misiones).parent / ruta_npz
+            trayectoria = cargar_trayectoria(ruta_npz)
+            if trayectoria is None or len(trayectoria["t"]) == 0 or len(trayectoria["longitudes"]) == 0:
+                continue
+            misiones.append(mision)
+            trayectorias.append(trayectoria)
+    if not trayectorias:
+        return None
+    return Corridas(misiones, trayectorias, factor_velocidad)
+
+
+def metricas_por_corrida(c: Corridas) -> Dict[str, np.ndarray]:
+    """Un arreglo de largo `c.n` por métrica (s, salvo indice_flujo_libre, adimensional)."""
+    def campo(nombre):
+        return np.array([np.nan if m.get(nombre) is None else m[nombre] for m in c.misiones], dtype=float)
+
+    t_accidente, t_despacho, t_llegada = campo("t_accidente"), campo("t_despacho"), campo("t_llegada")
+    detenido = c.velocidad < UMBRAL_DETENIDO
+    n_slots = len(c.longitudes)
+
+    # Retraso por calle: tiempo real en la calle menos el tiempo a flujo libre
+    t_edge = np.bincount(c.slot, weights=c.dt, minlength=n_slots)
+    visitada = np.bincount(c.slot, minlength=n_slots) > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_libre = np.where(c.v_libre > 0, c.longitudes / c.v_libre, np.nan)
+    retraso_slot = np.where(visitada & ~np.isnan(t_libre), np.maximum(t_edge - np.nan_to_num(t_libre), 0.0), 0.0)
+
+    v_libre_muestra = np.nan_to_num(c.v_libre[c.slot])
+    recorrido = np.bincount(c.corrida, weights=c.velocidad * c.dt, minlength=c.n)
+    recorrido_libre = np.bincount(c.corrida, weights=v_libre_muestra * c.dt, minlength=c.n)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        indice_flujo_libre = np.where(recorrido_libre > 0, recorrido / recorrido_libre, np.nan)
+
+    return {
+        "t_respuesta": t_despacho - t_accidente,
+        "t_viaje": t_llegada - t_despacho,
+        "t_total": t_llegada - t_accidente,
+        "t_detenido": np.bincount(c.corrida, weights=c.dt * detenido, minlength=c.n),
+        "t_detenido_tls": np.bincount(c.corrida, weights=c.dt * (detenido & c.es_tls[c.slot]), minlength=c.n),
+        "retraso_edges": np.bincount(c.corrida_slot, weights=retraso_slot, minlength=c.n),
+        "indice_flujo_libre": indice_flujo_libre,
+    }
+
+
+def detenido_por_tls(c: Corridas) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Tiempo detenido en el acceso a cada semáforo, por corrida: bincount sobre
+    (corrida, semáforo). Retorna (matriz (n, n_tls) en s, máscara de los
+    semáforos que están en la ruta de cada corrida).
+    """
+    n_tls = len(c.tls_ids)
+    if n_tls == 0:
+        return np.zeros((c.n, 0)), np.zeros((c.n, 0), dtype=bool)
+    tls_muestra = c.tls_slot[c.slot]
+    detenido = (c.velocidad < UMBRAL_DETENIDO) & (tls_muestra >= 0)
+    clave = c.corrida[detenido] * n_tls + tls_muestra[detenido]
+    matriz = np.bincount(clave, weights=c.dt[detenido], minlength=c.n * n_tls).reshape(c.n, n_tls)
+    con_tls = c.tls_slot >= 0
+    en_ruta = np.bincount(c.corrida_slot[con_tls] * n_tls + c.tls_slot[con_tls],
+                          minlength=c.n * n_tls).reshape(c.n, n_tls) > 0
+    return matriz, en_ruta
+
+
+def perfil_velocidad(c: Corridas, escenario: np.ndarray, n_escenarios: int, bins: int = 10) -> np.ndarray:
+    """
+    Relación v / v_libre por escenario y tramo de la ruta (fracción de su
+    longitud), ponderada por tiempo. Forma (n_escenarios, bins).
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraccion = (c.inicio_edge[c.slot] + c.pos_en_edge) / c.largo_ruta[c.corrida]
+    tramo = np.clip(np.nan_to_num(fraccion * bins).astype(np.int64), 0, bins - 1)
+    clave = escenario[c.corrida] * bins + tramo
+    v_libre = np.nan_to_num(c.v_libre[c.slot])
+    suma_v = np.bincount(clave, weights=c.velocidad * c.dt, minlength=n_escenarios * bins)
+    suma_libre = np.bincount(clave, weights=v_libre * c.dt, minlength=n_escenarios * bins)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(suma_libre > 0, suma_v / suma_libre, np.nan).reshape(n_escenarios, bins)
+
+
+def intervalo_confianza(valores: np.ndarray, nivel: float = 0.95, n_boot: int = 2000,
+                        semilla: int = 0) -> Tuple[float, float, float]:
+    """(media, inf, sup) por bootstrap percentil; todas las réplicas en una sola matriz."""
+    valores = valores[~np.isnan(valores)]
+    if len(valores) == 0:
+        return np.nan, np.nan, np.nan
+    if len(valores) == 1:
+        return float(valores[0]), np.nan, np.nan
+    rng = np.random.default_rng(semilla)
+    medias = valores[rng.integers(0, len(valores), size=(n_boot, len(valores)))].mean(axis=1)
+    alfa = (1.0 - nivel) / 2.0
+    inf, sup = np.quantile(medias, [alfa, 1.0 - alfa])
+    return float(valores.mean()), float(inf), float(sup)
+
+
+def diferencia_medias(a: np.ndarray, b: np.ndarray, nivel: float = 0.95, n_boot: int = 2000,
+                      semilla: int = 0) -> Tuple[float, float, float]:
+    """Diferencia media(a) - media(b) con intervalo bootstrap (grupos independientes)."""
+    a, b = a[~np.isnan(a)], b[~np.isnan(b)]
+    if len(a) < 2 or len(b) < 2:
+        return (float(a.mean() - b.mean()) if len(a) and len(b) else np.nan), np.nan, np.nan
+    rng = np.random.default_rng(semilla)
+    dif = (a[rng.integers(0, len(a), size=(n_boot, len(a)))].mean(axis=1)
+           - b[rng.integers(0, len(b), size=(n_boot, len(b)))].mean(axis=1))
+    alfa = (1.0 - nivel) / 2.0
+    inf, sup = np.quantile(dif, [alfa, 1.0 - alfa])
+    return float(a.mean() - b.mean()), float(inf), float(sup)
+
+
+def reporte(c: Corridas, base: Optional[str] = None, bins: int = 10) -> dict:
+    """Resumen por escenario: media e IC95 de cada métrica, perfil y diferencias contra `base`."""
+    etiquetas, escenario = c.escenarios()
+    metricas = metricas_por_corrida(c)
+    perfil = perfil_velocidad(c, escenario, len(etiquetas), bins)
+    por_tls, en_ruta = detenido_por_tls(c)
+
+    resultado = {"corridas": c.n, "escenarios": {}}
+    for k, etiqueta in enumerate(etiquetas):
+        mascara = escenario == k
+        resumen = {"corridas": int(mascara.sum()), "perfil_velocidad": perfil[k].round(3).tolist()}
+        for nombre in METRICAS:
+            media, inf, sup = intervalo_confianza(metricas[nombre][mascara])
+            resumen[nombre] = {"media": media, "ic95": [inf, sup]}
+        # Por semáforo, sobre las corridas que lo tienen en la ruta; de mayor a menor media
+        detalle = {}
+        for j, tls_id in enumerate(c.tls_ids):
+            corridas_tls = mascara & en_ruta[:, j]
+            if corridas_tls.any():
+                media, inf, sup = intervalo_confianza(por_tls[corridas_tls, j])
+                detalle[str(tls_id)] = {"media": media, "ic95": [inf, sup], "corridas": int(corridas_tls.sum())}
+        resumen["t_detenido_por_tls"] = dict(sorted(detalle.items(), key=lambda kv: -kv[1]["media"]))
+        if base is not None and base in etiquetas and etiqueta != base:
+            mascara_base = escenario == int(np.flatnonzero(etiquetas == base)[0])
+            resumen["vs_base"] = {}
+            for nombre in METRICAS:
+                dif, inf, sup = diferencia_medias(metricas[nombre][mascara], metricas[nombre][mascara_base])
+                resumen["vs_base"][nombre] = {"diferencia": dif, "ic95": [inf, sup]}
+        resultado["escenarios"][str(etiqueta)] = resumen
+    return resultado
+
+
+def main(argv=None) -> int:
+    from config import ARCHIVO_MISIONES
+
+    parser = argparse.ArgumentParser(description="Tiempos de respuesta por escenario con IC95")
+    parser.add_argument("--misiones", default=str(ARCHIVO_MISIONES))
+    parser.add_argument("--base", help="escenario de referencia, p. ej. 'LARGA|sin_onda|reactivo'")
+    parser.add_argument("--bins", type=int, default=10, help="tramos del perfil de velocidad")
+    parser.add_argument("--top-tls", type=int, default=5, help="semáforos con más tiempo detenido a listar")
+    parser.add_argument("--json", help="guardar el reporte completo en este archivo")
+    args = parser.parse_args(argv)
+
+    corridas = cargar_corridas(Path(args.misiones))
+    if corridas is None:
+        print("[RESPUESTA] No hay misiones con trayectoria registrada")
+        return 1
+    resultado = reporte(corridas, args.base, args.bins)
+
+    print(f"[RESPUESTA] {resultado['corridas']} corridas")
+    for etiqueta, r in resultado["escenarios"].items():
+        print(f"\n[RESPUESTA] {etiqueta} ({r['corridas']} corridas)")
+        for nombre in METRICAS:
+            m = r[nombre]
+            linea = f"  {nombre:20s} {m['media']:9.2f}  IC95 [{m['ic95'][0]:.2f}, {m['ic95'][1]:.2f}]"
+            if "vs_base" in r:
+                d = r["vs_base"][nombre]
+                linea += f"  Δbase {d['diferencia']:+.2f} [{d['ic95'][0]:+.2f}, {d['ic95'][1]:+.2f}]"
+            print(linea)
+        print("  perfil v/v_libre     " + " ".join(f"{v:.2f}" for v in r["perfil_velocidad"]))
+        for tls_id, m in list(r["t_detenido_por_tls"].items())[:args.top_tls]:
+            print(f"  detenido en {tls_id:20s} {m['media']:7.2f}  IC95 [{m['ic95'][0]:.2f}, {m['ic95'][1]:.2f}]"
+                  f"  ({m['corridas']} corridas)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(resultado, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+Registro de la trayectoria de una ambulancia durante una misión, guardado como
+.npz (columnas NumPy) para su análisis posterior con analysis.response_times.
+"""
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+COLUMNAS = ("t", "x", "y", "velocidad", "indice_ruta", "pos_en_edge")
+
+
+class RegistroTrayectoria:
+    """
+    Acumula una muestra por paso en arreglos compactos (array("d")) y guarda,
+    junto a la trayectoria, la longitud y velocidad máxima de cada calle de la
+    ruta y qué semáforo controla el giro al final de cada calle ("" si
+    ninguno), para no depender de la red al analizar.
+    """
+
+    def __init__(self, ruta_edges: List[str], indice_tls=None):
+        self.columnas = {c: array("d") for c in COLUMNAS}
+        n = len(ruta_edges)
+        self.longitudes = np.full(n, np.nan)
+        self.vmax = np.full(n, np.nan)
+        self.es_tls = np.zeros(n, dtype=bool)
+        self.tls = [""] * n
+        if indice_tls is not None:
+            for i, edge_id in enumerate(ruta_edges):
+                datos = indice_tls.datos_edge(edge_id)
+                if datos:
+                    self.longitudes[i], self.vmax[i] = datos[0], datos[1]
+                tls_id = indice_tls.tls_en_movimiento(edge_id, ruta_edges[i + 1]) if i + 1 < n else None
+                if tls_id:
+                    self.es_tls[i] = True
+                    self.tls[i] = tls_id
+
+    def __len__(self) -> int:
+        return len(self.columnas["t"])
+
+    def registrar(self, t: float, muestra: Dict) -> None:
+        c = self.columnas
+        c["t"].append(t)
+        c["x"].append(muestra["x"])
+        c["y"].append(muestra["y"])
+        c["velocidad"].append(muestra["velocidad"])
+        c["indice_ruta"].append(muestra["indice_ruta"])
+        c["pos_en_edge"].append(muestra["pos_en_edge"])
+
+    def guardar(self, ruta_npz: Path) -> bool:
+        try:
+            ruta_npz = Path(ruta_npz)
+            ruta_npz.parent.mkdir(parents=True, exist_ok=True)
+            arreglos = {c: np.frombuffer(v, dtype=np.float64) for c, v in self.columnas.items()}
+            arreglos["indice_ruta"] = arreglos["indice_ruta"].astype(np.int32)
+            np.savez_compressed(ruta_npz, longitudes=self.longitudes, vmax=self.vmax,
+                                es_tls=self.es_tls, tls=np.array(self.tls, dtype=str), **arreglos)
+            return True
+        except Exception as e:
+            print(f"[TRAYECTORIA] Error guardando {ruta_npz}: {e}")
+            return False
+
+
+def cargar_trayectoria(ruta_npz: Path) -> Optional[Dict[str, np.ndarray]]:
+    try:
+        with np.load(ruta_npz) as datos:
+            return {k: datos[k] for k in datos.files}
+    except Exception as e:
+        print(f"[TRAYECTORIA] Error cargando {ruta_npz}: {e}")
+        return None
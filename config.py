@@ -8,11 +8,58 @@ SIMULACION_SUMO = "sumo_simulation"
 SUMO_CFG = PROYECTO_ROOT / SIMULACION_SUMO / "map.sumocfg"
 SUMO_NET = PROYECTO_ROOT / SIMULACION_SUMO / "map.net.xml"
 SUMO_ROUTES = PROYECTO_ROOT / SIMULACION_SUMO / "routes.rou.xml"
+SUMO_TRIPS = PROYECTO_ROOT / SIMULACION_SUMO / "trafico.trips.xml"     # demanda de fondo sin rutear
+
+# Salidas de la simulación
+EDGEDATA_SALIDA = PROYECTO_ROOT / SIMULACION_SUMO / "edgeData_output.xml"
+ARCHIVO_MISIONES = PROYECTO_ROOT / "misiones.jsonl"
+DIRECTORIO_TRAYECTORIAS = PROYECTO_ROOT / "trayectorias"   # un .npz por misión
+ARCHIVO_TABLA_DESPACHO = PROYECTO_ROOT / "tabla_despacho.json"   # despachos precalculados por zona
+DIRECTORIO_PERFILES_VIAJE = PROYECTO_ROOT / "perfiles_viaje"     # tiempos históricos por calle y franja
+DIRECTORIO_TESELAS = PROYECTO_ROOT / "teselas_red"               # red partida en teselas (routing.tiles)
 
 SUMO_BIN = os.getenv("SUMO_HOME", "/usr/share/sumo") + "/bin/sumo"
 
+# --- POOL DE INSTANCIAS SUMO (consultas "¿qué pasaría si...?") ---
+POOL_SUMO_TAMANO = 2                # instancias calentadas por defecto
+POOL_SUMO_MAX = 8                   # tope de instancias por pool
+POOL_SUMO_MAX_USOS = 50             # arriendos antes de reciclar el proceso
+POOL_SUMO_PASOS_CALENTAMIENTO = 0   # s simulados antes de guardar el snapshot
+POOL_SUMO_INTERVALO_SALUD = 30      # s entre chequeos de las instancias ociosas
+
+# --- MODO DE SIMULACIÓN (sumo_interface.meso) ---
+# "MICRO"   = microsimulación completa
+# "MESO"    = mesoscópico en toda la red, con control de cruces (la onda verde sigue actuando)
+# "HIBRIDO" = mesoscópico grueso en la red y control de cruces solo en los corredores de
+#             la tabla de despachos (fijados al arrancar: SUMO no cambia el modo de una
+#             calle con la simulación en marcha)
+MODOS_SIMULACION = ("MICRO", "MESO", "HIBRIDO")
+MODO_SIMULACION = os.getenv("MODO_SIMULACION", "MICRO")
+MESO_LONGITUD_SEGMENTO = 98.0       # m por segmento de cola (--meso-edgelength)
+MESO_PENALIDAD_SEMAFORO = 1.0       # demora por semáforo fuera de los corredores (--meso-tls-penalty)
+MARGEN_CORREDOR_MESO = 1            # cruces alrededor de cada ruta que también van en detalle
+RED_HIBRIDA = PROYECTO_ROOT / SIMULACION_SUMO / "map.hibrido.net.xml"
+TIPOS_MESO_HIBRIDO = PROYECTO_ROOT / SIMULACION_SUMO / "meso_corredor.add.xml"
+
+# --- RUTEO MASIVO DE DEMANDA (routing.bulk_router) ---
+RUTEO_MASIVO_BLOQUE = 50000         # viajes leídos, ruteados y escritos por bloque
+RUTEO_MASIVO_PROCESOS = None        # None = un proceso por CPU
+RUTEO_MASIVO_CLASE = "passenger"    # clase de vehículo SUMO para los giros y carriles permitidos
+
+# --- REGISTRO (structured_log) ---
+LOG_NIVEL = os.getenv("LOG_NIVEL", "INFO")
+# Nivel por etiqueta, p. ej. {"DIJKSTRA": "DEBUG"} para ver cada ruta nodo a nodo
+LOG_NIVELES_MODULO = {}
+LOG_ARCHIVO = PROYECTO_ROOT / "registro.jsonl"        # None = solo consola
+LOG_CAPACIDAD_COLA = 10000          # registros en espera; al llenarse se descartan
+LOG_BUFFER_TAM = 2000               # registros recientes retenidos en memoria
+LOG_NIVEL_BUFFER = "INFO"           # "DEBUG" guarda también el detalle (más costo por registro)
+LOG_ARCHIVO_VOLCADO = PROYECTO_ROOT / "volcado_registro.jsonl"   # buffer escrito tras un error crítico
+
 # --- CONFIGURACIÓN DE CONEXIÓN ---
 PUERTO_TRACI = 8813
+# Semilla de SUMO (--seed); fijarla por corrida permite comparar escenarios con IC
+SEMILLA_SUMO = int(os.getenv("SEMILLA_SUMO")) if os.getenv("SEMILLA_SUMO") else None
 #HOST_TRACI = "localhost"
 
 # --- CONFIGURACIÓN DE ACTIVACIÓN ---
@@ -25,12 +72,91 @@ TIEMPO_RESPUESTA = 10
 # --- CONFIGURACIÓN DE SEMÁFOROS (PRIORIDAD) ---
 ACTIVAR_PRIORIDAD_SEMAFORICA = True
 DISTANCIA_DETECCION_SEMAFORO = 50
+ESPEJO_MAX_AUDITORIA = 20000        # escrituras a semáforos retenidas en la auditoría (traffic_control.tls_state)
+
+# --- PLANIFICACIÓN PREDICTIVA DEL CORREDOR VERDE ---
+# Si está activa, al despachar se programan todos los semáforos de la ruta por ETA.
+# La detección reactiva a DISTANCIA_DETECCION_SEMAFORO queda solo como respaldo.
+ACTIVAR_PLAN_PREDICTIVO = True
+FACTOR_VELOCIDAD_AMBULANCIA = 1.5   # Igual al speedFactor del tipo "ambulancia"
+VELOCIDAD_MINIMA_ETA = 2.0          # m/s, evita ETAs infinitas en calles detenidas
+TIEMPO_PERDIDO_ARRANQUE = 2.0       # s, pérdida inicial al despejar una cola
+HEADWAY_DESCARGA = 2.0              # s por vehículo en cola
+MARGEN_PREEMPCION = 3.0             # s extra antes del adelanto calculado
+RADIO_CONTEXTO_SEMAFORO = 100       # m, radio de la suscripción de contexto por junction
+PERIODO_REFINAMIENTO_PLAN = 2       # s de simulación entre refinamientos del plan
+
+# Tabla de despachos precalculada: se ignora si el tráfico actual multiplica el
+# tiempo de viaje de la ruta guardada por más de este factor
+UMBRAL_DESVIO_TABLA = 2.0
+
+# --- PERFILES HISTÓRICOS DE TIEMPO DE VIAJE ---
+# Si está activo, el despacho en vivo minimiza el tiempo histórico de la franja
+# horaria en vez de la longitud, y al cerrar se acumula el edgeData de la corrida.
+USAR_PERFILES_VIAJE = False
+TAM_FRANJA_PERFIL = 900             # s por franja (96 franjas por día)
+ALFA_PERFIL = 0.3                   # peso de cada corrida nueva en el suavizado exponencial
+DESFASE_HORARIO_SIM = 8 * 3600      # hora del día (s) que corresponde a t=0 de la simulación
+
+# --- RED TESELADA (carga por región de interés) ---
+# Si está activa, la ruta en vivo se calcula sobre las teselas que cubren base y
+# accidente (más MARGEN_TESELAS por lado), cargando más solo si la búsqueda sale de ellas.
+USAR_RED_TESELADA = False
+TAM_TESELA = 500                    # m de lado
+MARGEN_TESELAS = 1                  # teselas extra alrededor del corredor
+
+# Hilos que calculan rutas en vivo mientras el bucle sigue avanzando la simulación
+HILOS_PLANIFICACION = 1
+
+# --- LIBERACIÓN POR INTERSECCIÓN (tras el paso de la ambulancia) ---
+DURACION_AMARILLO_LIBERACION = 3    # s de ámbar antes de devolver el programa
+FACTOR_COMPENSACION = 0.5           # s de verde extra por s de bloqueo a la calle transversal
+MAX_COMPENSACION = 30               # s, tope de la fase de compensación
+MAX_MEDICION_DESCARGA = 180         # s, tiempo máximo midiendo la descarga de colas
+
+# --- NOTIFICACIONES (despacho en segundo plano) ---
+ARCHIVO_NOTIFICACIONES = PROYECTO_ROOT / "notificaciones.jsonl"
+NOTIF_WEBHOOK_URL = os.getenv("NOTIF_WEBHOOK_URL")   # None = sin webhook
+NOTIF_CAPACIDAD_COLA = 1000         # alertas por sumidero; al llenarse se descarta la más antigua
+NOTIF_TAM_LOTE = 20                 # alertas por envío
+NOTIF_VENTANA_LOTE = 0.2            # s de espera para acumular un lote
+NOTIF_MAX_REINTENTOS = 3
+NOTIF_BACKOFF_BASE = 0.5            # s, se duplica en cada reintento
+NOTIF_BACKOFF_MAX = 8.0
+
+# Historial persistente de alertas (segmentos SQLite en modo WAL)
+DIRECTORIO_HISTORIAL = PROYECTO_ROOT / "historial_alertas"
+HISTORIAL_MAX_BYTES = 64 * 1024 * 1024   # rotación por tamaño de segmento
+HISTORIAL_MAX_SEGUNDOS = 24 * 3600       # rotación por antigüedad de segmento
+HISTORIAL_MAX_SEGMENTOS = 30             # None = conservar todos
+HISTORIAL_MAX_MEMORIA = 500              # alertas recientes retenidas en Notificador.historial
+
+# --- STREAM DE POSICIONES (dashboards) ---
+ACTIVAR_STREAM_POSICIONES = False     # abre un listener TCP/Unix en cada corrida
+POSICIONES_SOCKET = os.getenv("POSICIONES_SOCKET")   # ruta de socket Unix; None = TCP
+POSICIONES_HOST = "127.0.0.1"
+POSICIONES_PUERTO = 8765
+POSICIONES_HZ_DEFECTO = 1.0         # mensajes/s si el cliente no pide otra frecuencia
+POSICIONES_HZ_MAX = 10.0
 
 # --- CONFIGURACIÓN DE VEHÍCULOS ---
 AMBULANCIAS_DISPONIBLES = [
     {"id": "ambulancia_1", "inicio": "421920983#1", "hospital": "24214589#1"}
 ]
 
+# --- ASIGNACIÓN DE FLOTA ---
+# Si está activa, cada despacho elige la unidad por asignación óptima en lote
+# (fleet.assignment) entre AMBULANCIAS_DISPONIBLES y UNIDADES_POR_BASE unidades
+# en cada base; la unidad sale desde donde está (se ignoran EDGE_INICIO_MANUAL y la tabla).
+ACTIVAR_ASIGNACION_FLOTA = False
+UNIDADES_POR_BASE = 1
+PRESUPUESTO_ASIGNACION = 0.2        # s de cómputo; agotado, el resto se asigna de forma voraz
+
+# Cobertura y ubicación de bases (python -m fleet.coverage)
+TIEMPO_COBERTURA = 480              # s, tiempo de respuesta objetivo (8 min)
+FACTOR_HORIZONTE_COBERTURA = 2.0    # la p-mediana mira hasta este múltiplo del objetivo
+PRESUPUESTO_UBICACION = 120         # s de búsqueda local
+
 # --- VARIABLES DE CONTROL DE ESCENARIO ---
 ACCIDENTE_ID_MANUAL = "cJ3_4" # POSICION DE CAMARA
 
@@ -41,9 +167,17 @@ EDGE_INICIO_MANUAL = "534500048#0"  # Edge de inicio de ambulancia (Salida fija)
 # Modo de Selección de Base (Solo si EDGE_INICIO_MANUAL es None)
 # "LEJANIA"  = Selecciona la base más lejana (Simula el peor caso).
 # "CERCANIA" = Selecciona la base más cercana (Simula la respuesta óptima).
+# "TIEMPO"   = Menor ETA según los perfiles históricos (requiere USAR_PERFILES_VIAJE).
 #MODO_SELECCION_BASE = "CERCANIA"
 MODO_SELECCION_BASE = "LEJANIA"
 
+# "CORTA" = Dijkstra directo | "LARGA" = desvío por el nodo más lejano
+# "PARETO" = menos semáforos preemptados si el costo no sube más de TOLERANCIA_PARETO
 #TIPO_DE_RUTA = "CORTA"
 TIPO_DE_RUTA = "LARGA"
+TOLERANCIA_PARETO = 0.15            # fracción de costo extra aceptada por menos preempciones
+PRESUPUESTO_PARETO = 0.05           # s de cómputo del frente; agotado, se usa lo encontrado
+# Rutear en vivo sobre el grafo con las cadenas de grado 2 colapsadas (routing.chains).
+# No aplica con USAR_RED_TESELADA (las teselas se cargan sobre el grafo original).
+COMPRIMIR_CADENAS = True
 
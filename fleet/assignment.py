@@ -0,0 +1,243 @@
+"""
+Asignación óptima de ambulancias a incidentes simultáneos.
+
+Con varios incidentes pendientes, asignar de a uno (la unidad más cercana al
+primero) puede dejar al segundo sin una unidad razonable. Aquí se arma la
+matriz incidente × unidad de tiempos de viaje y se resuelve de una vez con el
+método húngaro, dentro de un presupuesto de tiempo de cómputo.
+
+La matriz sale de una búsqueda uno-a-muchos por incidente: un Dijkstra inverso
+(sobre predecesores) desde el junction del incidente da el tiempo desde todos
+los nodos, y cada unidad solo suma el tiempo de terminar su calle actual. Con
+cientos de unidades el costo lo domina el número de incidentes, no de unidades.
+"""
+import heapq
+import time
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+from config import FACTOR_VELOCIDAD_AMBULANCIA, VELOCIDAD_MINIMA_ETA
+from fleet.registry import RegistroFlota, Unidad
+from structured_log import obtener_logger
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+log = obtener_logger("FLOTA")
+
+# Costo de un par sin ruta. Finito para que el húngaro no opere con infinitos;
+# una asignación con este costo se descarta y el incidente queda pendiente.
+COSTO_INALCANZABLE = 1e9
+
+# Velocidad (m/s) cuando no hay índice de semáforos con la vmax de la calle
+VELOCIDAD_SIN_INDICE = 13.89
+
+
+def tiempo_edge_ambulancia(datos: dict, indice_tls) -> float:
+    """Tiempo de flujo libre de una arista del grafo a la velocidad de la ambulancia."""
+    info = indice_tls.datos_edge(datos.get("edge_id")) if indice_tls is not None else None
+    if info:
+        longitud, vmax = info[0], info[1]
+    else:
+        longitud, vmax = datos.get("peso", 0), VELOCIDAD_SIN_INDICE
+    return longitud / max(vmax * FACTOR_VELOCIDAD_AMBULANCIA, VELOCIDAD_MINIMA_ETA)
+
+
+def hungaro(costos: np.ndarray, presupuesto: Optional[float] = None) -> Tuple[np.ndarray, bool]:
+    """
+    Asignación de costo mínimo para una matriz filas × columnas con filas <= columnas
+    (algoritmo de caminos aumentantes más cortos con potenciales, O(n²·m), con
+    el barrido de columnas vectorizado en NumPy).
+
+    Retorna (columna asignada a cada fila, optima). Si se agota `presupuesto`
+    (segundos), las filas restantes se completan de forma voraz y optima=False.
+    """
+    n, m = costos.shape
+    if n > m:
+        raise ValueError("hungaro requiere filas <= columnas")
+    t0 = time.perf_counter()
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.int64)       # p[j] = fila (1..n) asignada a la columna j; 0 = libre
+    camino = np.zeros(m + 1, dtype=np.int64)
+    optima = True
+
+    fila = 1
+    while fila <= n:
+        if presupuesto is not None and time.perf_counter() - t0 > presupuesto:
+            optima = False
+            break
+        p[0] = fila
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        usada = np.zeros(m + 1, dtype=bool)
+        while True:
+            usada[j0] = True
+            i0 = p[j0]
+            libres = ~usada[1:]
+            reducido = costos[i0 - 1] - u[i0] - v[1:]
+            mejora = libres & (reducido < minv[1:])
+            minv[1:][mejora] = reducido[mejora]
+            camino[1:][mejora] = j0
+            candidatos = np.where(libres, minv[1:], np.inf)
+            j1 = int(np.argmin(candidatos)) + 1
+            delta = candidatos[j1 - 1]
+            usadas = np.flatnonzero(usada)
+            u[p[usadas]] += delta
+            v[usadas] -= delta
+            minv[1:][libres] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = camino[j0]
+            p[j0] = p[j1]
+            j0 = j1
+        fila += 1
+
+    asignacion = np.full(n, -1, dtype=np.int64)
+    for j in range(1, m + 1):
+        if p[j]:
+            asignacion[p[j] - 1] = j - 1
+
+    # Presupuesto agotado: el resto de filas toma la columna libre más barata
+    if not optima:
+        ocupadas = np.zeros(m, dtype=bool)
+        ocupadas[asignacion[asignacion >= 0]] = True
+        for i in range(fila - 1, n):
+            fila_costos = np.where(ocupadas, np.inf, costos[i])
+            j = int(np.argmin(fila_costos))
+            asignacion[i] = j
+            ocupadas[j] = True
+    return asignacion, optima
+
+
+class AsignadorFlota:
+    """
+    Mantiene los incidentes pendientes y los asigna en lote a las unidades
+    disponibles del RegistroFlota. Cuando una unidad se libera y hay incidentes
+    esperando, vuelve a resolver; esas asignaciones quedan en `listas` hasta
+    que el bucle de simulación las toma con tomar_asignaciones().
+    """
+
+    def __init__(self, grafo: "nx.DiGraph", registro: RegistroFlota, indice_tls=None,
+                 presupuesto: Optional[float] = None):
+        self.registro = registro
+        self.presupuesto = presupuesto
+        self.pendientes: Dict[str, str] = {}        # id_incidente -> junction destino
+        self.listas: List[dict] = []
+        self.ultima_resolucion: Dict[str, float] = {}
+        self._cache_tiempos: Dict[str, np.ndarray] = {}
+
+        # Grafo compacto: nodos numerados y, por nodo, sus aristas entrantes con tiempo
+        self.nodos = list(grafo.nodes())
+        self.indice_nodo = {nodo: i for i, nodo in enumerate(self.nodos)}
+        self.entrantes: List[List[Tuple[int, float]]] = [[] for _ in self.nodos]
+        self.edges: Dict[str, Tuple[int, float]] = {}   # edge_id -> (nodo destino, tiempo)
+        for a, b, datos in grafo.edges(data=True):
+            tiempo = self._tiempo_edge(datos, indice_tls)
+            ia, ib = self.indice_nodo[a], self.indice_nodo[b]
+            self.entrantes[ib].append((ia, tiempo))
+            self.edges[str(datos.get("edge_id"))] = (ib, tiempo)
+
+        registro.al_liberar(self._al_liberar_unidad)
+
+    @staticmethod
+    def _tiempo_edge(datos: dict, indice_tls) -> float:
+        return tiempo_edge_ambulancia(datos, indice_tls)
+
+    def tiempos_hacia(self, destino: str) -> np.ndarray:
+        """Tiempo desde cada nodo hasta `destino` (Dijkstra inverso). inf si no hay ruta."""
+        tiempos = self._cache_tiempos.get(destino)
+        if tiempos is not None:
+            return tiempos
+        tiempos = np.full(len(self.nodos), np.inf)
+        origen = self.indice_nodo.get(destino)
+        if origen is not None:
+            tiempos[origen] = 0.0
+            cola = [(0.0, origen)]
+            while cola:
+                t, nodo = heapq.heappop(cola)
+                if t > tiempos[nodo]:
+                    continue
+                for previo, tiempo in self.entrantes[nodo]:
+                    nuevo = t + tiempo
+                    if nuevo < tiempos[previo]:
+                        tiempos[previo] = nuevo
+                        heapq.heappush(cola, (nuevo, previo))
+        self._cache_tiempos[destino] = tiempos
+        return tiempos
+
+    def matriz_tiempos(self, destinos: List[str], unidades: List[Unidad]) -> np.ndarray:
+        """Matriz incidente × unidad: terminar la calle actual + ruta más rápida al incidente."""
+        nodo_unidad = np.empty(len(unidades), dtype=np.int64)
+        resto_edge = np.empty(len(unidades))
+        sin_edge = np.zeros(len(unidades), dtype=bool)
+        for k, unidad in enumerate(unidades):
+            datos = self.edges.get(unidad.edge)
+            if datos is None:
+                sin_edge[k] = True
+                nodo_unidad[k], resto_edge[k] = 0, 0.0
+            else:
+                nodo_unidad[k], resto_edge[k] = datos
+
+        matriz = np.empty((len(destinos), len(unidades)))
+        for i, destino in enumerate(destinos):
+            matriz[i] = self.tiempos_hacia(destino)[nodo_unidad] + resto_edge
+        matriz[:, sin_edge] = np.inf
+        return np.where(np.isfinite(matriz), matriz, COSTO_INALCANZABLE)
+
+    def reportar_incidente(self, id_incidente: str, destino: str) -> None:
+        self.pendientes[id_incidente] = destino
+
+    def resolver(self, t: float = 0.0) -> List[dict]:
+        """
+        Asigna los incidentes pendientes a unidades disponibles. Las unidades
+        elegidas pasan a "en_ruta". Retorna [{"incidente", "destino", "unidad", "eta"}].
+        Los incidentes sin unidad (faltan unidades o no hay ruta) siguen pendientes.
+        """
+        unidades = self.registro.disponibles()
+        if not self.pendientes or not unidades:
+            return []
+        t0 = time.perf_counter()
+        incidentes = list(self.pendientes)
+        destinos = [self.pendientes[i] for i in incidentes]
+        matriz = self.matriz_tiempos(destinos, unidades)
+
+        # El húngaro necesita filas <= columnas: con más incidentes que unidades se transpone
+        pares = []
+        if len(incidentes) <= len(unidades):
+            columnas, optima = hungaro(matriz, self.presupuesto)
+            pares = [(i, int(j)) for i, j in enumerate(columnas)]
+        else:
+            filas, optima = hungaro(matriz.T, self.presupuesto)
+            pares = [(int(i), j) for j, i in enumerate(filas)]
+
+        asignaciones = []
+        for i, j in pares:
+            costo = matriz[i, j]
+            if costo >= COSTO_INALCANZABLE:
+                continue
+            incidente, unidad = incidentes[i], unidades[j]
+            self.registro.marcar(unidad.id, "en_ruta", t, mision=incidente)
+            del self.pendientes[incidente]
+            asignaciones.append({"incidente": incidente, "destino": destinos[i],
+                                 "unidad": unidad.id, "eta": round(float(costo), 1)})
+
+        self.ultima_resolucion = {"incidentes": len(incidentes), "unidades": len(unidades),
+                                  "asignadas": len(asignaciones), "optima": optima,
+                                  "t_calculo": time.perf_counter() - t0}
+        log.info("%s/%s incidentes asignados entre %s unidades en %.1fms%s", len(asignaciones), len(incidentes),
+                 len(unidades), self.ultima_resolucion['t_calculo'] * 1000,
+                 '' if optima else ' (presupuesto agotado: resto voraz)')
+        return asignaciones
+
+    def tomar_asignaciones(self) -> List[dict]:
+        """Asignaciones hechas al liberarse unidades, aún no despachadas."""
+        listas, self.listas = self.listas, []
+        return listas
+
+    def _al_liberar_unidad(self, unidad: Unidad, t: float) -> None:
+        if self.pendientes:
+            self.listas.extend(self.resolver(t))
@@ -0,0 +1,384 @@
+"""
+Cobertura isócrona de las bases y ubicación recomendada de bases.
+
+Puntos de demanda: los junctions de accident_zones.json (o todos los nodos
+con --todos). Candidatos: las calles del grafo (una base es una calle de
+entrada, como en ambulance_bases.json), más las bases actuales. El tiempo de
+una base en la calle e hasta el punto d es el de terminar e más la ruta más
+rápida desde su nodo final, a flujo libre y a la velocidad de la ambulancia
+(el mismo costo que fleet.assignment).
+
+Los tiempos se obtienen con búsquedas acotadas por el horizonte, desde el
+lado más chico: un Dijkstra inverso por punto de demanda o uno directo por
+nodo final de candidato. De cada candidato se guarda:
+- un bitset (int de Python) con los puntos que alcanza dentro de T;
+- los pares (punto, tiempo) dentro del horizonte, para la p-mediana.
+
+La ubicación arranca voraz y sigue con búsqueda local por intercambios (sacar
+una base, poner un candidato). La unión de las demás bases sale de OR de
+prefijos y sufijos y su tiempo de mejor/segundo mejor, así cada intercambio
+cuesta un OR de bitsets y una resta sobre los pares del candidato.
+
+Uso:
+    python -m fleet.coverage [--tiempo 480] [--bases 7] [--objetivo cobertura|mediana]
+                             [--todos] [--celda 0] [--json reporte.json]
+"""
+import argparse
+import heapq
+import json
+import math
+import sys
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+from config import TIEMPO_COBERTURA, FACTOR_HORIZONTE_COBERTURA, PRESUPUESTO_UBICACION
+from fleet.assignment import tiempo_edge_ambulancia
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+
+class RedTiempos:
+    """Grafo compacto: nodos numerados, listas de adyacencia con tiempo de ambulancia."""
+
+    def __init__(self, grafo: "nx.DiGraph", indice_tls=None):
+        self.nodos = list(grafo.nodes())
+        self.indice_nodo = {nodo: i for i, nodo in enumerate(self.nodos)}
+        self.salientes: List[List[Tuple[int, float]]] = [[] for _ in self.nodos]
+        self.entrantes: List[List[Tuple[int, float]]] = [[] for _ in self.nodos]
+        self.edges: Dict[str, Tuple[int, int, float]] = {}   # edge_id -> (desde, hacia, tiempo)
+        self.xy = np.array([(grafo.nodes[n].get("x", 0.0), grafo.nodes[n].get("y", 0.0)) for n in self.nodos])
+        for a, b, datos in grafo.edges(data=True):
+            tiempo = tiempo_edge_ambulancia(datos, indice_tls)
+            ia, ib = self.indice_nodo[a], self.indice_nodo[b]
+            self.salientes[ia].append((ib, tiempo))
+            self.entrantes[ib].append((ia, tiempo))
+            self.edges[str(datos.get("edge_id"))] = (ia, ib, tiempo)
+
+    def acotado(self, fuentes: Dict[int, float], limite: float, inverso: bool = False) -> Dict[int, float]:
+        """Dijkstra multiorigen (fuentes con tiempo inicial) que no pasa de `limite` s."""
+        adyacencia = self.entrantes if inverso else self.salientes
+        tiempos = dict(fuentes)
+        cola = [(t, n) for n, t in fuentes.items()]
+        heapq.heapify(cola)
+        while cola:
+            t, nodo = heapq.heappop(cola)
+            if t > tiempos[nodo]:
+                continue
+            for vecino, tiempo in adyacencia[nodo]:
+                nuevo = t + tiempo
+                if nuevo <= limite and nuevo < tiempos.get(vecino, math.inf):
+                    tiempos[vecino] = nuevo
+                    heapq.heappush(cola, (nuevo, vecino))
+        return tiempos
+
+    def isocrona(self, edges: Iterable[str], limite: float = math.inf) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Isócrona multiorigen de un conjunto de bases: (tiempo, base) para cada
+        nodo, con la base más rápida como índice en `edges` (inf / -1 si no llega).
+        """
+        edges = list(edges)
+        fuentes: Dict[int, float] = {}
+        origen: Dict[int, int] = {}
+        for k, edge_id in enumerate(edges):
+            if edge_id in self.edges:
+                _, hacia, t = self.edges[edge_id]
+                if t < fuentes.get(hacia, math.inf):
+                    fuentes[hacia], origen[hacia] = t, k
+        tiempos = np.full(len(self.nodos), np.inf)
+        base = np.full(len(self.nodos), -1, dtype=np.int64)
+        # Una sola búsqueda desde todas las bases; cada nodo hereda la base de su predecesor
+        mejores = dict(fuentes)
+        cola = [(t, n) for n, t in fuentes.items()]
+        heapq.heapify(cola)
+        while cola:
+            t, nodo = heapq.heappop(cola)
+            if t > mejores[nodo]:
+                continue
+            tiempos[nodo], base[nodo] = t, origen[nodo]
+            for vecino, tiempo in self.salientes[nodo]:
+                nuevo = t + tiempo
+                if nuevo <= limite and nuevo < mejores.get(vecino, math.inf):
+                    mejores[vecino], origen[vecino] = nuevo, origen[nodo]
+                    heapq.heappush(cola, (nuevo, vecino))
+        return tiempos, base
+
+
+class Cobertura:
+    """
+    Tiempos candidato → punto de demanda dentro del horizonte y bitsets dentro
+    de `tiempo` (bit k = punto de demanda k).
+    """
+
+    def __init__(self, red: RedTiempos, demanda: Sequence[str], candidatos: Sequence[str],
+                 tiempo: float = TIEMPO_COBERTURA, horizonte: Optional[float] = None):
+        self.red = red
+        self.demanda = [d for d in demanda if d in red.indice_nodo]
+        self.candidatos = [c for c in dict.fromkeys(candidatos) if c in red.edges]
+        self.tiempo = tiempo
+        self.horizonte = horizonte if horizonte is not None else tiempo * FACTOR_HORIZONTE_COBERTURA
+        t0 = time.perf_counter()
+        pares = self._pares()
+        self.cercanos: List[Tuple[np.ndarray, np.ndarray]] = []
+        self.bits: List[int] = []
+        for lista in pares:
+            lista.sort()
+            idx = np.array([d for d, _ in lista], dtype=np.int64)
+            tiempos = np.array([t for _, t in lista], dtype=np.float64)
+            self.cercanos.append((idx, tiempos))
+            bits = 0
+            for d in idx[tiempos <= tiempo].tolist():
+                bits |= 1 << d
+            self.bits.append(bits)
+        self.t_calculo = time.perf_counter() - t0
+
+    def _pares(self) -> List[List[Tuple[int, float]]]:
+        red = self.red
+        nodos_demanda = [red.indice_nodo[d] for d in self.demanda]
+        finales: Dict[int, List[int]] = {}
+        for k, edge_id in enumerate(self.candidatos):
+            finales.setdefault(red.edges[edge_id][1], []).append(k)
+        pares: List[List[Tuple[int, float]]] = [[] for _ in self.candidatos]
+
+        if len(nodos_demanda) <= len(finales):
+            # Menos puntos que nodos de salida: un Dijkstra inverso por punto de demanda
+            for d, nodo in enumerate(nodos_demanda):
+                hasta = red.acotado({nodo: 0.0}, self.horizonte, inverso=True)
+                for final, t_final in hasta.items():
+                    for k in finales.get(final, ()):
+                        t = red.edges[self.candidatos[k]][2] + t_final
+                        if t <= self.horizonte:
+                            pares[k].append((d, t))
+        else:
+            posicion = {nodo: d for d, nodo in enumerate(nodos_demanda)}
+            for final, ks in finales.items():
+                t_min = min(red.edges[self.candidatos[k]][2] for k in ks)
+                desde = red.acotado({final: 0.0}, self.horizonte - t_min)
+                alcanzados = [(posicion[n], t) for n, t in desde.items() if n in posicion]
+                for k in ks:
+                    t_edge = red.edges[self.candidatos[k]][2]
+                    pares[k] = [(d, t + t_edge) for d, t in alcanzados if t + t_edge <= self.horizonte]
+        return pares
+
+    def __len__(self) -> int:
+        return len(self.candidatos)
+
+    def vector_tiempos(self, seleccion: Sequence[int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(mejor, segundo, asignado) por punto de demanda; los tiempos se topan en el horizonte."""
+        mejor = np.full(len(self.demanda), self.horizonte)
+        segundo = np.full(len(self.demanda), self.horizonte)
+        asignado = np.full(len(self.demanda), -1, dtype=np.int64)
+        for posicion, k in enumerate(seleccion):
+            idx, tiempos = self.cercanos[k]
+            previo = mejor[idx]
+            mejora = tiempos < previo
+            segundo[idx] = np.where(mejora, previo, np.minimum(segundo[idx], tiempos))
+            mejor[idx[mejora]] = tiempos[mejora]
+            asignado[idx[mejora]] = posicion
+        return mejor, segundo, asignado
+
+    def union(self, seleccion: Iterable[int]) -> int:
+        bits = 0
+        for k in seleccion:
+            bits |= self.bits[k]
+        return bits
+
+    def evaluar(self, seleccion: Sequence[int]) -> dict:
+        mejor, _, asignado = self.vector_tiempos(seleccion)
+        cubiertos = self.union(seleccion).bit_count()
+        alcanzados = mejor[asignado >= 0]
+        return {
+            "bases": [self.candidatos[k] for k in seleccion],
+            "puntos": len(self.demanda),
+            "cubiertos": cubiertos,
+            "cobertura": cubiertos / len(self.demanda) if self.demanda else 0.0,
+            "tiempo_medio": float(alcanzados.mean()) if len(alcanzados) else None,
+            "tiempo_p90": float(np.percentile(alcanzados, 90)) if len(alcanzados) else None,
+            "tiempo_max": float(alcanzados.max()) if len(alcanzados) else None,
+            "suma_tiempos": float(mejor.sum()),
+            "sin_cubrir": [self.demanda[d] for d in np.flatnonzero(mejor > self.tiempo).tolist()],
+        }
+
+
+def _clave(objetivo: str, cubiertos: int, suma: float) -> Tuple[float, float]:
+    """Mayor es mejor. Cobertura: puntos cubiertos y, a igualdad, menor tiempo total; mediana al revés."""
+    return (cubiertos, -suma) if objetivo == "cobertura" else (-suma, cubiertos)
+
+
+def ubicar_bases(cobertura: Cobertura, p: int, objetivo: str = "cobertura", fijas: Sequence[int] = (),
+                 presupuesto: Optional[float] = PRESUPUESTO_UBICACION) -> Tuple[List[int], dict]:
+    """
+    p bases entre los candidatos: voraz y luego intercambios de mejor mejora
+    hasta que ninguno mejore o se agote `presupuesto` (s). `objetivo`:
+    "cobertura" (máxima cobertura dentro de T) o "mediana" (p-mediana, suma
+    de tiempos topados en el horizonte). Las `fijas` no se sacan.
+    Retorna (índices de candidatos, {"iteraciones", "intercambios", "completo", "t"}).
+    """
+    if objetivo not in ("cobertura", "mediana"):
+        raise ValueError(f"objetivo desconocido: {objetivo}")
+    t0 = time.perf_counter()
+    seleccion = list(dict.fromkeys(fijas))[:p]
+    n = len(cobertura)
+
+    def ganancia(base_bits: int, base_tiempos: np.ndarray, base_suma: float, k: int) -> Tuple[float, float]:
+        idx, tiempos = cobertura.cercanos[k]
+        suma = base_suma - np.maximum(base_tiempos[idx] - tiempos, 0.0).sum()
+        return _clave(objetivo, (base_bits | cobertura.bits[k]).bit_count(), suma)
+
+    # Voraz
+    while len(seleccion) < min(p, n):
+        mejor_tiempos, _, _ = cobertura.vector_tiempos(seleccion)
+        bits, suma = cobertura.union(seleccion), mejor_tiempos.sum()
+        elegidos = set(seleccion)
+        mejor_k = max((k for k in range(n) if k not in elegidos),
+                      key=lambda k: ganancia(bits, mejor_tiempos, suma, k))
+        seleccion.append(mejor_k)
+
+    # Búsqueda local por intercambios
+    fijas = set(fijas)
+    iteraciones = intercambios = 0
+    completo = True
+    while True:
+        iteraciones += 1
+        mejor, segundo, asignado = cobertura.vector_tiempos(seleccion)
+        actual = _clave(objetivo, cobertura.union(seleccion).bit_count(), mejor.sum())
+        bits = [cobertura.bits[k] for k in seleccion]
+        prefijo = [0]
+        for b in bits:
+            prefijo.append(prefijo[-1] | b)
+        sufijo = [0]
+        for b in reversed(bits):
+            sufijo.append(sufijo[-1] | b)
+        sufijo.reverse()
+
+        elegidos = set(seleccion)
+        mejor_cambio, mejor_valor = None, actual
+        for posicion, k_fuera in enumerate(seleccion):
+            if k_fuera in fijas:
+                continue
+            if presupuesto is not None and time.perf_counter() - t0 > presupuesto:
+                completo = False
+                break
+            sin_bits = prefijo[posicion] | sufijo[posicion + 1]
+            sin_tiempos = np.where(asignado == posicion, segundo, mejor)
+            sin_suma = sin_tiempos.sum()
+            for k in range(n):
+                if k in elegidos:
+                    continue
+                valor = ganancia(sin_bits, sin_tiempos, sin_suma, k)
+                if valor > mejor_valor:
+                    mejor_cambio, mejor_valor = (posicion, k), valor
+        if mejor_cambio is not None:
+            seleccion[mejor_cambio[0]] = mejor_cambio[1]
+            intercambios += 1
+        if mejor_cambio is None or not completo:
+            break
+
+    return seleccion, {"iteraciones": iteraciones, "intercambios": intercambios, "completo": completo,
+                       "t": time.perf_counter() - t0}
+
+
+def candidatos_por_celda(red: RedTiempos, celda: float) -> List[str]:
+    """Una calle por celda de `celda` m (la de menor tiempo propio): reduce candidatos en redes grandes."""
+    if celda <= 0:
+        return list(red.edges)
+    por_celda: Dict[Tuple[int, int], Tuple[float, str]] = {}
+    for edge_id, (_, hacia, t) in red.edges.items():
+        x, y = red.xy[hacia]
+        clave = (int(x // celda), int(y // celda))
+        if clave not in por_celda or t < por_celda[clave][0]:
+            por_celda[clave] = (t, edge_id)
+    return [edge_id for _, edge_id in por_celda.values()]
+
+
+def recomendar_bases(cobertura: Cobertura, seleccion: Sequence[int]) -> Dict[str, dict]:
+    """Conjunto recomendado en el formato de ambulance_bases.json (junction lógico = punto más cercano)."""
+    bases = {}
+    for n, k in enumerate(seleccion, start=1):
+        idx, tiempos = cobertura.cercanos[k]
+        junction = cobertura.demanda[int(idx[np.argmin(tiempos)])] if len(idx) else None
+        bases[f"base_{n}"] = {"edge_entrada": cobertura.candidatos[k], "junction_logico": junction}
+    return bases
+
+
+def cobertura_red(red: RedTiempos, edges: Sequence[str], tiempo: float) -> float:
+    """Fracción de todos los nodos de la red a menos de `tiempo` s de alguna base (isócrona multiorigen)."""
+    tiempos, _ = red.isocrona(edges, tiempo)
+    return float(np.isfinite(tiempos).mean()) if len(tiempos) else 0.0
+
+
+def _imprimir(titulo: str, stats: dict, tiempo: float) -> None:
+    medio = f"{stats['tiempo_medio']:.1f}s" if stats["tiempo_medio"] is not None else "-"
+    maximo = f"{stats['tiempo_max']:.1f}s" if stats["tiempo_max"] is not None else "-"
+    print(f"[COBERTURA] {titulo}: {stats['cubiertos']}/{stats['puntos']} puntos en {tiempo:.0f}s "
+          f"({stats['cobertura'] * 100:.1f}%) | tiempo medio {medio}, máx {maximo} | "
+          f"red completa {stats.get('cobertura_red', 0.0) * 100:.1f}%")
+    if stats["sin_cubrir"]:
+        print(f"[COBERTURA]   sin cubrir: {', '.join(stats['sin_cubrir'][:20])}"
+              f"{' ...' if len(stats['sin_cubrir']) > 20 else ''}")
+
+
+def main(argv=None) -> int:
+    import xml.etree.ElementTree as ET
+    from config import SUMO_NET
+    from config_data.loader import cargar_configuraciones
+    from routing.dispatch_table import zonas_configuradas
+    from routing.graph_loader import construir_grafo
+    from traffic_control.tls_index import construir_indice_semaforos
+
+    parser = argparse.ArgumentParser(description="Cobertura de las bases y ubicación recomendada")
+    parser.add_argument("--tiempo", type=float, default=TIEMPO_COBERTURA, help="tiempo de respuesta objetivo (s)")
+    parser.add_argument("--bases", type=int, default=None, help="número de bases (por defecto, las actuales)")
+    parser.add_argument("--objetivo", choices=("cobertura", "mediana"), default="cobertura")
+    parser.add_argument("--todos", action="store_true", help="demanda = todos los nodos, no solo las zonas")
+    parser.add_argument("--celda", type=float, default=0.0, help="una calle candidata por celda de N m (0 = todas)")
+    parser.add_argument("--mantener", action="store_true", help="conservar las bases actuales y agregar")
+    parser.add_argument("--presupuesto", type=float, default=PRESUPUESTO_UBICACION)
+    parser.add_argument("--json", type=str, default=None, help="guardar reporte y bases recomendadas")
+    args = parser.parse_args(argv)
+
+    try:
+        raiz = ET.parse(SUMO_NET).getroot()
+        zonas, bases, _salidas = cargar_configuraciones()
+        red = RedTiempos(construir_grafo(raiz), construir_indice_semaforos(raiz))
+        demanda = red.nodos if args.todos else zonas_configuradas(zonas)
+        actuales = [datos["edge_entrada"] for datos in bases.values()]
+        candidatos = actuales + candidatos_por_celda(red, args.celda)
+
+        cobertura = Cobertura(red, demanda, candidatos, args.tiempo)
+        print(f"[COBERTURA] {len(cobertura.demanda)} puntos de demanda, {len(cobertura)} candidatos, "
+              f"horizonte {cobertura.horizonte:.0f}s ({cobertura.t_calculo:.2f}s)")
+
+        indice_candidato = {c: k for k, c in enumerate(cobertura.candidatos)}
+        seleccion_actual = [indice_candidato[e] for e in actuales if e in indice_candidato]
+        stats_actual = cobertura.evaluar(seleccion_actual)
+        stats_actual["cobertura_red"] = cobertura_red(red, stats_actual["bases"], args.tiempo)
+        _imprimir(f"Bases actuales ({len(seleccion_actual)})", stats_actual, args.tiempo)
+
+        p = args.bases or len(seleccion_actual)
+        fijas = seleccion_actual if args.mantener else ()
+        seleccion, info = ubicar_bases(cobertura, p, args.objetivo, fijas, args.presupuesto)
+        stats = cobertura.evaluar(seleccion)
+        stats["cobertura_red"] = cobertura_red(red, stats["bases"], args.tiempo)
+        _imprimir(f"Recomendadas ({len(seleccion)}, {args.objetivo})", stats, args.tiempo)
+        print(f"[COBERTURA] Búsqueda local: {info['intercambios']} intercambios en {info['iteraciones']} "
+              f"iteraciones, {info['t']:.2f}s{'' if info['completo'] else ' (presupuesto agotado)'}")
+        recomendadas = recomendar_bases(cobertura, seleccion)
+        for base_id, datos in recomendadas.items():
+            print(f"[COBERTURA]   {base_id}: {datos['edge_entrada']} (junction lógico {datos['junction_logico']})")
+
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump({"tiempo": args.tiempo, "objetivo": args.objetivo, "actual": stats_actual,
+                           "recomendado": stats, "busqueda": info, "bases": recomendadas}, f, indent=2)
+            print(f"[COBERTURA] Reporte guardado en {args.json}")
+        return 0
+    except Exception as e:
+        print(f"[COBERTURA] Error calculando cobertura: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from structured_log import obtener_logger
+
+log = obtener_logger("FLOTA")
+
+ESTADOS = ("disponible", "en_ruta", "en_escena", "fuera_servicio")
+
+
+@dataclass
+class Unidad:
+    """Estado de una ambulancia de la flota."""
+    id: str
+    base: str
+    edge: str                 # Calle donde está (o desde donde saldría)
+    estado: str = "disponible"
+    mision: Optional[str] = None
+    x: Optional[float] = None
+    y: Optional[float] = None
+    t_actualizado: float = 0.0
+    historial: List[tuple] = field(default_factory=list)   # (t, estado)
+
+
+class RegistroFlota:
+    """
+    Registro de la flota: posición, estado y disponibilidad de cada unidad.
+    Los cambios de estado se anotan con su tiempo de simulación y, al liberar
+    una unidad, se avisa a los observadores (p. ej. el asignador, que vuelve
+    a resolver los incidentes pendientes).
+    """
+
+    def __init__(self, unidades: Iterable[Unidad] = ()):
+        self.unidades: Dict[str, Unidad] = {u.id: u for u in unidades}
+        self._al_liberar = []
+
+    def __len__(self) -> int:
+        return len(self.unidades)
+
+    def agregar(self, unidad: Unidad) -> None:
+        self.unidades[unidad.id] = unidad
+
+    def disponibles(self) -> List[Unidad]:
+        return [u for u in self.unidades.values() if u.estado == "disponible"]
+
+    def ocupadas(self) -> List[Unidad]:
+        """Unidades en misión: las que pueden liberarse y disparar una nueva resolución."""
+        return [u for u in self.unidades.values() if u.estado in ("en_ruta", "en_escena")]
+
+    def obtener(self, unidad_id: str) -> Optional[Unidad]:
+        return self.unidades.get(unidad_id)
+
+    def al_liberar(self, callback) -> None:
+        """Registra callback(unidad, t) que se llama cada vez que una unidad queda disponible."""
+        self._al_liberar.append(callback)
+
+    def marcar(self, unidad_id: str, estado: str, t: float, mision: Optional[str] = None) -> bool:
+        unidad = self.unidades.get(unidad_id)
+        if unidad is None or estado not in ESTADOS:
+            return False
+        unidad.estado = estado
+        unidad.mision = mision if estado != "disponible" else None
+        unidad.t_actualizado = t
+        unidad.historial.append((t, estado))
+        if estado == "disponible":
+            for callback in self._al_liberar:
+                callback(unidad, t)
+        return True
+
+    def liberar(self, unidad_id: str, t: float, edge: Optional[str] = None) -> bool:
+        """Deja la unidad disponible; si se indica, en la calle donde terminó la misión."""
+        unidad = self.unidades.get(unidad_id)
+        if unidad is None:
+            return False
+        if edge:
+            unidad.edge = edge
+        return self.marcar(unidad_id, "disponible", t)
+
+    def actualizar_posicion(self, unidad_id: str, edge: Optional[str], x: float, y: float, t: float) -> None:
+        unidad = self.unidades.get(unidad_id)
+        if unidad is None:
+            return
+        if edge and not edge.startswith(":"):
+            unidad.edge = edge
+        unidad.x, unidad.y, unidad.t_actualizado = x, y, t
+
+
+def crear_registro_flota(ambulancias: List[dict], bases: dict, unidades_por_base: int = 0) -> RegistroFlota:
+    """
+    Registro inicial: las ambulancias de AMBULANCIAS_DISPONIBLES en su edge de
+    inicio, más `unidades_por_base` unidades estacionadas en cada base de
+    ambulance_bases.json.
+    """
+    registro = RegistroFlota()
+    for ambulancia in ambulancias:
+        registro.agregar(Unidad(ambulancia["id"], "config", ambulancia["inicio"]))
+    for base_id, datos in bases.items():
+        for k in range(unidades_por_base):
+            registro.agregar(Unidad(f"{base_id}_amb{k + 1}", base_id, datos["edge_entrada"]))
+    log.info("Registro creado: %s unidades", len(registro))
+    return registro
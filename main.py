@@ -1,162 +1,171 @@
-import traceback
 import sys
 import time
+
+# Referencia para medir el tiempo hasta el primer paso (time-to-ready)
+T_INICIO_PROCESO = time.perf_counter()
+
 import traci
-import math
+import traci.constants as tc
 import os
+import json
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from config import (
-    SUMO_CFG, SUMO_NET, PUERTO_TRACI, ARCHIVO_TRIGGER,
+    SUMO_CFG, SUMO_NET, PUERTO_TRACI, ARCHIVO_TRIGGER, ARCHIVO_MISIONES,
+    DIRECTORIO_TRAYECTORIAS, SEMILLA_SUMO, ARCHIVO_TABLA_DESPACHO, UMBRAL_DESVIO_TABLA, ACTIVAR_PRIORIDAD_SEMAFORICA,
     AMBULANCIAS_DISPONIBLES, TIEMPO_RESPUESTA,
-    ACCIDENTE_ID_MANUAL, EDGE_INICIO_MANUAL, MODO_SELECCION_BASE, TIPO_DE_RUTA
+    ACCIDENTE_ID_MANUAL, EDGE_INICIO_MANUAL, TIPO_DE_RUTA,
+    ARCHIVO_NOTIFICACIONES, NOTIF_WEBHOOK_URL, NOTIF_CAPACIDAD_COLA, NOTIF_TAM_LOTE,
+    NOTIF_VENTANA_LOTE, NOTIF_MAX_REINTENTOS, NOTIF_BACKOFF_BASE, NOTIF_BACKOFF_MAX,
+    DIRECTORIO_HISTORIAL, HISTORIAL_MAX_BYTES, HISTORIAL_MAX_SEGUNDOS, HISTORIAL_MAX_SEGMENTOS,
+    HISTORIAL_MAX_MEMORIA, ACTIVAR_STREAM_POSICIONES, POSICIONES_SOCKET, POSICIONES_HOST,
+    POSICIONES_PUERTO, POSICIONES_HZ_DEFECTO, POSICIONES_HZ_MAX,
+    ACTIVAR_ASIGNACION_FLOTA, UNIDADES_POR_BASE, PRESUPUESTO_ASIGNACION, HILOS_PLANIFICACION,
+    USAR_PERFILES_VIAJE, DESFASE_HORARIO_SIM, EDGEDATA_SALIDA, USAR_RED_TESELADA, COMPRIMIR_CADENAS,
+    MODO_SIMULACION
 )
 
-from accident_event.listener import wait_for_accident_event #eliminar?
-from routing.graph_loader import cargar_grafo_desde_sumo, obtener_nodos_proximos
-from routing.dijkstra import compute_optimal_route
+from accident_event.listener import leer_ubicacion_trigger, leer_severidad_trigger, asignar_ubicacion
+from routing.graph_loader import construir_grafo
+from routing.spatial_index import construir_indice_espacial
+from routing.strategy import planificar_ruta_despacho
+from routing.dispatch_table import obtener_tabla, zonas_configuradas
 from sumo_interface.traci_manager import GestorTraCI
-from sumo_interface.sim_controller import ControladorSimulacion
 from traffic_control.controller import ControladorCorredorVerde
-from config_data.loader import cargar_configuraciones, seleccionar_base_automatica
+from traffic_control.arbiter import severidad_numerica
+from traffic_control.tls_index import construir_indice_semaforos
+from sumo_interface.scheduler import PlanificadorEventos
+from config_data.loader import cargar_configuraciones
 from notifications.notifier import Notificador
+from notifications.dispatcher import (
+    DespachadorNotificaciones, SumideroConsola, SumideroJSONL, SumideroWebhook
+)
+from notifications.history_store import AlmacenHistorial, SumideroHistorial
+from structured_log import (
+    obtener_logger, configurar_logging, detener_logging, volcar_buffer, registros_descartados
+)
 
+log = obtener_logger("MAIN")
+log_sim = obtener_logger("SIM")
+log_notificador = obtener_logger("NOTIFICADOR")
 
-ZONAS_ACCIDENTE, BASES_AMBULANCIA, SALIDAS = cargar_configuraciones()
 
-def obtener_nodos_desde_edges(grafo, edge_inicio_id, edge_destino_id):
-    """
-    Busca en el grafo los nodos (junctions) que corresponden a los extremos 
-    de las calles (edges) indicadas.
-    """
-    nodo_start = None
-    # Convertimos a string para asegurar comparación
-    edge_inicio_id = str(edge_inicio_id)
-    
-    for u, v, data in grafo.edges(data=True):
-        edge_id = str(data.get("edge_id"))
-        if edge_id == edge_inicio_id:
-            nodo_start = v 
-        # No necesitamos buscar el edge_destino_id para el nodo final 
-        # si ya tenemos el ID del junction destino desde el JSON
-        
-    return nodo_start, None
-
-def distancia_euclidiana(p1, p2):
-    return math.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
-
-def encontrar_nodo_desvio_lejano(grafo, nodo_inicio, nodo_fin):
+# Se cargan en arranque_concurrente(), en paralelo con el lanzamiento de SUMO
+ZONAS_ACCIDENTE, BASES_AMBULANCIA, SALIDAS = {}, {}, {}
+TABLA_DESPACHO = None
+PERFILES_VIAJE = None
+RED_TESELADA = None
+GRAFO_COMPRIMIDO = None
+
+# Los subsistemas opcionales (teselas, perfiles, cadenas, flota, stream de
+# posiciones, trayectorias, modo híbrido) se importan donde se usan, solo si su
+# interruptor de config.py está activo: no alargan el arranque cuando no se usan.
+
+def encontrar_ambulancia_cercana(asignador, evento, t_actual=0.0):
     """
-    Busca un nodo en el grafo que maximice la distancia total (Inicio->Nodo + Nodo->Fin).
+    Reporta el accidente al asignador de flota y resuelve en lote junto con
+    los demás incidentes pendientes. Retorna la Unidad asignada a este evento
+    (ya marcada "en_ruta") o None si quedó en espera.
     """
+    id_incidente = evento.get("id_mision")
+    asignador.reportar_incidente(id_incidente, evento.get("id_interseccion", ACCIDENTE_ID_MANUAL))
+    for asignacion in asignador.resolver(t_actual):
+        if asignacion["incidente"] == id_incidente:
+            log.info("Ambulancia asignada: %s (ETA libre %.0fs)", asignacion['unidad'], asignacion['eta'])
+            return asignador.registro.obtener(asignacion["unidad"])
+    log.info("No hay ambulancias disponibles")
+    return None
+
+def guardar_mision(mision: dict) -> None:
+    """Agrega el registro de una misión terminada a ARCHIVO_MISIONES (una línea JSON)."""
     try:
-        pos_inicio = traci.junction.getPosition(nodo_inicio)
-        pos_fin = traci.junction.getPosition(nodo_fin)
-        
-        mejor_nodo = None
-        max_distancia = -1
-        
-        # Iteramos sobre todos los nodos del grafo para encontrar el más lejano
-        for nodo in grafo.nodes():
-            if nodo == nodo_inicio or nodo == nodo_fin:
-                continue
-                
-            try:
-                # Obtenemos posición candidata
-                pos_candidato = traci.junction.getPosition(nodo)
-                
-                # Calculamos cuánto desvío aporta
-                dist_a = distancia_euclidiana(pos_inicio, pos_candidato)
-                dist_b = distancia_euclidiana(pos_candidato, pos_fin)
-                dist_total = dist_a + dist_b
-                
-                if dist_total > max_distancia:
-                    max_distancia = dist_total
-                    mejor_nodo = nodo
-            except:
-                continue
-                
-        return mejor_nodo
+        with open(ARCHIVO_MISIONES, "a") as f:
+            f.write(json.dumps(mision) + "\n")
     except Exception as e:
-        print(f"[ROUTING] Error buscando desvío: {e}")
-        return None
+        log.error("Error guardando misión: %s", e)
 
-def calcular_ruta_con_estrategia(grafo, nodo_inicio, nodo_fin):
+def plan_tabla_vigente(despacho, indice_tls):
     """
-    Calcula la ruta según la estrategia definida en config.py (CORTA o LARGA).
+    Compara el tiempo de viaje actual de la ruta precalculada (traci.edge, una
+    consulta por calle al despachar) contra el de flujo libre. Si el tráfico lo
+    multiplica por más de UMBRAL_DESVIO_TABLA, el plan se recalcula en vivo.
     """
-    if TIPO_DE_RUTA == "CORTA":
-        # Estrategia Directa (Dijkstra Estándar)
-        return compute_optimal_route(grafo, nodo_inicio, nodo_fin)
-    
-    elif TIPO_DE_RUTA == "LARGA":
-        # Estrategia de Desvío (Waypoint)
-        print("[ROUTING] 🔄 Estrategia 'LARGA': Calculando desvío...")
-        nodo_intermedio = encontrar_nodo_desvio_lejano(grafo, nodo_inicio, nodo_fin)
-        
-        if not nodo_intermedio:
-            print("[ROUTING] Advertencia: No se encontró nodo de desvío. Usando ruta corta.")
-            return compute_optimal_route(grafo, nodo_inicio, nodo_fin)
-            
-        print(f"[ROUTING] 📍 Punto de desvío seleccionado: {nodo_intermedio}")
-        
-        # Calcular Tramo 1: Inicio -> Desvío
-        ruta_1 = compute_optimal_route(grafo, nodo_inicio, nodo_intermedio)
-        # Calcular Tramo 2: Desvío -> Fin
-        ruta_2 = compute_optimal_route(grafo, nodo_intermedio, nodo_fin)
-        
-        if ruta_1 and ruta_2:
-            # Unir rutas (ruta_2[1:] para no repetir el nodo intermedio)
-            return ruta_1 + ruta_2[1:]
-        else:
-            print("[ROUTING] Error: No se pudo conectar el desvío. Usando ruta corta.")
-            return compute_optimal_route(grafo, nodo_inicio, nodo_fin)
-            
-    return None
+    if indice_tls is None:
+        return True
+    t_libre = t_actual = 0.0
+    try:
+        for edge_id in despacho["ruta"]:
+            datos = indice_tls.datos_edge(edge_id)
+            if not datos or datos[1] <= 0:
+                continue
+            t_libre += datos[0] / datos[1]
+            t_actual += traci.edge.getTraveltime(edge_id)
+    except Exception:
+        return True
+    if t_libre > 0 and t_actual / t_libre > UMBRAL_DESVIO_TABLA:
+        log.info("Tráfico %.1fx sobre flujo libre: plan precalculado descartado", t_actual / t_libre)
+        return False
+    return True
 
-def encontrar_ambulancia_cercana(grafo, evento):
+def planificar_despacho(grafo, destino, unidad=None, t_sim=0.0):
     """
-    Encuentra la ambulancia más cercana al nodo del accidente.
+    Base, ruta y edges calculados en vivo (estrategia, desvío LARGA, Dijkstra).
+    No toca TraCI ni estado compartido: corre en el pool de planificación
+    mientras el bucle sigue avanzando la simulación. El grafo solo se lee.
+    Con perfiles de viaje cargados, los costos son los de la hora del día de `t_sim`.
+    Con red teselada, se planifica sobre las teselas del corredor base-accidente;
+    si no, sobre el grafo con cadenas comprimidas cuando está disponible.
     """
-    id_interseccion = evento.get("id_interseccion", "junction_1")
-    ambulancias_disponibles = [a for a in AMBULANCIAS_DISPONIBLES]
-    
-    if not ambulancias_disponibles:
-        print("[MAIN] No hay ambulancias disponibles")
+    if RED_TESELADA is not None:
+        if unidad is not None:
+            origenes = [unidad.edge]
+        elif EDGE_INICIO_MANUAL is not None:
+            origenes = [EDGE_INICIO_MANUAL]
+        else:
+            origenes = [datos["edge_entrada"] for datos in BASES_AMBULANCIA.values()]
+        with RED_TESELADA.candado:
+            grafo = RED_TESELADA.cargar_corredor([destino], origenes)
+            despacho = _planificar_en_grafo(grafo, destino, unidad, t_sim)
+        st = RED_TESELADA.stats
+        log.info("Red teselada: %s teselas (%s bajo demanda), %s nodos en memoria",
+                 st['teselas'], st['bajo_demanda'], grafo.number_of_nodes())
+        return despacho
+    if GRAFO_COMPRIMIDO is not None:
+        grafo = GRAFO_COMPRIMIDO
+    return _planificar_en_grafo(grafo, destino, unidad, t_sim)
+
+def _planificar_en_grafo(grafo, destino, unidad, t_sim):
+    t_salida = t_sim + DESFASE_HORARIO_SIM
+    if unidad is not None:
+        despacho = planificar_ruta_despacho(grafo, destino, BASES_AMBULANCIA, edge_inicio_manual=unidad.edge,
+                                            perfiles=PERFILES_VIAJE, t_salida=t_salida)
+        if despacho is not None:
+            despacho["base"] = unidad.base
+        return despacho
+    return planificar_ruta_despacho(grafo, destino, BASES_AMBULANCIA, perfiles=PERFILES_VIAJE, t_salida=t_salida)
+
+def plan_desde_tabla(tabla, destino, indice_tls):
+    """Plan precalculado de la zona si existe y sigue vigente con el tráfico actual (consulta TraCI)."""
+    despacho = tabla.plan(destino) if tabla is not None else None
+    if despacho is not None and not plan_tabla_vigente(despacho, indice_tls):
         return None
-    
-    ambulancia_elegida = ambulancias_disponibles[0]
-    print(f"[MAIN] Ambulancia asignada: {ambulancia_elegida['id']}")
-    
-    return ambulancia_elegida
+    if despacho is not None:
+        log.info("📋 Plan precalculado: base %s, ETA libre %.0fs, %s semáforos",
+                 despacho['base'], despacho['eta'], len(despacho['semaforos']))
+    return despacho
 
-def calcular_ruta_ambulancia(grafo, punto_partida, punto_llegada):
-    return compute_optimal_route(grafo, punto_partida, punto_llegada)
-
-def despachar_emergencia(grafo, gestor_traci, controlador_corredor, notificador):
+def aplicar_despacho(gestor_traci, controlador_corredor, notificador, despacho, destino, ambulancia_id,
+                     mision=None, unidad=None):
     """
-    Ejecuta toda la lógica de cálculo y despacho cuando ocurre el evento.
+    Parte TraCI del despacho, en el hilo del bucle: marcadores, generación de
+    la ambulancia, onda verde y alerta. Retorna el id de la ambulancia o None.
     """
-    print(f"[MAIN] 🚑 TIEMPO DE RESPUESTA CUMPLIDO. DESPACHANDO UNIDAD... T={gestor_traci.obtener_tiempo_simulacion()}")
-    
-    target_accident_junction = ACCIDENTE_ID_MANUAL 
-    ambulancia_id = "ambulancia_1"
-    
-    # 1. Selección de Base (Origen)
-    if EDGE_INICIO_MANUAL is not None:
-        print(f"[MAIN] ⚠️ Modo Manual (Config): Saliendo desde '{EDGE_INICIO_MANUAL}'")
-        edge_inicio = EDGE_INICIO_MANUAL
-        datos_base = {"id": "MANUAL_CFG"}
-    else:
-        print(f"[MAIN] 🤖 Modo Automático: Buscando base por '{MODO_SELECCION_BASE}'...")
-        datos_base, dist_logica = seleccionar_base_automatica(target_accident_junction, BASES_AMBULANCIA, modo=MODO_SELECCION_BASE)
-        if not datos_base: return None
-        edge_inicio = datos_base["edge_entrada"]
-        print(f"[MAIN] 🏥 Base Seleccionada: {datos_base.get('id')} (Dist. Lógica: {dist_logica:.2f})")
-
-    node_destino_id = target_accident_junction
-    print(f"[MAIN] 📍 Destino: {target_accident_junction} | Estrategia Ruta: {TIPO_DE_RUTA}")
-    
+    edge_inicio = despacho["edge_inicio"]
+    ruta_edges_traci = despacho["ruta"]
+    distancia_ruta = despacho["distancia"]
+
     # DIBUJAR MARCADOR DE BASE (BLANCO)
     try:
         # Obtenemos la coordenada inicial del edge de partida
@@ -166,51 +175,47 @@ def despachar_emergencia(grafo, gestor_traci, controlador_corredor, notificador)
             x_base, y_base = shape_inicio[0] # Primera coordenada (x, y)
             gestor_traci.agregar_marcador_base(x_base, y_base, activo=False) # BLANCO
     except Exception as e:
-        print(f"[MAIN] Warning visual base: {e}")
-
-    # 2. Calcular Ruta Física
-    nodo_origen, _ = obtener_nodos_desde_edges(grafo, edge_inicio, None)
-    
-    if not nodo_origen:
-        print(f"[MAIN] Error: Edge inicio '{edge_inicio}' no conecta.")
-        return None
+        log.warning("Warning visual base: %s", e)
 
-    # --- CAMBIO AQUÍ: Llamamos a la nueva función de estrategia ---
-    ruta_nodos = calcular_ruta_con_estrategia(grafo, nodo_origen, node_destino_id)
-    # -------------------------------------------------------------
-    
-    if not ruta_nodos:
-        print("[MAIN] Error: No hay ruta física disponible.")
-        return None
-
-    # 3. Convertir a Edges
-    ruta_edges_traci = [edge_inicio]
-    distancia_ruta = 0
-    for i in range(len(ruta_nodos)-1):
-        u, v = ruta_nodos[i], ruta_nodos[i+1]
-        if grafo.has_edge(u, v):
-            data = grafo[u][v]
-            ruta_edges_traci.append(data.get('edge_id'))
-            distancia_ruta += data.get('peso', 0)
-    
-    print(f"[MAIN] Ruta Final: {len(ruta_edges_traci)} tramos, {distancia_ruta:.1f}m")
+    log.info("Ruta Final: %s tramos, %.1fm", len(ruta_edges_traci), distancia_ruta)
 
     # 4. Visualizar y Generar
     try:
-        pos = traci.junction.getPosition(node_destino_id)
+        pos = traci.junction.getPosition(destino)
         gestor_traci.agregar_marcador_accidente(pos[0], pos[1])
     except: pass
 
     if not gestor_traci.generar_ambulancia(ambulancia_id, edge_inicio, ruta_edges_traci):
         return None
-
-    controlador_corredor.execute_green_wave(ruta_edges_traci, ambulancia_id)
-
-    origen_txt = f"Base {datos_base.get('id')}" if EDGE_INICIO_MANUAL is None else "Manual"
+    cobertura_detalle = gestor_traci.activar_corredor(ruta_edges_traci)
+
+    t_despacho = gestor_traci.obtener_tiempo_simulacion()
+    if mision is not None:
+        mision.update({
+            "id_ambulancia": ambulancia_id,
+            "destino": destino,
+            "ruta": ruta_edges_traci,
+            "distancia": distancia_ruta,
+            "estrategia": TIPO_DE_RUTA,
+            "t_despacho": t_despacho,
+            "modo_simulacion": gestor_traci.modo_simulacion,
+            "cobertura_detalle": cobertura_detalle,
+        })
+    severidad = (mision or {}).get("severidad", 1)
+    # Con plan de la tabla, la secuencia de semáforos ya está calculada: se siembra con t_despacho
+    plan_predictivo = controlador_corredor.programar_onda_verde(ruta_edges_traci, ambulancia_id, t_despacho,
+                                                                severidad, despacho.get("semaforos"))
+    if not plan_predictivo:
+        controlador_corredor.execute_green_wave(ruta_edges_traci, ambulancia_id, severidad=severidad)
+    if mision is not None:
+        mision["plan_predictivo"] = plan_predictivo
+
+    origen_txt = f"Base {despacho['base']}" if EDGE_INICIO_MANUAL is None or unidad is not None else "Manual"
     notificador.send_alert({
         "tipo": "despacho",
+        "id_mision": (mision or {}).get("id_mision"),
         "id_ambulancia": ambulancia_id,
-        "destino": node_destino_id,
+        "destino": destino,
         "ruta": ruta_edges_traci,
         "distancia": distancia_ruta,
         "mensaje": f"Ambulancia en camino ({origen_txt} - Ruta {TIPO_DE_RUTA})."
@@ -218,98 +223,451 @@ def despachar_emergencia(grafo, gestor_traci, controlador_corredor, notificador)
 
     return ambulancia_id
 
+def muestrear_ambulancia(controlador_corredor, ambulancia_id, ruta):
+    """
+    Posición, edge, velocidad y ETA restante de la ambulancia, leídos de su
+    suscripción TraCI (sin consultas extra). Retorna None si aún no hay datos.
+    """
+    resultados = controlador_corredor.muestra_ambulancia(ambulancia_id)
+    if not resultados or tc.VAR_POSITION not in resultados:
+        return None
+    x, y = resultados[tc.VAR_POSITION]
+    eta = None
+    if controlador_corredor.planificador is not None and ruta:
+        eta = controlador_corredor.planificador.eta_restante(
+            ruta, resultados.get(tc.VAR_ROUTE_INDEX, 0), resultados.get(tc.VAR_LANEPOSITION, 0.0))
+    return {
+        "x": x, "y": y,
+        "edge": resultados.get(tc.VAR_ROAD_ID),
+        "velocidad": resultados.get(tc.VAR_SPEED, 0.0),
+        "eta": eta,
+        "indice_ruta": resultados.get(tc.VAR_ROUTE_INDEX, 0),
+        "pos_en_edge": resultados.get(tc.VAR_LANEPOSITION, 0.0),
+    }
+
+def cargar_red(ruta_net_xml, con_grafo=True):
+    """
+    Parsea map.net.xml una sola vez y construye el grafo y los índices.
+    Pensada para ejecutarse en un hilo mientras SUMO arranca.
+    Con `con_grafo=False` (red teselada) el grafo completo no se arma y se retorna None.
+    """
+    t0 = time.perf_counter()
+    raiz = ET.parse(ruta_net_xml).getroot()
+    indice_tls = construir_indice_semaforos(raiz)
+    indice_espacial = construir_indice_espacial(raiz)
+    grafo = None
+    if con_grafo:
+        grafo = construir_grafo(raiz)
+        grafo.graph["edges_semaforo"] = indice_tls.edges_semaforizados()
+    return grafo, indice_tls, indice_espacial, time.perf_counter() - t0
+
+def arranque_concurrente(gestor_traci):
+    """
+    Lanza SUMO (bloqueante en traci.start) en el hilo principal mientras un
+    hilo de trabajo carga la red e índices y otro las configuraciones JSON.
+    Con ambos listos, un tercero carga (o reconstruye) la tabla de despachos.
+    En modo HIBRIDO, SUMO espera a la tabla: sus rutas definen los corredores
+    que se simulan en detalle.
+    Con red teselada no se arma el grafo completo: la tabla y la flota usan el
+    grafo de teselas con la región de las zonas y las bases ya cargada.
+    Retorna (grafo, indice_tls, indice_espacial) o None si SUMO no arrancó.
+    """
+    global ZONAS_ACCIDENTE, BASES_AMBULANCIA, SALIDAS, TABLA_DESPACHO, PERFILES_VIAJE, RED_TESELADA, GRAFO_COMPRIMIDO
+
+    def preparar_red_teselada():
+        from routing.tiles import cargar_red_teselada
+        from routing.graph_loader import cargar_grafo_desde_sumo
+        indice_tls = futuro_red.result()[1]
+        red = cargar_red_teselada()
+        if red is None:
+            log.warning("Red teselada no disponible: se usa el grafo completo")
+            grafo = cargar_grafo_desde_sumo(SUMO_NET)
+            grafo.graph["edges_semaforo"] = indice_tls.edges_semaforizados()
+            return None, grafo
+        zonas, bases, _salidas = futuro_cfg.result()
+        with red.candado:
+            red.grafo.graph["edges_semaforo"] = indice_tls.edges_semaforizados()
+            # Región fija de zonas configuradas y bases; lo demás se carga bajo demanda
+            red.cargar_corredor(zonas_configuradas(zonas) + [ACCIDENTE_ID_MANUAL],
+                                [datos["edge_entrada"] for datos in bases.values()])
+        return red, red.grafo
+
+    def grafo_ruteo():
+        if futuro_teselas is None:
+            return futuro_red.result()[0]
+        return futuro_teselas.result()[1]
+
+    def preparar_tabla():
+        grafo, indice_tls = grafo_ruteo(), futuro_red.result()[1]
+        zonas, bases, _salidas = futuro_cfg.result()
+        red = futuro_teselas.result()[0] if futuro_teselas is not None else None
+        if red is None:
+            return obtener_tabla(ARCHIVO_TABLA_DESPACHO, SUMO_NET, grafo, indice_tls, zonas, bases)
+        with red.candado:
+            return obtener_tabla(ARCHIVO_TABLA_DESPACHO, SUMO_NET, grafo, indice_tls, zonas, bases)
+
+    def preparar_grafo_comprimido():
+        from routing.chains import comprimir_cadenas
+        grafo = futuro_red.result()[0]
+        zonas, _bases, _salidas = futuro_cfg.result()
+        # Los junctions de accidente quedan como nodos: son destinos de búsqueda
+        return comprimir_cadenas(grafo, zonas_configuradas(zonas) + [ACCIDENTE_ID_MANUAL])
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=4, thread_name_prefix="arranque") as pool:
+        futuro_red = pool.submit(cargar_red, SUMO_NET, not USAR_RED_TESELADA)
+        futuro_cfg = pool.submit(cargar_configuraciones)
+        futuro_teselas = pool.submit(preparar_red_teselada) if USAR_RED_TESELADA else None
+        futuro_tabla = pool.submit(preparar_tabla)
+        futuro_comprimido = (pool.submit(preparar_grafo_comprimido)
+                             if COMPRIMIR_CADENAS and not USAR_RED_TESELADA else None)
+
+        if MODO_SIMULACION == "HIBRIDO" and futuro_tabla.result() is not None:
+            from sumo_interface.meso import edges_corredores
+            gestor_traci.configurar_hibrido(edges_corredores(futuro_tabla.result(), grafo_ruteo()))
+
+        t_sumo = time.perf_counter()
+        sumo_ok = gestor_traci.iniciar_sumo()
+        t_sumo = time.perf_counter() - t_sumo
+
+        _grafo, indice_tls, indice_espacial, t_red = futuro_red.result()
+        grafo = grafo_ruteo()
+        ZONAS_ACCIDENTE, BASES_AMBULANCIA, SALIDAS = futuro_cfg.result()
+        TABLA_DESPACHO = futuro_tabla.result()
+        if futuro_teselas is not None:
+            RED_TESELADA = futuro_teselas.result()[0]
+        if futuro_comprimido is not None:
+            GRAFO_COMPRIMIDO = futuro_comprimido.result()
+
+    if USAR_PERFILES_VIAJE:
+        from routing.travel_profiles import cargar_perfiles
+        # memmap: no se lee el archivo, solo las páginas que se consulten
+        PERFILES_VIAJE = cargar_perfiles()
+        if PERFILES_VIAJE is not None:
+            log.info("Perfiles de viaje: %s calles, %s corridas", len(PERFILES_VIAJE), PERFILES_VIAJE.corridas)
+
+    if not sumo_ok:
+        return None
+
+    t_total = time.perf_counter() - t0
+    log.info("⏱️ Arranque en %.2fs (SUMO %.2fs || red e índices %.2fs)", t_total, t_sumo, t_red)
+    return grafo, indice_tls, indice_espacial
+
+def crear_notificador():
+    """
+    Notificador cuyas alertas salen por un despachador en segundo plano:
+    consola, archivo JSONL, historial SQLite y, si NOTIF_WEBHOOK_URL está
+    definido, un webhook HTTP.
+    """
+    notificador = Notificador(activo=True, max_historial=HISTORIAL_MAX_MEMORIA)
+    lote = {"tam_lote": NOTIF_TAM_LOTE, "ventana_lote": NOTIF_VENTANA_LOTE}
+    sumideros = [
+        SumideroConsola(Notificador.formatear_alerta, omitir=("estado",), **lote),
+        SumideroJSONL(ARCHIVO_NOTIFICACIONES, **lote),
+        SumideroHistorial(AlmacenHistorial(DIRECTORIO_HISTORIAL, HISTORIAL_MAX_BYTES,
+                                           HISTORIAL_MAX_SEGUNDOS, HISTORIAL_MAX_SEGMENTOS), **lote),
+    ]
+    if NOTIF_WEBHOOK_URL:
+        sumideros.append(SumideroWebhook(NOTIF_WEBHOOK_URL, **lote))
+
+    despachador = DespachadorNotificaciones(
+        sumideros, capacidad=NOTIF_CAPACIDAD_COLA, max_reintentos=NOTIF_MAX_REINTENTOS,
+        backoff_base=NOTIF_BACKOFF_BASE, backoff_max=NOTIF_BACKOFF_MAX
+    )
+    despachador.iniciar()
+    notificador.despachador = despachador
+    return notificador
 
 def ejecutar_simulacion_trigger():
     print("\n" + "="*60)
     print("SISTEMA DE GESTIÓN - ESPERANDO TRIGGER EXTERNO")
     print("="*60 + "\n")
-    print(f"[INFO] Ejecute 'python trigger_accident.py' para provocar el accidente.")
+    log.info("Ejecute 'python trigger_accident.py' para provocar el accidente.")
 
-    notificador = Notificador(activo=True)
-    gestor_traci = GestorTraCI(SUMO_CFG, PUERTO_TRACI, modo_gui=True)
+    notificador = crear_notificador()
+    gestor_traci = GestorTraCI(SUMO_CFG, PUERTO_TRACI, modo_gui=True, semilla=SEMILLA_SUMO)
     
     if os.path.exists(ARCHIVO_TRIGGER):
         try: os.remove(ARCHIVO_TRIGGER)
         except: pass
 
-    if not gestor_traci.iniciar_sumo():
+    recursos = arranque_concurrente(gestor_traci)
+    if recursos is None:
         return False
+    grafo, indice_tls, indice_espacial = recursos
+    primer_paso = True
+
+    registro_flota = asignador = None
+    if ACTIVAR_ASIGNACION_FLOTA:
+        from fleet.registry import crear_registro_flota
+        from fleet.assignment import AsignadorFlota
+        registro_flota = crear_registro_flota(AMBULANCIAS_DISPONIBLES, BASES_AMBULANCIA, UNIDADES_POR_BASE)
+        asignador = AsignadorFlota(grafo, registro_flota, indice_tls, PRESUPUESTO_ASIGNACION)
 
-    grafo = cargar_grafo_desde_sumo(SUMO_NET)
-    controlador_corredor = ControladorCorredorVerde()
+    eventos = PlanificadorEventos()
+    controlador_corredor = ControladorCorredorVerde(indice_tls, eventos)
 
     ambulancia_activa = None
     ambulancia_en_ruta = False
     tiempo_accidente_detectado = None
-    tiempo_despacho_programado = None
-    ambulancia_despachada = False
+    mision = None
+    evento_estado = None
+    ultima_muestra = None
+    trayectoria = None
+
+    # Planificación en vivo fuera del bucle; los hilos comparten el grafo en solo lectura
+    pool_planificacion = ThreadPoolExecutor(max_workers=HILOS_PLANIFICACION, thread_name_prefix="planificacion")
+    solicitud_plan = None
+
+    servidor_posiciones = None
+    if ACTIVAR_STREAM_POSICIONES:
+        from notifications.position_stream import ServidorPosiciones
+        servidor_posiciones = ServidorPosiciones(POSICIONES_SOCKET, POSICIONES_HOST, POSICIONES_PUERTO,
+                                                 POSICIONES_HZ_DEFECTO, POSICIONES_HZ_MAX)
+        if not servidor_posiciones.iniciar():
+            servidor_posiciones = None
+
+    def despachar(t_actual):
+        """
+        Decide el plan sin detener el bucle: el plan precalculado se aplica en
+        este mismo paso; la planificación en vivo se envía al pool y se aplica
+        en completar_despacho() el paso en que termina. Con flota, si no hay
+        unidad libre pero alguna está ocupada, el incidente queda pendiente y
+        sale cuando el asignador lo resuelve al liberarse una (despachar_asignaciones).
+        """
+        log.info("🚑 TIEMPO DE RESPUESTA CUMPLIDO. DESPACHANDO UNIDAD... T=%s", t_actual)
+        destino = (mision.get("destino") if mision else None) or ACCIDENTE_ID_MANUAL
+        log.info("📍 Destino: %s | Estrategia Ruta: %s", destino, TIPO_DE_RUTA)
+        unidad = None
+        if asignador is not None and mision is not None:
+            unidad = encontrar_ambulancia_cercana(
+                asignador, {"id_mision": mision["id_mision"], "id_interseccion": destino}, t_actual)
+            if unidad is None:
+                if registro_flota.ocupadas():
+                    log.info("Incidente %s en espera de una unidad", mision["id_mision"])
+                    mision["t_espera"] = t_actual
+                    return
+                # Ninguna unidad ocupada que pueda liberarse: sale el despacho clásico
+                asignador.pendientes.pop(mision["id_mision"], None)
+        iniciar_plan(destino, unidad, t_actual)
+
+    def despachar_asignaciones(t_actual):
+        """Despacha los incidentes que el asignador resolvió al liberarse unidades."""
+        for asignacion in asignador.tomar_asignaciones():
+            unidad = registro_flota.obtener(asignacion["unidad"])
+            if (mision is None or asignacion["incidente"] != mision["id_mision"]
+                    or ambulancia_activa is not None or solicitud_plan is not None):
+                # El bucle atiende una misión a la vez: la unidad vuelve a quedar libre
+                log.warning("Asignación %s → %s sin misión en espera", asignacion["unidad"], asignacion["incidente"])
+                registro_flota.liberar(unidad.id, t_actual)
+                continue
+            log.info("Ambulancia asignada: %s (ETA libre %.0fs, %.0fs en espera)",
+                     unidad.id, asignacion["eta"], t_actual - mision.get("t_espera", t_actual))
+            iniciar_plan(asignacion["destino"], unidad, t_actual)
+
+    def iniciar_plan(destino, unidad, t_actual):
+        nonlocal solicitud_plan
+        solicitud = {"destino": destino, "unidad": unidad, "t0": time.perf_counter(), "t_sim": t_actual}
+        # La tabla se calcula a flujo libre: con perfiles históricos se planifica en vivo
+        usar_tabla = unidad is None and PERFILES_VIAJE is None
+        despacho = plan_desde_tabla(TABLA_DESPACHO, destino, indice_tls) if usar_tabla else None
+        if despacho is not None:
+            aplicar_plan(solicitud, despacho, t_actual)
+        else:
+            solicitud["futuro"] = pool_planificacion.submit(planificar_despacho, grafo, destino, unidad, t_actual)
+            solicitud_plan = solicitud
+
+    def completar_despacho(t_actual):
+        nonlocal solicitud_plan
+        if solicitud_plan is None or not solicitud_plan["futuro"].done():
+            return
+        solicitud, solicitud_plan = solicitud_plan, None
+        try:
+            despacho = solicitud["futuro"].result()
+        except Exception as e:
+            log.error("Error en la planificación del despacho: %s", e)
+            despacho = None
+        aplicar_plan(solicitud, despacho, t_actual)
+
+    def aplicar_plan(solicitud, despacho, t_actual):
+        nonlocal ambulancia_activa
+        unidad = solicitud["unidad"]
+        if despacho is not None:
+            ambulancia_id = unidad.id if unidad is not None else "ambulancia_1"
+            ambulancia_activa = aplicar_despacho(gestor_traci, controlador_corredor, notificador, despacho,
+                                                 solicitud["destino"], ambulancia_id, mision, unidad)
+        if ambulancia_activa is None:
+            if unidad is not None:
+                registro_flota.liberar(unidad.id, t_actual)
+            return
+        latencia = time.perf_counter() - solicitud["t0"]
+        log.info("⏱️ Planificación → spawn: %.1fms (%.0fs de simulación)",
+                 latencia * 1000, t_actual - solicitud['t_sim'])
+        if mision is not None:
+            mision["latencia_planificacion"] = round(latencia, 4)
+            mision["t_sim_planificacion"] = t_actual - solicitud["t_sim"]
+
+    def imprimir_estado(t_actual):
+        if not ultima_muestra:
+            return
+        eta = ultima_muestra["eta"]
+        eta_txt = f" | ETA {eta:.0f}s" if eta is not None else ""
+        log_sim.info("T=%.1f | 📍 %s | Vel: %.1f m/s%s",
+                     t_actual, ultima_muestra['edge'], ultima_muestra['velocidad'], eta_txt)
+        notificador.send_alert({
+            "tipo": "estado",
+            "id_mision": (mision or {}).get("id_mision"),
+            "id_ambulancia": ambulancia_activa,
+            "posicion": (round(ultima_muestra["x"], 1), round(ultima_muestra["y"], 1)),
+            "velocidad": ultima_muestra["velocidad"],
+            "tiempo_estimado": eta,
+        })
 
     try:
         while True:
             if not gestor_traci.avanzar_simulacion(1):
-                print("[MAIN] Simulación detenida por SUMO.")
+                log.info("Simulación detenida por SUMO.")
                 break
             
             tiempo_actual = gestor_traci.obtener_tiempo_simulacion()
+            if primer_paso:
+                primer_paso = False
+                log.info("⏱️ Primer paso a %.2fs del inicio (despacho no disponible hasta aquí)",
+                         time.perf_counter() - T_INICIO_PROCESO)
+            # Dispara en orden los temporizadores vencidos (despacho, semáforos, estado)
+            eventos.procesar(tiempo_actual)
+            if asignador is not None and asignador.listas:
+                despachar_asignaciones(tiempo_actual)
+            completar_despacho(tiempo_actual)
+            controlador_corredor.procesar_liberaciones(tiempo_actual)
 
             if tiempo_accidente_detectado is None:
                 if os.path.exists(ARCHIVO_TRIGGER):
-                    try: os.remove(ARCHIVO_TRIGGER)
+                    contenido = ""
+                    try:
+                        with open(ARCHIVO_TRIGGER, "r") as f:
+                            contenido = f.read()
+                        os.remove(ARCHIVO_TRIGGER)
                     except: pass 
                     tiempo_accidente_detectado = tiempo_actual
-                    tiempo_despacho_programado = tiempo_actual + TIEMPO_RESPUESTA
-                    print(f"\n[MAIN] 💥 ¡SEÑAL DE ACCIDENTE RECIBIDA! T={tiempo_actual:.1f}")
-                    notificador.send_alert({"tipo": "accidente", "mensaje": f"Despacho en {TIEMPO_RESPUESTA}s"})
-
-            if tiempo_despacho_programado and not ambulancia_despachada:
-                if tiempo_actual >= tiempo_despacho_programado:
-                    ambulancia_activa = despachar_emergencia(grafo, gestor_traci, controlador_corredor, notificador)
-                    ambulancia_despachada = True
+                    eventos.programar(tiempo_actual + TIEMPO_RESPUESTA, despachar)
+                    mision = {"id_mision": f"m{int(time.time())}", "t_accidente": tiempo_actual,
+                              "severidad": severidad_numerica(leer_severidad_trigger(contenido))}
+                    coordenadas = leer_ubicacion_trigger(contenido)
+                    if coordenadas:
+                        evento = asignar_ubicacion({"coordenadas": coordenadas}, indice_espacial)
+                        mision["destino"] = evento.get("id_interseccion")
+                        mision["coordenadas"] = coordenadas
+                    log.info("💥 ¡SEÑAL DE ACCIDENTE RECIBIDA! T=%.1f", tiempo_actual)
+                    notificador.send_alert({"tipo": "accidente", "id_mision": mision["id_mision"], "mensaje": f"Despacho en {TIEMPO_RESPUESTA}s"})
 
             if ambulancia_activa:
                 if ambulancia_en_ruta:
-                    controlador_corredor.execute_green_wave(None, ambulancia_activa)
+                    if not controlador_corredor.ejecutar_plan(ambulancia_activa, tiempo_actual):
+                        controlador_corredor.execute_green_wave(None, ambulancia_activa, tiempo_actual,
+                                                                (mision or {}).get("severidad", 1))
+
+                    ultima_muestra = muestrear_ambulancia(controlador_corredor, ambulancia_activa,
+                                                          (mision or {}).get("ruta"))
+                    if servidor_posiciones is not None and ultima_muestra:
+                        servidor_posiciones.publicar(tiempo_actual, {ambulancia_activa: ultima_muestra})
+                    if trayectoria is not None and ultima_muestra:
+                        trayectoria.registrar(tiempo_actual, ultima_muestra)
+                    if registro_flota is not None and ultima_muestra:
+                        registro_flota.actualizar_posicion(ambulancia_activa, ultima_muestra["edge"],
+                                                           ultima_muestra["x"], ultima_muestra["y"], tiempo_actual)
 
                 vehiculos_vivos = traci.vehicle.getIDList()
                 if not ambulancia_en_ruta:
                     if ambulancia_activa in vehiculos_vivos:
-                        print(f"[MAIN] 🚑 Unidad {ambulancia_activa} operativa.")
+                        log.info("🚑 Unidad %s operativa.", ambulancia_activa)
                         ambulancia_en_ruta = True
+                        evento_estado = eventos.programar_periodico(5, imprimir_estado)
+                        if mision is not None:
+                            from analysis.trajectory import RegistroTrayectoria
+                            trayectoria = RegistroTrayectoria(mision.get("ruta") or [], indice_tls)
                 elif ambulancia_en_ruta:
                     if ambulancia_activa not in vehiculos_vivos:
-                        print(f"[MAIN] ✅ Misión completada.")
+                        log.info("✅ Misión completada.")
+                        eventos.cancelar(evento_estado)
+                        evento_estado = None
                         gestor_traci.eliminar_marcador_accidente()
                         gestor_traci.eliminar_marcador_base()
-                        controlador_corredor.restaurar_todos_los_semaforos()
-                        notificador.send_alert({"tipo": "fin", "mensaje": "Misión finalizada"})
+                        controlador_corredor.finalizar_plan(ambulancia_activa, tiempo_actual)
+                        controlador_corredor.restaurar_todos_los_semaforos(tiempo_actual)
+                        descarga = controlador_corredor.resumen_descarga()
+                        if descarga.get("intersecciones"):
+                            log.info("Descarga transversal: %s intersecciones, media %.1fs, %s vehículos",
+                                     descarga['intersecciones'], descarga['t_descarga_medio'],
+                                     descarga['vehiculos_descargados'])
+                        notificador.send_alert({"tipo": "fin", "id_mision": (mision or {}).get("id_mision"),
+                                                "id_ambulancia": ambulancia_activa, "mensaje": "Misión finalizada"})
+                        if mision is not None:
+                            mision["t_llegada"] = tiempo_actual
+                            mision["semilla"] = SEMILLA_SUMO
+                            mision["corredor_verde"] = ACTIVAR_PRIORIDAD_SEMAFORICA
+                            if trayectoria is not None and len(trayectoria):
+                                ruta_npz = DIRECTORIO_TRAYECTORIAS / f"{mision['id_mision']}.npz"
+                                if trayectoria.guardar(ruta_npz):
+                                    mision["trayectoria"] = str(ruta_npz)
+                            mision["ventanas_override"] = [
+                                v for v in controlador_corredor.ventanas_override
+                                if v["t_inicio"] is not None and v["t_inicio"] >= mision.get("t_despacho", 0)
+                            ]
+                            # [t, tls_id, tipo, valor, motivo] de cada escritura a semáforos durante la misión
+                            mision["auditoria_semaforos"] = controlador_corredor.espejo.registros(
+                                desde=mision.get("t_despacho", 0))
+                            mision["escrituras_semaforos"] = controlador_corredor.espejo.resumen()
+                            guardar_mision(mision)
+                        if registro_flota is not None:
+                            # La unidad queda libre en la calle final de su ruta
+                            ruta_final = (mision or {}).get("ruta") or [None]
+                            registro_flota.liberar(ambulancia_activa, tiempo_actual, edge=ruta_final[-1])
+                        mision = None
                         ambulancia_activa = None
                         ambulancia_en_ruta = False
-                        ambulancia_despachada = False
+                        ultima_muestra = None
+                        trayectoria = None
+                        if servidor_posiciones is not None:
+                            servidor_posiciones.publicar(tiempo_actual, {})
                         tiempo_accidente_detectado = None
-                        tiempo_despacho_programado = None
-                        print("[MAIN] Esperando nueva emergencia...")
-                    else:
-                        if int(tiempo_actual) % 5 == 0:
-                            try:
-                                vel = traci.vehicle.getSpeed(ambulancia_activa)
-                                road_id = traci.vehicle.getRoadID(ambulancia_activa)
-                                print(f"[SIM] T={tiempo_actual:.1f} | 📍 {road_id} | Vel: {vel:.1f} m/s")
-                            except: pass
+                        log.info("Esperando nueva emergencia...")
+
+            # Una sola escritura por semáforo con cambios, sea cual sea el número de reclamos
+            controlador_corredor.aplicar_reclamos(tiempo_actual)
 
     except KeyboardInterrupt:
-        print("\n[MAIN] Detenido por usuario.")
+        log.info("Detenido por usuario.")
     except Exception as e:
-        print(f"[MAIN] Error crítico: {e}")
-        traceback.print_exc()
+        log.exception("Error crítico: %s", e)
+        volcar_buffer()
     finally:
+        pool_planificacion.shutdown(wait=False, cancel_futures=True)
         gestor_traci.cerrar_conexion()
+        if USAR_PERFILES_VIAJE and os.path.exists(EDGEDATA_SALIDA):
+            # SUMO escribe edgeData al cerrar: la corrida se suma a los perfiles
+            from routing.travel_profiles import incorporar_edgedata
+            incorporar_edgedata([EDGEDATA_SALIDA], indice_tls)
+        if servidor_posiciones is not None:
+            servidor_posiciones.detener()
+        notificador.despachador.detener()
+        for nombre, st in notificador.despachador.estadisticas().items():
+            log_notificador.info("%s: %s enviadas en %s lotes | coalescidas=%s descartadas=%s fallidas=%s "
+                                 "reintentos=%s cola máx=%s latencia máx=%.2fs", nombre, st['enviadas'], st['lotes'],
+                                 st['coalescidas'], st['descartadas'], st['fallidas'], st['reintentos'],
+                                 st['profundidad_max'], st['latencia_max'])
+        if registros_descartados():
+            log.warning("%s registros de log descartados por cola llena", registros_descartados())
 
 if __name__ == "__main__":
+    configurar_logging()
     try:
         #exito = ejecutar_sistema_emergencias()
         exito = ejecutar_simulacion_trigger()
         sys.exit(0 if exito else 1)
     except Exception as e:
-        print(f"[MAIN] Error fatal: {e}")
-        traceback.print_exc()
+        log.exception("Error fatal: %s", e)
+        volcar_buffer()
         sys.exit(1)
+    finally:
+        detener_logging()
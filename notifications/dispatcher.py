@@ -0,0 +1,225 @@
+import json
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional
+
+from structured_log import obtener_logger
+
+log = obtener_logger("NOTIFICADOR")
+
+# Tipos de alerta periódicos: dentro de un lote solo importa la última por ambulancia
+TIPOS_COALESCIBLES = ("posicion", "estado")
+
+
+class Sumidero:
+    """
+    Destino de notificaciones. Las subclases implementan enviar(lote) y lanzan
+    una excepción si el envío falla, para que el despachador lo reintente.
+    """
+
+    nombre = "sumidero"
+
+    def __init__(self, tam_lote: int = 20, ventana_lote: float = 0.2,
+                 coalescer: Iterable[str] = TIPOS_COALESCIBLES):
+        self.tam_lote = tam_lote
+        self.ventana_lote = ventana_lote
+        self.tipos_coalescibles = set(coalescer)
+
+    def enviar(self, lote: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def cerrar(self) -> None:
+        pass
+
+
+class SumideroConsola(Sumidero):
+    nombre = "consola"
+
+    def __init__(self, formatear: Callable[[Dict[str, Any]], str], omitir: Iterable[str] = (), **kwargs):
+        super().__init__(**kwargs)
+        # Texto de cada alerta, p. ej. Notificador.formatear_alerta
+        self.formatear = formatear
+        # Tipos que no se imprimen (p. ej. "estado", que ya tiene su propia línea)
+        self.omitir = set(omitir)
+
+    def enviar(self, lote: List[Dict[str, Any]]) -> None:
+        for alerta in lote:
+            if alerta.get("tipo") not in self.omitir:
+                print(self.formatear(alerta))
+
+
+class SumideroJSONL(Sumidero):
+    nombre = "jsonl"
+
+    def __init__(self, ruta: Path, **kwargs):
+        super().__init__(**kwargs)
+        self.ruta = Path(ruta)
+
+    def enviar(self, lote: List[Dict[str, Any]]) -> None:
+        with open(self.ruta, "a") as f:
+            for alerta in lote:
+                f.write(json.dumps(alerta, default=str) + "\n")
+
+
+class SumideroWebhook(Sumidero):
+    """Envía cada lote como un arreglo JSON en un único POST."""
+
+    nombre = "webhook"
+
+    def __init__(self, url: str, timeout: float = 5.0, **kwargs):
+        super().__init__(**kwargs)
+        self.url = url
+        self.timeout = timeout
+
+    def enviar(self, lote: List[Dict[str, Any]]) -> None:
+        import urllib.request  # solo con webhook configurado: no se paga al importar el módulo
+        cuerpo = json.dumps(lote, default=str).encode("utf-8")
+        peticion = urllib.request.Request(self.url, data=cuerpo, method="POST",
+                                          headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(peticion, timeout=self.timeout) as respuesta:
+            if respuesta.status >= 300:
+                raise RuntimeError(f"HTTP {respuesta.status}")
+
+
+class _CanalSumidero:
+    """Cola acotada, hilo de envío y contadores de un sumidero."""
+
+    def __init__(self, sumidero: Sumidero, capacidad: int):
+        self.sumidero = sumidero
+        self.cola: Deque[tuple] = deque()  # (instante_encolado, alerta)
+        self.capacidad = capacidad
+        self.condicion = threading.Condition()
+        self.hilo: Optional[threading.Thread] = None
+        self.stats = {
+            "encoladas": 0, "enviadas": 0, "lotes": 0, "coalescidas": 0,
+            "descartadas": 0, "reintentos": 0, "fallidas": 0,
+            "profundidad_max": 0, "latencia_max": 0.0,
+        }
+
+
+class DespachadorNotificaciones:
+    """
+    Envía notificaciones en segundo plano para que ningún canal lento detenga
+    el bucle de simulación. publicar() nunca bloquea: cada sumidero tiene su
+    propia cola acotada y su hilo, y si la cola se llena se descarta la alerta
+    periódica más antigua (contabilizada en las estadísticas de contrapresión).
+    """
+
+    def __init__(self, sumideros: Iterable[Sumidero], capacidad: int = 1000,
+                 max_reintentos: int = 3, backoff_base: float = 0.5, backoff_max: float = 8.0):
+        self.capacidad = capacidad
+        self.max_reintentos = max_reintentos
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.canales = [_CanalSumidero(s, capacidad) for s in sumideros]
+        self._activo = False
+
+    def iniciar(self) -> None:
+        if self._activo:
+            return
+        self._activo = True
+        for canal in self.canales:
+            canal.hilo = threading.Thread(target=self._bucle_envio, args=(canal,),
+                                          name=f"notif-{canal.sumidero.nombre}", daemon=True)
+            canal.hilo.start()
+
+    def publicar(self, alerta: Dict[str, Any]) -> None:
+        """Encola la alerta en todos los sumideros. O(1) y sin E/S."""
+        marca = time.monotonic()
+        for canal in self.canales:
+            with canal.condicion:
+                if len(canal.cola) >= canal.capacidad:
+                    self._descartar_una(canal)
+                canal.cola.append((marca, alerta))
+                canal.stats["encoladas"] += 1
+                canal.stats["profundidad_max"] = max(canal.stats["profundidad_max"], len(canal.cola))
+                canal.condicion.notify()
+
+    def detener(self, timeout: float = 5.0) -> None:
+        """Vacía las colas pendientes (hasta `timeout` por sumidero) y detiene los hilos."""
+        self._activo = False
+        for canal in self.canales:
+            with canal.condicion:
+                canal.condicion.notify_all()
+        for canal in self.canales:
+            if canal.hilo is not None:
+                canal.hilo.join(timeout)
+
+    def estadisticas(self) -> Dict[str, Dict[str, Any]]:
+        resultado = {}
+        for canal in self.canales:
+            with canal.condicion:
+                resultado[canal.sumidero.nombre] = dict(canal.stats, pendientes=len(canal.cola))
+        return resultado
+
+    def _bucle_envio(self, canal: _CanalSumidero) -> None:
+        sumidero = canal.sumidero
+        while True:
+            with canal.condicion:
+                while not canal.cola and self._activo:
+                    canal.condicion.wait()
+                if not canal.cola and not self._activo:
+                    # El cierre se hace en el mismo hilo que usó el sumidero (p. ej. sqlite3)
+                    sumidero.cerrar()
+                    return
+                # Espera breve para acumular un lote, salvo que ya esté lleno o se esté cerrando
+                limite = time.monotonic() + sumidero.ventana_lote
+                while len(canal.cola) < sumidero.tam_lote and self._activo:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        break
+                    canal.condicion.wait(restante)
+                n = min(sumidero.tam_lote, len(canal.cola))
+                pendientes = [canal.cola.popleft() for _ in range(n)]
+
+            lote = self._coalescer(pendientes, sumidero.tipos_coalescibles)
+            canal.stats["coalescidas"] += len(pendientes) - len(lote)
+            if self._enviar_con_reintentos(canal, [alerta for _, alerta in lote]):
+                canal.stats["enviadas"] += len(lote)
+                canal.stats["lotes"] += 1
+                latencia = time.monotonic() - pendientes[0][0]
+                canal.stats["latencia_max"] = max(canal.stats["latencia_max"], latencia)
+            else:
+                canal.stats["fallidas"] += len(lote)
+
+    @staticmethod
+    def _descartar_una(canal: _CanalSumidero) -> None:
+        """Con la cola llena descarta la alerta coalescible más antigua; si no hay, la más antigua."""
+        tipos = canal.sumidero.tipos_coalescibles
+        for i, (_, alerta) in enumerate(canal.cola):
+            if alerta.get("tipo") in tipos:
+                del canal.cola[i]
+                break
+        else:
+            canal.cola.popleft()
+        canal.stats["descartadas"] += 1
+
+    @staticmethod
+    def _coalescer(pendientes: List[tuple], tipos: set) -> List[tuple]:
+        """Conserva solo la última alerta coalescible por (tipo, ambulancia), en orden de llegada."""
+        if not tipos:
+            return pendientes
+        ultima = {}
+        for i, (_, alerta) in enumerate(pendientes):
+            if alerta.get("tipo") in tipos:
+                ultima[(alerta.get("tipo"), alerta.get("id_ambulancia"))] = i
+        conservar = set(ultima.values())
+        return [p for i, p in enumerate(pendientes)
+                if p[1].get("tipo") not in tipos or i in conservar]
+
+    def _enviar_con_reintentos(self, canal: _CanalSumidero, lote: List[Dict[str, Any]]) -> bool:
+        espera = self.backoff_base
+        for intento in range(self.max_reintentos + 1):
+            try:
+                canal.sumidero.enviar(lote)
+                return True
+            except Exception as e:
+                if intento == self.max_reintentos:
+                    log.error("Sumidero '%s' descartó %s alertas: %s", canal.sumidero.nombre, len(lote), e)
+                    return False
+                canal.stats["reintentos"] += 1
+                time.sleep(espera)
+                espera = min(espera * 2, self.backoff_max)
+        return False
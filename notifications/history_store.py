@@ -0,0 +1,251 @@
+"""
+Historial persistente de alertas en segmentos SQLite (modo WAL) con rotación.
+
+Uso:
+    python -m notifications.history_store [--mision ID] [--ambulancia ID] [--tipo T]
+                                          [--desde ISO] [--hasta ISO] [--limite N]
+"""
+import argparse
+import heapq
+import json
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from notifications.dispatcher import Sumidero
+
+PREFIJO_SEGMENTO = "alertas_"
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS alertas (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    id_mision TEXT,
+    id_ambulancia TEXT,
+    tipo TEXT,
+    datos TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_alertas_ts ON alertas (ts);
+CREATE INDEX IF NOT EXISTS idx_alertas_mision ON alertas (id_mision, ts);
+CREATE INDEX IF NOT EXISTS idx_alertas_ambulancia ON alertas (id_ambulancia, ts);
+CREATE INDEX IF NOT EXISTS idx_alertas_tipo ON alertas (tipo, ts);
+"""
+
+Instante = Union[None, float, str, datetime]
+
+
+def _a_epoch(valor: Instante) -> Optional[float]:
+    if valor is None:
+        return None
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    if isinstance(valor, str):
+        valor = datetime.fromisoformat(valor)
+    return valor.timestamp()
+
+
+class AlmacenHistorial:
+    """
+    Almacén append-only de alertas. Escribe en un segmento SQLite a la vez y
+    abre uno nuevo cuando el actual supera `max_bytes` o `max_segundos`; los
+    segmentos más viejos se borran al pasar de `max_segmentos`. Las consultas
+    por rango descartan segmentos completos según el mínimo y el máximo `ts`
+    de sus filas (no según su apertura: el despachador entrega por lotes y con
+    reintentos, así que una alerta puede llegar después de una rotación
+    posterior a su timestamp).
+
+    La conexión de escritura pertenece al hilo que llama a agregar(); las
+    consultas abren conexiones propias de solo lectura (WAL permite leer
+    mientras se escribe).
+    """
+
+    def __init__(self, directorio: Path, max_bytes: int = 64 * 1024 * 1024,
+                 max_segundos: Optional[float] = 24 * 3600, max_segmentos: Optional[int] = None):
+        self.directorio = Path(directorio)
+        self.max_bytes = max_bytes
+        self.max_segundos = max_segundos
+        self.max_segmentos = max_segmentos
+        self._conexion: Optional[sqlite3.Connection] = None
+        self._segmento: Optional[Path] = None
+        self._t_apertura = 0.0
+        # segmento -> (ts mínimo, ts máximo); solo de segmentos que ya no reciben filas
+        self._rangos: Dict[Path, Tuple[Optional[float], Optional[float]]] = {}
+
+    def agregar(self, alertas: List[Dict[str, Any]]) -> None:
+        """Inserta un lote de alertas en una sola transacción."""
+        if not alertas:
+            return
+        if self._debe_rotar():
+            self._rotar()
+        filas = []
+        for alerta in alertas:
+            ts = _a_epoch(alerta.get("timestamp")) or time.time()
+            filas.append((ts, alerta.get("id_mision"), alerta.get("id_ambulancia"),
+                          alerta.get("tipo"), json.dumps(alerta, default=str)))
+        with self._conexion:
+            self._conexion.executemany(
+                "INSERT INTO alertas (ts, id_mision, id_ambulancia, tipo, datos) VALUES (?, ?, ?, ?, ?)",
+                filas)
+
+    def consultar(self, desde: Instante = None, hasta: Instante = None, id_mision: Optional[str] = None,
+                  id_ambulancia: Optional[str] = None, tipo: Optional[str] = None,
+                  limite: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Recorre en orden cronológico las alertas que cumplen los filtros, fila a
+        fila, sin cargar el historial completo en memoria. Los segmentos que
+        pueden tener filas del rango se leen a la vez y se mezclan por ts.
+        """
+        t_desde, t_hasta = _a_epoch(desde), _a_epoch(hasta)
+        condiciones, parametros = [], []
+        for columna, valor in (("id_mision", id_mision), ("id_ambulancia", id_ambulancia), ("tipo", tipo)):
+            if valor is not None:
+                condiciones.append(f"{columna} = ?")
+                parametros.append(str(valor))
+        if t_desde is not None:
+            condiciones.append("ts >= ?")
+            parametros.append(t_desde)
+        if t_hasta is not None:
+            condiciones.append("ts < ?")
+            parametros.append(t_hasta)
+        sql = "SELECT ts, datos FROM alertas"
+        if condiciones:
+            sql += " WHERE " + " AND ".join(condiciones)
+        sql += " ORDER BY ts"
+        if limite is not None:
+            sql += f" LIMIT {int(limite)}"
+
+        conexiones = []
+        try:
+            cursores = []
+            for segmento in self._segmentos_en_rango(t_desde, t_hasta):
+                conexiones.append(sqlite3.connect(f"file:{segmento}?mode=ro", uri=True))
+                cursores.append(conexiones[-1].execute(sql, parametros))
+            for n, (_ts, datos) in enumerate(heapq.merge(*cursores, key=lambda fila: fila[0])):
+                if limite is not None and n >= limite:
+                    return
+                yield json.loads(datos)
+        finally:
+            for conexion in conexiones:
+                conexion.close()
+
+    def segmentos(self) -> List[Path]:
+        return sorted(self.directorio.glob(f"{PREFIJO_SEGMENTO}*.sqlite"))
+
+    def cerrar(self) -> None:
+        if self._conexion is not None:
+            self._conexion.close()
+            self._conexion = None
+
+    def _segmentos_en_rango(self, t_desde: Optional[float], t_hasta: Optional[float]) -> List[Path]:
+        segmentos = self.segmentos()
+        self._rangos = {s: r for s, r in self._rangos.items() if s in segmentos}
+        seleccion = []
+        for i, segmento in enumerate(segmentos):
+            ts_min, ts_max = self._rango_ts(segmento, ultimo=i == len(segmentos) - 1)
+            if ts_min is None:
+                continue  # segmento vacío
+            if t_hasta is not None and ts_min >= t_hasta:
+                continue
+            if t_desde is not None and ts_max < t_desde:
+                continue
+            seleccion.append(segmento)
+        return seleccion
+
+    def _rango_ts(self, segmento: Path, ultimo: bool) -> Tuple[Optional[float], Optional[float]]:
+        """
+        (ts mínimo, ts máximo) de las filas del segmento: con el índice sobre ts
+        son dos búsquedas en el árbol. Solo el último segmento puede seguir
+        recibiendo filas (de este u otro proceso); el rango de los demás se guarda.
+        """
+        rango = self._rangos.get(segmento)
+        if rango is not None:
+            return rango
+        conexion = sqlite3.connect(f"file:{segmento}?mode=ro", uri=True)
+        try:
+            rango = conexion.execute("SELECT min(ts), max(ts) FROM alertas").fetchone()
+        finally:
+            conexion.close()
+        if not ultimo:
+            self._rangos[segmento] = rango
+        return rango
+
+    def _debe_rotar(self) -> bool:
+        if self._conexion is None:
+            return True
+        if self.max_segundos is not None and time.time() - self._t_apertura >= self.max_segundos:
+            return True
+        return self._tamano_segmento() >= self.max_bytes
+
+    def _tamano_segmento(self) -> int:
+        """Bytes del segmento actual contando su -wal, que crece hasta cada checkpoint."""
+        total = 0
+        for ruta in (self._segmento, Path(f"{self._segmento}-wal")):
+            try:
+                total += ruta.stat().st_size
+            except FileNotFoundError:
+                pass
+        return total
+
+    def _rotar(self) -> None:
+        self.cerrar()
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self._t_apertura = time.time()
+        sello = datetime.fromtimestamp(self._t_apertura).strftime("%Y%m%d_%H%M%S_%f")
+        self._segmento = self.directorio / f"{PREFIJO_SEGMENTO}{sello}.sqlite"
+        self._conexion = sqlite3.connect(self._segmento)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=NORMAL")
+        self._conexion.executescript(ESQUEMA)
+
+        if self.max_segmentos is not None:
+            for viejo in self.segmentos()[:-self.max_segmentos]:
+                for ruta in (viejo, Path(f"{viejo}-wal"), Path(f"{viejo}-shm")):
+                    ruta.unlink(missing_ok=True)
+
+
+class SumideroHistorial(Sumidero):
+    """Sumidero del despachador que persiste cada lote en el AlmacenHistorial."""
+
+    nombre = "historial"
+
+    def __init__(self, almacen: AlmacenHistorial, **kwargs):
+        # El historial conserva todas las alertas: sin coalescer
+        kwargs.setdefault("coalescer", ())
+        super().__init__(**kwargs)
+        self.almacen = almacen
+
+    def enviar(self, lote: List[Dict[str, Any]]) -> None:
+        self.almacen.agregar(lote)
+
+    def cerrar(self) -> None:
+        self.almacen.cerrar()
+
+
+def main(argv=None) -> int:
+    from config import DIRECTORIO_HISTORIAL
+
+    parser = argparse.ArgumentParser(description="Consulta del historial de alertas")
+    parser.add_argument("--directorio", default=str(DIRECTORIO_HISTORIAL))
+    parser.add_argument("--mision")
+    parser.add_argument("--ambulancia")
+    parser.add_argument("--tipo")
+    parser.add_argument("--desde", help="instante ISO 8601")
+    parser.add_argument("--hasta", help="instante ISO 8601")
+    parser.add_argument("--limite", type=int)
+    args = parser.parse_args(argv)
+
+    almacen = AlmacenHistorial(Path(args.directorio))
+    total = 0
+    for alerta in almacen.consultar(args.desde, args.hasta, args.mision, args.ambulancia,
+                                    args.tipo, args.limite):
+        print(json.dumps(alerta, ensure_ascii=False, default=str))
+        total += 1
+    print(f"[HISTORIAL] {total} alertas en {len(almacen.segmentos())} segmentos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,18 @@
+from collections import deque
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import json
 
+from notifications.dispatcher import DespachadorNotificaciones
+
 class Notificador:
-    def __init__(self, activo: bool = True):
+    def __init__(self, activo: bool = True, despachador: Optional[DespachadorNotificaciones] = None,
+                 max_historial: int = 500):
         self.activo = activo
-        self.historial = []
+        # Solo las alertas recientes; el historial completo va al AlmacenHistorial
+        self.historial = deque(maxlen=max_historial)
+        # Si hay despachador, las alertas se envían en segundo plano a sus sumideros
+        self.despachador = despachador
     
     def send_alert(self, datos: Dict[str, Any]) -> bool:
         """
@@ -19,6 +26,7 @@ class Notificador:
             alerta = {
                 "timestamp": datetime.now().isoformat(),
                 "tipo": datos.get("tipo", "generico"),
+                "id_mision": datos.get("id_mision"),
                 "id_ambulancia": datos.get("id_ambulancia"),
                 "destino": datos.get("destino"),
                 "ruta": datos.get("ruta"),
@@ -30,51 +38,65 @@ class Notificador:
             }
             
             self.historial.append(alerta)
-            self._imprimir_alerta(alerta)
+            if self.despachador is not None:
+                self.despachador.publicar(alerta)
+            else:
+                self._imprimir_alerta(alerta)
             return True
         except Exception as e:
             print(f"[NOTIFICADOR] Error enviando alerta: {e}")
             return False
     
-    def _imprimir_alerta(self, alerta: Dict[str, Any]) -> None:
+    @staticmethod
+    def formatear_alerta(alerta: Dict[str, Any]) -> str:
         """
-        Imprime una alerta formateada en consola de forma segura.
+        Bloque de texto de una alerta para consola (lo usa también SumideroConsola).
         """
         linea_separadora = "=" * 60
-        print(linea_separadora)
-        print(f"[ALERTA] {alerta['tipo'].upper()}")
-        print(f"Timestamp: {alerta['timestamp']}")
+        lineas = [linea_separadora, f"[ALERTA] {alerta['tipo'].upper()}", f"Timestamp: {alerta['timestamp']}"]
         
         if alerta.get('id_ambulancia'):
-            print(f"Ambulancia: {alerta['id_ambulancia']}")
+            lineas.append(f"Ambulancia: {alerta['id_ambulancia']}")
         if alerta.get('destino'):
-            print(f"Destino: {alerta['destino']}")
+            lineas.append(f"Destino: {alerta['destino']}")
             
         ruta = alerta.get('ruta')
         if ruta and isinstance(ruta, list):
             ruta_str = ' -> '.join(str(r) for r in ruta)
             if len(ruta_str) > 100: ruta_str = ruta_str[:97] + "..."
-            print(f"Ruta: {ruta_str}")
+            lineas.append(f"Ruta: {ruta_str}")
             
         if alerta.get('distancia') is not None:
-            print(f"Distancia: {alerta['distancia']}m")
+            lineas.append(f"Distancia: {alerta['distancia']}m")
             
         pos = alerta.get('posicion')
         if pos:
-            print(f"Posición actual: {pos}")
+            lineas.append(f"Posición actual: {pos}")
             
         vel = alerta.get('velocidad')
         if vel is not None:
-            print(f"Velocidad: {vel:.2f} m/s")
+            lineas.append(f"Velocidad: {vel:.2f} m/s")
             
         if alerta.get('mensaje'):
-            print(f"Mensaje: {alerta['mensaje']}")
-        print(linea_separadora)
+            lineas.append(f"Mensaje: {alerta['mensaje']}")
+        lineas.append(linea_separadora)
+        return "\n".join(lineas)
+
+    def _imprimir_alerta(self, alerta: Dict[str, Any]) -> None:
+        """
+        Imprime una alerta formateada en consola de forma segura.
+        """
+        print(self.formatear_alerta(alerta))
     
     def enviar_notificacion_bot(self, alerta_texto: str, canal_id: str = None) -> bool:
         """
-        Placeholder para envío a bot de Telegram o similar.
+        Placeholder para envío a bot de Telegram o similar. Con despachador,
+        el texto se publica como alerta tipo "bot" (p. ej. hacia el webhook).
         """
+        if self.despachador is not None:
+            self.despachador.publicar({"timestamp": datetime.now().isoformat(), "tipo": "bot",
+                                       "mensaje": alerta_texto, "canal": canal_id})
+            return True
         print(f"[NOTIFICADOR] [PLACEHOLDER] Envío a bot: {alerta_texto}")
         if canal_id:
             print(f"[NOTIFICADOR] [PLACEHOLDER] Canal: {canal_id}")
@@ -84,10 +106,10 @@ class Notificador:
         """
         Retorna el historial de alertas.
         """
-        return self.historial
+        return list(self.historial)
     
     def limpiar_historial(self) -> None:
         """
         Limpia el historial de alertas.
         """
-        self.historial = []
+        self.historial.clear()
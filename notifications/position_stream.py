@@ -0,0 +1,235 @@
+import json
+import os
+import selectors
+import socket
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from structured_log import obtener_logger
+
+log = obtener_logger("POSICIONES")
+
+# Resolución con la que se comparan los campos para el delta (cambios menores no se envían)
+RESOLUCION = {"x": 0.1, "y": 0.1, "velocidad": 0.1, "eta": 0.5, "pos_en_edge": 0.5}
+
+# Tope del búfer de salida por cliente; si un cliente lento lo supera se le
+# descartan las líneas pendientes (salvo el final de la que ya empezó a
+# recibir) y recibe un snapshot completo en el próximo envío
+MAX_BUFER_CLIENTE = 256 * 1024
+
+
+def _cuantizar(campos: Dict[str, Any]) -> Dict[str, Any]:
+    resultado = {}
+    for clave, valor in campos.items():
+        paso = RESOLUCION.get(clave)
+        if paso is not None and valor is not None:
+            valor = round(round(valor / paso) * paso, 3)
+        resultado[clave] = valor
+    return resultado
+
+
+class _Suscriptor:
+    def __init__(self, conexion: socket.socket, periodo: float):
+        self.conexion = conexion
+        self.periodo = periodo
+        self.t_proximo = 0.0
+        self.version_enviada = -1
+        self.enviado: Optional[Dict[str, Dict[str, Any]]] = None   # None = requiere snapshot
+        self.entrada = b""
+        self.salida = bytearray()
+        # True si salida empieza a mitad de una línea cuyo comienzo ya se envió
+        self.parcial = False
+
+
+class ServidorPosiciones:
+    """
+    Publica la posición de las ambulancias activas a clientes locales (socket
+    Unix o TCP) como líneas JSON. El bucle de simulación solo llama a
+    publicar() con la última muestra, que reemplaza a la anterior (coalescencia);
+    un hilo aparte reparte a cada cliente a la frecuencia que eligió, enviando
+    solo los campos que cambiaron desde su último mensaje. Con muchos clientes
+    el costo en TraCI es el mismo: una lectura de suscripción por ambulancia.
+
+    Un cliente puede fijar su frecuencia enviando una línea {"hz": 2}.
+    Mensajes: {"tipo": "snapshot"|"delta", "t": t_sim, "seq": n,
+               "ambulancias": {id: {campos}}, "retiradas": [ids]}
+    """
+
+    def __init__(self, ruta_socket: Optional[str] = None, host: str = "127.0.0.1", puerto: int = 8765,
+                 hz_defecto: float = 1.0, hz_max: float = 10.0):
+        self.ruta_socket = ruta_socket
+        self.host = host
+        self.puerto = puerto
+        self.hz_defecto = hz_defecto
+        self.hz_max = hz_max
+        self._estado: Dict[str, Dict[str, Any]] = {}
+        self._t_sim = 0.0
+        self._version = 0
+        self._candado = threading.Lock()
+        self._selector = selectors.DefaultSelector()
+        self._servidor: Optional[socket.socket] = None
+        self._suscriptores: Dict[socket.socket, _Suscriptor] = {}
+        self._hilo: Optional[threading.Thread] = None
+        self._activo = False
+        self.stats = {"clientes": 0, "mensajes": 0, "bytes": 0, "resincronizaciones": 0}
+
+    def iniciar(self) -> bool:
+        try:
+            if self.ruta_socket:
+                if os.path.exists(self.ruta_socket):
+                    os.remove(self.ruta_socket)
+                self._servidor = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self._servidor.bind(self.ruta_socket)
+                destino = self.ruta_socket
+            else:
+                self._servidor = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                self._servidor.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                self._servidor.bind((self.host, self.puerto))
+                self.puerto = self._servidor.getsockname()[1]
+                destino = f"{self.host}:{self.puerto}"
+            self._servidor.listen()
+            self._servidor.setblocking(False)
+            self._selector.register(self._servidor, selectors.EVENT_READ)
+
+            self._activo = True
+            self._hilo = threading.Thread(target=self._bucle, name="stream-posiciones", daemon=True)
+            self._hilo.start()
+            log.info("Stream de posiciones en %s", destino)
+            return True
+        except Exception as e:
+            # p. ej. otra corrida en el mismo equipo ya escucha en el puerto
+            log.warning("No se pudo iniciar el stream de posiciones: %s", e)
+            if self._servidor is not None:
+                self._servidor.close()
+                self._servidor = None
+            return False
+
+    def publicar(self, t_sim: float, ambulancias: Dict[str, Dict[str, Any]]) -> None:
+        """Reemplaza el estado publicado por la muestra de este paso. Sin E/S."""
+        estado = {amb: _cuantizar(campos) for amb, campos in ambulancias.items()}
+        with self._candado:
+            self._t_sim = t_sim
+            if estado != self._estado:
+                self._estado = estado
+                self._version += 1
+
+    def detener(self) -> None:
+        self._activo = False
+        if self._hilo is not None:
+            self._hilo.join(2.0)
+        for conexion in list(self._suscriptores):
+            self._cerrar_cliente(conexion)
+        if self._servidor is not None:
+            self._selector.unregister(self._servidor)
+            self._servidor.close()
+            if self.ruta_socket and os.path.exists(self.ruta_socket):
+                os.remove(self.ruta_socket)
+        self._selector.close()
+
+    def _bucle(self) -> None:
+        intervalo = 1.0 / self.hz_max
+        while self._activo:
+            for clave, mascara in self._selector.select(timeout=intervalo):
+                conexion = clave.fileobj
+                if conexion is self._servidor:
+                    self._aceptar()
+                    continue
+                if mascara & selectors.EVENT_READ:
+                    self._leer(conexion)
+                if mascara & selectors.EVENT_WRITE and conexion in self._suscriptores:
+                    self._escribir(conexion)
+
+            ahora = time.monotonic()
+            with self._candado:
+                estado, t_sim, version = self._estado, self._t_sim, self._version
+            for suscriptor in list(self._suscriptores.values()):
+                if ahora >= suscriptor.t_proximo and version != suscriptor.version_enviada:
+                    suscriptor.t_proximo = ahora + suscriptor.periodo
+                    suscriptor.version_enviada = version
+                    self._encolar(suscriptor, estado, t_sim, version)
+
+    def _aceptar(self) -> None:
+        try:
+            conexion, _ = self._servidor.accept()
+        except OSError:
+            return
+        conexion.setblocking(False)
+        self._suscriptores[conexion] = _Suscriptor(conexion, 1.0 / self.hz_defecto)
+        self._selector.register(conexion, selectors.EVENT_READ)
+        self.stats["clientes"] += 1
+
+    def _leer(self, conexion: socket.socket) -> None:
+        suscriptor = self._suscriptores.get(conexion)
+        try:
+            datos = conexion.recv(4096)
+        except OSError:
+            datos = b""
+        if not datos or suscriptor is None:
+            self._cerrar_cliente(conexion)
+            return
+        suscriptor.entrada += datos
+        while b"\n" in suscriptor.entrada:
+            linea, suscriptor.entrada = suscriptor.entrada.split(b"\n", 1)
+            try:
+                hz = float(json.loads(linea).get("hz", self.hz_defecto))
+                suscriptor.periodo = 1.0 / min(max(hz, 0.01), self.hz_max)
+                suscriptor.t_proximo = 0.0
+            except (ValueError, AttributeError):
+                continue
+
+    def _encolar(self, suscriptor: _Suscriptor, estado: Dict[str, Dict[str, Any]],
+                 t_sim: float, version: int) -> None:
+        if len(suscriptor.salida) > MAX_BUFER_CLIENTE:
+            # Se conserva el resto de la línea ya empezada: el cliente no debe recibir JSON truncado
+            fin = suscriptor.salida.find(b"\n") + 1 if suscriptor.parcial else 0
+            del suscriptor.salida[fin:]
+            suscriptor.enviado = None
+            self.stats["resincronizaciones"] += 1
+
+        if suscriptor.enviado is None:
+            mensaje = {"tipo": "snapshot", "t": round(t_sim, 2), "seq": version, "ambulancias": estado, "retiradas": []}
+        else:
+            cambios = {}
+            for amb, campos in estado.items():
+                previo = suscriptor.enviado.get(amb, {})
+                delta = {k: v for k, v in campos.items() if previo.get(k) != v}
+                if delta:
+                    cambios[amb] = delta
+            retiradas = [amb for amb in suscriptor.enviado if amb not in estado]
+            if not cambios and not retiradas:
+                return
+            mensaje = {"tipo": "delta", "t": round(t_sim, 2), "seq": version, "ambulancias": cambios, "retiradas": retiradas}
+        suscriptor.enviado = estado
+
+        datos = (json.dumps(mensaje, separators=(",", ":")) + "\n").encode("utf-8")
+        suscriptor.salida += datos
+        self.stats["mensajes"] += 1
+        self.stats["bytes"] += len(datos)
+        self._escribir(suscriptor.conexion)
+
+    def _escribir(self, conexion: socket.socket) -> None:
+        suscriptor = self._suscriptores.get(conexion)
+        if suscriptor is None:
+            return
+        try:
+            if suscriptor.salida:
+                enviados = conexion.send(suscriptor.salida)
+                if enviados:
+                    suscriptor.parcial = suscriptor.salida[enviados - 1] != ord("\n")
+                    del suscriptor.salida[:enviados]
+        except BlockingIOError:
+            pass
+        except OSError:
+            self._cerrar_cliente(conexion)
+            return
+        eventos = selectors.EVENT_READ | (selectors.EVENT_WRITE if suscriptor.salida else 0)
+        self._selector.modify(conexion, eventos)
+
+    def _cerrar_cliente(self, conexion: socket.socket) -> None:
+        self._suscriptores.pop(conexion, None)
+        try:
+            self._selector.unregister(conexion)
+        except (KeyError, ValueError):
+            pass
+        conexion.close()
@@ -0,0 +1,263 @@
+"""
+Ruteo masivo de la demanda de fondo: convierte los <trip> de un archivo de
+viajes (p. ej. trafico.trips.xml de randomTrips) en <vehicle> con <route>,
+con el Dijkstra del proyecto en lugar de una corrida externa de duarouter.
+
+- Se rutea sobre el grafo de conexiones (graph_loader.construir_grafo_conexiones),
+  así que las rutas respetan los giros permitidos para la clase de vehículo.
+- Los viajes se agrupan por calle de origen (y franja horaria con perfiles):
+  cada grupo comparte un solo árbol de caminos (dijkstra.arbol_caminos), que
+  se detiene al alcanzar todos los destinos del grupo.
+- Los grupos se reparten en un pool de procesos; cada proceso carga la red una
+  vez al iniciar.
+- La entrada se lee y la salida se escribe por bloques de RUTEO_MASIVO_BLOQUE
+  viajes (iterparse), de modo que la memoria no crece con el número de viajes.
+  La salida conserva el orden de la entrada (SUMO exige salidas ordenadas).
+
+Costos: tiempo a flujo libre, tiempos medidos de un edgeData (--edgedata) o
+perfiles históricos a la hora de salida de cada franja (--perfiles).
+
+Uso (--salida es obligatorio: no se pisa el routes.rou.xml versionado por omisión):
+    python -m routing.bulk_router [VIAJES.xml] --salida RUTAS.rou.xml [--procesos N]
+                                  [--edgedata edgeData_output.xml --desde T --hasta T] [--perfiles]
+"""
+import argparse
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from xml.sax.saxutils import quoteattr
+
+from config import (
+    SUMO_NET, SUMO_TRIPS, RUTEO_MASIVO_BLOQUE, RUTEO_MASIVO_PROCESOS, RUTEO_MASIVO_CLASE,
+    DESFASE_HORARIO_SIM
+)
+from routing.dijkstra import arbol_caminos, camino_en_arbol, dijkstra_ruta_optima
+from routing.graph_loader import construir_grafo_conexiones
+
+# Atributos de <trip> que la ruta reemplaza
+ATRIBUTOS_VIAJE = ("from", "to", "via", "fromJunction", "toJunction", "fromTaz", "toTaz")
+SEGUNDOS_DIA = 86400
+
+# Estado de cada proceso de trabajo (se llena en _iniciar_trabajador)
+_TRABAJADOR: dict = {}
+
+# Un grupo: (calle de origen, franja, [(índice del viaje, [via..., destino])])
+Grupo = Tuple[str, int, List[Tuple[int, List[str]]]]
+
+
+def _iniciar_trabajador(ruta_net: str, clase: str, pesos: Optional[Dict[str, float]], usar_perfiles: bool) -> None:
+    _TRABAJADOR["grafo"] = construir_grafo_conexiones(ET.parse(ruta_net).getroot(), clase)
+    _TRABAJADOR["pesos"] = pesos
+    _TRABAJADOR["perfiles"] = None
+    if usar_perfiles:
+        from routing.travel_profiles import cargar_perfiles
+        _TRABAJADOR["perfiles"] = cargar_perfiles()
+
+
+def _funcion_costo(franja: int):
+    perfiles = _TRABAJADOR["perfiles"]
+    if perfiles is not None:
+        # Árbol compartido por la franja: los costos son los de su inicio
+        return perfiles.funcion_costo(franja * perfiles.tam_franja)
+    pesos = _TRABAJADOR["pesos"]
+    if pesos is not None:
+        return lambda datos, _acumulado: pesos.get(datos["edge_id"], datos["peso"])
+    return None
+
+
+def rutear_grupo(grupo: Grupo) -> List[Tuple[int, Optional[str]]]:
+    """Rutas (edges separados por espacio, None si no hay) de los viajes de un grupo."""
+    origen, franja, viajes = grupo
+    grafo = _TRABAJADOR["grafo"]
+    funcion_costo = _funcion_costo(franja)
+    _distancias, padres = arbol_caminos(grafo, origen, {tramos[0] for _i, tramos in viajes}, funcion_costo)
+
+    resultado = []
+    for indice, tramos in viajes:
+        ruta = camino_en_arbol(padres, tramos[0])
+        # Viajes con via: los tramos siguientes no comparten árbol
+        for desde, hasta in zip(tramos, tramos[1:]):
+            if ruta is None:
+                break
+            siguiente, _ = dijkstra_ruta_optima(grafo, desde, hasta, funcion_costo)
+            ruta = ruta + siguiente[1:] if siguiente else None
+        resultado.append((indice, " ".join(ruta) if ruta else None))
+    return resultado
+
+
+def leer_bloques(ruta_viajes: Path, tam_bloque: int) -> Iterator[List[ET.Element]]:
+    """Elementos de primer nivel del archivo de viajes, de a `tam_bloque` <trip>."""
+    bloque: List[ET.Element] = []
+    viajes = 0
+    profundidad = 0
+    contexto = ET.iterparse(str(ruta_viajes), events=("start", "end"))
+    _, raiz = next(contexto)
+    for evento, elem in contexto:
+        if evento == "start":
+            profundidad += 1
+            continue
+        profundidad -= 1
+        if profundidad < 0:
+            break  # cierre de la raíz
+        if profundidad > 0:
+            continue
+        bloque.append(elem)
+        raiz.remove(elem)
+        if elem.tag == "trip":
+            viajes += 1
+            if viajes >= tam_bloque:
+                yield bloque
+                bloque, viajes = [], 0
+    if bloque:
+        yield bloque
+
+
+def _escribir(f, elem: ET.Element, ruta: Optional[str]) -> None:
+    if elem.tag != "trip":
+        f.write("    " + ET.tostring(elem, encoding="unicode").strip() + "\n")
+        return
+    atributos = "".join(f" {k}={quoteattr(v)}" for k, v in elem.attrib.items() if k not in ATRIBUTOS_VIAJE)
+    f.write(f"    <vehicle{atributos}>\n        <route edges={quoteattr(ruta)}/>\n")
+    for hijo in elem:
+        f.write("        " + ET.tostring(hijo, encoding="unicode").strip() + "\n")
+    f.write("    </vehicle>\n")
+
+
+def rutear_viajes(ruta_viajes: Path, ruta_salida: Path, ruta_net: Path = SUMO_NET,
+                  procesos: Optional[int] = RUTEO_MASIVO_PROCESOS, tam_bloque: int = RUTEO_MASIVO_BLOQUE,
+                  pesos: Optional[Dict[str, float]] = None, usar_perfiles: bool = False,
+                  clase: str = RUTEO_MASIVO_CLASE) -> Optional[dict]:
+    """
+    Rutea todos los <trip> de `ruta_viajes` y escribe `ruta_salida` (.rou.xml).
+    Los viajes sin ruta se omiten. Retorna estadísticas o None si falla.
+    """
+    procesos = procesos or os.cpu_count() or 1
+    tam_franja = None
+    if usar_perfiles:
+        from routing.travel_profiles import cargar_perfiles
+        perfiles = cargar_perfiles()
+        if perfiles is None:
+            print("[RUTEO_MASIVO] No hay perfiles de viaje: use --edgedata o el flujo libre")
+            return None
+        tam_franja = perfiles.tam_franja
+
+    t0 = time.perf_counter()
+    stats = {"viajes": 0, "ruteados": 0, "sin_ruta": 0, "arboles": 0}
+    sin_ruta: List[str] = []
+    temporal = Path(f"{ruta_salida}.tmp")
+    initargs = (str(ruta_net), clase, pesos, usar_perfiles)
+    pool = ProcessPoolExecutor(procesos, initializer=_iniciar_trabajador, initargs=initargs) if procesos > 1 else None
+    if pool is None:
+        _iniciar_trabajador(*initargs)
+
+    try:
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n\n<!-- generado por routing.bulk_router -->\n\n'
+                    '<routes xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+                    'xsi:noNamespaceSchemaLocation="http://sumo.dlr.de/xsd/routes_file.xsd">\n')
+            for numero, bloque in enumerate(leer_bloques(ruta_viajes, tam_bloque), 1):
+                t_bloque = time.perf_counter()
+                grupos: Dict[Tuple[str, int], List[Tuple[int, List[str]]]] = {}
+                for i, elem in enumerate(bloque):
+                    if elem.tag != "trip":
+                        continue
+                    stats["viajes"] += 1
+                    origen, destino = elem.get("from"), elem.get("to")
+                    if not origen or not destino:
+                        continue
+                    franja = 0
+                    if tam_franja:
+                        franja = int((float(elem.get("depart", 0)) + DESFASE_HORARIO_SIM) % SEGUNDOS_DIA // tam_franja)
+                    tramos = elem.get("via", "").split() + [destino]
+                    grupos.setdefault((origen, franja), []).append((i, tramos))
+
+                lista = [(origen, franja, viajes) for (origen, franja), viajes in grupos.items()]
+                if pool is not None:
+                    lotes = pool.map(rutear_grupo, lista, chunksize=max(1, len(lista) // (procesos * 4)))
+                else:
+                    lotes = map(rutear_grupo, lista)
+                rutas: Dict[int, Optional[str]] = {}
+                for lote in lotes:
+                    rutas.update(lote)
+                stats["arboles"] += len(lista)
+
+                for i, elem in enumerate(bloque):
+                    if elem.tag == "trip":
+                        ruta = rutas.get(i)
+                        if ruta is None:
+                            stats["sin_ruta"] += 1
+                            if len(sin_ruta) < 10:
+                                sin_ruta.append(elem.get("id", "?"))
+                            continue
+                        stats["ruteados"] += 1
+                    _escribir(f, elem, rutas.get(i))
+                print(f"[RUTEO_MASIVO] Bloque {numero}: {sum(e.tag == 'trip' for e in bloque)} viajes, "
+                      f"{len(lista)} árboles ({time.perf_counter() - t_bloque:.1f}s)")
+            f.write("</routes>\n")
+        os.replace(temporal, ruta_salida)
+    except Exception as e:
+        print(f"[RUTEO_MASIVO] Error ruteando {ruta_viajes}: {e}")
+        temporal.unlink(missing_ok=True)
+        return None
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    stats["segundos"] = time.perf_counter() - t0
+    if sin_ruta:
+        print(f"[RUTEO_MASIVO] {stats['sin_ruta']} viajes sin ruta (omitidos), p. ej.: {', '.join(sin_ruta)}")
+    return stats
+
+
+def pesos_edgedata(ruta_xml: Path, ruta_net: Path = SUMO_NET, desde: Optional[float] = None,
+                   hasta: Optional[float] = None, clase: str = RUTEO_MASIVO_CLASE) -> Dict[str, float]:
+    """Tiempo de viaje medido por calle (longitud / velocidad media ponderada del edgeData)."""
+    from analysis.edgedata import cargar_edgedata
+
+    grafo = construir_grafo_conexiones(ET.parse(ruta_net).getroot(), clase)
+    datos = cargar_edgedata(ruta_xml, desde, hasta, edges=set(grafo.nodes))
+    agregado = datos.agregar_por_edge()
+    pesos = {}
+    for i, edge_id in enumerate(datos.edges):
+        velocidad = agregado["velocidad"][i]
+        if agregado["muestreo"][i] > 0 and velocidad > 0:
+            pesos[edge_id] = grafo.nodes[edge_id]["longitud"] / float(velocidad)
+    return pesos
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Rutea en lote un archivo de viajes (.trips.xml) a .rou.xml")
+    parser.add_argument("viajes", nargs="?", type=Path, default=SUMO_TRIPS)
+    parser.add_argument("--salida", type=Path, required=True, help="archivo .rou.xml a escribir")
+    parser.add_argument("--red", type=Path, default=SUMO_NET)
+    parser.add_argument("--procesos", type=int, default=RUTEO_MASIVO_PROCESOS,
+                        help="procesos de ruteo (por defecto, uno por CPU)")
+    parser.add_argument("--bloque", type=int, default=RUTEO_MASIVO_BLOQUE, help="viajes por bloque")
+    parser.add_argument("--clase", default=RUTEO_MASIVO_CLASE, help="clase de vehículo SUMO")
+    costos = parser.add_mutually_exclusive_group()
+    costos.add_argument("--edgedata", type=Path, help="costos = tiempos medidos en este edgeData")
+    costos.add_argument("--perfiles", action="store_true", help="costos = perfiles históricos por franja")
+    parser.add_argument("--desde", type=float, help="inicio de la ventana del edgeData (s)")
+    parser.add_argument("--hasta", type=float, help="fin de la ventana del edgeData (s)")
+    args = parser.parse_args(argv)
+
+    pesos = None
+    if args.edgedata:
+        pesos = pesos_edgedata(args.edgedata, args.red, args.desde, args.hasta, args.clase)
+        print(f"[RUTEO_MASIVO] {len(pesos)} calles con tiempo medido en {args.edgedata}")
+
+    stats = rutear_viajes(args.viajes, args.salida, args.red, args.procesos, args.bloque, pesos,
+                          args.perfiles, args.clase)
+    if stats is None:
+        return 1
+    print(f"[RUTEO_MASIVO] {stats['ruteados']}/{stats['viajes']} viajes ruteados con {stats['arboles']} árboles "
+          f"en {stats['segundos']:.1f}s → {args.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
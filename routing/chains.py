@@ -0,0 +1,122 @@
+"""
+Compresión de cadenas de grado 2 del grafo de ruteo.
+
+SUMO parte las calles en tramos (#0, #1, ...) unidos por junctions triviales.
+Un junction es interior de una cadena si solo continúa la calle:
+- sentido único: un predecesor y un sucesor distintos;
+- doble sentido: los mismos dos vecinos como predecesores y sucesores.
+comprimir_cadenas() reemplaza cada cadena por una superarista con el peso
+total y la lista de tramos originales ("tramos": datos de cada arista), de
+modo que Dijkstra/Pareto buscan sobre menos nodos y la ruta se expande a
+edges de SUMO con edges_arista() antes de traci.route.add.
+
+Los junctions de `conservar` (zonas de accidente, etc.) nunca se comprimen;
+un destino que sí quedó dentro de una cadena se rutea sobre el grafo
+original (grafo.graph["original"]).
+"""
+import time
+from typing import Iterable, List, Optional, Tuple, TYPE_CHECKING
+
+from structured_log import obtener_logger
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+log = obtener_logger("CHAINS")
+
+
+def _es_interior(grafo: "nx.DiGraph", nodo: str) -> bool:
+    predecesores = set(grafo.predecessors(nodo))
+    sucesores = set(grafo.successors(nodo))
+    if nodo in sucesores:
+        return False
+    if len(predecesores) == 1 and len(sucesores) == 1:
+        return predecesores != sucesores
+    return len(predecesores) == 2 and predecesores == sucesores
+
+
+def comprimir_cadenas(grafo: "nx.DiGraph", conservar: Iterable[str] = ()) -> "nx.DiGraph":
+    """
+    Grafo con las cadenas de grado 2 colapsadas. Las superaristas llevan
+    peso (suma), edge_id (primer tramo) y tramos; las aristas que no forman
+    cadena se copian tal cual. Entre dos nodos con más de una cadena se
+    conserva la de menor peso. Los junctions sin calles se descartan.
+    """
+    import networkx as nx
+    t0 = time.perf_counter()
+    conservar = set(conservar)
+    interiores = {n for n in grafo if n not in conservar and _es_interior(grafo, n)}
+
+    comprimido = nx.DiGraph()
+    comprimido.graph.update(grafo.graph)
+    comprimido.graph["original"] = grafo
+    edges_cadena = {}          # edge_id de un tramo -> (nodo final, tramos de su cadena, posición)
+    comprimido.graph["edges_cadena"] = edges_cadena
+    for nodo, datos in grafo.nodes(data=True):
+        if nodo not in interiores and (grafo.degree(nodo) > 0 or nodo in conservar):
+            comprimido.add_node(nodo, **datos)
+
+    recorridos = set()
+    for inicio in list(comprimido.nodes):
+        for siguiente in grafo.successors(inicio):
+            tramos = [grafo[inicio][siguiente]]
+            previo, actual = inicio, siguiente
+            en_camino = set()
+            while actual in interiores and actual not in en_camino:
+                en_camino.add(actual)
+                # El único sucesor que no es volver por donde se vino
+                proximo = next(w for w in grafo.successors(actual) if w != previo)
+                tramos.append(grafo[actual][proximo])
+                previo, actual = actual, proximo
+            if actual in interiores:
+                continue
+            recorridos |= en_camino
+            tramos = [dict(t) for t in tramos]
+            if len(tramos) > 1:
+                # También las cadenas descartadas abajo: una unidad puede estar en cualquiera de sus tramos
+                for posicion, tramo in enumerate(tramos):
+                    edges_cadena[tramo.get("edge_id")] = (actual, tramos, posicion)
+            if actual == inicio:
+                continue
+            peso = sum(t.get("peso", 0) for t in tramos)
+            if comprimido.has_edge(inicio, actual) and comprimido[inicio][actual].get("peso", 0) <= peso:
+                continue
+            if len(tramos) == 1:
+                comprimido.add_edge(inicio, actual, **tramos[0])
+            else:
+                comprimido.add_edge(inicio, actual, peso=peso, edge_id=tramos[0].get("edge_id"), tramos=tramos)
+
+    # Anillos formados solo por nodos interiores: no se alcanzan desde fuera, se copian sin comprimir
+    for nodo in interiores - recorridos:
+        comprimido.add_node(nodo, **grafo.nodes[nodo])
+    for nodo in interiores - recorridos:
+        for sucesor in grafo.successors(nodo):
+            if sucesor in comprimido:
+                comprimido.add_edge(nodo, sucesor, **grafo[nodo][sucesor])
+
+    log.info("Grafo comprimido: %s → %s nodos, %s → %s aristas (%.2fs)", grafo.number_of_nodes(),
+             comprimido.number_of_nodes(), grafo.number_of_edges(), comprimido.number_of_edges(),
+             time.perf_counter() - t0)
+    return comprimido
+
+
+def edges_arista(datos: dict) -> List[str]:
+    """Edges de SUMO de una arista del grafo (varios si es una superarista)."""
+    tramos = datos.get("tramos")
+    if tramos:
+        return [t.get("edge_id") for t in tramos]
+    return [datos.get("edge_id")]
+
+
+def salida_de_edge(grafo: "nx.DiGraph", edge_id: str) -> Tuple[Optional[str], List[str], float]:
+    """
+    Para una calle de salida que quedó dentro de una cadena: (nodo donde
+    termina la cadena, tramos que faltan recorrer, su longitud). (None, [], 0)
+    si la calle no está en una cadena (o el grafo no está comprimido).
+    """
+    en_cadena = grafo.graph.get("edges_cadena", {}).get(edge_id)
+    if en_cadena is None:
+        return None, [], 0.0
+    hasta, tramos, posicion = en_cadena
+    resto = tramos[posicion + 1:]
+    return hasta, [t.get("edge_id") for t in resto], sum(t.get("peso", 0) for t in resto)
@@ -1,18 +1,48 @@
 import heapq
-import networkx as nx
-from typing import List, Tuple, Optional
+from typing import Callable, Dict, Iterable, List, Tuple, Optional, TYPE_CHECKING
 
-def dijkstra_ruta_optima(grafo: nx.DiGraph, nodo_inicio: str, nodo_destino: str) -> Tuple[Optional[List[str]], float]:
+from structured_log import obtener_logger, Diferido
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+log = obtener_logger("DIJKSTRA")
+
+def costo_arista(datos: dict, acumulado: float,
+                 funcion_costo: Optional[Callable[[dict, float], float]] = None) -> float:
+    """
+    Costo de una arista: 'peso' o funcion_costo. En una superarista
+    (routing.chains) funcion_costo se evalúa tramo a tramo, cada uno a la
+    hora en que se llega a él.
+    """
+    if funcion_costo is None:
+        return datos.get('peso', 1)
+    tramos = datos.get("tramos")
+    if not tramos:
+        return funcion_costo(datos, acumulado)
+    total = acumulado
+    for tramo in tramos:
+        total += funcion_costo(tramo, total)
+    return total - acumulado
+
+def dijkstra_ruta_optima(grafo: "nx.DiGraph", nodo_inicio: str, nodo_destino: str,
+                         funcion_costo: Optional[Callable[[dict, float], float]] = None) -> Tuple[Optional[List[str]], float]:
     """
     Implementa algoritmo Dijkstra para encontrar la ruta óptima.
     Retorna (lista de nodos, distancia total) o (None, float('inf')) si no hay ruta.
+    `funcion_costo(datos_arista, costo_acumulado)` reemplaza al atributo 'peso',
+    p. ej. con el tiempo de viaje a la hora de llegada (routing.travel_profiles).
+
+    Si el grafo trae grafo.graph["expandir"] (red teselada, routing.tiles), se
+    llama con cada nodo antes de relajar sus aristas, para cargar bajo demanda
+    la tesela en la que la búsqueda acaba de entrar.
     """
     if nodo_inicio not in grafo or nodo_destino not in grafo:
         return None, float('inf')
     
-    distancias = {nodo: float('inf') for nodo in grafo.nodes()}
-    distancias[nodo_inicio] = 0
-    padres = {nodo: None for nodo in grafo.nodes()}
+    expandir = grafo.graph.get("expandir")
+    distancias = {nodo_inicio: 0}
+    padres = {nodo_inicio: None}
     
     cola_prioridad = [(0, nodo_inicio)]
     visitados = set()
@@ -26,17 +56,23 @@ def dijkstra_ruta_optima(grafo: nx.DiGraph, nodo_inicio: str, nodo_destino: str)
         
         if distancia_actual > distancias[nodo_actual]:
             continue
+        if nodo_actual == nodo_destino:
+            # Asentado el destino no hay camino más corto: no se explora (ni carga) el resto
+            break
+        if expandir is not None:
+            expandir(nodo_actual)
         
         for vecino in grafo.neighbors(nodo_actual):
-            peso_arista = grafo[nodo_actual][vecino].get('peso', 1)
+            datos_arista = grafo[nodo_actual][vecino]
+            peso_arista = costo_arista(datos_arista, distancia_actual, funcion_costo)
             nueva_distancia = distancia_actual + peso_arista
             
-            if nueva_distancia < distancias[vecino]:
+            if nueva_distancia < distancias.get(vecino, float('inf')):
                 distancias[vecino] = nueva_distancia
                 padres[vecino] = nodo_actual
                 heapq.heappush(cola_prioridad, (nueva_distancia, vecino))
     
-    if distancias[nodo_destino] == float('inf'):
+    if nodo_destino not in distancias:
         return None, float('inf')
     
     ruta = []
@@ -48,15 +84,70 @@ def dijkstra_ruta_optima(grafo: nx.DiGraph, nodo_inicio: str, nodo_destino: str)
     
     return ruta, distancias[nodo_destino]
 
-def compute_optimal_route(grafo: nx.DiGraph, nodo_inicio: str, nodo_destino: str) -> Optional[List[str]]:
+def arbol_caminos(grafo: "nx.DiGraph", nodo_inicio: str, destinos: Optional[Iterable[str]] = None,
+                  funcion_costo: Optional[Callable[[dict, float], float]] = None) -> Tuple[Dict[str, float], Dict[str, Optional[str]]]:
+    """
+    Árbol de caminos mínimos desde `nodo_inicio` (uno a muchos), con los mismos
+    costos que dijkstra_ruta_optima. Si se dan `destinos`, la búsqueda termina
+    al asentarlos todos. Retorna (distancias, padres); la ruta a un nodo se
+    reconstruye con camino_en_arbol().
+    """
+    if nodo_inicio not in grafo:
+        return {}, {}
+    pendientes = set(destinos) if destinos is not None else None
+    expandir = grafo.graph.get("expandir")
+    distancias = {nodo_inicio: 0.0}
+    padres: Dict[str, Optional[str]] = {nodo_inicio: None}
+    asentados = set()
+    cola_prioridad = [(0.0, nodo_inicio)]
+    # Dict de sucesores crudo (como los algoritmos de networkx): las vistas de
+    # grafo.adj cuestan más que la propia búsqueda al armar miles de árboles
+    sucesores = getattr(grafo, "_succ", grafo.adj)
+
+    while cola_prioridad:
+        distancia_actual, nodo_actual = heapq.heappop(cola_prioridad)
+        if nodo_actual in asentados:
+            continue
+        asentados.add(nodo_actual)
+        if pendientes is not None:
+            pendientes.discard(nodo_actual)
+            if not pendientes:
+                break
+        if expandir is not None:
+            expandir(nodo_actual)
+
+        for vecino, datos_arista in sucesores[nodo_actual].items():
+            nueva_distancia = distancia_actual + costo_arista(datos_arista, distancia_actual, funcion_costo)
+            if nueva_distancia < distancias.get(vecino, float('inf')):
+                distancias[vecino] = nueva_distancia
+                padres[vecino] = nodo_actual
+                heapq.heappush(cola_prioridad, (nueva_distancia, vecino))
+
+    return distancias, padres
+
+def camino_en_arbol(padres: Dict[str, Optional[str]], nodo_destino: str) -> Optional[List[str]]:
+    """Nodos desde la raíz del árbol hasta `nodo_destino`, o None si no se alcanzó."""
+    if nodo_destino not in padres:
+        return None
+    ruta = []
+    nodo_actual = nodo_destino
+    while nodo_actual is not None:
+        ruta.append(nodo_actual)
+        nodo_actual = padres[nodo_actual]
+    ruta.reverse()
+    return ruta
+
+def compute_optimal_route(grafo: "nx.DiGraph", nodo_inicio: str, nodo_destino: str,
+                          funcion_costo: Optional[Callable[[dict, float], float]] = None) -> Optional[List[str]]:
     """
     Interfaz pública para calcular la ruta óptima.
     """
-    ruta, distancia = dijkstra_ruta_optima(grafo, nodo_inicio, nodo_destino)
+    ruta, distancia = dijkstra_ruta_optima(grafo, nodo_inicio, nodo_destino, funcion_costo)
     
     if ruta:
-        print(f"[DIJKSTRA] Ruta óptima encontrada: {' -> '.join(ruta)} (distancia: {distancia})")
+        # La ruta completa solo se arma si DIJKSTRA está en DEBUG
+        log.debug("Ruta óptima encontrada: %s (distancia: %s)", Diferido(" -> ".join, ruta), distancia)
     else:
-        print(f"[DIJKSTRA] No hay ruta disponible entre {nodo_inicio} y {nodo_destino}")
+        log.info("No hay ruta disponible entre %s y %s", nodo_inicio, nodo_destino)
     
     return ruta
@@ -0,0 +1,200 @@
+"""
+Tabla precalculada de despachos: para cada zona de accidente configurada, la
+base elegida, la ruta en edges, la secuencia de semáforos con su desfase desde
+la salida y la ETA esperada a flujo libre.
+
+La tabla lleva una huella (hash) de map.net.xml, de los JSON de configuración
+y de los parámetros que cambian la decisión; si alguno cambia, se descarta.
+
+Uso:
+    python -m routing.dispatch_table [--salida tabla_despacho.json]
+"""
+import argparse
+import hashlib
+import json
+import sys
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, TYPE_CHECKING
+
+from config import (
+    TIPO_DE_RUTA, MODO_SELECCION_BASE, EDGE_INICIO_MANUAL, FACTOR_VELOCIDAD_AMBULANCIA, TOLERANCIA_PARETO
+)
+from config_data.loader import CONFIG_DIR
+from routing.strategy import planificar_ruta_despacho
+from traffic_control.planner import PlanificadorOndaVerde
+from traffic_control.tls_index import IndiceSemaforos
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+ARCHIVOS_CONFIGURACION = ("accident_zones.json", "ambulance_bases.json", "exit_edges.json")
+
+
+def huella_configuracion(ruta_net: Path, config_dir: Path = CONFIG_DIR) -> str:
+    """Hash de la red, los JSON de configuración y los parámetros de despacho."""
+    h = hashlib.sha256()
+    for ruta in [Path(ruta_net)] + [Path(config_dir) / nombre for nombre in ARCHIVOS_CONFIGURACION]:
+        h.update(ruta.name.encode())
+        try:
+            h.update(ruta.read_bytes())
+        except FileNotFoundError:
+            h.update(b"<ausente>")
+    parametros = [TIPO_DE_RUTA, MODO_SELECCION_BASE, EDGE_INICIO_MANUAL, FACTOR_VELOCIDAD_AMBULANCIA,
+                  TOLERANCIA_PARETO]
+    h.update(json.dumps(parametros).encode())
+    return h.hexdigest()
+
+
+def zonas_configuradas(zonas: dict) -> List[str]:
+    """Aplana accident_zones.json (columnas simples y complejas) a una lista de junctions."""
+    resultado = []
+    for columna in zonas.values():
+        if "zones" in columna:
+            resultado.extend(columna["zones"])
+        for subzona in columna.get("subzonas", {}).values():
+            resultado.extend(subzona.get("zones", []))
+    return resultado
+
+
+class TablaDespacho:
+    """
+    Tabla persistida. Los ids de edge y de semáforo se guardan una sola vez y
+    las rutas como listas de índices; plan() decodifica una zona en O(largo de ruta).
+    """
+
+    def __init__(self, huella: str, edges: List[str], tls: List[str], planes: Dict[str, dict]):
+        self.huella = huella
+        self.edges = edges
+        self.tls = tls
+        self.planes = planes
+
+    def __len__(self) -> int:
+        return len(self.planes)
+
+    def __contains__(self, zona: str) -> bool:
+        return zona in self.planes
+
+    def plan(self, zona: str) -> Optional[dict]:
+        """
+        {"base", "edge_inicio", "ruta", "distancia", "eta", "semaforos": [(tls_id, indice_ruta, desfase)]}
+        o None si la zona no está en la tabla.
+        """
+        codificado = self.planes.get(zona)
+        if codificado is None:
+            return None
+        ruta = [self.edges[i] for i in codificado["ruta"]]
+        return {
+            "base": codificado["base"],
+            "edge_inicio": ruta[0],
+            "ruta": ruta,
+            "distancia": codificado["distancia"],
+            "eta": codificado["eta"],
+            "semaforos": [(self.tls[t], i, d) for t, i, d in codificado["semaforos"]],
+        }
+
+    def guardar(self, ruta: Path) -> bool:
+        try:
+            with open(ruta, "w") as f:
+                json.dump({"huella": self.huella, "edges": self.edges, "tls": self.tls, "planes": self.planes},
+                          f, separators=(",", ":"))
+            return True
+        except Exception as e:
+            print(f"[DISPATCH_TABLE] Error guardando tabla: {e}")
+            return False
+
+
+def cargar_tabla(ruta: Path, huella: str) -> Optional[TablaDespacho]:
+    """Carga la tabla si existe y su huella coincide; si no, retorna None."""
+    try:
+        with open(ruta, "r") as f:
+            datos = json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"[DISPATCH_TABLE] Tabla ilegible, se reconstruirá: {e}")
+        return None
+    if datos.get("huella") != huella:
+        print("[DISPATCH_TABLE] La red o la configuración cambiaron: tabla descartada")
+        return None
+    return TablaDespacho(datos["huella"], datos["edges"], datos["tls"], datos["planes"])
+
+
+def construir_tabla(grafo: "nx.DiGraph", indice_tls: IndiceSemaforos, zonas: Iterable[str],
+                    bases: dict, huella: str) -> TablaDespacho:
+    """Calcula el despacho de cada zona con la misma lógica que el despacho en vivo."""
+    planificador = PlanificadorOndaVerde(indice_tls)
+    edges: List[str] = []
+    indice_edges: Dict[str, int] = {}
+    tls: List[str] = []
+    indice_tls_ids: Dict[str, int] = {}
+    planes = {}
+
+    def internar(valor, lista, indice):
+        i = indice.get(valor)
+        if i is None:
+            i = indice[valor] = len(lista)
+            lista.append(valor)
+        return i
+
+    for zona in zonas:
+        despacho = planificar_ruta_despacho(grafo, zona, bases)
+        if not despacho:
+            print(f"[DISPATCH_TABLE] Sin ruta para la zona {zona}")
+            continue
+        ruta = despacho["ruta"]
+        secuencia = planificador.secuencia_tls(ruta)
+        planes[zona] = {
+            "base": despacho["base"],
+            "ruta": [internar(e, edges, indice_edges) for e in ruta],
+            "distancia": despacho["distancia"],
+            "eta": round(planificador.eta_restante(ruta, 0, 0.0), 2),
+            "semaforos": [[internar(e.tls_id, tls, indice_tls_ids), e.indice_ruta, round(e.eta_min, 2)]
+                          for e in secuencia],
+        }
+    return TablaDespacho(huella, edges, tls, planes)
+
+
+def obtener_tabla(ruta_tabla: Path, ruta_net: Path, grafo: "nx.DiGraph", indice_tls: IndiceSemaforos,
+                  zonas: dict, bases: dict) -> Optional[TablaDespacho]:
+    """Carga la tabla persistida o, si falta o está desactualizada, la reconstruye y la guarda."""
+    try:
+        huella = huella_configuracion(ruta_net)
+        tabla = cargar_tabla(ruta_tabla, huella)
+        if tabla is not None:
+            print(f"[DISPATCH_TABLE] Tabla cargada: {len(tabla)} zonas")
+            return tabla
+        t0 = time.perf_counter()
+        tabla = construir_tabla(grafo, indice_tls, zonas_configuradas(zonas), bases, huella)
+        tabla.guardar(ruta_tabla)
+        print(f"[DISPATCH_TABLE] Tabla construida: {len(tabla)} zonas en {time.perf_counter() - t0:.2f}s")
+        return tabla
+    except Exception as e:
+        print(f"[DISPATCH_TABLE] Error preparando tabla de despacho: {e}")
+        return None
+
+
+def main(argv=None) -> int:
+    from config import SUMO_NET, ARCHIVO_TABLA_DESPACHO
+    from config_data.loader import cargar_configuraciones
+    from routing.graph_loader import construir_grafo
+    from traffic_control.tls_index import construir_indice_semaforos
+
+    parser = argparse.ArgumentParser(description="Precalcula la tabla de despachos por zona")
+    parser.add_argument("--salida", default=str(ARCHIVO_TABLA_DESPACHO))
+    parser.add_argument("--forzar", action="store_true", help="reconstruir aunque la huella coincida")
+    args = parser.parse_args(argv)
+
+    if args.forzar:
+        Path(args.salida).unlink(missing_ok=True)
+    raiz = ET.parse(SUMO_NET).getroot()
+    zonas, bases, _salidas = cargar_configuraciones()
+    grafo, indice_tls = construir_grafo(raiz), construir_indice_semaforos(raiz)
+    grafo.graph["edges_semaforo"] = indice_tls.edges_semaforizados()
+    tabla = obtener_tabla(Path(args.salida), SUMO_NET, grafo, indice_tls, zonas, bases)
+    return 0 if tabla is not None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,20 +1,35 @@
-import networkx as nx
 import xml.etree.ElementTree as ET
-from typing import Dict, Tuple
+from typing import Dict, Tuple, TYPE_CHECKING
 from pathlib import Path
 
-def cargar_grafo_desde_sumo(ruta_net_xml: Path) -> nx.DiGraph:
+if TYPE_CHECKING:
+    import networkx as nx
+
+# networkx se importa dentro de las funciones: es un import pesado y así se
+# resuelve en el hilo de carga mientras SUMO arranca (ver main.arranque_concurrente)
+
+def cargar_grafo_desde_sumo(ruta_net_xml: Path) -> "nx.DiGraph":
     """
     Carga el archivo map.net.xml y construye un grafo NetworkX.
     Nodos = intersecciones (junctions)
     Aristas = vías (edges) con peso = longitud
     """
+    try:
+        return construir_grafo(ET.parse(ruta_net_xml).getroot())
+    except Exception as e:
+        print(f"[GRAPH_LOADER] Error cargando grafo: {e}")
+        import networkx as nx
+        return nx.DiGraph()
+
+def construir_grafo(raiz: ET.Element) -> "nx.DiGraph":
+    """
+    Construye el grafo desde la raíz ya parseada de map.net.xml, para poder
+    compartir un único parseo entre el grafo y los índices.
+    """
+    import networkx as nx
     grafo = nx.DiGraph()
     
     try:
-        arbol = ET.parse(ruta_net_xml)
-        raiz = arbol.getroot()
-        
         junctions = raiz.findall(".//junction")
         for junction in junctions:
             junction_id = junction.get("id")
@@ -39,10 +54,59 @@ def cargar_grafo_desde_sumo(ruta_net_xml: Path) -> nx.DiGraph:
         print(f"[GRAPH_LOADER] Error cargando grafo: {e}")
         return nx.DiGraph()
 
-def obtener_nodos_proximos(grafo: nx.DiGraph, nodo: str, distancia_maxima: float = 500) -> list:
+def _carril_permite(lane: ET.Element, clase: str) -> bool:
+    permitidas = lane.get("allow")
+    if permitidas is not None and permitidas != "all" and clase not in permitidas.split():
+        return False
+    prohibidas = lane.get("disallow", "")
+    return prohibidas != "all" and clase not in prohibidas.split()
+
+def construir_grafo_conexiones(raiz: ET.Element, clase: str = "passenger") -> "nx.DiGraph":
+    """
+    Grafo de calles para rutear demanda: nodos = edges (no internos) con algún
+    carril para `clase` (longitud, velocidad); arcos = <connection> entre
+    carriles permitidos, así que la ruta respeta los giros de la red. El arco
+    lleva edge_id y peso (tiempo a flujo libre) de la calle a la que entra.
+    """
+    import networkx as nx
+    grafo = nx.DiGraph()
+    carriles_ok = set()
+
+    try:
+        for edge in raiz.iter("edge"):
+            if edge.get("function") == "internal":
+                continue
+            velocidad, longitud = 0.0, 0.0
+            for lane in edge.iter("lane"):
+                if _carril_permite(lane, clase):
+                    carriles_ok.add(lane.get("id"))
+                    velocidad = max(velocidad, float(lane.get("speed", 13.89)))
+                    longitud = float(lane.get("length", 100))
+            if velocidad > 0:
+                grafo.add_node(edge.get("id"), longitud=longitud, velocidad=velocidad)
+
+        for conexion in raiz.iter("connection"):
+            desde, hacia = conexion.get("from"), conexion.get("to")
+            if desde not in grafo or hacia not in grafo or grafo.has_edge(desde, hacia):
+                continue
+            if (f"{desde}_{conexion.get('fromLane')}" in carriles_ok
+                    and f"{hacia}_{conexion.get('toLane')}" in carriles_ok):
+                datos = grafo.nodes[hacia]
+                grafo.add_edge(desde, hacia, edge_id=hacia, peso=datos["longitud"] / datos["velocidad"])
+
+        print(f"[GRAPH_LOADER] Grafo de conexiones ({clase}): {grafo.number_of_nodes()} calles, "
+              f"{grafo.number_of_edges()} giros")
+        return grafo
+
+    except Exception as e:
+        print(f"[GRAPH_LOADER] Error cargando grafo de conexiones: {e}")
+        return nx.DiGraph()
+
+def obtener_nodos_proximos(grafo: "nx.DiGraph", nodo: str, distancia_maxima: float = 500) -> list:
     """
     Obtiene nodos vecinos dentro de una distancia máxima.
     """
+    import networkx as nx
     if nodo not in grafo:
         return []
     
@@ -0,0 +1,145 @@
+"""
+Ruteo multiobjetivo: costo de viaje frente a número de semáforos preemptados.
+
+Una ruta algo más larga que cruza menos accesos semaforizados puede ser mejor
+en conjunto, porque cada preempción del corredor verde corta el tráfico
+transversal. frente_pareto() calcula, con un algoritmo de etiquetas
+(label-setting) en orden lexicográfico (costo, semáforos), todas las rutas no
+dominadas; elegir_ruta() aplica la política de la estrategia "PARETO".
+
+Poda:
+- por nodo: una etiqueta se descarta si otra en el mismo nodo es mejor o igual
+  en ambos costos;
+- contra el destino: con cotas inferiores exactas (Dijkstra inverso de cada
+  costo por separado), se descarta si costo + cota ya es dominado por una ruta
+  encontrada.
+"""
+import heapq
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple, TYPE_CHECKING
+
+from routing.chains import edges_arista
+from routing.dijkstra import costo_arista
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+
+def _dominada(etiquetas: List[Tuple[float, int]], costo: float, semaforos: int) -> bool:
+    for c, s in etiquetas:
+        if c <= costo and s <= semaforos:
+            return True
+    return False
+
+
+def _cotas_inversas(grafo: "nx.DiGraph", destino: str, costo_arista: Callable[[dict], float]) -> Dict[str, float]:
+    """Dijkstra inverso (sobre predecesores) desde el destino con un solo costo."""
+    cotas = {destino: 0.0}
+    cola = [(0.0, destino)]
+    while cola:
+        d, nodo = heapq.heappop(cola)
+        if d > cotas[nodo]:
+            continue
+        for previo in grafo.predecessors(nodo):
+            nuevo = d + costo_arista(grafo[previo][nodo])
+            if nuevo < cotas.get(previo, float("inf")):
+                cotas[previo] = nuevo
+                heapq.heappush(cola, (nuevo, previo))
+    return cotas
+
+
+def frente_pareto(grafo: "nx.DiGraph", inicio: str, destino: str, edges_semaforo: Set[str],
+                  funcion_costo: Optional[Callable[[dict, float], float]] = None,
+                  presupuesto: Optional[float] = None) -> Tuple[List[dict], bool]:
+    """
+    Frente de Pareto entre `inicio` y `destino` para (costo, accesos semaforizados).
+    El costo es el atributo 'peso' o `funcion_costo(datos, costo_acumulado)` como
+    en routing.dijkstra. Retorna ([{"ruta", "edges", "costo", "semaforos"}] por
+    costo creciente, completo); completo=False si se agotó `presupuesto` (s).
+    """
+    if inicio not in grafo or destino not in grafo:
+        return [], True
+    t0 = time.perf_counter()
+
+    def costo_de(datos: dict, acumulado: float) -> float:
+        return costo_arista(datos, acumulado, funcion_costo)
+
+    def semaforo_de(datos: dict) -> int:
+        # Una superarista (routing.chains) cuenta cada tramo semaforizado
+        return sum(1 for edge_id in edges_arista(datos) if edge_id in edges_semaforo)
+
+    # Cotas inferiores: solo con costos estáticos y grafo completo (en una red
+    # teselada las aristas aún no cargadas harían la cota optimista en exceso)
+    expandir = grafo.graph.get("expandir")
+    if funcion_costo is None and expandir is None:
+        cota_costo = _cotas_inversas(grafo, destino, lambda d: d.get("peso", 1))
+        cota_semaforos = _cotas_inversas(grafo, destino, semaforo_de)
+        if inicio not in cota_costo:
+            return [], True
+    else:
+        cota_costo = cota_semaforos = {}
+
+    etiquetas: List[Tuple[str, int, Optional[dict]]] = [(inicio, -1, None)]   # (nodo, padre, datos de arista)
+    cola = [(0.0, 0, 0)]
+    permanentes: Dict[str, List[Tuple[float, int]]] = {}
+    frente: List[Tuple[float, int, int]] = []
+    frente_valores: List[Tuple[float, int]] = []
+    completo = True
+    extraidas = 0
+
+    while cola:
+        extraidas += 1
+        if presupuesto is not None and extraidas % 256 == 0 and time.perf_counter() - t0 > presupuesto:
+            completo = False
+            break
+        costo, semaforos, i = heapq.heappop(cola)
+        nodo = etiquetas[i][0]
+        bolsa = permanentes.setdefault(nodo, [])
+        if _dominada(bolsa, costo, semaforos):
+            continue
+        bolsa.append((costo, semaforos))
+        if nodo == destino:
+            frente.append((costo, semaforos, i))
+            frente_valores.append((costo, semaforos))
+            if semaforos == 0:
+                # Ninguna ruta posterior (más cara) puede mejorar 0 semáforos
+                break
+            continue
+        if expandir is not None:
+            expandir(nodo)
+
+        for vecino in grafo.neighbors(nodo):
+            datos = grafo[nodo][vecino]
+            nuevo_costo = costo + costo_de(datos, costo)
+            nuevos_semaforos = semaforos + semaforo_de(datos)
+            if vecino in permanentes and _dominada(permanentes[vecino], nuevo_costo, nuevos_semaforos):
+                continue
+            if frente_valores and _dominada(frente_valores, nuevo_costo + cota_costo.get(vecino, 0.0),
+                                            nuevos_semaforos + cota_semaforos.get(vecino, 0)):
+                continue
+            etiquetas.append((vecino, i, datos))
+            heapq.heappush(cola, (nuevo_costo, nuevos_semaforos, len(etiquetas) - 1))
+
+    resultado = []
+    for costo, semaforos, i in frente:
+        nodos, edges = [], []
+        while i >= 0:
+            nodo, padre, datos = etiquetas[i]
+            nodos.append(nodo)
+            if datos is not None:
+                edges.extend(reversed(edges_arista(datos)))
+            i = padre
+        resultado.append({"ruta": nodos[::-1], "edges": edges[::-1], "costo": costo, "semaforos": semaforos})
+    return resultado, completo
+
+
+def elegir_ruta(frente: List[dict], tolerancia: float) -> Optional[dict]:
+    """
+    Política PARETO: entre las rutas cuyo costo no supera en más de `tolerancia`
+    (fracción) al mínimo, la de menos semáforos; a igualdad, la de menor costo.
+    """
+    if not frente:
+        return None
+    limite = frente[0]["costo"] * (1 + tolerancia)
+    candidatas = [r for r in frente if r["costo"] <= limite]
+    return min(candidatas, key=lambda r: (r["semaforos"], r["costo"]))
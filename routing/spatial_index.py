@@ -0,0 +1,182 @@
+import math
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class IndiceEspacial:
+    """
+    Índice de rejilla (grid) sobre los junctions y las formas de los carriles
+    de map.net.xml. Cada celda guarda los puntos y segmentos que la tocan, de
+    modo que una consulta solo revisa las celdas vecinas en anillos crecientes
+    en lugar de recorrer todos los carriles de la red.
+    """
+
+    def __init__(self, tam_celda: float = 50.0):
+        self.tam_celda = tam_celda
+        self.junctions: List[Tuple[str, float, float]] = []
+        # (edge_id, lane_id, x1, y1, x2, y2, offset_inicio_segmento)
+        self.segmentos: List[Tuple[str, str, float, float, float, float, float]] = []
+        self._celdas_junctions: Dict[Tuple[int, int], List[int]] = {}
+        self._celdas_segmentos: Dict[Tuple[int, int], List[int]] = {}
+        self._limites = None  # (cx_min, cy_min, cx_max, cy_max)
+
+    def agregar_junction(self, junction_id: str, x: float, y: float) -> None:
+        i = len(self.junctions)
+        self.junctions.append((junction_id, x, y))
+        celda = self._celda(x, y)
+        self._celdas_junctions.setdefault(celda, []).append(i)
+        self._ampliar_limites(celda, celda)
+
+    def agregar_lane(self, edge_id: str, lane_id: str, forma: List[Tuple[float, float]]) -> None:
+        offset = 0.0
+        for (x1, y1), (x2, y2) in zip(forma, forma[1:]):
+            i = len(self.segmentos)
+            self.segmentos.append((edge_id, lane_id, x1, y1, x2, y2, offset))
+            offset += math.hypot(x2 - x1, y2 - y1)
+
+            c1 = self._celda(min(x1, x2), min(y1, y2))
+            c2 = self._celda(max(x1, x2), max(y1, y2))
+            for cx in range(c1[0], c2[0] + 1):
+                for cy in range(c1[1], c2[1] + 1):
+                    self._celdas_segmentos.setdefault((cx, cy), []).append(i)
+            self._ampliar_limites(c1, c2)
+
+    def junction_cercano(self, x: float, y: float) -> Optional[Tuple[str, float]]:
+        """Retorna (junction_id, distancia) del junction más cercano al punto."""
+        mejor = None
+        mejor_d2 = float("inf")
+        for celdas in self._anillos(x, y, lambda: mejor_d2):
+            for celda in celdas:
+                for i in self._celdas_junctions.get(celda, ()):
+                    jid, jx, jy = self.junctions[i]
+                    d2 = (jx - x) ** 2 + (jy - y) ** 2
+                    if d2 < mejor_d2:
+                        mejor, mejor_d2 = jid, d2
+        if mejor is None:
+            return None
+        return mejor, math.sqrt(mejor_d2)
+
+    def edge_cercano(self, x: float, y: float) -> Optional[Tuple[str, str, float, float]]:
+        """
+        Retorna (edge_id, lane_id, offset, distancia): el carril más cercano y la
+        posición proyectada sobre él, medida desde su inicio (apta para traci).
+        """
+        mejor = None
+        mejor_d2 = float("inf")
+        for celdas in self._anillos(x, y, lambda: mejor_d2):
+            for celda in celdas:
+                for i in self._celdas_segmentos.get(celda, ()):
+                    edge_id, lane_id, x1, y1, x2, y2, offset = self.segmentos[i]
+                    dx, dy = x2 - x1, y2 - y1
+                    largo2 = dx * dx + dy * dy
+                    t = 0.0 if largo2 == 0 else max(0.0, min(1.0, ((x - x1) * dx + (y - y1) * dy) / largo2))
+                    px, py = x1 + t * dx, y1 + t * dy
+                    d2 = (px - x) ** 2 + (py - y) ** 2
+                    if d2 < mejor_d2:
+                        mejor_d2 = d2
+                        mejor = (edge_id, lane_id, offset + t * math.sqrt(largo2))
+        if mejor is None:
+            return None
+        return mejor[0], mejor[1], mejor[2], math.sqrt(mejor_d2)
+
+    def buscar_lote(self, puntos: Iterable[Tuple[float, float]]) -> List[dict]:
+        """
+        Map-matching de una ráfaga de reportes. Retorna, para cada punto, el
+        junction y el edge más cercanos con su offset.
+        """
+        resultados = []
+        for x, y in puntos:
+            junction = self.junction_cercano(x, y)
+            edge = self.edge_cercano(x, y)
+            resultados.append({
+                "coordenadas": (x, y),
+                "junction": junction[0] if junction else None,
+                "dist_junction": junction[1] if junction else None,
+                "edge": edge[0] if edge else None,
+                "lane": edge[1] if edge else None,
+                "offset": edge[2] if edge else None,
+                "dist_edge": edge[3] if edge else None,
+            })
+        return resultados
+
+    def _celda(self, x: float, y: float) -> Tuple[int, int]:
+        return int(math.floor(x / self.tam_celda)), int(math.floor(y / self.tam_celda))
+
+    def _ampliar_limites(self, c1: Tuple[int, int], c2: Tuple[int, int]) -> None:
+        if self._limites is None:
+            self._limites = (c1[0], c1[1], c2[0], c2[1])
+        else:
+            a, b, c, d = self._limites
+            self._limites = (min(a, c1[0]), min(b, c1[1]), max(c, c2[0]), max(d, c2[1]))
+
+    def _anillos(self, x: float, y: float, mejor_d2):
+        """
+        Genera las celdas en anillos cuadrados alrededor del punto. Se detiene
+        cuando el anillo ya no puede contener algo más cercano que lo encontrado
+        o cuando cubre toda la red.
+        """
+        if self._limites is None:
+            return
+        cx, cy = self._celda(x, y)
+        a, b, c, d = self._limites
+        radio_max = max(abs(cx - a), abs(cx - c), abs(cy - b), abs(cy - d))
+        for r in range(radio_max + 1):
+            # Distancia mínima posible a cualquier celda del anillo r
+            if r > 0 and ((r - 1) * self.tam_celda) ** 2 > mejor_d2():
+                return
+            if r == 0:
+                yield [(cx, cy)]
+                continue
+            anillo = [(cx + i, cy - r) for i in range(-r, r + 1)]
+            anillo += [(cx + i, cy + r) for i in range(-r, r + 1)]
+            anillo += [(cx - r, cy + j) for j in range(-r + 1, r)]
+            anillo += [(cx + r, cy + j) for j in range(-r + 1, r)]
+            yield anillo
+
+
+def _parsear_forma(texto: str) -> List[Tuple[float, float]]:
+    puntos = []
+    for par in texto.split():
+        coords = par.split(",")
+        puntos.append((float(coords[0]), float(coords[1])))
+    return puntos
+
+
+def cargar_indice_espacial(ruta_net_xml: Path, tam_celda: float = 50.0) -> IndiceEspacial:
+    """
+    Construye el índice espacial desde map.net.xml (junctions no internos y
+    formas de los carriles de calles no internas).
+    """
+    try:
+        return construir_indice_espacial(ET.parse(ruta_net_xml).getroot(), tam_celda)
+    except Exception as e:
+        print(f"[SPATIAL_INDEX] Error cargando índice espacial: {e}")
+        return IndiceEspacial(tam_celda)
+
+
+def construir_indice_espacial(raiz: ET.Element, tam_celda: float = 50.0) -> IndiceEspacial:
+    """
+    Construye el índice espacial desde la raíz ya parseada de map.net.xml.
+    """
+    indice = IndiceEspacial(tam_celda)
+    try:
+        for junction in raiz.findall("junction"):
+            if junction.get("type") == "internal":
+                continue
+            indice.agregar_junction(junction.get("id"), float(junction.get("x", 0)), float(junction.get("y", 0)))
+
+        for edge in raiz.findall("edge"):
+            if edge.get("function") == "internal":
+                continue
+            for lane in edge.findall("lane"):
+                forma = lane.get("shape")
+                if forma:
+                    indice.agregar_lane(edge.get("id"), lane.get("id"), _parsear_forma(forma))
+
+        print(f"[SPATIAL_INDEX] Índice cargado: {len(indice.junctions)} junctions, "
+              f"{len(indice.segmentos)} segmentos de carril")
+        return indice
+    except Exception as e:
+        print(f"[SPATIAL_INDEX] Error cargando índice espacial: {e}")
+        return IndiceEspacial(tam_celda)
@@ -0,0 +1,210 @@
+import math
+from typing import Optional, TYPE_CHECKING
+
+from config import TIPO_DE_RUTA, MODO_SELECCION_BASE, EDGE_INICIO_MANUAL, TOLERANCIA_PARETO, PRESUPUESTO_PARETO
+from config_data.loader import seleccionar_base_automatica
+from routing.dijkstra import compute_optimal_route, dijkstra_ruta_optima
+from routing.pareto import frente_pareto, elegir_ruta
+from routing.chains import edges_arista, salida_de_edge
+from structured_log import obtener_logger
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+log = obtener_logger("ROUTING")
+
+# Estrategias de ruta y selección de base. Solo usan el grafo (con x, y de cada
+# junction), sin TraCI, para poder precalcular despachos fuera de línea.
+
+def obtener_nodos_desde_edges(grafo: "nx.DiGraph", edge_inicio_id, edge_destino_id):
+    """
+    Busca en el grafo los nodos (junctions) que corresponden a los extremos
+    de las calles (edges) indicadas.
+    """
+    nodo_start = None
+    # Convertimos a string para asegurar comparación
+    edge_inicio_id = str(edge_inicio_id)
+
+    for u, v, data in grafo.edges(data=True):
+        edge_id = str(data.get("edge_id"))
+        if edge_id == edge_inicio_id:
+            nodo_start = v
+        # No necesitamos buscar el edge_destino_id para el nodo final
+        # si ya tenemos el ID del junction destino desde el JSON
+
+    return nodo_start, None
+
+def nodo_de_salida(grafo: "nx.DiGraph", edge_id):
+    """
+    Nodo desde el que se busca al salir por `edge_id` y los edges que faltan
+    recorrer hasta él (no vacío solo si la calle quedó dentro de una cadena
+    comprimida, ver routing.chains). Retorna (nodo, edges, longitud).
+    """
+    nodo, resto, longitud = salida_de_edge(grafo, str(edge_id))
+    if nodo is None:
+        nodo, _ = obtener_nodos_desde_edges(grafo, edge_id, None)
+    return nodo, resto, longitud
+
+def distancia_euclidiana(p1, p2):
+    return math.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
+
+def encontrar_nodo_desvio_lejano(grafo: "nx.DiGraph", nodo_inicio, nodo_fin):
+    """
+    Busca un nodo en el grafo que maximice la distancia total (Inicio->Nodo + Nodo->Fin).
+    Las posiciones salen de los atributos x, y del grafo (las mismas de map.net.xml).
+    """
+    try:
+        nodos = grafo.nodes
+        pos_inicio = (nodos[nodo_inicio]["x"], nodos[nodo_inicio]["y"])
+        pos_fin = (nodos[nodo_fin]["x"], nodos[nodo_fin]["y"])
+
+        mejor_nodo = None
+        max_distancia = -1
+
+        # Iteramos sobre todos los nodos del grafo para encontrar el más lejano
+        for nodo, datos in nodos(data=True):
+            if nodo == nodo_inicio or nodo == nodo_fin:
+                continue
+            # Junctions internos: no tienen calles en el grafo, no sirven de desvío
+            if grafo.degree(nodo) == 0:
+                continue
+
+            # Calculamos cuánto desvío aporta
+            pos_candidato = (datos.get("x", 0.0), datos.get("y", 0.0))
+            dist_total = distancia_euclidiana(pos_inicio, pos_candidato) + distancia_euclidiana(pos_candidato, pos_fin)
+
+            if dist_total > max_distancia:
+                max_distancia = dist_total
+                mejor_nodo = nodo
+
+        return mejor_nodo
+    except Exception as e:
+        log.error("Error buscando desvío: %s", e)
+        return None
+
+def calcular_ruta_con_estrategia(grafo: "nx.DiGraph", nodo_inicio, nodo_fin, estrategia: str = TIPO_DE_RUTA,
+                                 funcion_costo=None):
+    """
+    Calcula la ruta según la estrategia indicada (por defecto TIPO_DE_RUTA de config.py).
+    `funcion_costo` (opcional) reemplaza la longitud como costo de Dijkstra.
+    "PARETO" necesita grafo.graph["edges_semaforo"] (ver IndiceSemaforos.edges_semaforizados).
+    """
+    if estrategia == "CORTA":
+        # Estrategia Directa (Dijkstra Estándar)
+        return compute_optimal_route(grafo, nodo_inicio, nodo_fin, funcion_costo)
+
+    elif estrategia == "LARGA":
+        # Estrategia de Desvío (Waypoint)
+        log.info("🔄 Estrategia 'LARGA': Calculando desvío...")
+        nodo_intermedio = encontrar_nodo_desvio_lejano(grafo, nodo_inicio, nodo_fin)
+
+        if not nodo_intermedio:
+            log.warning("Advertencia: No se encontró nodo de desvío. Usando ruta corta.")
+            return compute_optimal_route(grafo, nodo_inicio, nodo_fin, funcion_costo)
+
+        log.info("📍 Punto de desvío seleccionado: %s", nodo_intermedio)
+
+        # Calcular Tramo 1: Inicio -> Desvío
+        ruta_1 = compute_optimal_route(grafo, nodo_inicio, nodo_intermedio, funcion_costo)
+        # Calcular Tramo 2: Desvío -> Fin
+        ruta_2 = compute_optimal_route(grafo, nodo_intermedio, nodo_fin, funcion_costo)
+
+        if ruta_1 and ruta_2:
+            # Unir rutas (ruta_2[1:] para no repetir el nodo intermedio)
+            return ruta_1 + ruta_2[1:]
+        else:
+            log.error("Error: No se pudo conectar el desvío. Usando ruta corta.")
+            return compute_optimal_route(grafo, nodo_inicio, nodo_fin, funcion_costo)
+
+    elif estrategia == "PARETO":
+        # Costo frente a semáforos preemptados: se acepta hasta TOLERANCIA_PARETO
+        # más de costo a cambio de cruzar menos accesos semaforizados
+        frente, completo = frente_pareto(grafo, nodo_inicio, nodo_fin, grafo.graph.get("edges_semaforo", set()),
+                                         funcion_costo, PRESUPUESTO_PARETO)
+        elegida = elegir_ruta(frente, TOLERANCIA_PARETO)
+        if elegida is None:
+            log.warning("Advertencia: Frente de Pareto vacío. Usando ruta corta.")
+            return compute_optimal_route(grafo, nodo_inicio, nodo_fin, funcion_costo)
+        opciones = ", ".join(f"{r['costo']:.0f}/{r['semaforos']}" for r in frente)
+        log.info("⚖️ Frente Pareto (costo/semáforos): %s%s → %.0f/%s", opciones,
+                 '' if completo else ' (presupuesto agotado)', elegida['costo'], elegida['semaforos'])
+        return elegida["ruta"]
+
+    return None
+
+def seleccionar_base_por_tiempo(grafo: "nx.DiGraph", destino: str, bases: dict, perfiles, t_salida: float):
+    """
+    Base con menor ETA histórica a la hora de salida (modo "TIEMPO"): un
+    Dijkstra dependiente de la hora desde cada base. Retorna (datos_base, eta).
+    """
+    funcion_costo = perfiles.funcion_costo(t_salida)
+    mejor, mejor_eta = {}, float("inf")
+    for base_id, datos in bases.items():
+        nodo_origen, resto, _ = nodo_de_salida(grafo, datos["edge_entrada"])
+        if not nodo_origen:
+            continue
+        t_cadena = perfiles.eta_ruta([datos["edge_entrada"]] + resto, t_salida)
+        _, eta = dijkstra_ruta_optima(grafo, nodo_origen, destino, funcion_costo)
+        eta += t_cadena
+        if eta < mejor_eta:
+            mejor, mejor_eta = dict(datos, id=base_id), eta
+    return mejor, mejor_eta
+
+def planificar_ruta_despacho(grafo: "nx.DiGraph", destino: str, bases: dict,
+                             estrategia: str = TIPO_DE_RUTA, modo_base: str = MODO_SELECCION_BASE,
+                             edge_inicio_manual: Optional[str] = EDGE_INICIO_MANUAL,
+                             perfiles=None, t_salida: float = 0.0) -> Optional[dict]:
+    """
+    Decide base de salida y ruta (en edges) hacia el junction `destino`.
+    Retorna {"base", "edge_inicio", "ruta", "distancia"} o None si no hay ruta.
+    Con `perfiles` (routing.travel_profiles) la ruta minimiza el tiempo histórico
+    a la hora `t_salida` (s del día) y se agrega "eta_perfil".
+    Sobre un grafo comprimido (routing.chains), un destino que quedó dentro de
+    una cadena se rutea sobre el grafo original.
+    """
+    original = grafo.graph.get("original")
+    if original is not None and destino not in grafo:
+        grafo = original
+    if edge_inicio_manual is not None:
+        log.info("⚠️ Modo Manual (Config): Saliendo desde '%s'", edge_inicio_manual)
+        edge_inicio = edge_inicio_manual
+        base_id = "MANUAL_CFG"
+    elif modo_base == "TIEMPO" and perfiles is not None:
+        datos_base, eta = seleccionar_base_por_tiempo(grafo, destino, bases, perfiles, t_salida)
+        if not datos_base:
+            return None
+        edge_inicio = datos_base["edge_entrada"]
+        base_id = datos_base.get("id")
+        log.info("🏥 Base Seleccionada: %s (ETA histórica: %.0fs)", base_id, eta)
+    else:
+        log.info("🤖 Modo Automático: Buscando base por '%s'...", modo_base)
+        datos_base, dist_logica = seleccionar_base_automatica(destino, bases, modo=modo_base)
+        if not datos_base:
+            return None
+        edge_inicio = datos_base["edge_entrada"]
+        base_id = datos_base.get("id")
+        log.info("🏥 Base Seleccionada: %s (Dist. Lógica: %.2f)", base_id, dist_logica)
+
+    nodo_origen, resto_cadena, distancia = nodo_de_salida(grafo, edge_inicio)
+    if not nodo_origen:
+        log.error("Error: Edge inicio '%s' no conecta.", edge_inicio)
+        return None
+
+    funcion_costo = perfiles.funcion_costo(t_salida) if perfiles is not None else None
+    ruta_nodos = calcular_ruta_con_estrategia(grafo, nodo_origen, destino, estrategia, funcion_costo)
+    if not ruta_nodos:
+        log.error("Error: No hay ruta física disponible.")
+        return None
+
+    # Convertir a Edges (una superarista aporta todos sus tramos)
+    ruta_edges = [edge_inicio] + resto_cadena
+    for u, v in zip(ruta_nodos, ruta_nodos[1:]):
+        if grafo.has_edge(u, v):
+            data = grafo[u][v]
+            ruta_edges.extend(edges_arista(data))
+            distancia += data.get("peso", 0)
+
+    despacho = {"base": base_id, "edge_inicio": edge_inicio, "ruta": ruta_edges, "distancia": distancia}
+    if perfiles is not None:
+        despacho["eta_perfil"] = perfiles.eta_ruta(ruta_edges, t_salida)
+    return despacho
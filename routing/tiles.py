@@ -0,0 +1,208 @@
+"""
+Red teselada para carga por región de interés.
+
+Fuera de línea, map.net.xml se parte en teselas cuadradas de TAM_TESELA metros:
+cada tesela guarda sus junctions y las calles que salen de ellos. Una calle
+que termina en otra tesela deja su nodo destino como nodo frontera (con sus
+coordenadas y la tesela a la que pertenece).
+
+En línea, RedTeselada carga solo las teselas del rectángulo que cubre la base
+y el accidente (más un margen) y, si una búsqueda llega a un nodo frontera,
+carga esa tesela en ese momento (ver grafo.graph["expandir"] en
+routing.dijkstra). La memoria y el tiempo de carga dependen del área de la
+misión; lo único global es el índice nodo/calle → tesela.
+
+Uso:
+    python -m routing.tiles [--tam 500] [--directorio teselas_red]
+"""
+import argparse
+import json
+import math
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple, TYPE_CHECKING
+
+from config import SUMO_NET, DIRECTORIO_TESELAS, TAM_TESELA, MARGEN_TESELAS
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+Clave = Tuple[int, int]
+
+
+def clave_tesela(x: float, y: float, tam: float) -> Clave:
+    return int(math.floor(x / tam)), int(math.floor(y / tam))
+
+
+def _texto(clave: Clave) -> str:
+    return f"{clave[0]}_{clave[1]}"
+
+
+def huella_red(ruta_net: Path) -> str:
+    """Tamaño y fecha de modificación de la red: barato incluso para redes metropolitanas."""
+    estado = Path(ruta_net).stat()
+    return f"{estado.st_size}-{int(estado.st_mtime)}"
+
+
+def construir_teselas(ruta_net: Path = SUMO_NET, directorio: Path = DIRECTORIO_TESELAS,
+                      tam: float = TAM_TESELA) -> bool:
+    """
+    Parsea la red en streaming (iterparse) y escribe una tesela por archivo
+    más indice.json. Los junctions internos y sin calles no se guardan.
+    Una calle pertenece a la tesela de su junction de origen.
+    """
+    try:
+        t0 = time.perf_counter()
+        coordenadas: Dict[str, Tuple[float, float]] = {}
+        calles: List[Tuple[str, str, str, float]] = []
+        for _, elem in ET.iterparse(str(ruta_net), events=("end",)):
+            if elem.tag == "junction":
+                if elem.get("type") != "internal":
+                    coordenadas[elem.get("id")] = (float(elem.get("x", 0)), float(elem.get("y", 0)))
+                elem.clear()
+            elif elem.tag == "edge":
+                desde, hacia = elem.get("from"), elem.get("to")
+                if desde and hacia and elem.get("function") != "internal":
+                    # Misma longitud que routing.graph_loader (atributo del edge, o 100)
+                    calles.append((elem.get("id"), desde, hacia, float(elem.get("length", 100))))
+                elem.clear()
+
+        teselas: Dict[Clave, dict] = {}
+        nodo_tesela: Dict[str, str] = {}
+        edge_tesela: Dict[str, str] = {}
+        for edge_id, desde, hacia, longitud in calles:
+            if desde not in coordenadas or hacia not in coordenadas:
+                continue
+            clave = clave_tesela(*coordenadas[desde], tam)
+            clave_hacia = clave_tesela(*coordenadas[hacia], tam)
+            tesela = teselas.setdefault(clave, {"nodos": {}, "edges": []})
+            tesela["nodos"][desde] = coordenadas[desde]
+            xh, yh = coordenadas[hacia]
+            tesela["edges"].append([edge_id, desde, hacia, longitud, xh, yh, _texto(clave_hacia)])
+            # El destino también figura en su propia tesela (aunque no salgan calles de él)
+            teselas.setdefault(clave_hacia, {"nodos": {}, "edges": []})["nodos"][hacia] = coordenadas[hacia]
+            nodo_tesela[desde] = _texto(clave)
+            nodo_tesela.setdefault(hacia, _texto(clave_hacia))
+            edge_tesela[edge_id] = _texto(clave)
+
+        directorio = Path(directorio)
+        directorio.mkdir(parents=True, exist_ok=True)
+        for clave, tesela in teselas.items():
+            with open(directorio / f"t_{_texto(clave)}.json", "w") as f:
+                json.dump(tesela, f, separators=(",", ":"))
+        with open(directorio / "indice.json", "w") as f:
+            json.dump({"huella": huella_red(ruta_net), "tam": tam, "nodos": nodo_tesela, "edges": edge_tesela},
+                      f, separators=(",", ":"))
+        print(f"[TILES] {len(teselas)} teselas de {tam:.0f}m ({len(calles)} calles) "
+              f"en {time.perf_counter() - t0:.2f}s")
+        return True
+    except Exception as e:
+        print(f"[TILES] Error construyendo teselas: {e}")
+        return False
+
+
+class RedTeselada:
+    """
+    Grafo NetworkX (mismo esquema que routing.graph_loader: nodos con x, y y
+    aristas con peso y edge_id) que crece tesela a tesela. Las cargas se
+    serializan con `candado`; quien recorra el grafo mientras otro hilo puede
+    expandirlo debe tomar el mismo candado.
+    """
+
+    def __init__(self, directorio: Path, indice: dict, margen: int = MARGEN_TESELAS):
+        import networkx as nx
+        self.directorio = Path(directorio)
+        self.tam = indice["tam"]
+        self.margen = margen
+        self.nodo_tesela: Dict[str, str] = indice["nodos"]
+        self.edge_tesela: Dict[str, str] = indice["edges"]
+        self.cargadas: Set[str] = set()
+        self.candado = threading.RLock()
+        self.grafo = nx.DiGraph()
+        self.grafo.graph["expandir"] = self.expandir
+        self.stats = {"teselas": 0, "bajo_demanda": 0, "t_carga": 0.0}
+
+    def cargar_tesela(self, texto: str, bajo_demanda: bool = False) -> bool:
+        with self.candado:
+            if texto in self.cargadas:
+                return True
+            t0 = time.perf_counter()
+            try:
+                with open(self.directorio / f"t_{texto}.json", "r") as f:
+                    tesela = json.load(f)
+            except FileNotFoundError:
+                # Rectángulo con zonas sin calles: la tesela simplemente no existe
+                self.cargadas.add(texto)
+                return False
+            for nodo, (x, y) in tesela["nodos"].items():
+                self.grafo.add_node(nodo, x=x, y=y, tesela=texto)
+            for edge_id, desde, hacia, longitud, xh, yh, tesela_hacia in tesela["edges"]:
+                if hacia not in self.grafo:
+                    # Nodo frontera: queda con coordenadas y se completa al cargar su tesela
+                    self.grafo.add_node(hacia, x=xh, y=yh, tesela=tesela_hacia)
+                self.grafo.add_edge(desde, hacia, peso=longitud, edge_id=edge_id)
+            self.cargadas.add(texto)
+            self.stats["teselas"] += 1
+            self.stats["bajo_demanda"] += bajo_demanda
+            self.stats["t_carga"] += time.perf_counter() - t0
+            return True
+
+    def expandir(self, nodo: str) -> None:
+        """Carga la tesela del nodo si aún no está (hook de routing.dijkstra)."""
+        texto = self.grafo.nodes[nodo].get("tesela") if nodo in self.grafo else self.nodo_tesela.get(nodo)
+        if texto is not None and texto not in self.cargadas:
+            self.cargar_tesela(texto, bajo_demanda=True)
+
+    def cargar_corredor(self, nodos: Iterable[str] = (), edges: Iterable[str] = ()) -> "nx.DiGraph":
+        """
+        Carga las teselas del rectángulo que cubre los nodos y calles dados
+        (p. ej. bases candidatas y accidente) más `margen` teselas por lado.
+        """
+        claves = [self.nodo_tesela[n] for n in nodos if n in self.nodo_tesela]
+        claves += [self.edge_tesela[e] for e in edges if e in self.edge_tesela]
+        if not claves:
+            return self.grafo
+        coords = [tuple(int(v) for v in c.split("_")) for c in claves]
+        xs, ys = [c[0] for c in coords], [c[1] for c in coords]
+        with self.candado:
+            for cx in range(min(xs) - self.margen, max(xs) + self.margen + 1):
+                for cy in range(min(ys) - self.margen, max(ys) + self.margen + 1):
+                    self.cargar_tesela(_texto((cx, cy)))
+        return self.grafo
+
+
+def cargar_red_teselada(directorio: Path = DIRECTORIO_TESELAS, ruta_net: Path = SUMO_NET,
+                        margen: int = MARGEN_TESELAS) -> Optional[RedTeselada]:
+    """Abre el índice de teselas; si falta o la red cambió, las reconstruye primero."""
+    directorio = Path(directorio)
+    try:
+        try:
+            with open(directorio / "indice.json", "r") as f:
+                indice = json.load(f)
+        except FileNotFoundError:
+            indice = None
+        if indice is None or indice.get("huella") != huella_red(ruta_net):
+            if not construir_teselas(ruta_net, directorio):
+                return None
+            with open(directorio / "indice.json", "r") as f:
+                indice = json.load(f)
+        return RedTeselada(directorio, indice, margen)
+    except Exception as e:
+        print(f"[TILES] Error abriendo la red teselada: {e}")
+        return None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Parte map.net.xml en teselas para carga por región")
+    parser.add_argument("--net", type=Path, default=SUMO_NET)
+    parser.add_argument("--directorio", type=Path, default=DIRECTORIO_TESELAS)
+    parser.add_argument("--tam", type=float, default=TAM_TESELA, help="lado de la tesela en metros")
+    args = parser.parse_args(argv)
+    return 0 if construir_teselas(args.net, args.directorio, args.tam) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
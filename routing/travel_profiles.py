@@ -0,0 +1,201 @@
+"""
+Perfiles históricos de tiempo de viaje por calle y franja horaria, construidos
+a partir de las salidas edgeData de varias corridas.
+
+El almacén es un directorio con:
+    tiempos.npy  float32, calles × franjas (NaN = franja sin datos)
+    libre.npy    float32, tiempo a flujo libre de cada calle (respaldo)
+    meta.json    ids de calle, tamaño de franja, alfa y corridas acumuladas
+
+Los .npy se abren como memmap: la carga es instantánea y una consulta es
+una indexación NumPy, de modo que un lote de millones de pares (calle, hora)
+se resuelve en una sola operación con consultar().
+
+Uso:
+    python -m routing.travel_profiles edgeData_output.xml [...] [--desfase S] [--alfa A]
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, TYPE_CHECKING
+
+import numpy as np
+
+from config import DIRECTORIO_PERFILES_VIAJE, TAM_FRANJA_PERFIL, ALFA_PERFIL, DESFASE_HORARIO_SIM
+
+if TYPE_CHECKING:
+    from analysis.edgedata import DatosEdge
+
+SEGUNDOS_DIA = 86400
+
+
+class PerfilesViaje:
+    """
+    Tiempos de viaje históricos (s) por calle y franja del día. Cada corrida
+    nueva se incorpora con suavizado exponencial: t = alfa·obs + (1-alfa)·t;
+    una franja sin datos toma la primera observación tal cual.
+    """
+
+    def __init__(self, directorio: Path, edges: List[str], tiempos: np.ndarray, libre: np.ndarray,
+                 tam_franja: int, alfa: float, corridas: int = 0):
+        self.directorio = Path(directorio)
+        self.edges = edges
+        self.indice_edges: Dict[str, int] = {e: i for i, e in enumerate(edges)}
+        self.tiempos = tiempos
+        self.libre = libre
+        self.tam_franja = tam_franja
+        self.n_franjas = tiempos.shape[1]
+        self.alfa = alfa
+        self.corridas = corridas
+
+    def __len__(self) -> int:
+        return len(self.edges)
+
+    def franja(self, t):
+        """Franja del día de un tiempo (s desde medianoche); acepta escalares o arreglos."""
+        return (np.asarray(t) % SEGUNDOS_DIA // self.tam_franja).astype(np.int64)
+
+    def consultar(self, indices: np.ndarray, t) -> np.ndarray:
+        """Tiempo de viaje de las calles `indices` a la hora `t` (vectorizado, con respaldo a flujo libre)."""
+        valores = self.tiempos[indices, self.franja(t)]
+        return np.where(np.isnan(valores), self.libre[indices], valores)
+
+    def tiempo(self, edge_id: str, t: float) -> Optional[float]:
+        i = self.indice_edges.get(edge_id)
+        if i is None:
+            return None
+        valor = self.tiempos[i, int(t % SEGUNDOS_DIA // self.tam_franja)]
+        return float(self.libre[i] if np.isnan(valor) else valor)
+
+    def eta_ruta(self, ruta_edges: Sequence[str], t_salida: float) -> float:
+        """ETA dependiente de la hora: cada calle se evalúa a la hora en que se llega a ella."""
+        t = t_salida
+        for edge_id in ruta_edges:
+            t += self.tiempo(edge_id, t) or 0.0
+        return t - t_salida
+
+    def funcion_costo(self, t_salida: float) -> Callable[[dict, float], float]:
+        """Costo de arista para routing.dijkstra: tiempo de la calle a la hora de llegada."""
+        def costo(datos: dict, t_acumulado: float) -> float:
+            tiempo = self.tiempo(datos.get("edge_id"), t_salida + t_acumulado)
+            return tiempo if tiempo is not None else datos.get("peso", 1)
+        return costo
+
+    def actualizar(self, datos: "DatosEdge", desfase: float = 0.0) -> int:
+        """
+        Incorpora una corrida (DatosEdge de analysis.edgedata). Los intervalos
+        se promedian por (calle, franja) ponderando por segundos muestreados y
+        luego se suavizan contra el perfil. `desfase` es la hora del día (s) a
+        la que empezó la simulación. Retorna las celdas actualizadas.
+        """
+        indices = np.array([self.indice_edges.get(e, -1) for e in datos.edges], dtype=np.int64)[datos.edge]
+        valido = (indices >= 0) & (datos.muestreo > 0) & (datos.tiempo_viaje > 0)
+        celdas = indices[valido] * self.n_franjas + self.franja(datos.inicio[valido] + desfase)
+        pesos = datos.muestreo[valido]
+
+        total = len(self.edges) * self.n_franjas
+        suma_pesos = np.bincount(celdas, weights=pesos, minlength=total)
+        suma = np.bincount(celdas, weights=pesos * datos.tiempo_viaje[valido], minlength=total)
+        observadas = np.flatnonzero(suma_pesos)
+        observacion = (suma[observadas] / suma_pesos[observadas]).astype(np.float32)
+
+        plano = self.tiempos.reshape(-1)
+        previo = plano[observadas]
+        plano[observadas] = np.where(np.isnan(previo), observacion,
+                                     self.alfa * observacion + (1 - self.alfa) * previo)
+        self.corridas += 1
+        return len(observadas)
+
+    def guardar(self) -> bool:
+        try:
+            if isinstance(self.tiempos, np.memmap):
+                self.tiempos.flush()
+            with open(self.directorio / "meta.json", "w") as f:
+                json.dump({"edges": self.edges, "tam_franja": self.tam_franja, "alfa": self.alfa,
+                           "corridas": self.corridas}, f)
+            return True
+        except Exception as e:
+            print(f"[PERFILES] Error guardando perfiles: {e}")
+            return False
+
+
+def crear_perfiles(directorio: Path, libres: Dict[str, float], tam_franja: int = TAM_FRANJA_PERFIL,
+                   alfa: float = ALFA_PERFIL) -> PerfilesViaje:
+    """Crea un almacén vacío (todo NaN) para las calles de `libres` {edge_id: tiempo a flujo libre}."""
+    directorio = Path(directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+    edges = list(libres)
+    n_franjas = SEGUNDOS_DIA // tam_franja
+    tiempos = np.lib.format.open_memmap(directorio / "tiempos.npy", mode="w+", dtype=np.float32,
+                                        shape=(len(edges), n_franjas))
+    tiempos[:] = np.nan
+    libre = np.array([libres[e] for e in edges], dtype=np.float32)
+    np.save(directorio / "libre.npy", libre)
+    perfiles = PerfilesViaje(directorio, edges, tiempos, libre, tam_franja, alfa)
+    perfiles.guardar()
+    return perfiles
+
+
+def cargar_perfiles(directorio: Path = DIRECTORIO_PERFILES_VIAJE, escritura: bool = False) -> Optional[PerfilesViaje]:
+    """Abre el almacén como memmap (solo lectura salvo `escritura`). None si no existe."""
+    directorio = Path(directorio)
+    try:
+        with open(directorio / "meta.json", "r") as f:
+            meta = json.load(f)
+        tiempos = np.load(directorio / "tiempos.npy", mmap_mode="r+" if escritura else "r")
+        libre = np.load(directorio / "libre.npy")
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"[PERFILES] Perfiles ilegibles en {directorio}: {e}")
+        return None
+    return PerfilesViaje(directorio, meta["edges"], tiempos, libre, meta["tam_franja"], meta["alfa"],
+                         meta.get("corridas", 0))
+
+
+def tiempos_libres(indice_tls) -> Dict[str, float]:
+    """{edge_id: longitud / velocidad máxima} desde el IndiceSemaforos."""
+    return {e: datos[0] / datos[1] for e, datos in indice_tls.edges.items() if datos[1] > 0}
+
+
+def incorporar_edgedata(rutas_xml: Sequence[Path], indice_tls, directorio: Path = DIRECTORIO_PERFILES_VIAJE,
+                        desfase: float = DESFASE_HORARIO_SIM, alfa: Optional[float] = None) -> Optional[PerfilesViaje]:
+    """Abre (o crea) el almacén y le suma cada archivo edgeData como una corrida."""
+    from analysis.edgedata import cargar_edgedata
+
+    try:
+        perfiles = cargar_perfiles(directorio, escritura=True)
+        if perfiles is None:
+            perfiles = crear_perfiles(directorio, tiempos_libres(indice_tls))
+        if alfa is not None:
+            perfiles.alfa = alfa
+        for ruta_xml in rutas_xml:
+            celdas = perfiles.actualizar(cargar_edgedata(ruta_xml), desfase)
+            print(f"[PERFILES] {ruta_xml}: {celdas} celdas actualizadas (corrida {perfiles.corridas})")
+        perfiles.guardar()
+        return perfiles
+    except Exception as e:
+        print(f"[PERFILES] Error incorporando edgeData: {e}")
+        return None
+
+
+def main(argv=None) -> int:
+    from config import SUMO_NET
+    from traffic_control.tls_index import cargar_indice_semaforos
+
+    parser = argparse.ArgumentParser(description="Acumula salidas edgeData en los perfiles de tiempo de viaje")
+    parser.add_argument("edgedata", nargs="+", type=Path)
+    parser.add_argument("--directorio", type=Path, default=DIRECTORIO_PERFILES_VIAJE)
+    parser.add_argument("--desfase", type=float, default=DESFASE_HORARIO_SIM,
+                        help="hora del día (s) a la que empieza la simulación")
+    parser.add_argument("--alfa", type=float, default=None, help="peso de la corrida nueva en el suavizado")
+    args = parser.parse_args(argv)
+
+    perfiles = incorporar_edgedata(args.edgedata, cargar_indice_semaforos(SUMO_NET), args.directorio,
+                                   args.desfase, args.alfa)
+    return 0 if perfiles is not None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+"""
+Registro estructurado de bajo costo para el bucle de simulación.
+
+Cada módulo pide su logger por la etiqueta que ya usaba en sus prints
+(obtener_logger("MAIN") → "[MAIN] ..."). Hasta que se llama a
+configurar_logging() los mensajes salen por stdout de forma síncrona, igual
+que antes; después:
+
+- el hilo que registra solo encola el registro (QueueHandler); la escritura a
+  consola y al archivo JSONL la hace un QueueListener en su propio hilo;
+- el formateo es perezoso: log.debug("ruta %s", Diferido(...)) no construye el
+  texto si el nivel del módulo lo descarta;
+- cada etiqueta puede tener su nivel (LOG_NIVELES_MODULO);
+- un buffer circular guarda los últimos registros en memoria (sin formatear)
+  y volcar_buffer() los escribe a disco tras un error crítico.
+"""
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import (
+    LOG_NIVEL, LOG_NIVELES_MODULO, LOG_ARCHIVO, LOG_CAPACIDAD_COLA, LOG_BUFFER_TAM, LOG_NIVEL_BUFFER,
+    LOG_ARCHIVO_VOLCADO
+)
+
+RAIZ = "siviaer"
+
+# Atributos propios de LogRecord: el resto son campos de `extra` y van al JSON
+_ATRIBUTOS_ESTANDAR = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def _etiqueta(record: logging.LogRecord) -> str:
+    return record.name.rpartition(".")[2]
+
+
+def _nivel(nivel) -> int:
+    return nivel if isinstance(nivel, int) else logging.getLevelName(str(nivel).upper())
+
+
+class Diferido:
+    """Argumento de log que solo se calcula si el registro se formatea: Diferido(" -> ".join, ruta)."""
+
+    __slots__ = ("funcion", "args")
+
+    def __init__(self, funcion, *args):
+        self.funcion = funcion
+        self.args = args
+
+    def __str__(self) -> str:
+        return str(self.funcion(*self.args))
+
+
+class FormatoConsola(logging.Formatter):
+    """Mismo aspecto que los prints anteriores: "[ETIQUETA] mensaje"."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        texto = f"[{_etiqueta(record)}] {record.getMessage()}"
+        if record.exc_info:
+            texto += "\n" + self.formatException(record.exc_info)
+        return texto
+
+
+class FormatoJSON(logging.Formatter):
+    """Una línea JSON por registro, con los campos de `extra` al mismo nivel."""
+
+    def a_dict(self, record: logging.LogRecord) -> dict:
+        datos = {"t": round(record.created, 3), "nivel": record.levelname, "modulo": _etiqueta(record),
+                 "hilo": record.threadName, "msg": record.getMessage()}
+        for clave, valor in vars(record).items():
+            if clave not in _ATRIBUTOS_ESTANDAR:
+                datos[clave] = valor
+        if record.exc_info:
+            datos["excepcion"] = self.formatException(record.exc_info)
+        return datos
+
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(self.a_dict(record), ensure_ascii=False, default=str)
+
+
+class ManejadorCola(logging.handlers.QueueHandler):
+    """QueueHandler con cola acotada: si se llena se descarta el registro en vez de bloquear el bucle."""
+
+    def __init__(self, cola: queue.Queue):
+        super().__init__(cola)
+        self.descartados = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+
+class OyenteCola(logging.handlers.QueueListener):
+    """QueueListener cuya marca de fin espera lugar en la cola acotada en vez de fallar."""
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)
+
+
+class FiltroNiveles(logging.Filter):
+    """Nivel por etiqueta para la salida (el logger puede dejar pasar más para el buffer)."""
+
+    def __init__(self, nivel: int, niveles: Dict[str, int]):
+        super().__init__()
+        self.nivel = nivel
+        self.niveles = niveles
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= self.niveles.get(_etiqueta(record), self.nivel)
+
+
+class BufferCircular(logging.Handler):
+    """
+    Últimos `capacidad` registros en memoria. emit() solo agrega el LogRecord
+    (deque.append es atómico): el texto se arma al volcar.
+    """
+
+    def __init__(self, capacidad: int, nivel: int = logging.NOTSET):
+        super().__init__(nivel)
+        self.registros: deque = deque(maxlen=capacidad)
+        self.formato = FormatoJSON()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.registros.append(record)
+
+    def recientes(self, n: Optional[int] = None) -> List[dict]:
+        registros = list(self.registros)
+        if n is not None:
+            registros = registros[-n:]
+        return [self.formato.a_dict(r) for r in registros]
+
+    def volcar(self, ruta: Path) -> int:
+        registros = list(self.registros)
+        with open(ruta, "w", encoding="utf-8") as f:
+            for record in registros:
+                f.write(self.formato.format(record) + "\n")
+        return len(registros)
+
+
+_raiz = logging.getLogger(RAIZ)
+_raiz.propagate = False
+_raiz.setLevel(logging.INFO)
+# Salida síncrona por defecto (herramientas de línea de comandos, antes de configurar)
+_manejador_inicial = logging.StreamHandler(sys.stdout)
+_manejador_inicial.setFormatter(FormatoConsola())
+_manejador_inicial.setLevel(logging.INFO)
+_raiz.addHandler(_manejador_inicial)
+
+_candado = threading.Lock()
+_estado = {"oyente": None, "cola": None, "buffer": None}
+
+
+def obtener_logger(etiqueta: str) -> logging.Logger:
+    return logging.getLogger(f"{RAIZ}.{etiqueta}")
+
+
+def configurar_logging(nivel=LOG_NIVEL, niveles_modulo: Optional[Dict[str, str]] = None,
+                       archivo: Optional[Path] = LOG_ARCHIVO, nivel_buffer=LOG_NIVEL_BUFFER,
+                       capacidad_cola: int = LOG_CAPACIDAD_COLA, tam_buffer: int = LOG_BUFFER_TAM,
+                       consola: bool = True) -> bool:
+    """
+    Pasa el registro a modo asíncrono: consola y `archivo` (JSONL, None = sin
+    archivo) detrás de una cola, más el buffer circular en memoria.
+    """
+    with _candado:
+        try:
+            _detener()
+            nivel = _nivel(nivel)
+            nivel_buffer = _nivel(nivel_buffer)
+            niveles = {e: _nivel(n) for e, n in (LOG_NIVELES_MODULO if niveles_modulo is None
+                                                  else niveles_modulo).items()}
+
+            salidas: List[logging.Handler] = []
+            if consola:
+                manejador = logging.StreamHandler(sys.stdout)
+                manejador.setFormatter(FormatoConsola())
+                salidas.append(manejador)
+            if archivo is not None:
+                manejador = logging.FileHandler(archivo, encoding="utf-8")
+                manejador.setFormatter(FormatoJSON())
+                salidas.append(manejador)
+
+            cola: queue.Queue = queue.Queue(capacidad_cola)
+            manejador_cola = ManejadorCola(cola)
+            manejador_cola.addFilter(FiltroNiveles(nivel, niveles))
+            buffer = BufferCircular(tam_buffer, nivel_buffer)
+            oyente = OyenteCola(cola, *salidas, respect_handler_level=True)
+
+            # Cada logger deja pasar lo que pida su salida o el buffer; lo demás
+            # se descarta en isEnabledFor() sin crear el registro
+            for handler in list(_raiz.handlers):
+                _raiz.removeHandler(handler)
+            _raiz.setLevel(min(nivel, nivel_buffer))
+            for etiqueta, nivel_modulo in niveles.items():
+                obtener_logger(etiqueta).setLevel(min(nivel_modulo, nivel_buffer))
+            _raiz.addHandler(buffer)
+            _raiz.addHandler(manejador_cola)
+            oyente.start()
+            _estado.update(oyente=oyente, cola=manejador_cola, buffer=buffer)
+            return True
+        except Exception as e:
+            print(f"[LOG] Error configurando el registro: {e}")
+            return False
+
+
+def _detener() -> None:
+    oyente = _estado["oyente"]
+    if oyente is None:
+        return
+    # stop() vacía la cola antes de terminar el hilo
+    oyente.stop()
+    for handler in oyente.handlers:
+        handler.close()
+    _raiz.removeHandler(_estado["cola"])
+    _raiz.addHandler(_manejador_inicial)
+    _estado["oyente"] = None
+
+
+def detener_logging() -> None:
+    """Vacía la cola, cierra el archivo y vuelve a la salida síncrona (el buffer se conserva)."""
+    with _candado:
+        _detener()
+
+
+def registros_descartados() -> int:
+    return _estado["cola"].descartados if _estado["cola"] is not None else 0
+
+
+def registros_recientes(n: Optional[int] = None) -> List[dict]:
+    buffer = _estado["buffer"]
+    return buffer.recientes(n) if buffer is not None else []
+
+
+def volcar_buffer(ruta: Path = LOG_ARCHIVO_VOLCADO) -> Optional[Path]:
+    """Escribe el buffer circular como JSONL (para examinar un fallo). Retorna la ruta o None."""
+    buffer = _estado["buffer"]
+    if buffer is None:
+        return None
+    try:
+        n = buffer.volcar(ruta)
+        print(f"[LOG] {n} registros recientes volcados en {ruta}")
+        return Path(ruta)
+    except Exception as e:
+        print(f"[LOG] Error volcando el buffer: {e}")
+        return None
@@ -0,0 +1,323 @@
+"""
+Modos de simulación mesoscópicos para demanda a escala de ciudad.
+
+- "MICRO":   microsimulación completa (comportamiento por defecto).
+- "MESO":    --mesosim en toda la red, con control de cruces para que los
+             semáforos (y la onda verde) sigan actuando.
+- "HIBRIDO": --mesosim grueso en la red (sin control de cruces; los semáforos
+             se aproximan con --meso-tls-penalty) y control detallado solo en
+             los corredores de despacho.
+
+SUMO no permite pasar una calle de meso a micro con la simulación en marcha:
+el modo es global y los parámetros meso por calle se leen al cargar la red.
+Por eso el modo HIBRIDO fija los corredores al arrancar: las rutas de la tabla
+de despachos más MARGEN_CORREDOR_MESO cruces alrededor pasan a un tipo de calle
+propio (escribir_red_hibrida) con control de cruces. Al despachar,
+GestorTraCI.activar_corredor() informa qué fracción de la ruta real quedó
+dentro de esos corredores.
+
+Comparación contra microsimulación (mismo accidente, misma semilla, SUMO sin
+interfaz):
+    python -m sumo_interface.meso --modos HIBRIDO MESO [--zona J12] [--hasta 1800] [--json meso.json]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+from config import (
+    SUMO_CFG, SUMO_NET, MODOS_SIMULACION, MESO_LONGITUD_SEGMENTO, MESO_PENALIDAD_SEMAFORO,
+    MARGEN_CORREDOR_MESO, RED_HIBRIDA, TIPOS_MESO_HIBRIDO
+)
+
+TIPO_CORREDOR = "siviaer_corredor"
+
+
+def argumentos_modo(modo: str) -> List[str]:
+    """Opciones de línea de comandos de SUMO para el modo (sin la red híbrida)."""
+    if modo not in MODOS_SIMULACION:
+        raise ValueError(f"Modo de simulación desconocido: {modo} (opciones: {', '.join(MODOS_SIMULACION)})")
+    if modo == "MICRO":
+        return []
+    argumentos = ["--mesosim", "true", "--meso-edgelength", str(MESO_LONGITUD_SEGMENTO)]
+    if modo == "MESO":
+        return argumentos + ["--meso-junction-control", "true"]
+    return argumentos + ["--meso-junction-control", "false", "--meso-tls-penalty", str(MESO_PENALIDAD_SEMAFORO)]
+
+
+def edges_con_margen(grafo, ruta: Iterable[str], margen: int = MARGEN_CORREDOR_MESO) -> Set[str]:
+    """
+    Calles de la ruta más las que unen sus junctions con los que están a
+    `margen` cruces o menos (en ambos sentidos), para que las colas que
+    alcanzan a la ambulancia también se simulen en detalle.
+    """
+    extremos = {str(d.get("edge_id")): (u, v) for u, v, d in grafo.edges(data=True)}
+    corredor = {str(e) for e in ruta}
+    nodos = set()
+    for e in corredor:
+        if e in extremos:
+            nodos.update(extremos[e])
+    frontera = set(nodos)
+    for _ in range(margen):
+        vecinos = set()
+        for n in frontera:
+            vecinos.update(grafo.successors(n))
+            vecinos.update(grafo.predecessors(n))
+        frontera = vecinos - nodos
+        nodos |= frontera
+    if margen > 0:
+        corredor.update(e for e, (u, v) in extremos.items() if u in nodos and v in nodos)
+    return corredor
+
+
+def edges_corredores(tabla, grafo, margen: int = MARGEN_CORREDOR_MESO) -> Set[str]:
+    """Unión de los corredores (con margen) de todas las zonas de la TablaDespacho."""
+    edges = set()
+    for zona in tabla.planes:
+        edges |= edges_con_margen(grafo, tabla.plan(zona)["ruta"], margen)
+    return edges
+
+
+def archivos_adicionales(archivo_config: Path) -> List[str]:
+    """additional-files del .sumocfg como rutas absolutas (en la línea de comandos se reemplazan)."""
+    try:
+        raiz = ET.parse(archivo_config).getroot()
+        elem = raiz.find("./input/additional-files")
+        if elem is None:
+            return []
+        base = Path(archivo_config).resolve().parent
+        return [str((base / a.strip()).resolve()) for a in elem.get("value", "").split(",") if a.strip()]
+    except Exception as e:
+        print(f"[MESO] Error leyendo {archivo_config}: {e}")
+        return []
+
+
+def escribir_red_hibrida(edges_detalle: Set[str], ruta_net: Path = SUMO_NET, destino_net: Path = RED_HIBRIDA,
+                         destino_tipos: Path = TIPOS_MESO_HIBRIDO) -> bool:
+    """
+    Copia de la red donde las calles de `edges_detalle` tienen el tipo
+    TIPO_CORREDOR, más el archivo adicional con los parámetros meso de ese
+    tipo (control de cruces, sin penalidad de semáforo). Si la red y el
+    conjunto de calles no cambiaron, se reutilizan los archivos existentes.
+    """
+    try:
+        estado = os.stat(ruta_net)
+        huella = hashlib.sha1(f"{Path(ruta_net).resolve()}|{estado.st_mtime_ns}|{estado.st_size}|"
+                              f"{'|'.join(sorted(edges_detalle))}".encode()).hexdigest()
+        marca = f"<!-- huella {huella} -->"
+        if Path(destino_net).exists() and Path(destino_tipos).exists():
+            with open(destino_tipos, encoding="utf-8") as f:
+                if f.readline().strip() == marca:
+                    print(f"[MESO] Red híbrida vigente ({len(edges_detalle)} calles en detalle)")
+                    return True
+
+        arbol = ET.parse(ruta_net)
+        marcadas = 0
+        for edge in arbol.getroot().iter("edge"):
+            if edge.get("function") != "internal" and edge.get("id") in edges_detalle:
+                edge.set("type", TIPO_CORREDOR)
+                marcadas += 1
+        arbol.write(destino_net, encoding="UTF-8", xml_declaration=True)
+
+        with open(destino_tipos, "w", encoding="utf-8") as f:
+            f.write(marca + "\n")
+            f.write("<additional>\n"
+                    f'    <type id="{TIPO_CORREDOR}">\n'
+                    '        <meso junctionControl="true" tlsPenalty="0" tlsFlowPenalty="0"/>\n'
+                    "    </type>\n"
+                    "</additional>\n")
+        print(f"[MESO] Red híbrida escrita: {marcadas} calles en detalle → {destino_net}")
+        return True
+    except Exception as e:
+        print(f"[MESO] Error escribiendo la red híbrida: {e}")
+        return False
+
+
+# --- Comparación contra microsimulación ---
+
+def _correr_modo(modo: str, plan: dict, edges_detalle: Optional[Set[str]], t_accidente: float,
+                 horizonte: float, semilla: int, puerto: int) -> Optional[dict]:
+    import traci
+    from sumo_interface.traci_manager import GestorTraCI
+
+    prefijo = f"meso_{modo.lower()}_"
+    gestor = GestorTraCI(SUMO_CFG, puerto, modo_gui=False, semilla=semilla, modo_simulacion=modo,
+                         prefijo_salida=prefijo)
+    if modo == "HIBRIDO" and not gestor.configurar_hibrido(edges_detalle):
+        return None
+    if not gestor.iniciar_sumo():
+        return None
+    try:
+        t0 = time.perf_counter()
+        traci.simulationStep(t_accidente)
+        if not gestor.generar_ambulancia("ambulancia_meso", plan["edge_inicio"], plan["ruta"]):
+            return None
+        cobertura = gestor.activar_corredor(plan["ruta"])
+        t_despacho = gestor.obtener_tiempo_simulacion()
+        t_llegada, en_red = None, False
+        # Avance por segundos (no por paso): el costo de TraCI no debe diluir la aceleración
+        while (t := gestor.obtener_tiempo_simulacion()) < horizonte:
+            traci.simulationStep(min(t + 1.0, horizonte))
+            if t_llegada is None:
+                presente = "ambulancia_meso" in traci.vehicle.getIDList()
+                if en_red and not presente:
+                    t_llegada = gestor.obtener_tiempo_simulacion()
+                en_red = en_red or presente
+        reloj = time.perf_counter() - t0
+    finally:
+        gestor.cerrar_conexion()
+
+    return {
+        "modo": modo,
+        "reloj_s": reloj,
+        "tiempo_real": horizonte / reloj if reloj > 0 else None,
+        "t_despacho": t_despacho,
+        "viaje_ambulancia": t_llegada - t_despacho if t_llegada is not None else None,
+        "cobertura_detalle": cobertura,
+        "edgedata": str(Path(SUMO_CFG).parent / f"{prefijo}edgeData_output.xml"),
+    }
+
+
+def diferencias_edgedata(modo_xml: Path, micro_xml: Path, corredor: Set[str], desde: float,
+                         hasta: float) -> Dict[str, dict]:
+    """
+    Error de velocidad media por calle (ponderado por tiempo muestreado en
+    micro) y diferencia de veh-h simulados, en el corredor y fuera de él.
+    """
+    from analysis.edgedata import cargar_edgedata
+
+    modo = cargar_edgedata(modo_xml, desde, hasta)
+    micro = cargar_edgedata(micro_xml, desde, hasta)
+    agg_modo, agg_micro = modo.agregar_por_edge(), micro.agregar_por_edge()
+    idx = np.array([modo.indice_edges.get(e, -1) for e in micro.edges], dtype=np.int64)
+    valido = idx >= 0
+    idx_seguro = np.where(valido, idx, 0)
+    v_micro = agg_micro["velocidad"]
+    v_modo = np.where(valido, agg_modo["velocidad"][idx_seguro], np.nan)
+    s_micro = agg_micro["muestreo"]
+    s_modo = np.where(valido, agg_modo["muestreo"][idx_seguro], 0.0)
+    en_corredor = micro.mascara_edges(corredor)
+
+    def resumir(mascara: np.ndarray) -> dict:
+        m = mascara & valido & (v_micro > 0) & np.isfinite(v_modo)
+        peso = s_micro[m].sum()
+        error = np.abs(v_modo[m] - v_micro[m]) / v_micro[m]
+        vh_micro = s_micro[mascara].sum() / 3600.0
+        vh_modo = s_modo[mascara].sum() / 3600.0
+        return {
+            "edges": int(m.sum()),
+            "error_velocidad": float((error * s_micro[m]).sum() / peso) if peso > 0 else None,
+            "veh_horas_micro": float(vh_micro),
+            "delta_veh_horas": float(vh_modo - vh_micro),
+        }
+
+    return {"corredor": resumir(en_corredor), "resto": resumir(~en_corredor)}
+
+
+def comparar_modos(modos: List[str], zona: Optional[str] = None, t_accidente: float = 300.0,
+                   horizonte: float = 1800.0, semilla: int = 42, puerto: int = 8850,
+                   margen: int = MARGEN_CORREDOR_MESO) -> Optional[dict]:
+    """
+    Corre MICRO y cada modo con el mismo despacho (plan de la tabla para
+    `zona`) y reporta aceleración, ETA de la ambulancia y error de edgeData.
+    """
+    from config import ARCHIVO_TABLA_DESPACHO
+    from config_data.loader import cargar_configuraciones
+    from routing.dispatch_table import obtener_tabla
+    from routing.graph_loader import construir_grafo
+    from traffic_control.tls_index import construir_indice_semaforos
+
+    raiz = ET.parse(SUMO_NET).getroot()
+    grafo, indice_tls = construir_grafo(raiz), construir_indice_semaforos(raiz)
+    grafo.graph["edges_semaforo"] = indice_tls.edges_semaforizados()
+    zonas, bases, _salidas = cargar_configuraciones()
+    tabla = obtener_tabla(ARCHIVO_TABLA_DESPACHO, SUMO_NET, grafo, indice_tls, zonas, bases)
+    if tabla is None or len(tabla) == 0:
+        print("[MESO] Sin tabla de despachos")
+        return None
+    zona = zona or next(iter(tabla.planes))
+    plan = tabla.plan(zona)
+    if plan is None:
+        print(f"[MESO] La zona {zona} no está en la tabla de despachos")
+        return None
+    edges_detalle = edges_corredores(tabla, grafo, margen)
+    corredor = edges_con_margen(grafo, plan["ruta"], margen)
+
+    corridas = {}
+    for modo in ["MICRO"] + [m for m in modos if m != "MICRO"]:
+        print(f"[MESO] Corriendo {modo} ({horizonte:.0f}s simulados)...")
+        corridas[modo] = _correr_modo(modo, plan, edges_detalle, t_accidente, horizonte, semilla, puerto)
+        if corridas[modo] is None:
+            print(f"[MESO] Falló la corrida {modo}")
+            if modo == "MICRO":
+                return None
+
+    micro = corridas["MICRO"]
+    for modo, corrida in corridas.items():
+        if corrida is None or modo == "MICRO":
+            continue
+        corrida["aceleracion"] = micro["reloj_s"] / corrida["reloj_s"] if corrida["reloj_s"] > 0 else None
+        if corrida["viaje_ambulancia"] is not None and micro["viaje_ambulancia"] is not None:
+            corrida["delta_viaje_ambulancia"] = corrida["viaje_ambulancia"] - micro["viaje_ambulancia"]
+        try:
+            corrida["edgedata_vs_micro"] = diferencias_edgedata(Path(corrida["edgedata"]), Path(micro["edgedata"]),
+                                                                corredor, micro["t_despacho"], horizonte)
+        except Exception as e:
+            print(f"[MESO] Error comparando edgeData de {modo}: {e}")
+    return {"zona": zona, "semilla": semilla, "horizonte": horizonte, "calles_detalle": len(edges_detalle),
+            "corridas": corridas}
+
+
+def _texto(valor, formato: str = ".1f", sufijo: str = "") -> str:
+    return "—" if valor is None else f"{valor:{formato}}{sufijo}"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Aceleración y precisión de meso/híbrido frente a micro")
+    parser.add_argument("--modos", nargs="+", default=["HIBRIDO"], choices=MODOS_SIMULACION)
+    parser.add_argument("--zona", help="junction del accidente (por defecto, la primera zona de la tabla)")
+    parser.add_argument("--accidente", type=float, default=300.0, help="s simulados antes del despacho")
+    parser.add_argument("--hasta", type=float, default=1800.0, help="s simulados por corrida")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--puerto", type=int, default=8850)
+    parser.add_argument("--margen", type=int, default=MARGEN_CORREDOR_MESO)
+    parser.add_argument("--json", type=Path, help="guardar el reporte completo")
+    args = parser.parse_args(argv)
+
+    reporte = comparar_modos(args.modos, args.zona, args.accidente, args.hasta, args.semilla, args.puerto,
+                             args.margen)
+    if reporte is None:
+        return 1
+
+    print(f"[MESO] Zona {reporte['zona']}, semilla {reporte['semilla']}, "
+          f"{reporte['calles_detalle']} calles en detalle (HIBRIDO)")
+    for modo, c in reporte["corridas"].items():
+        if c is None:
+            continue
+        linea = (f"[MESO] {modo:8s} reloj {c['reloj_s']:.1f}s ({_texto(c['tiempo_real'], '.1f', 'x')} tiempo real)"
+                 f" | ambulancia {_texto(c['viaje_ambulancia'], '.0f', 's')}")
+        if modo != "MICRO":
+            linea += (f" | aceleración {_texto(c.get('aceleracion'), '.2f', 'x')}"
+                      f" | Δ ambulancia {_texto(c.get('delta_viaje_ambulancia'), '+.0f', 's')}")
+            for ambito, d in c.get("edgedata_vs_micro", {}).items():
+                error = d["error_velocidad"]
+                linea += (f" | {ambito}: error v {_texto(error * 100 if error is not None else None, '.1f', '%')},"
+                          f" Δ veh-h {d['delta_veh_horas']:+.1f}")
+        print(linea)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reporte, f, indent=2)
+        print(f"[MESO] Reporte guardado en {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
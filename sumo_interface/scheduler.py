@@ -0,0 +1,91 @@
+import heapq
+import itertools
+from typing import Callable, Dict, List, Optional, Tuple
+
+from structured_log import obtener_logger
+
+log = obtener_logger("SCHEDULER")
+
+
+class PlanificadorEventos:
+    """
+    Planificador de eventos en tiempo de SIMULACIÓN (traci.simulation.getTime()).
+    Los callbacks se guardan en un heap ordenado por instante de disparo, así que
+    programar y disparar cuestan O(log n) y un paso sin eventos vencidos es O(1).
+    A diferencia de time.time(), sigue siendo correcto aunque la simulación
+    corra más rápida o más lenta que el tiempo real.
+    """
+
+    def __init__(self):
+        self._cola: List[Tuple[float, int]] = []
+        self._eventos: Dict[int, Tuple[Callable, tuple, Optional[float]]] = {}
+        self._contador = itertools.count(1)
+        self.t_actual = 0.0
+
+    def __len__(self) -> int:
+        return len(self._eventos)
+
+    def programar(self, t_disparo: float, callback: Callable, *args) -> int:
+        """Programa callback(t_actual, *args) en el instante t_disparo. Retorna el id del evento."""
+        return self._insertar(t_disparo, callback, args, None)
+
+    def programar_en(self, retraso: float, callback: Callable, *args) -> int:
+        """Programa callback dentro de `retraso` segundos de simulación desde el último paso procesado."""
+        return self._insertar(self.t_actual + retraso, callback, args, None)
+
+    def programar_periodico(self, periodo: float, callback: Callable, *args,
+                            t_inicio: Optional[float] = None) -> int:
+        """
+        Programa callback cada `periodo` segundos. El id se conserva entre
+        repeticiones, de modo que un solo cancelar() detiene la serie.
+        """
+        t0 = self.t_actual + periodo if t_inicio is None else t_inicio
+        return self._insertar(t0, callback, args, periodo)
+
+    def cancelar(self, id_evento: Optional[int]) -> bool:
+        """
+        Cancela un evento. La entrada del heap se descarta de forma perezosa al
+        llegar a la cima, sin recorrer la cola.
+        """
+        if id_evento is None:
+            return False
+        return self._eventos.pop(id_evento, None) is not None
+
+    def pendiente(self, id_evento: Optional[int]) -> bool:
+        return id_evento in self._eventos
+
+    def procesar(self, t_actual: float) -> int:
+        """
+        Dispara todos los eventos vencidos hasta t_actual (inclusive), en orden.
+        Retorna la cantidad de callbacks ejecutados.
+        """
+        self.t_actual = t_actual
+        disparados = 0
+        while self._cola and self._cola[0][0] <= t_actual:
+            t_disparo, id_evento = heapq.heappop(self._cola)
+            evento = self._eventos.get(id_evento)
+            if evento is None:
+                continue
+
+            callback, args, periodo = evento
+            if periodo is None:
+                del self._eventos[id_evento]
+            else:
+                t_siguiente = t_disparo + periodo
+                if t_siguiente <= t_actual:
+                    # Si hubo un salto largo no se recuperan las repeticiones perdidas
+                    t_siguiente = t_actual + periodo
+                heapq.heappush(self._cola, (t_siguiente, id_evento))
+
+            try:
+                callback(t_actual, *args)
+            except Exception as e:
+                log.error("Error en evento %s (%s): %s", id_evento, getattr(callback, "__name__", callback), e)
+            disparados += 1
+        return disparados
+
+    def _insertar(self, t_disparo: float, callback: Callable, args: tuple, periodo: Optional[float]) -> int:
+        id_evento = next(self._contador)
+        self._eventos[id_evento] = (callback, args, periodo)
+        heapq.heappush(self._cola, (t_disparo, id_evento))
+        return id_evento
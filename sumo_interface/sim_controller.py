@@ -1,6 +1,9 @@
 import time
 from typing import Optional, List
 from .traci_manager import GestorTraCI
+from structured_log import obtener_logger
+
+log = obtener_logger("SIM_CONTROLLER")
 
 class ControladorSimulacion:
     def __init__(self, gestor_traci: GestorTraCI):
@@ -24,10 +27,10 @@ class ControladorSimulacion:
                 
                 time.sleep(0.01)
             
-            print(f"[SIM_CONTROLLER] Simulación completada ({duracion_segundos}s)")
+            log.info("Simulación completada (%ss)", duracion_segundos)
             return True
         except Exception as e:
-            print(f"[SIM_CONTROLLER] Error ejecutando simulación: {e}")
+            log.error("Error ejecutando simulación: %s", e)
             return False
     
     def rastrear_vehiculo(self, vehiculo_id: str) -> bool:
@@ -37,10 +40,10 @@ class ControladorSimulacion:
         try:
             self.vehiculos_rastreados[vehiculo_id] = True
             self.posiciones_historial[vehiculo_id] = []
-            print(f"[SIM_CONTROLLER] Rastreando vehículo: {vehiculo_id}")
+            log.info("Rastreando vehículo: %s", vehiculo_id)
             return True
         except Exception as e:
-            print(f"[SIM_CONTROLLER] Error rastreando: {e}")
+            log.error("Error rastreando: %s", e)
             return False
     
     def obtener_datos_rastreo(self, vehiculo_id: str) -> Optional[dict]:
@@ -66,7 +69,7 @@ class ControladorSimulacion:
             
             return datos
         except Exception as e:
-            print(f"[SIM_CONTROLLER] Error obteniendo datos: {e}")
+            log.error("Error obteniendo datos: %s", e)
             return None
     
     def detener_rastreo(self, vehiculo_id: str) -> bool:
@@ -78,8 +81,8 @@ class ControladorSimulacion:
                 del self.vehiculos_rastreados[vehiculo_id]
             
             historial = self.posiciones_historial.get(vehiculo_id, [])
-            print(f"[SIM_CONTROLLER] Rastreo detenido: {vehiculo_id} ({len(historial)} puntos)")
+            log.info("Rastreo detenido: %s (%s puntos)", vehiculo_id, len(historial))
             return True
         except Exception as e:
-            print(f"[SIM_CONTROLLER] Error deteniendo rastreo: {e}")
+            log.error("Error deteniendo rastreo: %s", e)
             return False
@@ -4,14 +4,33 @@ import subprocess
 import time
 import os
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, List, Optional, Set
+
+from config import MODO_SIMULACION, MODOS_SIMULACION, RED_HIBRIDA, TIPOS_MESO_HIBRIDO
+from structured_log import obtener_logger
+
+log = obtener_logger("TRACI_MANAGER")
+log_traci = obtener_logger("TRACI")
 
 class GestorTraCI:
-    def __init__(self, archivo_config: Path, puerto: int = 8813, modo_gui: bool = False):
+    def __init__(self, archivo_config: Path, puerto: int = 8813, modo_gui: bool = False,
+                 semilla: Optional[int] = None, modo_simulacion: str = MODO_SIMULACION,
+                 prefijo_salida: Optional[str] = None):
+        self.semilla = semilla
         self.archivo_config = str(archivo_config.resolve()) if isinstance(archivo_config, Path) else str(Path(archivo_config).resolve())
         self.puerto = int(puerto)
         self.modo_gui = modo_gui
         self.conexion_activa = False
+        # Modo micro / meso / híbrido (ver sumo_interface.meso)
+        self.modo_simulacion = modo_simulacion
+        self.prefijo_salida = prefijo_salida
+        self.argumentos_hibrido: List[str] = []
+        self.edges_detalle: Optional[Set[str]] = None
+        # Se valida el modo antes de lanzar nada; sumo_interface.meso solo se
+        # importa si hace falta (en MICRO no se usa)
+        if modo_simulacion not in MODOS_SIMULACION:
+            raise ValueError(f"Modo de simulación desconocido: {modo_simulacion} "
+                             f"(opciones: {', '.join(MODOS_SIMULACION)})")
     
     def iniciar_sumo(self) -> bool:
         """
@@ -19,7 +38,7 @@ class GestorTraCI:
         """
         try:
             # 1. Determinar qué binario usar
-            binary = "sumo-gui" #if self.modo_gui else "sumo-gui"
+            binary = "sumo-gui" if self.modo_gui else "sumo"
             
             # 2. Construir el comando
             # Nota: traci.start espera una lista de argumentos
@@ -32,22 +51,64 @@ class GestorTraCI:
                 "--no-warnings", "true",
                 "--window-size", "1000,800"
             ]
+            if self.semilla is not None:
+                comando_sumo += ["--seed", str(self.semilla)]
+            if self.prefijo_salida:
+                comando_sumo += ["--output-prefix", self.prefijo_salida]
+            modo = self.modo_simulacion
+            if modo == "HIBRIDO" and not self.argumentos_hibrido:
+                log.warning("Modo HIBRIDO sin corredores configurados: se usa MESO en toda la red")
+                modo = "MESO"
+            if modo != "MICRO":
+                from sumo_interface.meso import argumentos_modo
+                comando_sumo += argumentos_modo(modo)
+            if modo == "HIBRIDO":
+                comando_sumo += self.argumentos_hibrido
             
-            print(f"[TRACI_MANAGER] Iniciando SUMO: {' '.join(comando_sumo)}")
+            log.info("Iniciando SUMO: %s", ' '.join(comando_sumo))
             
             # 3. Iniciar SUMO usando traci.start
             traci.start(comando_sumo, port=self.puerto, label="sim1")
             
             self.conexion_activa = True
-            print("[TRACI_MANAGER] Conexión TraCI establecida correctamente")
+            log.info("Conexión TraCI establecida correctamente")
             return True
             
         except Exception as e:
-            print(f"[TRACI_MANAGER] Error iniciando SUMO: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Error iniciando SUMO: %s", e)
             return False
     
+    def configurar_hibrido(self, edges_detalle: Iterable[str]) -> bool:
+        """
+        Prepara el modo HIBRIDO antes de iniciar_sumo(): red con las calles de
+        `edges_detalle` (corredores de despacho) como tipo con control de cruces.
+        """
+        from sumo_interface.meso import archivos_adicionales, escribir_red_hibrida
+        self.edges_detalle = set(edges_detalle)
+        if not escribir_red_hibrida(self.edges_detalle):
+            return False
+        adicionales = archivos_adicionales(Path(self.archivo_config)) + [str(TIPOS_MESO_HIBRIDO)]
+        self.argumentos_hibrido = ["--net-file", str(RED_HIBRIDA), "--additional-files", ",".join(adicionales)]
+        return True
+
+    def activar_corredor(self, ruta: list) -> float:
+        """
+        Llamado al despachar. El modo de cada calle quedó fijo al arrancar, así
+        que solo mide qué fracción de la ruta se simula con control de cruces
+        (1.0 en MICRO y MESO) y avisa si la ambulancia sale de los corredores.
+        """
+        if self.modo_simulacion != "HIBRIDO" or not self.edges_detalle:
+            return 1.0
+        ruta_limpia = [str(e) for e in ruta]
+        fuera = [e for e in ruta_limpia if e not in self.edges_detalle]
+        cobertura = 1.0 - len(fuera) / len(ruta_limpia) if ruta_limpia else 1.0
+        if fuera:
+            log.warning("Corredor híbrido: %s de %s calles de la ruta van en meso grueso (p. ej. %s)",
+                        len(fuera), len(ruta_limpia), fuera[0])
+        else:
+            log.info("Corredor híbrido: toda la ruta con control de cruces")
+        return cobertura
+
     def avanzar_simulacion(self, pasos: int = 1) -> bool:
         """
         Avanza la simulación SUMO N pasos.
@@ -57,7 +118,7 @@ class GestorTraCI:
                 traci.simulationStep()
             return True
         except Exception as e:
-            print(f"[TRACI_MANAGER] Error avanzando simulación: {e}")
+            log.error("Error avanzando simulación: %s", e)
             return False
     
     def obtener_tiempo_simulacion(self) -> float:
@@ -98,7 +159,7 @@ class GestorTraCI:
                     traci.vehicletype.setShapeClass(tipo_vehiculo, "emergency")
                     traci.vehicletype.setSpeedFactor(tipo_vehiculo, 1.5)
                 except Exception as e:
-                    print(f"[TRACI] Advertencia configurando tipo: {e}")
+                    log_traci.warning("Advertencia configurando tipo: %s", e)
 
             # Limpiar vehículo anterior si existe (reutilización)
             if ambulancia_id in traci.vehicle.getIDList():
@@ -118,13 +179,11 @@ class GestorTraCI:
             
             traci.vehicle.setSpeedMode(ambulancia_id, 1)
             
-            print(f"[TRACI_MANAGER] Ambulancia {ambulancia_id} generada en {edge_inicio} (Ruta ID: {ruta_id})")
+            log.info("Ambulancia %s generada en %s (Ruta ID: %s)", ambulancia_id, edge_inicio, ruta_id)
             return True
             
         except Exception as e:
-            print(f"[TRACI_MANAGER] Error generando ambulancia: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Error generando ambulancia: %s", e)
             return False
         
     def agregar_marcador_accidente(self, x: float, y: float):
@@ -168,10 +227,10 @@ class GestorTraCI:
                 layer=90
             )
 
-            print(f"[TRACI] 📍 Marcador de accidente colocado en ({x:.2f}, {y:.2f})")
+            log_traci.info("📍 Marcador de accidente colocado en (%.2f, %.2f)", x, y)
             return True
         except Exception as e:
-            print(f"[TRACI] Error dibujando marcador: {e}")
+            log_traci.error("Error dibujando marcador: %s", e)
             return False
         
     def agregar_marcador_base(self, x: float, y: float, activo: bool = False):
@@ -204,10 +263,10 @@ class GestorTraCI:
             traci.polygon.add("zona_base", shape, color_poly, fill=True, layer=90)
             
             estado_str = "VERDE (Activo)" if activo else "BLANCO (Planificación)"
-            print(f"[TRACI] 🏥 Marcador Base colocado en ({x:.1f}, {y:.1f}) - {estado_str}")
+            log_traci.info("🏥 Marcador Base colocado en (%.1f, %.1f) - %s", x, y, estado_str)
             return True
         except Exception as e:
-            print(f"[TRACI] Error dibujando base: {e}")
+            log_traci.error("Error dibujando base: %s", e)
             return False
 
     def eliminar_marcador_base(self):
@@ -229,10 +288,10 @@ class GestorTraCI:
             if "zona_accidente" in traci.polygon.getIDList():
                 traci.polygon.remove("zona_accidente")
                 
-            print("[TRACI] 🗑️ Marcador de accidente eliminado.")
+            log_traci.info("🗑️ Marcador de accidente eliminado.")
             return True
         except Exception as e:
-            print(f"[TRACI] Error eliminando marcador: {e}")
+            log_traci.error("Error eliminando marcador: %s", e)
             return False
         
     def _generar_circulo(self, x, y, radio, puntos=30):
@@ -272,8 +331,8 @@ class GestorTraCI:
             if self.conexion_activa:
                 traci.close()
                 self.conexion_activa = False
-                print("[TRACI_MANAGER] Conexión TraCI cerrada")
+                log.info("Conexión TraCI cerrada")
             return True
         except Exception as e:
-            print(f"[TRACI_MANAGER] Error cerrando conexión: {e}")
+            log.error("Error cerrando conexión: %s", e)
             return False
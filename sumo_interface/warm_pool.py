@@ -0,0 +1,309 @@
+"""
+Pool de instancias SUMO sin interfaz, arrancadas y calentadas de antemano,
+para experimentos y consultas "¿qué pasaría si...?" de baja latencia.
+
+Cada instancia tiene su propio puerto (pedido al SO, como hace traci.start) y
+su etiqueta TraCI. Tras el arranque (y PASOS_CALENTAMIENTO pasos opcionales)
+se guarda un snapshot con simulation.saveState; al devolver una instancia se
+restaura con loadState, que recarga el estado sin relanzar el proceso ni volver
+a leer la red. Una instancia que falla el chequeo de salud o supera su máximo de
+usos se recicla (se cierra y se arranca otra en su lugar); si un arranque falla,
+el chequeo de salud lo reintenta hasta completar `tamano`.
+
+Uso:
+    pool = PoolSumo(SUMO_CFG, tamano=2)
+    pool.iniciar()
+    with pool.arrendar() as conexion:     # traci.Connection
+        conexion.simulationStep(60)
+    pool.detener()
+
+    python -m sumo_interface.warm_pool [--tamano 2] [--consultas 5]
+"""
+import argparse
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+import traci
+from sumolib.miscutils import getFreeSocketPort
+
+from config import (
+    SUMO_CFG, SUMO_BIN, POOL_SUMO_TAMANO, POOL_SUMO_MAX, POOL_SUMO_MAX_USOS,
+    POOL_SUMO_PASOS_CALENTAMIENTO, POOL_SUMO_INTERVALO_SALUD
+)
+
+
+@dataclass
+class InstanciaSumo:
+    etiqueta: str
+    puerto: int
+    snapshot: Optional[str] = None
+    conexion: Optional["traci.connection.Connection"] = None
+    usos: int = 0
+    t_arranque: float = 0.0          # s que tardó en arrancar y calentarse
+    creada: float = field(default_factory=time.monotonic)
+
+
+class PoolSumo:
+    """
+    Mantiene hasta `tamano` instancias ociosas en una cola. arrendar() entrega
+    la conexión de una y, al salir del bloque, la restaura al snapshot o la
+    recicla. Un hilo de salud revisa las ociosas cada `intervalo_salud` s.
+    """
+
+    def __init__(self, archivo_config: Path = SUMO_CFG, tamano: int = POOL_SUMO_TAMANO,
+                 max_usos: int = POOL_SUMO_MAX_USOS,
+                 pasos_calentamiento: int = POOL_SUMO_PASOS_CALENTAMIENTO, semilla: Optional[int] = None,
+                 estado_inicial: Optional[Path] = None, intervalo_salud: float = POOL_SUMO_INTERVALO_SALUD,
+                 binario: str = SUMO_BIN):
+        if not 1 <= tamano <= POOL_SUMO_MAX:
+            raise ValueError(f"tamano debe estar entre 1 y POOL_SUMO_MAX ({POOL_SUMO_MAX})")
+        self.archivo_config = str(Path(archivo_config).resolve())
+        self.tamano = tamano
+        self.max_usos = max_usos
+        self.pasos_calentamiento = pasos_calentamiento
+        self.semilla = semilla
+        self.estado_inicial = str(estado_inicial) if estado_inicial else None
+        self.intervalo_salud = intervalo_salud
+        self.binario = binario
+        self._ociosas: "queue.Queue[InstanciaSumo]" = queue.Queue()
+        self._todas: Dict[str, InstanciaSumo] = {}
+        self._puertos: Set[int] = set()     # de instancias vivas o arrancando
+        self._candado = threading.Lock()
+        self._sin_arranques = threading.Condition(self._candado)
+        self._directorio = tempfile.mkdtemp(prefix="pool_sumo_")
+        self._activo = False
+        self._hilo_salud: Optional[threading.Thread] = None
+        self._contador = 0
+        self._arrancando = 0
+        self.stats = {"arranques": 0, "arrendadas": 0, "restauradas": 0, "recicladas": 0, "fallidas": 0,
+                      "espera_max": 0.0, "t_arranque_medio": 0.0}
+
+    def iniciar(self) -> bool:
+        """Arranca las instancias (en paralelo, un hilo por instancia) y el chequeo de salud."""
+        self._activo = True
+        hilos = [threading.Thread(target=self._reponer, name=f"pool-sumo-{i}") for i in range(self.tamano)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        if self.intervalo_salud:
+            self._hilo_salud = threading.Thread(target=self._bucle_salud, name="pool-sumo-salud", daemon=True)
+            self._hilo_salud.start()
+        listas = self._ociosas.qsize()
+        print(f"[POOL_SUMO] {listas}/{self.tamano} instancias listas "
+              f"(arranque medio {self.stats['t_arranque_medio']:.2f}s)")
+        return listas > 0
+
+    @contextmanager
+    def arrendar(self, timeout: Optional[float] = None):
+        """
+        Entrega la traci.Connection de una instancia ociosa (espera hasta
+        `timeout` s; None si no hay). Al salir la restaura o la recicla.
+        """
+        t0 = time.monotonic()
+        try:
+            instancia = self._ociosas.get(timeout=timeout)
+        except queue.Empty:
+            yield None
+            return
+        espera = time.monotonic() - t0
+        with self._candado:
+            self.stats["arrendadas"] += 1
+            self.stats["espera_max"] = max(self.stats["espera_max"], espera)
+        instancia.usos += 1
+        sana = True
+        try:
+            yield instancia.conexion
+        except Exception:
+            sana = False
+            raise
+        finally:
+            self._devolver(instancia, sana)
+
+    def detener(self) -> None:
+        self._activo = False
+        if self._hilo_salud is not None:
+            self._hilo_salud.join(2.0)
+        # Un reciclado en curso terminaría después y dejaría un sumo huérfano
+        with self._sin_arranques:
+            self._sin_arranques.wait_for(lambda: self._arrancando == 0, timeout=30)
+        for instancia in list(self._todas.values()):
+            self._cerrar(instancia)
+        shutil.rmtree(self._directorio, ignore_errors=True)
+        print(f"[POOL_SUMO] Pool detenido | {self.stats}")
+
+    def _devolver(self, instancia: InstanciaSumo, sana: bool) -> None:
+        if sana and instancia.usos < self.max_usos and self._restaurar(instancia):
+            with self._candado:
+                self.stats["restauradas"] += 1
+            self._ociosas.put(instancia)
+            return
+        with self._candado:
+            self.stats["recicladas"] += 1
+        self._cerrar(instancia)
+        if self._activo:
+            # Se repone en segundo plano: quien devuelve no paga el arranque
+            threading.Thread(target=self._reponer, name="pool-sumo-reponer", daemon=True).start()
+
+    def _restaurar(self, instancia: InstanciaSumo) -> bool:
+        try:
+            instancia.conexion.simulation.loadState(instancia.snapshot)
+            return True
+        except Exception as e:
+            print(f"[POOL_SUMO] {instancia.etiqueta}: no se pudo restaurar el snapshot: {e}")
+            return False
+
+    def _reponer(self) -> None:
+        instancia = self._arrancar()
+        if instancia is not None:
+            self._ociosas.put(instancia)
+
+    def _arrancar(self) -> Optional[InstanciaSumo]:
+        with self._candado:
+            # Límite de tamaño: vivas (ociosas + arrendadas) más las que están arrancando
+            if not self._activo or len(self._todas) + self._arrancando >= self.tamano:
+                return None
+            self._arrancando += 1
+            indice = self._contador
+            self._contador += 1
+        try:
+            return self._lanzar(indice)
+        finally:
+            with self._candado:
+                self._arrancando -= 1
+                self._sin_arranques.notify_all()
+
+    def _lanzar(self, indice: int) -> Optional[InstanciaSumo]:
+        etiqueta = f"pool_{indice}"
+        puerto = self._puerto_libre()
+        # output-prefix: cada instancia escribe sus salidas (edgeData, etc.) en archivos propios
+        comando = [self.binario, "-c", self.archivo_config, "--no-step-log", "true", "--no-warnings", "true",
+                   "--output-prefix", f"{etiqueta}_"]
+        if self.semilla is not None:
+            comando += ["--seed", str(self.semilla)]
+        proceso = None
+        try:
+            t0 = time.perf_counter()
+            # Proceso propio + traci.connect: no toca la conexión global por
+            # defecto (la de main.py) y es seguro arrancar varias en paralelo
+            proceso = subprocess.Popen(comando + ["--remote-port", str(puerto)],
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            conexion = traci.connect(puerto, proc=proceso, label=etiqueta)
+            if self.estado_inicial:
+                conexion.simulation.loadState(self.estado_inicial)
+            if self.pasos_calentamiento:
+                conexion.simulationStep(conexion.simulation.getTime() + self.pasos_calentamiento)
+            snapshot = self.estado_inicial or os.path.join(self._directorio, f"{etiqueta}.xml")
+            if not self.estado_inicial:
+                conexion.simulation.saveState(snapshot)
+            instancia = InstanciaSumo(etiqueta, puerto, snapshot, conexion, t_arranque=time.perf_counter() - t0)
+        except Exception as e:
+            print(f"[POOL_SUMO] Error arrancando {etiqueta} en el puerto {puerto}: {e}")
+            if proceso is not None and proceso.poll() is None:
+                proceso.kill()
+            with self._candado:
+                self._puertos.discard(puerto)
+                self.stats["fallidas"] += 1
+            return None
+        with self._candado:
+            self._todas[etiqueta] = instancia
+            self.stats["arranques"] += 1
+            n = self.stats["arranques"]
+            self.stats["t_arranque_medio"] += (instancia.t_arranque - self.stats["t_arranque_medio"]) / n
+        return instancia
+
+    def _puerto_libre(self) -> int:
+        """
+        Puerto libre según el SO (lo mismo que hace traci.start), reservado
+        hasta que se cierre la instancia. Entre que se pide y SUMO lo abre hay
+        una ventana en la que el SO podría repetirlo a un arranque paralelo.
+        """
+        while True:
+            puerto = getFreeSocketPort()
+            with self._candado:
+                if puerto not in self._puertos:
+                    self._puertos.add(puerto)
+                    return puerto
+
+    def _cerrar(self, instancia: InstanciaSumo) -> None:
+        with self._candado:
+            self._todas.pop(instancia.etiqueta, None)
+        try:
+            instancia.conexion.close()
+        except Exception:
+            pass
+        with self._candado:
+            # El puerto se libera cuando el proceso ya lo soltó
+            self._puertos.discard(instancia.puerto)
+
+    def _sana(self, instancia: InstanciaSumo) -> bool:
+        try:
+            instancia.conexion.simulation.getTime()
+            return True
+        except Exception:
+            return False
+
+    def _bucle_salud(self) -> None:
+        while self._activo:
+            time.sleep(self.intervalo_salud)
+            revisadas: List[InstanciaSumo] = []
+            # Solo las ociosas: las arrendadas son de su arrendatario
+            while True:
+                try:
+                    revisadas.append(self._ociosas.get_nowait())
+                except queue.Empty:
+                    break
+            for instancia in revisadas:
+                if self._sana(instancia):
+                    self._ociosas.put(instancia)
+                else:
+                    print(f"[POOL_SUMO] {instancia.etiqueta} no responde: se recicla")
+                    self._devolver(instancia, sana=False)
+            # Un arranque fallido (al iniciar o al reponer) deja el pool corto:
+            # un intento por lugar faltante en cada revisión
+            with self._candado:
+                faltantes = self.tamano - len(self._todas) - self._arrancando
+            for _ in range(faltantes):
+                if not self._activo:
+                    break
+                self._reponer()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Arranca un pool de SUMO y mide el tiempo por consulta")
+    parser.add_argument("--tamano", type=int, default=POOL_SUMO_TAMANO)
+    parser.add_argument("--consultas", type=int, default=5)
+    parser.add_argument("--pasos", type=int, default=300, help="s de simulación por consulta")
+    args = parser.parse_args(argv)
+
+    pool = PoolSumo(tamano=args.tamano, intervalo_salud=0)
+    if not pool.iniciar():
+        return 1
+    try:
+        for i in range(args.consultas):
+            t0 = time.perf_counter()
+            with pool.arrendar(timeout=30) as conexion:
+                if conexion is None:
+                    print("[POOL_SUMO] Sin instancias disponibles")
+                    return 1
+                conexion.simulationStep(conexion.simulation.getTime() + args.pasos)
+                vehiculos = conexion.vehicle.getIDCount()
+            print(f"[POOL_SUMO] Consulta {i + 1}: {args.pasos}s simulados, {vehiculos} vehículos, "
+                  f"{time.perf_counter() - t0:.2f}s de reloj (arranque evitado)")
+    finally:
+        pool.detener()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
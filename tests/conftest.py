@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Los módulos se importan desde la raíz del proyecto (config, routing, ...), como en main.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
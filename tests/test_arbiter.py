@@ -0,0 +1,44 @@
+from accident_event.listener import leer_severidad_trigger, leer_ubicacion_trigger
+from traffic_control.arbiter import ArbitroPreempcion, severidad_numerica
+from traffic_control.tls_index import IndiceSemaforos
+
+
+def indice_cruce():
+    """Un semáforo con dos accesos en conflicto: norte (enlaces 0-1) y este (2-3)."""
+    indice = IndiceSemaforos()
+    indice.num_enlaces["J"] = 4
+    indice.fases["J"] = [(30, "GGrr"), (3, "yyrr"), (30, "rrGG"), (3, "rryy")]
+    indice.enlaces_por_edge["J"] = {"norte": (0, 1), "este": (2, 3)}
+    return indice
+
+
+def test_severidad_del_trigger():
+    contenido = "timestamp=1.0|tipo=grave|ubicacion=10.5,20"
+    assert leer_severidad_trigger(contenido) == "grave"
+    assert leer_ubicacion_trigger(contenido) == (10.5, 20.0)
+    assert severidad_numerica(leer_severidad_trigger(contenido)) == 3
+    assert severidad_numerica(leer_severidad_trigger("timestamp=1.0|ubicacion=manual")) == 1
+    assert severidad_numerica("desconocida") == 1
+
+
+def test_conflicto_se_resuelve_por_severidad_y_luego_eta():
+    arbitro = ArbitroPreempcion(indice_cruce())
+    arbitro.reclamar("a", "J", "norte", eta=5.0, severidad=1)
+    arbitro.reclamar("b", "J", "este", eta=20.0, severidad=3)
+    assert arbitro.resolver() == {"J": "rrGG"}
+    assert arbitro.en_espera("J") == ["a"]
+
+    # A igual severidad gana la ETA menor
+    arbitro.reclamar("b", "J", "este", eta=20.0, severidad=1)
+    assert arbitro.resolver() == {"J": "GGrr"}
+    assert arbitro.en_espera("J") == ["b"]
+
+
+def test_liberar_concede_al_que_espera():
+    arbitro = ArbitroPreempcion(indice_cruce())
+    arbitro.reclamar("a", "J", "norte", eta=5.0, severidad=3)
+    arbitro.reclamar("b", "J", "este", eta=8.0, severidad=1)
+    arbitro.resolver()
+    assert arbitro.liberar("a", "J") is False
+    assert arbitro.resolver() == {"J": "rrGG"}
+    assert arbitro.liberar("b", "J") is True
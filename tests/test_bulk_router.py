@@ -0,0 +1,146 @@
+import random
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from routing import bulk_router
+from routing.bulk_router import pesos_edgedata, rutear_viajes
+from routing.dijkstra import arbol_caminos, camino_en_arbol, dijkstra_ruta_optima
+from routing.graph_loader import construir_grafo_conexiones
+
+N = 5
+# Calle sin carril para autos: nunca debe aparecer en una ruta
+BUS = "2_2-2_3"
+# Giro prohibido: de 1_1-2_1 no se puede seguir a 2_1-2_2
+PROHIBIDO = ("1_1-2_1", "2_1-2_2")
+
+
+def escribir_red(ruta):
+    """Grilla N×N con calles "a-b" en ambos sentidos, largos variados y todos los giros salvo U y PROHIBIDO."""
+    rng = random.Random(7)
+    entrantes, salientes = {}, {}
+    lineas = ["<net>"]
+    for i in range(N):
+        for j in range(N):
+            for di, dj in ((1, 0), (0, 1)):
+                if i + di >= N or j + dj >= N:
+                    continue
+                a, b = f"{i}_{j}", f"{i + di}_{j + dj}"
+                for desde, hacia in ((a, b), (b, a)):
+                    edge = f"{desde}-{hacia}"
+                    permiso = ' allow="bus"' if edge == BUS else ""
+                    lineas.append(f'  <edge id="{edge}" from="{desde}" to="{hacia}">'
+                                  f'<lane id="{edge}_0" speed="13.89" length="{rng.uniform(80, 300):.1f}"{permiso}/>'
+                                  f'</edge>')
+                    salientes.setdefault(desde, []).append((edge, hacia))
+                    entrantes.setdefault(hacia, []).append((edge, desde))
+    conexiones = set()
+    for nodo, llegan in entrantes.items():
+        for entra, origen in llegan:
+            for sale, destino in salientes[nodo]:
+                if destino != origen and (entra, sale) != PROHIBIDO:
+                    conexiones.add((entra, sale))
+                    lineas.append(f'  <connection from="{entra}" to="{sale}" fromLane="0" toLane="0"/>')
+    lineas.append("</net>")
+    ruta.write_text("\n".join(lineas))
+    return sorted(edge for sale in salientes.values() for edge, _ in sale), conexiones
+
+
+def escribir_viajes(ruta, edges, n=300):
+    rng = random.Random(11)
+    autos = [e for e in edges if e != BUS]
+    lineas = ['<routes>', '  <vType id="auto" vClass="passenger"/>']
+    for k in range(n):
+        origen, destino = rng.sample(autos, 2)
+        via = f' via="{rng.choice(autos)}"' if k % 10 == 0 else ""
+        hijo = f'<param key="k" value="{k}"/>' if k % 7 == 0 else ""
+        lineas.append(f'  <trip id="t{k}" type="auto" depart="{k:.2f}" from="{origen}" to="{destino}"{via}>'
+                      f'{hijo}</trip>')
+    # Destino sin carril para autos: sin ruta, se omite
+    lineas.append(f'  <trip id="t_bus" type="auto" depart="{n}.00" from="{autos[0]}" to="{BUS}"/>')
+    lineas.append("</routes>")
+    ruta.write_text("\n".join(lineas))
+
+
+@pytest.fixture
+def red(tmp_path):
+    ruta_net = tmp_path / "red.net.xml"
+    edges, conexiones = escribir_red(ruta_net)
+    ruta_viajes = tmp_path / "viajes.trips.xml"
+    escribir_viajes(ruta_viajes, edges)
+    return ruta_net, ruta_viajes, conexiones
+
+
+def vehiculos(ruta):
+    return [(v.get("id"), v.find("route").get("edges").split(), v) for v in ET.parse(ruta).getroot().iter("vehicle")]
+
+
+def test_rutas_validas_en_orden_y_sin_la_calle_de_bus(red, tmp_path):
+    ruta_net, ruta_viajes, conexiones = red
+    salida = tmp_path / "rutas.rou.xml"
+    stats = rutear_viajes(ruta_viajes, salida, ruta_net, procesos=1, tam_bloque=40)
+    assert (stats["viajes"], stats["ruteados"], stats["sin_ruta"]) == (301, 300, 1)
+
+    raiz = ET.parse(salida).getroot()
+    assert raiz[0].tag == "vType"
+    viajes = {t.get("id"): t for t in ET.parse(ruta_viajes).getroot().iter("trip")}
+    salidos = vehiculos(salida)
+    assert [v for v, _, _ in salidos] == [f"t{k}" for k in range(300)]
+    for id_viaje, edges, vehiculo in salidos:
+        viaje = viajes[id_viaje]
+        assert edges[0] == viaje.get("from") and edges[-1] == viaje.get("to")
+        assert BUS not in edges
+        assert all(par in conexiones for par in zip(edges, edges[1:]))
+        if viaje.get("via"):
+            assert viaje.get("via") in edges
+        assert "from" not in vehiculo.attrib and vehiculo.get("depart") == viaje.get("depart")
+        assert [p.get("value") for p in vehiculo.iter("param")] == [p.get("value") for p in viaje.iter("param")]
+
+
+def test_varios_procesos_dan_la_misma_salida(red, tmp_path):
+    ruta_net, ruta_viajes, _ = red
+    una, dos = tmp_path / "uno.rou.xml", tmp_path / "dos.rou.xml"
+    rutear_viajes(ruta_viajes, una, ruta_net, procesos=1, tam_bloque=64)
+    rutear_viajes(ruta_viajes, dos, ruta_net, procesos=2, tam_bloque=64)
+    assert una.read_bytes() == dos.read_bytes()
+
+
+def test_arbol_comparte_costos_con_dijkstra(red):
+    ruta_net, _, _ = red
+    grafo = construir_grafo_conexiones(ET.parse(ruta_net).getroot())
+    destinos = [e for e in grafo.nodes if e != "0_0-1_0"]
+    distancias, padres = arbol_caminos(grafo, "0_0-1_0", destinos)
+    for destino in destinos:
+        _camino, costo = dijkstra_ruta_optima(grafo, "0_0-1_0", destino)
+        assert distancias[destino] == pytest.approx(costo)
+        en_arbol = camino_en_arbol(padres, destino)
+        assert sum(grafo[a][b]["peso"] for a, b in zip(en_arbol, en_arbol[1:])) == pytest.approx(costo)
+    assert camino_en_arbol(padres, "inexistente") is None
+
+
+def test_edgedata_desvia_de_la_calle_lenta(red, tmp_path):
+    ruta_net, _, _ = red
+    viajes = tmp_path / "uno.trips.xml"
+    viajes.write_text('<routes><trip id="a" depart="0" from="0_0-1_0" to="3_0-4_0"/></routes>')
+    libre = tmp_path / "libre.rou.xml"
+    rutear_viajes(viajes, libre, ruta_net, procesos=1)
+    (_, edges, _), = vehiculos(libre)
+    lenta = edges[1]
+
+    edgedata = tmp_path / "edgedata.xml"
+    edgedata.write_text(f'<meandata><interval begin="0" end="3600">'
+                        f'<edge id="{lenta}" speed="0.5" sampledSeconds="600"/></interval></meandata>')
+    pesos = pesos_edgedata(edgedata, ruta_net)
+    assert set(pesos) == {lenta}
+    medida = tmp_path / "medida.rou.xml"
+    rutear_viajes(viajes, medida, ruta_net, procesos=1, pesos=pesos)
+    (_, desvio, _), = vehiculos(medida)
+    assert lenta not in desvio and desvio[-1] == "3_0-4_0"
+
+
+def test_cli_exige_salida(red, capsys):
+    _, ruta_viajes, _ = red
+    with pytest.raises(SystemExit) as salida:
+        bulk_router.main([str(ruta_viajes)])
+    assert salida.value.code == 2
+    assert "--salida" in capsys.readouterr().err
@@ -0,0 +1,153 @@
+import math
+import random
+from itertools import combinations
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from fleet.assignment import tiempo_edge_ambulancia
+from fleet.coverage import Cobertura, RedTiempos, _clave, cobertura_red, ubicar_bases
+
+
+def grilla_aleatoria(semilla, n=5):
+    """Grilla n×n "i_j" con calles "a-b" en ambos sentidos de largo aleatorio; faltan algunas."""
+    rng = random.Random(semilla)
+    grafo = nx.DiGraph()
+    for i in range(n):
+        for j in range(n):
+            grafo.add_node(f"{i}_{j}", x=100.0 * i, y=100.0 * j)
+            for di, dj in ((1, 0), (0, 1)):
+                if i + di < n and j + dj < n:
+                    a, b = f"{i}_{j}", f"{i + di}_{j + dj}"
+                    for desde, hacia in ((a, b), (b, a)):
+                        if rng.random() < 0.9:
+                            grafo.add_edge(desde, hacia, peso=rng.uniform(50, 600), edge_id=f"{desde}-{hacia}")
+    return grafo
+
+
+def distancias(grafo):
+    """Tiempo de ambulancia entre todo par de nodos, con networkx."""
+    return dict(nx.all_pairs_dijkstra_path_length(
+        grafo, weight=lambda a, b, datos: tiempo_edge_ambulancia(datos, None)))
+
+
+def tiempo_base(grafo, dist, edge_id, punto):
+    """Terminar la calle de la base y seguir por la ruta más rápida (inf si no llega)."""
+    a, b = next((a, b) for a, b, d in grafo.edges(data=True) if d["edge_id"] == edge_id)
+    return tiempo_edge_ambulancia(grafo[a][b], None) + dist[b].get(punto, math.inf)
+
+
+def cobertura_de(semilla, todos_los_puntos):
+    grafo = grilla_aleatoria(semilla)
+    dist = distancias(grafo)
+    red = RedTiempos(grafo)
+    rng = random.Random(semilla)
+    demanda = list(grafo.nodes) if todos_los_puntos else rng.sample(list(grafo.nodes), 6)
+    candidatos = rng.sample(sorted(red.edges), 10)
+    # Objetivo en la mediana de los tiempos: cobertura parcial
+    todos = [tiempo_base(grafo, dist, c, d) for c in candidatos for d in demanda]
+    tiempo = float(np.median([t for t in todos if math.isfinite(t)]))
+    return grafo, dist, Cobertura(red, demanda, candidatos, tiempo)
+
+
+def valor_fuerza_bruta(grafo, dist, cobertura, seleccion, objetivo):
+    """_clave calculada desde networkx, sin bitsets ni vectores de la cobertura."""
+    cubiertos, suma = 0, 0.0
+    for punto in cobertura.demanda:
+        t = min((tiempo_base(grafo, dist, cobertura.candidatos[k], punto) for k in seleccion), default=math.inf)
+        cubiertos += t <= cobertura.tiempo
+        suma += min(t, cobertura.horizonte)
+    return _clave(objetivo, cubiertos, suma)
+
+
+def mejora(valor, actual, tolerancia=1e-6):
+    """valor > actual en orden lexicográfico, sin contar diferencias de redondeo en las sumas."""
+    if abs(valor[0] - actual[0]) > tolerancia:
+        return valor[0] > actual[0]
+    return valor[1] > actual[1] + tolerancia
+
+
+@pytest.mark.parametrize("semilla", range(6))
+@pytest.mark.parametrize("todos_los_puntos", [False, True])
+def test_pares_y_bits_coinciden_con_networkx(semilla, todos_los_puntos):
+    # Pocos puntos: Dijkstra inverso por punto; todos los nodos: directo por nodo final de candidato
+    grafo, dist, cobertura = cobertura_de(semilla, todos_los_puntos)
+    for k, candidato in enumerate(cobertura.candidatos):
+        esperado = {}
+        for d, punto in enumerate(cobertura.demanda):
+            t = tiempo_base(grafo, dist, candidato, punto)
+            if t <= cobertura.horizonte:
+                esperado[d] = t
+        idx, tiempos = cobertura.cercanos[k]
+        assert idx.tolist() == sorted(esperado)
+        assert tiempos.tolist() == pytest.approx([esperado[d] for d in idx.tolist()])
+        assert cobertura.bits[k] == sum(1 << d for d, t in esperado.items() if t <= cobertura.tiempo)
+
+
+@pytest.mark.parametrize("semilla", range(6))
+def test_mejor_y_segundo_por_punto(semilla):
+    grafo, dist, cobertura = cobertura_de(semilla, False)
+    seleccion = [0, 3, 7, 5]
+    mejor, segundo, asignado = cobertura.vector_tiempos(seleccion)
+    for d, punto in enumerate(cobertura.demanda):
+        tiempos = sorted(min(tiempo_base(grafo, dist, cobertura.candidatos[k], punto), cobertura.horizonte)
+                         for k in seleccion)
+        assert (mejor[d], segundo[d]) == pytest.approx((tiempos[0], tiempos[1]))
+        if asignado[d] >= 0:
+            k = seleccion[asignado[d]]
+            assert tiempo_base(grafo, dist, cobertura.candidatos[k], punto) == pytest.approx(mejor[d])
+        else:
+            assert mejor[d] == cobertura.horizonte
+
+
+@pytest.mark.parametrize("semilla", range(6))
+@pytest.mark.parametrize("objetivo", ["cobertura", "mediana"])
+@pytest.mark.parametrize("p", [1, 2])
+def test_ubicacion_igual_a_busqueda_exhaustiva(semilla, objetivo, p):
+    grafo, dist, cobertura = cobertura_de(semilla, False)
+    seleccion, info = ubicar_bases(cobertura, p, objetivo, presupuesto=5.0)
+    assert len(set(seleccion)) == p and info["completo"]
+    optimo = max(valor_fuerza_bruta(grafo, dist, cobertura, c, objetivo)
+                 for c in combinations(range(len(cobertura)), p))
+    assert valor_fuerza_bruta(grafo, dist, cobertura, seleccion, objetivo) == pytest.approx(optimo)
+
+
+@pytest.mark.parametrize("semilla", range(6))
+@pytest.mark.parametrize("objetivo", ["cobertura", "mediana"])
+def test_ningun_intercambio_mejora_el_resultado(semilla, objetivo):
+    # Lo que la búsqueda local garantiza para cualquier p, verificado sin prefijos/sufijos
+    grafo, dist, cobertura = cobertura_de(semilla, False)
+    seleccion, _ = ubicar_bases(cobertura, 3, objetivo)
+    actual = valor_fuerza_bruta(grafo, dist, cobertura, seleccion, objetivo)
+    for posicion in range(len(seleccion)):
+        for k in set(range(len(cobertura))) - set(seleccion):
+            vecina = seleccion[:posicion] + [k] + seleccion[posicion + 1:]
+            valor = valor_fuerza_bruta(grafo, dist, cobertura, vecina, objetivo)
+            assert not mejora(valor, actual)
+
+
+def test_bases_fijas_y_presupuesto():
+    _grafo, _dist, cobertura = cobertura_de(0, False)
+    seleccion, _ = ubicar_bases(cobertura, 3, fijas=[4])
+    assert seleccion[0] == 4 and len(set(seleccion)) == 3
+    _seleccion, info = ubicar_bases(cobertura, 3, presupuesto=0.0)
+    assert not info["completo"]
+    with pytest.raises(ValueError):
+        ubicar_bases(cobertura, 2, "otro")
+
+
+@pytest.mark.parametrize("semilla", range(4))
+def test_isocrona_multiorigen(semilla):
+    grafo = grilla_aleatoria(semilla)
+    dist = distancias(grafo)
+    red = RedTiempos(grafo)
+    bases = random.Random(semilla).sample(sorted(red.edges), 3)
+    tiempos, base = red.isocrona(bases)
+    for nodo, i in red.indice_nodo.items():
+        por_base = [tiempo_base(grafo, dist, b, nodo) for b in bases]
+        assert tiempos[i] == pytest.approx(min(por_base))
+        if math.isfinite(tiempos[i]):
+            assert por_base[base[i]] == pytest.approx(tiempos[i])
+    limite = float(np.median(tiempos[np.isfinite(tiempos)]))
+    assert cobertura_red(red, bases, limite) == pytest.approx(np.mean(tiempos <= limite))
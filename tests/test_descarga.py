@@ -0,0 +1,74 @@
+"""Medición de la descarga de colas transversales tras liberar un semáforo (traci falso)."""
+from types import SimpleNamespace
+
+import pytest
+
+from traffic_control import controller
+from traffic_control.controller import ControladorCorredorVerde
+
+HALTING = controller.tc.LAST_STEP_VEHICLE_HALTING_NUMBER
+
+
+class TraciCarriles:
+    def __init__(self):
+        self.colas = {}
+        self.suscritos = set()
+        self.lane = SimpleNamespace(
+            subscribe=lambda lane, variables: self.suscritos.add(lane),
+            unsubscribe=lambda lane: self.suscritos.discard(lane),
+            getSubscriptionResults=lambda lane: {HALTING: self.colas.get(lane, 0)},
+        )
+
+
+@pytest.fixture
+def traci(monkeypatch):
+    falso = TraciCarriles()
+    monkeypatch.setattr(controller, "traci", falso)
+    return falso
+
+
+@pytest.fixture
+def ctrl():
+    c = ControladorCorredorVerde()
+    # J1: enlace 0 desde la calle de la ambulancia, enlace 1 desde la transversal "t"
+    c.indice_tls = SimpleNamespace(
+        enlaces_por_edge={"J1": {"e": (0,), "t": (1,)}},
+        datos_edge=lambda edge: {"e": (100, 13.9, ("e_0",), "J1"), "t": (100, 13.9, ("t_0", "t_1"), "J1")}[edge],
+    )
+    return c
+
+
+def test_mide_hasta_que_la_transversal_se_vacia(traci, ctrl):
+    traci.colas = {"t_0": 3, "t_1": 2}
+    ctrl._iniciar_medicion_descarga("J1", {1}, 100.0, 40.0, 10.0)
+    assert traci.suscritos == {"t_0", "t_1"}
+    ctrl._actualizar_mediciones_descarga(105.0)
+    assert ctrl.metricas_descarga == []
+    traci.colas = {}
+    ctrl._actualizar_mediciones_descarga(112.0)
+    assert [(m["t_descarga"], m["cola_inicial"]) for m in ctrl.metricas_descarga] == [(12.0, 5)]
+    assert not traci.suscritos and not ctrl.mediciones_descarga
+
+
+def test_sin_cola_inicial_no_se_mide(traci, ctrl):
+    ctrl._iniciar_medicion_descarga("J1", {1}, 100.0, 40.0, 10.0)
+    ctrl._actualizar_mediciones_descarga(100.1)
+    assert ctrl.metricas_descarga == [] and not ctrl.mediciones_descarga
+    assert not traci.suscritos
+    assert ctrl.resumen_descarga() == {"intersecciones": 0}
+
+
+def test_segunda_liberacion_no_pisa_la_medicion_pendiente(traci, ctrl):
+    traci.colas = {"t_0": 4}
+    ctrl._iniciar_medicion_descarga("J1", {1}, 100.0, 30.0, 0.0)
+    # Otra ambulancia bloquea y libera J1 antes de que la cola se vacíe
+    traci.colas = {"t_0": 6}
+    ctrl._iniciar_medicion_descarga("J1", {1}, 130.0, 20.0, 0.0)
+    traci.colas = {}
+    ctrl._actualizar_mediciones_descarga(139.0)
+
+    assert [(m["t_liberacion"], m["cola_inicial"], m["t_descarga"]) for m in ctrl.metricas_descarga] == [
+        (100.0, 4, None), (130.0, 6, 9.0)]
+    resumen = ctrl.resumen_descarga()
+    assert (resumen["intersecciones"], resumen["t_descarga_medio"]) == (1, 9.0)
+    assert not traci.suscritos
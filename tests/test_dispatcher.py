@@ -0,0 +1,171 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from notifications.dispatcher import DespachadorNotificaciones, Sumidero, SumideroConsola, SumideroWebhook
+from notifications.notifier import Notificador
+
+
+class ServidorStub:
+    """Servidor HTTP local en un puerto efímero que guarda el cuerpo de cada POST."""
+
+    def __init__(self, fallos: int = 0, demora: float = 0.0):
+        self.cuerpos = []
+        self.fallos = fallos
+        self.demora = demora
+        stub = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def do_POST(self):
+                cuerpo = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                time.sleep(stub.demora)
+                stub.cuerpos.append(cuerpo)
+                codigo = 500 if len(stub.cuerpos) <= stub.fallos else 200
+                self.send_response(codigo)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), Manejador)
+        self.url = f"http://127.0.0.1:{self.servidor.server_address[1]}/alertas"
+        self.hilo = threading.Thread(target=self.servidor.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+def alerta(tipo, ambulancia="amb1", **extra):
+    return {"tipo": tipo, "id_ambulancia": ambulancia, **extra}
+
+
+def test_webhook_recibe_lotes_coalescidos():
+    with ServidorStub() as stub:
+        despachador = DespachadorNotificaciones(
+            [SumideroWebhook(stub.url, tam_lote=4, ventana_lote=0.5)], backoff_base=0.01)
+        despachador.iniciar()
+        for alertas in ([alerta("despacho"), alerta("estado", n=1), alerta("estado", n=2),
+                         alerta("estado", ambulancia="amb2", n=3)],
+                        [alerta("accidente"), alerta("fin")]):
+            for a in alertas:
+                despachador.publicar(a)
+            time.sleep(0.05)
+        despachador.detener()
+
+    # Un POST por lote: el primero llega lleno (4) y pierde el estado viejo de amb1
+    assert [[a["tipo"] for a in cuerpo] for cuerpo in stub.cuerpos] == [
+        ["despacho", "estado", "estado"], ["accidente", "fin"]]
+    assert [a.get("n") for a in stub.cuerpos[0][1:]] == [2, 3]
+    st = despachador.estadisticas()["webhook"]
+    assert (st["enviadas"], st["lotes"], st["coalescidas"], st["fallidas"]) == (5, 2, 1, 0)
+
+
+def test_webhook_reintenta_tras_5xx():
+    with ServidorStub(fallos=2) as stub:
+        despachador = DespachadorNotificaciones(
+            [SumideroWebhook(stub.url, tam_lote=10, ventana_lote=0.05)], max_reintentos=3, backoff_base=0.01)
+        despachador.iniciar()
+        despachador.publicar(alerta("despacho"))
+        despachador.detener()
+
+    # Dos respuestas 500 y el mismo lote aceptado al tercer intento
+    assert len(stub.cuerpos) == 3
+    assert stub.cuerpos[0] == stub.cuerpos[2]
+    st = despachador.estadisticas()["webhook"]
+    assert (st["reintentos"], st["enviadas"], st["fallidas"]) == (2, 1, 0)
+
+
+def test_webhook_agota_reintentos():
+    with ServidorStub(fallos=10) as stub:
+        despachador = DespachadorNotificaciones(
+            [SumideroWebhook(stub.url, tam_lote=10, ventana_lote=0.05)], max_reintentos=2, backoff_base=0.01)
+        despachador.iniciar()
+        despachador.publicar(alerta("despacho"))
+        despachador.detener()
+
+    assert len(stub.cuerpos) == 3
+    st = despachador.estadisticas()["webhook"]
+    assert (st["reintentos"], st["enviadas"], st["fallidas"]) == (2, 0, 1)
+
+
+def test_send_alert_no_espera_al_sumidero_lento():
+    with ServidorStub(demora=0.5) as stub:
+        despachador = DespachadorNotificaciones([SumideroWebhook(stub.url, tam_lote=1, ventana_lote=0.0)])
+        despachador.iniciar()
+        notificador = Notificador(despachador=despachador)
+
+        t0 = time.perf_counter()
+        for i in range(20):
+            assert notificador.send_alert({"tipo": "estado", "id_ambulancia": f"amb{i}"})
+        transcurrido = time.perf_counter() - t0
+        pendientes = despachador.estadisticas()["webhook"]["pendientes"]
+        canal = despachador.canales[0]
+        with canal.condicion:
+            canal.cola.clear()  # no esperar a que el servidor lento reciba todo
+        despachador.detener()
+
+    # 20 alertas a 0.5 s por POST serían 10 s si send_alert esperara al envío
+    assert transcurrido < 0.1
+    assert pendientes >= 18
+
+
+class SumideroMemoria(Sumidero):
+    nombre = "memoria"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.lotes = []
+
+    def enviar(self, lote):
+        self.lotes.append(lote)
+
+
+def test_cola_llena_descarta_la_periodica_mas_antigua():
+    # Sin iniciar() nadie consume la cola: cada publicación extra fuerza un descarte
+    despachador = DespachadorNotificaciones([SumideroMemoria()], capacidad=3)
+    for a in (alerta("estado", n=1), alerta("despacho"), alerta("estado", n=2),
+              alerta("accidente"), alerta("fin"), alerta("bot")):
+        despachador.publicar(a)
+
+    cola = [a for _, a in despachador.canales[0].cola]
+    # Primero se van los estados (n=1, luego n=2); sin periódicas, la más antigua
+    assert [a["tipo"] for a in cola] == ["accidente", "fin", "bot"]
+    assert despachador.estadisticas()["memoria"]["descartadas"] == 3
+
+
+def test_detener_vacia_la_cola():
+    sumidero = SumideroMemoria(tam_lote=2, ventana_lote=0.01)
+    despachador = DespachadorNotificaciones([sumidero])
+    for i in range(5):
+        despachador.publicar(alerta("despacho", n=i))
+    despachador.iniciar()
+    despachador.detener()
+    assert [a["n"] for lote in sumidero.lotes for a in lote] == [0, 1, 2, 3, 4]
+    assert all(len(lote) <= 2 for lote in sumidero.lotes)
+
+
+@pytest.mark.parametrize("tipos", [(), ("estado",)])
+def test_coalescer_conserva_el_orden(tipos):
+    pendientes = [(0, alerta("estado", n=1)), (0, alerta("despacho")), (0, alerta("estado", n=2))]
+    lote = DespachadorNotificaciones._coalescer(pendientes, set(tipos))
+    esperado = ["1", "despacho", "2"] if not tipos else ["despacho", "2"]
+    assert [str(a.get("n", a["tipo"])) for _, a in lote] == esperado
+
+
+def test_consola_usa_el_formato_publico_del_notificador(capsys):
+    sumidero = SumideroConsola(Notificador.formatear_alerta, omitir=("estado",))
+    sumidero.enviar([alerta("estado", timestamp="t0"),
+                     alerta("despacho", timestamp="t1", ruta=["a", "b"], velocidad=12.5)])
+    salida = capsys.readouterr().out
+    assert "ESTADO" not in salida
+    assert Notificador.formatear_alerta(alerta("despacho", timestamp="t1", ruta=["a", "b"], velocidad=12.5)) in salida
+    assert "Ruta: a -> b" in salida and "Velocidad: 12.50 m/s" in salida
@@ -0,0 +1,92 @@
+from itertools import permutations
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from fleet.assignment import COSTO_INALCANZABLE, AsignadorFlota, hungaro, tiempo_edge_ambulancia
+from fleet.registry import RegistroFlota, Unidad
+
+
+def costo_fuerza_bruta(costos):
+    n, m = costos.shape
+    return min(sum(costos[i, cols[i]] for i in range(n)) for cols in permutations(range(m), n))
+
+
+@pytest.mark.parametrize("forma", [(1, 1), (3, 3), (4, 6), (6, 6), (5, 8)])
+def test_hungaro_es_optimo(forma):
+    rng = np.random.default_rng(sum(forma))
+    for _ in range(20):
+        costos = rng.integers(1, 100, size=forma).astype(float)
+        asignacion, optima = hungaro(costos)
+        assert optima
+        assert len(set(asignacion.tolist())) == forma[0]
+        assert costos[np.arange(forma[0]), asignacion].sum() == costo_fuerza_bruta(costos)
+
+
+def test_hungaro_sin_presupuesto_completa_voraz():
+    costos = np.random.default_rng(1).random((6, 8))
+    asignacion, optima = hungaro(costos, presupuesto=0.0)
+    assert not optima
+    assert sorted(set(asignacion.tolist())) == sorted(asignacion.tolist())
+    assert (asignacion >= 0).all()
+
+
+def grilla(n=4, largo=100.0):
+    """Grilla n×n de junctions "i_j" con calles en ambos sentidos "a-b"."""
+    grafo = nx.DiGraph()
+    for i in range(n):
+        for j in range(n):
+            for di, dj in ((1, 0), (0, 1)):
+                if i + di < n and j + dj < n:
+                    a, b = f"{i}_{j}", f"{i + di}_{j + dj}"
+                    grafo.add_edge(a, b, peso=largo, edge_id=f"{a}-{b}")
+                    grafo.add_edge(b, a, peso=largo, edge_id=f"{b}-{a}")
+    return grafo
+
+
+def test_tiempos_hacia_coincide_con_dijkstra():
+    grafo = grilla()
+    grafo["1_1"]["2_1"]["peso"] = 500.0
+    asignador = AsignadorFlota(grafo, RegistroFlota())
+    tiempos = asignador.tiempos_hacia("3_3")
+    esperado = nx.single_source_dijkstra_path_length(
+        grafo.reverse(), "3_3", weight=lambda a, b, datos: tiempo_edge_ambulancia(datos, None))
+    for nodo, t in esperado.items():
+        assert np.isclose(tiempos[asignador.indice_nodo[nodo]], t)
+
+
+def test_resolver_asigna_en_lote_y_reintenta_al_liberar():
+    # u1 termina su calle en 1_1 y u2 en 3_2
+    registro = RegistroFlota([Unidad("u1", "b1", "0_1-1_1"), Unidad("u2", "b2", "3_1-3_2")])
+    asignador = AsignadorFlota(grilla(), registro)
+
+    # De a uno, i1 se llevaría a u1 (1 calle contra 2) e i2 a u2 (4 calles): 5 en total.
+    # En lote u2 va a i1 y u1 a i2: 3 calles.
+    asignador.reportar_incidente("i1", "2_1")
+    asignador.reportar_incidente("i2", "0_1")
+    asignaciones = {a["incidente"]: a["unidad"] for a in asignador.resolver(10.0)}
+    assert asignaciones == {"i1": "u2", "i2": "u1"}
+    assert not asignador.pendientes
+    assert [u.estado for u in registro.unidades.values()] == ["en_ruta", "en_ruta"]
+
+    # Sin unidades libres el incidente queda pendiente hasta que se libera una
+    asignador.reportar_incidente("i3", "2_2")
+    assert asignador.resolver(20.0) == []
+    assert registro.ocupadas() and "i3" in asignador.pendientes
+    registro.liberar("u1", 30.0, edge="1_1-2_1")
+    listas = asignador.tomar_asignaciones()
+    assert [(a["incidente"], a["unidad"]) for a in listas] == [("i3", "u1")]
+    assert asignador.tomar_asignaciones() == []
+    assert registro.obtener("u1").estado == "en_ruta"
+
+
+def test_incidente_inalcanzable_queda_pendiente():
+    grafo = grilla()
+    grafo.add_node("aislado")
+    registro = RegistroFlota([Unidad("u1", "b1", "0_0-1_0")])
+    asignador = AsignadorFlota(grafo, registro)
+    asignador.reportar_incidente("i1", "aislado")
+    assert asignador.matriz_tiempos(["aislado"], registro.disponibles())[0, 0] == COSTO_INALCANZABLE
+    assert asignador.resolver() == []
+    assert "i1" in asignador.pendientes and not registro.ocupadas()
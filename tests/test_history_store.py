@@ -0,0 +1,70 @@
+import time
+
+from notifications.history_store import AlmacenHistorial
+
+
+def lote(inicio, n, relleno=1000):
+    return [{"timestamp": 1_700_000_000.0 + i, "tipo": "estado", "id_mision": f"m{i % 3}",
+             "id_ambulancia": "amb1", "n": i, "relleno": "x" * relleno} for i in range(inicio, inicio + n)]
+
+
+def test_rota_por_tamano_contando_el_wal(tmp_path):
+    max_bytes = 64 * 1024
+    almacen = AlmacenHistorial(tmp_path, max_bytes=max_bytes, max_segundos=None)
+    for inicio in range(0, 400, 10):
+        almacen.agregar(lote(inicio, 10))
+        # Antes del checkpoint automático casi todo está en el -wal, no en el .sqlite
+        assert almacen._tamano_segmento() < max_bytes + 64 * 1024
+    almacen.cerrar()
+
+    segmentos = almacen.segmentos()
+    assert len(segmentos) > 4
+    # Cerrado, el WAL vuelve al archivo principal: ningún segmento pasa de un lote sobre el límite
+    assert all(s.stat().st_size < max_bytes + 32 * 1024 for s in segmentos)
+    assert [a["n"] for a in almacen.consultar()] == list(range(400))
+
+
+def test_consulta_filtra_y_respeta_el_limite(tmp_path):
+    almacen = AlmacenHistorial(tmp_path, max_bytes=16 * 1024, max_segundos=None)
+    for inicio in range(0, 60, 6):
+        almacen.agregar(lote(inicio, 6))
+    almacen.cerrar()
+
+    assert [a["n"] for a in almacen.consultar(id_mision="m1", limite=4)] == [1, 4, 7, 10]
+    assert [a["n"] for a in almacen.consultar(desde=1_700_000_050.0)] == list(range(50, 60))
+
+
+def test_max_segmentos_borra_los_mas_viejos(tmp_path):
+    almacen = AlmacenHistorial(tmp_path, max_bytes=16 * 1024, max_segundos=None, max_segmentos=2)
+    for inicio in range(0, 100, 10):
+        almacen.agregar(lote(inicio, 10))
+    almacen.cerrar()
+    assert len(almacen.segmentos()) == 2
+    # Ni .sqlite ni -wal/-shm sueltos de los segmentos borrados
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+def test_alerta_tardia_tras_una_rotacion_se_encuentra_por_rango(tmp_path):
+    # El despachador entrega por lotes y con reintentos: la alerta llega después de abrir el segmento
+    t_alerta = time.time()
+    time.sleep(0.3)
+    almacen = AlmacenHistorial(tmp_path, max_segundos=None)
+    almacen.agregar([{"timestamp": t_alerta, "tipo": "despacho", "id_mision": "m1"}])
+    assert [a["id_mision"] for a in almacen.consultar(id_mision="m1")] == ["m1"]
+    assert len(list(almacen.consultar(hasta=t_alerta + 0.15))) == 1
+    assert list(almacen.consultar(desde=t_alerta + 0.15)) == []
+    almacen.cerrar()
+
+
+def test_segmentos_solapados_se_mezclan_en_orden(tmp_path):
+    almacen = AlmacenHistorial(tmp_path, max_bytes=1, max_segundos=None)   # un segmento por lote
+    almacen.agregar(lote(10, 5))
+    almacen.agregar(lote(0, 5))           # reintento: timestamps anteriores al segmento previo
+    almacen.agregar(lote(15, 5))
+    assert len(almacen.segmentos()) == 3
+    assert [a["n"] for a in almacen.consultar()] == [*range(5), *range(10, 20)]
+    assert [a["n"] for a in almacen.consultar(limite=7)] == [0, 1, 2, 3, 4, 10, 11]
+    # Límites de segmento: desde/hasta por el ts de las filas, no por la apertura
+    assert [a["n"] for a in almacen.consultar(desde=1_700_000_004.0, hasta=1_700_000_011.0)] == [4, 10]
+    assert [a["n"] for a in almacen.consultar(desde=1_700_000_015.0)] == list(range(15, 20))
+    almacen.cerrar()
@@ -0,0 +1,74 @@
+import random
+
+import networkx as nx
+import pytest
+
+from routing.chains import comprimir_cadenas
+from routing.pareto import elegir_ruta, frente_pareto
+
+
+def grafo_aleatorio(semilla, n=9, p=0.3):
+    rng = random.Random(semilla)
+    grafo = nx.gnp_random_graph(n, p, seed=semilla, directed=True)
+    grafo = nx.relabel_nodes(grafo, {i: f"n{i}" for i in grafo})
+    for a, b in grafo.edges:
+        grafo[a][b].update(peso=float(rng.randint(1, 20)), edge_id=f"{a}-{b}")
+    semaforos = {datos["edge_id"] for _, _, datos in grafo.edges(data=True) if rng.random() < 0.4}
+    return grafo, semaforos
+
+
+def frente_fuerza_bruta(grafo, inicio, destino, semaforos):
+    valores = set()
+    for ruta in nx.all_simple_paths(grafo, inicio, destino):
+        aristas = [grafo[a][b] for a, b in zip(ruta, ruta[1:])]
+        valores.add((sum(d["peso"] for d in aristas), sum(d["edge_id"] in semaforos for d in aristas)))
+    return sorted(v for v in valores
+                  if not any(o != v and o[0] <= v[0] and o[1] <= v[1] for o in valores))
+
+
+@pytest.mark.parametrize("semilla", range(40))
+def test_frente_coincide_con_enumeracion_de_caminos(semilla):
+    grafo, semaforos = grafo_aleatorio(semilla)
+    for inicio in list(grafo)[:3]:
+        for destino in list(grafo)[-3:]:
+            if inicio == destino:
+                continue
+            frente, completo = frente_pareto(grafo, inicio, destino, semaforos)
+            assert completo
+            assert [(r["costo"], r["semaforos"]) for r in frente] == frente_fuerza_bruta(
+                grafo, inicio, destino, semaforos)
+            for r in frente:
+                assert r["ruta"][0] == inicio and r["ruta"][-1] == destino
+                assert r["edges"] == [grafo[a][b]["edge_id"] for a, b in zip(r["ruta"], r["ruta"][1:])]
+                assert r["semaforos"] == sum(e in semaforos for e in r["edges"])
+
+
+def test_frente_igual_sobre_cadenas_comprimidas():
+    # Escalera: dos caminos paralelos partidos en tramos de grado 2, con cruces cada 4 tramos
+    grafo = nx.DiGraph()
+    semaforos = set()
+    for lado, peso in (("a", 10.0), ("b", 12.0)):
+        for k in range(12):
+            u, v = f"{lado}{k}", f"{lado}{k + 1}"
+            grafo.add_edge(u, v, peso=peso, edge_id=f"{u}-{v}")
+            if lado == "a" and k % 3 == 0:
+                semaforos.add(f"{u}-{v}")
+    for k in range(0, 13, 4):
+        for u, v in ((f"a{k}", f"b{k}"), (f"b{k}", f"a{k}")):
+            grafo.add_edge(u, v, peso=5.0, edge_id=f"{u}-{v}")
+
+    comprimido = comprimir_cadenas(grafo, ["a0", "a12"])
+    assert comprimido.number_of_nodes() < grafo.number_of_nodes()
+    original, _ = frente_pareto(grafo, "a0", "a12", semaforos)
+    sobre_cadenas, _ = frente_pareto(comprimido, "a0", "a12", semaforos)
+    assert [(r["costo"], r["semaforos"], r["edges"]) for r in sobre_cadenas] == [
+        (r["costo"], r["semaforos"], r["edges"]) for r in original]
+    assert len(original) > 1
+
+
+def test_elegir_ruta_por_tolerancia():
+    frente = [{"costo": 100.0, "semaforos": 5}, {"costo": 108.0, "semaforos": 2}, {"costo": 130.0, "semaforos": 0}]
+    assert elegir_ruta(frente, 0.0)["costo"] == 100.0
+    assert elegir_ruta(frente, 0.1)["semaforos"] == 2
+    assert elegir_ruta(frente, 0.5)["semaforos"] == 0
+    assert elegir_ruta([], 0.1) is None
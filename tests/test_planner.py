@@ -0,0 +1,95 @@
+"""Plan de onda verde sembrado desde la secuencia de la tabla de despacho (traci falso)."""
+import xml.etree.ElementTree as ET
+from types import SimpleNamespace
+
+import pytest
+
+from traffic_control import controller, planner
+from traffic_control.controller import ControladorCorredorVerde
+from traffic_control.planner import PlanificadorOndaVerde
+from traffic_control.tls_index import construir_indice_semaforos
+
+RUTA = ["a", "b", "c", "d"]
+
+
+def indice_en_linea():
+    """Cuatro calles de 1 km en línea; J1 y J3 semaforizados, J2 sin semáforo."""
+    lineas = ["<net>"]
+    for k, edge in enumerate(RUTA):
+        lineas.append(f'<edge id="{edge}" from="J{k}" to="J{k + 1}">'
+                      f'<lane id="{edge}_0" speed="13.89" length="1000"/></edge>')
+    for tls in ("J1", "J3"):
+        lineas.append(f'<tlLogic id="{tls}" programID="0"><phase duration="30" state="rG"/></tlLogic>')
+    lineas.append('<connection from="a" to="b" tl="J1" linkIndex="0"/>')
+    lineas.append('<connection from="x" to="b" tl="J1" linkIndex="1"/>')
+    lineas.append('<connection from="b" to="c"/>')
+    lineas.append('<connection from="c" to="d" tl="J3" linkIndex="0"/>')
+    lineas.append('<connection from="y" to="d" tl="J3" linkIndex="1"/>')
+    lineas.append("</net>")
+    return construir_indice_semaforos(ET.fromstring("".join(lineas)))
+
+
+class TraciFalso:
+    def __init__(self):
+        self.contextos = set()
+        self.posicion = {}
+        self.junction = SimpleNamespace(
+            subscribeContext=lambda j, dominio, radio, variables: self.contextos.add(j),
+            unsubscribeContext=lambda j, dominio, radio: self.contextos.discard(j),
+            getContextSubscriptionResults=lambda j: {},
+        )
+        self.vehicle = SimpleNamespace(subscribe=lambda v, variables: None,
+                                       getSubscriptionResults=lambda v: self.posicion)
+        self.edge = SimpleNamespace(getLastStepMeanSpeed=lambda e: 13.89)
+
+
+@pytest.fixture
+def traci(monkeypatch):
+    falso = TraciFalso()
+    monkeypatch.setattr(planner, "traci", falso)
+    monkeypatch.setattr(controller, "traci", falso)
+    return falso
+
+
+def secuencia_tabla(indice):
+    """Como la guarda routing.dispatch_table: (tls_id, indice_ruta, desfase desde la salida)."""
+    return [(e.tls_id, e.indice_ruta, round(e.eta_min, 2))
+            for e in PlanificadorOndaVerde(indice).secuencia_tls(RUTA)]
+
+
+def test_sembrar_corre_los_desfases_al_despacho(traci):
+    indice = indice_en_linea()
+    semaforos = secuencia_tabla(indice)
+    assert [(t, i) for t, i, _ in semaforos] == [("J1", 0), ("J3", 2)]
+
+    sembrado = PlanificadorOndaVerde(indice).sembrar(RUTA, semaforos, 500.0)
+    en_vivo = PlanificadorOndaVerde(indice).planificar(RUTA, 500.0, usar_velocidad_viva=False)
+    assert [(e.tls_id, e.edge_aproximacion, e.junction, e.estado) for e in sembrado] == [
+        (e.tls_id, e.edge_aproximacion, e.junction, e.estado) for e in en_vivo]
+    for s, v in zip(sembrado, en_vivo):
+        assert s.eta_min == pytest.approx(v.eta_min, abs=0.01)
+        assert s.t_activacion == pytest.approx(v.t_activacion, abs=0.01)
+    assert traci.contextos == {"J1", "J3"}
+
+
+def test_sembrar_ignora_entradas_que_no_calzan_con_la_ruta(traci):
+    indice = indice_en_linea()
+    sembrado = PlanificadorOndaVerde(indice).sembrar(RUTA, [("J1", 0, 48.0), ("J1", 2, 96.0), ("J9", 7, 1.0)], 0.0)
+    assert [(e.tls_id, e.indice_ruta) for e in sembrado] == [("J1", 0)]
+
+
+def test_plan_de_la_tabla_se_refina_en_el_primer_paso(traci):
+    indice = indice_en_linea()
+    ctrl = ControladorCorredorVerde(indice)
+    assert ctrl.programar_onda_verde(RUTA, "amb1", 500.0, semaforos=secuencia_tabla(indice))
+    entradas = ctrl.planes["amb1"]["entradas"]
+    assert [e.eta_max for e in entradas] == [e.eta_min for e in entradas]
+
+    # La ambulancia arrancó lenta: el refinamiento corre las ETA con su velocidad real
+    traci.posicion = {controller.tc.VAR_ROUTE_INDEX: 0, controller.tc.VAR_LANEPOSITION: 100.0,
+                      controller.tc.VAR_SPEED: 5.0}
+    assert ctrl.ejecutar_plan("amb1", 500.0)
+    assert ctrl.planes["amb1"]["t_refinado"] == 500.0
+    assert entradas[0].eta_min == pytest.approx(500.0 + 900.0 / (13.89 * 1.5))
+    assert entradas[0].eta_max == pytest.approx(500.0 + 900.0 / 5.0)
+    assert not any(e.activo for e in entradas)
@@ -0,0 +1,80 @@
+import json
+import socket
+import time
+
+import notifications.position_stream as position_stream
+from notifications.position_stream import ServidorPosiciones, _Suscriptor
+
+
+def muestra(i, n=2000):
+    return {f"amb{k}": {"x": i + k, "y": 2.0 * i, "velocidad": 10.0, "edge": f"e{i}"} for k in range(n)}
+
+
+def test_desborde_conserva_el_final_de_la_linea_empezada(monkeypatch):
+    monkeypatch.setattr(position_stream, "MAX_BUFER_CLIENTE", 64)
+    servidor = ServidorPosiciones()
+    suscriptor = _Suscriptor(None, 1.0)
+    suscriptor.enviado = {}
+    suscriptor.salida = bytearray(b'2,"y":3}}}\n' + b'{"tipo":"delta"}\n' * 10)
+    suscriptor.parcial = True
+
+    servidor._encolar(suscriptor, {"amb1": {"x": 1.0}}, 5.0, 7)
+
+    resto, snapshot, vacio = bytes(suscriptor.salida).split(b"\n")
+    assert resto == b'2,"y":3}}}' and vacio == b""
+    assert json.loads(snapshot)["tipo"] == "snapshot"
+    assert servidor.stats["resincronizaciones"] == 1
+
+    # En el borde de una línea se descarta todo lo pendiente
+    suscriptor.salida = bytearray(b'{"tipo":"delta"}\n' * 10)
+    suscriptor.parcial = False
+    servidor._encolar(suscriptor, {"amb1": {"x": 2.0}}, 6.0, 8)
+    assert json.loads(suscriptor.salida)["tipo"] == "snapshot"
+
+
+def test_cliente_lento_solo_recibe_lineas_json_completas(monkeypatch):
+    monkeypatch.setattr(position_stream, "MAX_BUFER_CLIENTE", 16 * 1024)
+    servidor = ServidorPosiciones(puerto=0, hz_defecto=100.0, hz_max=100.0)
+    assert servidor.iniciar()
+    cliente = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    cliente.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    cliente.connect(("127.0.0.1", servidor.puerto))
+    try:
+        # El cliente no lee mientras se publica: el búfer del servidor se desborda
+        i = 0
+        limite = time.monotonic() + 10
+        while servidor.stats["resincronizaciones"] < 3 and time.monotonic() < limite:
+            servidor.publicar(float(i), muestra(i))
+            i += 1
+            time.sleep(0.002)
+        assert servidor.stats["resincronizaciones"] >= 3
+
+        servidor.publicar(float(i), {})
+        cliente.settimeout(0.5)
+        datos = b""
+        try:
+            while True:
+                bloque = cliente.recv(65536)
+                if not bloque:
+                    break
+                datos += bloque
+        except socket.timeout:
+            pass
+    finally:
+        cliente.close()
+        servidor.detener()
+
+    lineas = datos.split(b"\n")
+    assert lineas[-1] == b""
+    mensajes = [json.loads(linea) for linea in lineas[:-1]]
+    assert sum(m["tipo"] == "snapshot" for m in mensajes) >= 2
+    assert [m["seq"] for m in mensajes] == sorted(m["seq"] for m in mensajes)
+
+
+def test_puerto_ocupado_no_inicia_y_libera_el_socket():
+    primero = ServidorPosiciones(host="127.0.0.1", puerto=0)
+    assert primero.iniciar()
+    segundo = ServidorPosiciones(host="127.0.0.1", puerto=primero.puerto)
+    assert not segundo.iniciar()
+    assert segundo._servidor is None
+    primero.detener()
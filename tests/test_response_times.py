@@ -0,0 +1,92 @@
+import json
+
+import numpy as np
+
+from analysis.response_times import (
+    UMBRAL_DETENIDO, cargar_corridas, detenido_por_tls, metricas_por_corrida, reporte
+)
+from analysis.trajectory import RegistroTrayectoria
+
+RUTA = ["e0", "e1", "e2", "e3"]
+# Giro controlado al final de cada calle (e3 es la última: sin giro)
+SEMAFOROS = {("e0", "e1"): "J1", ("e1", "e2"): "J2", ("e2", "e3"): "J1"}
+
+
+class IndiceFalso:
+    def datos_edge(self, edge_id):
+        return (100.0, 10.0, (f"{edge_id}_0",), "j")
+
+    def tls_en_movimiento(self, edge_entrada, edge_salida):
+        return SEMAFOROS.get((edge_entrada, edge_salida))
+
+
+def simular(rng, n_muestras=120):
+    """Muestras a 1 s con paradas al azar; el índice de ruta avanza en cuatro tramos."""
+    indice = np.minimum(np.arange(n_muestras) * len(RUTA) // n_muestras, len(RUTA) - 1)
+    velocidad = np.where(rng.random(n_muestras) < 0.3, 0.0, rng.uniform(1, 12, n_muestras))
+    return indice, velocidad
+
+
+def guardar_corridas(tmp_path, n=6, sin_columna_tls=()):
+    rng = np.random.default_rng(3)
+    esperado = []
+    with open(tmp_path / "misiones.jsonl", "w") as f:
+        for k in range(n):
+            registro = RegistroTrayectoria(RUTA, IndiceFalso())
+            indice, velocidad = simular(rng)
+            for t, (i, v) in enumerate(zip(indice, velocidad)):
+                registro.registrar(float(t), {"x": 0.0, "y": 0.0, "velocidad": float(v),
+                                              "indice_ruta": int(i), "pos_en_edge": 0.0})
+            ruta_npz = tmp_path / f"m{k}.npz"
+            assert registro.guardar(ruta_npz)
+            if k in sin_columna_tls:
+                # Formato anterior, sin la columna "tls"
+                with np.load(ruta_npz) as datos:
+                    columnas = {c: datos[c] for c in datos.files if c != "tls"}
+                np.savez_compressed(ruta_npz, **columnas)
+
+            # Fuerza bruta: dt hasta la siguiente muestra, la última no suma
+            por_tls = {"J1": 0.0, "J2": 0.0}
+            for t in range(len(indice) - 1):
+                tls = SEMAFOROS.get(tuple(RUTA[indice[t]:indice[t] + 2]))
+                if tls and velocidad[t] < UMBRAL_DETENIDO:
+                    por_tls[tls] += 1.0
+            esperado.append(por_tls)
+            f.write(json.dumps({"id_mision": f"m{k}", "t_accidente": 0.0, "t_despacho": 10.0,
+                                "t_llegada": 130.0, "estrategia": "CORTA" if k % 2 else "LARGA",
+                                "trayectoria": ruta_npz.name}) + "\n")
+    return esperado
+
+
+def test_detenido_por_tls_coincide_con_fuerza_bruta(tmp_path):
+    esperado = guardar_corridas(tmp_path)
+    corridas = cargar_corridas(tmp_path / "misiones.jsonl", factor_velocidad=1.0)
+
+    matriz, en_ruta = detenido_por_tls(corridas)
+    assert list(corridas.tls_ids) == ["J1", "J2"]
+    assert en_ruta.all()
+    np.testing.assert_allclose(matriz, [[e["J1"], e["J2"]] for e in esperado])
+    # El desglose suma el total en semáforos
+    np.testing.assert_allclose(matriz.sum(axis=1), metricas_por_corrida(corridas)["t_detenido_tls"])
+
+
+def test_reporte_lista_semaforos_por_escenario(tmp_path):
+    esperado = guardar_corridas(tmp_path)
+    resultado = reporte(cargar_corridas(tmp_path / "misiones.jsonl", factor_velocidad=1.0))
+
+    larga = resultado["escenarios"]["LARGA|onda|reactivo"]["t_detenido_por_tls"]
+    medias = {tls: np.mean([e[tls] for e in esperado[0::2]]) for tls in ("J1", "J2")}
+    assert set(larga) == {"J1", "J2"}
+    assert list(larga) == sorted(medias, key=lambda tls: -medias[tls])
+    for tls, m in larga.items():
+        assert np.isclose(m["media"], medias[tls]) and m["corridas"] == 3
+
+
+def test_trayectorias_sin_columna_tls_solo_suman_al_total(tmp_path):
+    esperado = guardar_corridas(tmp_path, n=2, sin_columna_tls=(0,))
+    corridas = cargar_corridas(tmp_path / "misiones.jsonl", factor_velocidad=1.0)
+
+    matriz, en_ruta = detenido_por_tls(corridas)
+    assert not en_ruta[0].any() and en_ruta[1].all()
+    np.testing.assert_allclose(matriz[1], [esperado[1]["J1"], esperado[1]["J2"]])
+    assert np.isclose(metricas_por_corrida(corridas)["t_detenido_tls"][0], sum(esperado[0].values()))
@@ -0,0 +1,85 @@
+import math
+import random
+
+import pytest
+
+from config import SUMO_NET
+from routing.spatial_index import IndiceEspacial, cargar_indice_espacial
+
+
+def junction_fuerza_bruta(indice, x, y):
+    return min(math.hypot(jx - x, jy - y) for _jid, jx, jy in indice.junctions)
+
+
+def edge_fuerza_bruta(indice, x, y):
+    mejor = float("inf")
+    for _e, _l, x1, y1, x2, y2, _o in indice.segmentos:
+        dx, dy = x2 - x1, y2 - y1
+        largo2 = dx * dx + dy * dy
+        t = 0.0 if largo2 == 0 else max(0.0, min(1.0, ((x - x1) * dx + (y - y1) * dy) / largo2))
+        mejor = min(mejor, math.hypot(x1 + t * dx - x, y1 + t * dy - y))
+    return mejor
+
+
+def indice_aleatorio(tam_celda, semilla=3):
+    """Junctions dispersos y carriles quebrados, algunos más largos que varias celdas."""
+    rng = random.Random(semilla)
+    indice = IndiceEspacial(tam_celda)
+    for i in range(60):
+        indice.agregar_junction(f"j{i}", rng.uniform(0, 1000), rng.uniform(0, 600))
+    for i in range(80):
+        forma = [(rng.uniform(0, 1000), rng.uniform(0, 600))]
+        for _ in range(rng.randint(1, 4)):
+            x, y = forma[-1]
+            forma.append((x + rng.uniform(-150, 150), y + rng.uniform(-150, 150)))
+        indice.agregar_lane(f"e{i}", f"e{i}_0", forma)
+    return indice
+
+
+@pytest.mark.parametrize("tam_celda", [7.0, 50.0, 400.0])
+def test_coincide_con_fuerza_bruta(tam_celda):
+    indice = indice_aleatorio(tam_celda)
+    rng = random.Random(5)
+    # Incluye puntos fuera de la red, donde los anillos arrancan lejos de toda celda ocupada
+    for _ in range(500):
+        x, y = rng.uniform(-300, 1300), rng.uniform(-300, 900)
+        _jid, dj = indice.junction_cercano(x, y)
+        assert dj == pytest.approx(junction_fuerza_bruta(indice, x, y))
+        edge_id, lane_id, offset, de = indice.edge_cercano(x, y)
+        assert de == pytest.approx(edge_fuerza_bruta(indice, x, y))
+        assert lane_id == f"{edge_id}_0" and offset >= 0
+
+
+def test_offset_se_mide_desde_el_inicio_del_carril():
+    indice = IndiceEspacial(10.0)
+    indice.agregar_lane("e", "e_0", [(0, 0), (100, 0), (100, 50)])
+    assert indice.edge_cercano(40, 3) == ("e", "e_0", pytest.approx(40.0), pytest.approx(3.0))
+    assert indice.edge_cercano(104, 30) == ("e", "e_0", pytest.approx(130.0), pytest.approx(4.0))
+
+
+def test_indice_vacio():
+    indice = IndiceEspacial()
+    assert indice.junction_cercano(0, 0) is None and indice.edge_cercano(0, 0) is None
+    assert indice.buscar_lote([(1, 2)])[0]["edge"] is None
+
+
+def test_buscar_lote_equivale_a_consultas_sueltas():
+    indice = indice_aleatorio(50.0)
+    puntos = [(random.Random(i).uniform(0, 1000), random.Random(-i).uniform(0, 600)) for i in range(50)]
+    for punto, r in zip(puntos, indice.buscar_lote(puntos)):
+        junction, edge = indice.junction_cercano(*punto), indice.edge_cercano(*punto)
+        assert r["coordenadas"] == punto
+        assert (r["junction"], r["dist_junction"]) == junction
+        assert (r["edge"], r["lane"], r["offset"], r["dist_edge"]) == edge
+
+
+@pytest.mark.skipif(not SUMO_NET.exists(), reason="sin la red del proyecto")
+def test_red_del_proyecto():
+    indice = cargar_indice_espacial(SUMO_NET)
+    xs = [x for _j, x, _y in indice.junctions]
+    ys = [y for _j, _x, y in indice.junctions]
+    rng = random.Random(9)
+    for _ in range(200):
+        x, y = rng.uniform(min(xs), max(xs)), rng.uniform(min(ys), max(ys))
+        assert indice.junction_cercano(x, y)[1] == pytest.approx(junction_fuerza_bruta(indice, x, y))
+        assert indice.edge_cercano(x, y)[3] == pytest.approx(edge_fuerza_bruta(indice, x, y))
@@ -0,0 +1,135 @@
+"""EspejoSemaforos y el camino reactivo del controlador contra un traci falso."""
+from types import SimpleNamespace
+
+import pytest
+
+from traffic_control import controller, tls_state
+from traffic_control.controller import ControladorCorredorVerde
+from traffic_control.tls_state import ESTADO, FASE, PROGRAMA, EspejoSemaforos
+
+
+class TraciFalso:
+    """Registra cada escritura de semáforo; la ambulancia ve el semáforo que diga `siguiente`."""
+
+    def __init__(self):
+        self.escrituras = []
+        self.siguiente = []
+        self.trafficlight = SimpleNamespace(
+            setRedYellowGreenState=lambda tls, estado: self.escrituras.append(("estado", tls, estado)),
+            setProgram=lambda tls, programa: self.escrituras.append(("programa", tls, programa)),
+            setPhase=lambda tls, fase: self.escrituras.append(("fase", tls, fase)),
+            setPhaseDuration=lambda tls, d: self.escrituras.append(("duracion", tls, d)),
+            getProgram=lambda tls: "0",
+            # J1: enlace 0 desde el carril de la ambulancia, enlace 1 desde la transversal
+            getControlledLinks=lambda tls: [[("e_in_0", "e_out_0", "")], [("t_in_0", "e_out_0", "")]],
+        )
+        self.vehicle = SimpleNamespace(getNextTLS=lambda v: self.siguiente, getLaneID=lambda v: "e_in_0")
+        self.lane = SimpleNamespace(getEdgeID=lambda lane: lane.rsplit("_", 1)[0])
+        self.simulation = SimpleNamespace(getTime=lambda: 0.0)
+
+
+@pytest.fixture
+def traci(monkeypatch):
+    falso = TraciFalso()
+    monkeypatch.setattr(tls_state, "traci", falso)
+    monkeypatch.setattr(controller, "traci", falso)
+    return falso
+
+
+def test_fijar_estado_descarta_lo_ya_pendiente_o_escrito(traci):
+    espejo = EspejoSemaforos()
+    assert espejo.fijar_estado("J1", "Gr", 0.0, "a")
+    assert not espejo.fijar_estado("J1", "Gr", 0.0, "a")     # ya pendiente
+    assert espejo.aplicar() == 1
+    assert not espejo.fijar_estado("J1", "Gr", 1.0, "a")     # SUMO ya lo tiene
+    assert espejo.aplicar() == 0
+    assert traci.escrituras == [("estado", "J1", "Gr")]
+    assert (espejo.escrituras, espejo.evitadas) == (1, 2)
+
+
+def test_aplicar_escribe_una_vez_por_semaforo_y_paso(traci):
+    espejo = EspejoSemaforos()
+    espejo.fijar_estado("J1", "Gr", 0.0, "a")
+    espejo.fijar_estado("J1", "rG", 0.0, "b")
+    espejo.fijar_estado("J2", "G", 0.0, "a")
+    assert espejo.aplicar() == 2
+    assert traci.escrituras == [("estado", "J1", "rG"), ("estado", "J2", "G")]
+    # Vuelve al estado escrito dentro del mismo paso: no hay round trip
+    espejo.fijar_estado("J1", "Gr", 1.0, "a")
+    espejo.fijar_estado("J1", "rG", 1.0, "b")
+    assert espejo.aplicar() == 0
+    assert espejo.estado("J1") == "rG"
+
+
+def test_programa_y_fase_descartan_el_estado_pendiente(traci):
+    espejo = EspejoSemaforos()
+    espejo.fijar_estado("J1", "Gr", 0.0, "a")
+    espejo.aplicar()
+    espejo.fijar_estado("J1", "yr", 1.0, "ambar")
+    assert espejo.fijar_programa("J1", "0", 1.0, "liberacion")
+    assert espejo.aplicar() == 0
+    assert espejo.estado("J1") is None
+
+    # Tras devolver el programa, el mismo estado forzado se vuelve a escribir
+    espejo.fijar_estado("J1", "Gr", 2.0, "a")
+    assert espejo.fijar_fase("J1", 2, 2.0, "compensacion", duracion=30)
+    assert espejo.aplicar() == 0
+    assert traci.escrituras[1:] == [("programa", "J1", "0"), ("fase", "J1", 2), ("duracion", "J1", 30)]
+    assert espejo.escrituras == 4
+
+
+def test_auditoria_en_orden_acotada_y_filtrable(traci):
+    espejo = EspejoSemaforos(max_auditoria=3)
+    espejo.fijar_estado("J1", "Gr", 0.0, "reclamo")
+    espejo.aplicar()
+    espejo.fijar_estado("J1", "yr", 5.0, "ambar")
+    espejo.aplicar()
+    espejo.fijar_programa("J1", "0", 8.0, "liberacion")
+    espejo.fijar_fase("J1", 1, 8.0, "compensacion", duracion=12)
+    assert espejo.registros() == [
+        [5.0, "J1", ESTADO, "yr", "ambar"],
+        [8.0, "J1", PROGRAMA, "0", "liberacion"],
+        [8.0, "J1", FASE, "1:12", "compensacion"],
+    ]
+    assert [r[1] for r in espejo.registros(desde=8.0)] == ["J1", "J1"]
+
+
+def test_resumen(traci):
+    espejo = EspejoSemaforos()
+    assert espejo.resumen()["fraccion_evitada"] == 0.0
+    for t in range(4):
+        espejo.fijar_estado("J1", "Gr", float(t), "a")
+        espejo.aplicar()
+    assert espejo.resumen() == {"escrituras": 1, "evitadas": 3, "fraccion_evitada": 0.75, "semaforos": 1}
+
+
+def test_override_reactivo_sostenido_escribe_una_vez(traci):
+    ctrl = ControladorCorredorVerde()          # sin índice: camino reactivo lento
+    traci.siguiente = [("J1", 0, 30.0, "r")]
+    for t in range(50):
+        assert ctrl.execute_green_wave([], "amb1", float(t))
+        ctrl.aplicar_reclamos(float(t))
+        ctrl.procesar_liberaciones(float(t))
+    assert traci.escrituras == [("estado", "J1", "Gr")]
+
+    # Cruza: ámbar, y al terminar el ámbar vuelve el programa original
+    traci.siguiente = []
+    for t in range(50, 55):
+        ctrl.execute_green_wave([], "amb1", float(t))
+        ctrl.aplicar_reclamos(float(t))
+        ctrl.procesar_liberaciones(float(t))
+    # Otra pasada por el mismo semáforo se fuerza de nuevo
+    traci.siguiente = [("J1", 0, 20.0, "r")]
+    ctrl.execute_green_wave([], "amb1", 60.0)
+    ctrl.aplicar_reclamos(60.0)
+
+    assert [r[2:] for r in ctrl.espejo.registros()] == [
+        [ESTADO, "Gr", "reactivo"],
+        [ESTADO, "yr", "ambar"],
+        [PROGRAMA, "0", "liberacion"],
+        [ESTADO, "Gr", "reactivo"],
+    ]
+    t_ambar, t_programa = (r[0] for r in ctrl.espejo.registros()[1:3])
+    # El ámbar dura DURACION_AMARILLO_LIBERACION, contado desde el último paso procesado
+    assert t_ambar == 50.0 and t_programa - t_ambar == pytest.approx(controller.DURACION_AMARILLO_LIBERACION, abs=1.0)
+    assert ctrl.espejo.resumen()["evitadas"] == 49
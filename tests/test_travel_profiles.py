@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from analysis.edgedata import COLUMNAS, DatosEdge
+from routing.travel_profiles import SEGUNDOS_DIA, cargar_perfiles, crear_perfiles
+
+LIBRES = {"a": 10.0, "b": 20.0, "c": 40.0}
+HORA = 3600
+
+
+def datos_edge(filas, edges=("a", "b", "c", "z")):
+    """DatosEdge sintético: filas (edge, inicio, muestreo, tiempo_viaje), intervalos de 5 min."""
+    edges = list(edges)
+    columnas = {atributo: np.zeros(len(filas)) for atributo in COLUMNAS.values()}
+    columnas["inicio"] = np.array([f[1] for f in filas], dtype=float)
+    columnas["fin"] = columnas["inicio"] + 300
+    columnas["edge"] = np.array([edges.index(f[0]) for f in filas], dtype=np.int64)
+    columnas["muestreo"] = np.array([f[2] for f in filas], dtype=float)
+    columnas["tiempo_viaje"] = np.array([f[3] for f in filas], dtype=float)
+    return DatosEdge(edges, columnas)
+
+
+@pytest.fixture
+def perfiles(tmp_path):
+    return crear_perfiles(tmp_path / "perfiles", LIBRES, tam_franja=HORA, alfa=0.25)
+
+
+def test_primera_corrida_promedia_por_muestreo_sin_suavizar(perfiles):
+    assert perfiles.n_franjas == 24 and np.isnan(perfiles.tiempos).all()
+    celdas = perfiles.actualizar(datos_edge([
+        ("a", 0, 100, 10.0), ("a", 1800, 300, 30.0),    # misma franja: (100·10 + 300·30) / 400
+        ("a", HORA, 50, 12.0),
+        ("b", 0, 0, 99.0),                              # sin muestreo
+        ("b", 600, 10, 0.0),                            # sin tiempo de viaje
+        ("z", 0, 100, 5.0),                             # calle fuera del perfil
+    ]))
+    assert celdas == 2 and perfiles.corridas == 1
+    assert perfiles.tiempos[0, 0] == pytest.approx(25.0)
+    assert perfiles.tiempos[0, 1] == pytest.approx(12.0)
+    assert np.isnan(perfiles.tiempos).sum() == 3 * 24 - 2
+
+
+def test_corridas_siguientes_suavizan_y_respetan_el_desfase(perfiles):
+    perfiles.actualizar(datos_edge([("a", 0, 100, 20.0)]))
+    perfiles.actualizar(datos_edge([("a", 0, 100, 40.0), ("b", 0, 100, 8.0)]))
+    assert perfiles.tiempos[0, 0] == pytest.approx(0.25 * 40.0 + 0.75 * 20.0)
+    assert perfiles.tiempos[1, 0] == pytest.approx(8.0)     # primera observación de b
+
+    # Simulación que empieza a las 23:00: el intervalo de la hora 1 cae en la franja 0 del día siguiente
+    perfiles.actualizar(datos_edge([("c", 0, 100, 50.0), ("c", HORA, 100, 60.0)]), desfase=23 * HORA)
+    assert perfiles.tiempos[2, 23] == pytest.approx(50.0)
+    assert perfiles.tiempos[2, 0] == pytest.approx(60.0)
+    assert perfiles.corridas == 3
+
+
+def test_consultas_caen_a_flujo_libre_sin_datos(perfiles):
+    perfiles.actualizar(datos_edge([("a", 8 * HORA, 100, 30.0)]))
+    assert perfiles.tiempo("a", 8 * HORA + 10) == pytest.approx(30.0)
+    assert perfiles.tiempo("a", 9 * HORA) == 10.0
+    assert perfiles.tiempo("a", SEGUNDOS_DIA + 8 * HORA) == pytest.approx(30.0)
+    assert perfiles.tiempo("z", 0) is None
+
+    indices = np.array([0, 0, 1, 2])
+    t = np.array([8 * HORA, 7 * HORA, 8 * HORA, 8 * HORA])
+    assert perfiles.consultar(indices, t).tolist() == pytest.approx([30.0, 10.0, 20.0, 40.0])
+    # Cada calle se evalúa a la hora de llegada: se sale a las 7:59:50 y a se alcanza en la franja 8
+    assert perfiles.eta_ruta(["b", "a"], 8 * HORA - 10) == pytest.approx(20.0 + 30.0)
+    assert perfiles.eta_ruta(["b", "a"], 7 * HORA) == pytest.approx(20.0 + 10.0)
+
+    costo = perfiles.funcion_costo(8 * HORA)
+    assert costo({"edge_id": "a"}, 0.0) == pytest.approx(30.0)
+    assert costo({"edge_id": "z", "peso": 7}, 0.0) == 7
+
+
+def test_memmap_persiste_entre_aperturas(perfiles, tmp_path):
+    directorio = tmp_path / "perfiles"
+    perfiles.actualizar(datos_edge([("b", 0, 100, 30.0)]))
+    assert perfiles.guardar()
+
+    lectura = cargar_perfiles(directorio)
+    assert isinstance(lectura.tiempos, np.memmap) and lectura.corridas == 1
+    assert (lectura.tam_franja, lectura.alfa, lectura.edges) == (HORA, 0.25, list(LIBRES))
+    assert lectura.tiempo("b", 0) == pytest.approx(30.0)
+    with pytest.raises(ValueError):
+        lectura.actualizar(datos_edge([("b", 0, 100, 10.0)]))
+
+    escritura = cargar_perfiles(directorio, escritura=True)
+    escritura.actualizar(datos_edge([("b", 0, 100, 10.0)]))
+    escritura.guardar()
+    assert cargar_perfiles(directorio).tiempo("b", 0) == pytest.approx(0.25 * 10.0 + 0.75 * 30.0)
+    assert cargar_perfiles(tmp_path / "no_existe") is None
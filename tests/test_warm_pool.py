@@ -0,0 +1,205 @@
+"""PoolSumo contra un TraCI falso: sin binario de SUMO, Popen y traci.connect se sustituyen."""
+import os
+import threading
+import time
+
+import pytest
+
+from sumo_interface import warm_pool
+from sumo_interface.warm_pool import PoolSumo
+
+
+class SimulacionFalsa:
+    def __init__(self, conexion):
+        self.conexion = conexion
+        self.cargados = []
+
+    def getTime(self):
+        if self.conexion.caida:
+            raise ConnectionError("sin respuesta")
+        return self.conexion.t
+
+    def saveState(self, ruta):
+        with open(ruta, "w") as f:
+            f.write(f"<snapshot time='{self.conexion.t}'/>")
+
+    def loadState(self, ruta):
+        assert os.path.exists(ruta)
+        self.cargados.append(ruta)
+        self.conexion.t = 0.0
+
+
+class ConexionFalsa:
+    def __init__(self, sumo, puerto):
+        self.sumo = sumo
+        self.puerto = puerto
+        self.t = 0.0
+        self.caida = False
+        self.cerrada = False
+        self.simulation = SimulacionFalsa(self)
+
+    def simulationStep(self, t=0.0):
+        self.t = t
+
+    def close(self):
+        self.cerrada = True
+        with self.sumo.candado:
+            self.sumo.abiertos.discard(self.puerto)
+
+
+class ProcesoFalso:
+    def __init__(self, puerto):
+        self.puerto = puerto
+
+    def poll(self):
+        return None
+
+    def kill(self):
+        pass
+
+
+class SumoFalso:
+    """Hace de SO y de binario: un puerto abierto por un proceso vivo no se puede volver a abrir."""
+
+    def __init__(self):
+        self.candado = threading.Lock()
+        self.abiertos = set()
+        self.puertos = []
+        self.conexiones = []
+
+    def popen(self, comando, **kwargs):
+        puerto = int(comando[comando.index("--remote-port") + 1])
+        with self.candado:
+            if puerto in self.abiertos:
+                raise OSError(f"puerto {puerto} en uso")
+            self.abiertos.add(puerto)
+            self.puertos.append(puerto)
+        return ProcesoFalso(puerto)
+
+    def connect(self, puerto, proc=None, label="default"):
+        conexion = ConexionFalsa(self, puerto)
+        self.conexiones.append(conexion)
+        return conexion
+
+
+@pytest.fixture
+def sumo(monkeypatch):
+    falso = SumoFalso()
+    monkeypatch.setattr(warm_pool.subprocess, "Popen", falso.popen)
+    monkeypatch.setattr(warm_pool.traci, "connect", falso.connect)
+    return falso
+
+
+def esperar(condicion, limite=2.0):
+    t0 = time.monotonic()
+    while not condicion():
+        assert time.monotonic() - t0 < limite
+        time.sleep(0.01)
+
+
+def test_arrendar_restaura_el_snapshot(sumo):
+    pool = PoolSumo(tamano=1, intervalo_salud=0)
+    assert pool.iniciar()
+    for _ in range(3):
+        with pool.arrendar(timeout=1) as conexion:
+            conexion.simulationStep(300)
+        assert conexion.simulation.getTime() == 0.0
+    assert len(sumo.conexiones) == 1
+    assert conexion.simulation.cargados == [os.path.join(pool._directorio, "pool_0.xml")] * 3
+    assert pool.stats["restauradas"] == 3
+    pool.detener()
+
+
+def test_recicla_tras_max_usos_o_una_excepcion(sumo):
+    pool = PoolSumo(tamano=1, max_usos=2, intervalo_salud=0)
+    pool.iniciar()
+    with pool.arrendar(timeout=1) as primera:
+        pass
+    with pool.arrendar(timeout=1) as conexion:
+        assert conexion is primera
+    assert primera.cerrada                      # segundo uso = max_usos
+    with pytest.raises(RuntimeError):
+        with pool.arrendar(timeout=1) as segunda:
+            assert segunda is not primera
+            raise RuntimeError("consulta rota")
+    assert segunda.cerrada
+    with pool.arrendar(timeout=1) as tercera:
+        assert tercera is not None and not tercera.cerrada
+    assert pool.stats["recicladas"] == 2
+    pool.detener()
+
+
+def test_un_reciclado_no_reutiliza_el_puerto_de_una_instancia_viva(sumo):
+    pool = PoolSumo(tamano=2, max_usos=1, intervalo_salud=0)
+    pool.iniciar()
+    with pool.arrendar(timeout=1) as larga:
+        # Con puertos rotativos la instancia 16 chocaba con la que sigue arrendada
+        for _ in range(40):
+            with pool.arrendar(timeout=2) as corta:
+                assert corta is not None and corta.puerto != larga.puerto
+    # 2 iniciales + 40 cortas + la larga, todas recicladas (max_usos=1)
+    esperar(lambda: pool.stats["arranques"] == 43)
+    assert pool.stats["fallidas"] == 0
+    pool.detener()
+
+
+def test_descarta_un_puerto_libre_ya_reservado(sumo, monkeypatch):
+    propuestos = iter([9101, 9101, 9101, 9102])
+    monkeypatch.setattr(warm_pool, "getFreeSocketPort", lambda: next(propuestos))
+    pool = PoolSumo(tamano=2, intervalo_salud=0)
+    pool.iniciar()
+    assert sorted(sumo.puertos) == [9101, 9102]
+    assert pool.stats["fallidas"] == 0
+    pool.detener()
+
+
+def test_detener_cierra_todo_y_borra_los_snapshots(sumo):
+    pool = PoolSumo(tamano=2, max_usos=1, intervalo_salud=0)
+    pool.iniciar()
+    assert len(os.listdir(pool._directorio)) == 2
+    with pool.arrendar(timeout=1):
+        pass
+    # detener() con el reciclado aún en marcha: no debe quedar ningún sumo abierto
+    pool.detener()
+    assert all(c.cerrada for c in sumo.conexiones)
+    assert not sumo.abiertos
+    assert not os.path.exists(pool._directorio)
+
+
+def test_chequeo_de_salud_recicla_la_ociosa_que_no_responde(sumo):
+    pool = PoolSumo(tamano=1, intervalo_salud=0.02)
+    pool.iniciar()
+    sumo.conexiones[0].caida = True
+    esperar(lambda: pool.stats["arranques"] == 2)
+    with pool.arrendar(timeout=1) as conexion:
+        assert conexion is sumo.conexiones[1]
+    assert sumo.conexiones[0].cerrada
+    pool.detener()
+
+
+def test_chequeo_de_salud_repone_un_arranque_fallido(sumo, monkeypatch):
+    popen = sumo.popen
+    fallos = [OSError("sumo no arrancó")]
+
+    def popen_falla_una_vez(comando, **kwargs):
+        if fallos:
+            raise fallos.pop()
+        return popen(comando, **kwargs)
+
+    monkeypatch.setattr(warm_pool.subprocess, "Popen", popen_falla_una_vez)
+    pool = PoolSumo(tamano=2, intervalo_salud=0.02)
+    assert pool.iniciar()
+    assert pool.stats["fallidas"] == 1
+    esperar(lambda: pool._ociosas.qsize() == 2)
+    assert (pool.stats["arranques"], len(pool._todas)) == (2, 2)
+    pool.detener()
+    assert not sumo.abiertos
+
+
+def test_sin_ociosas_arrendar_entrega_none_al_vencer_el_timeout(sumo):
+    pool = PoolSumo(tamano=1, intervalo_salud=0)
+    pool.iniciar()
+    with pool.arrendar(timeout=1):
+        with pool.arrendar(timeout=0.05) as ninguna:
+            assert ninguna is None
+    pool.detener()
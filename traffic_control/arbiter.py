@@ -0,0 +1,163 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+
+from traffic_control.tls_index import IndiceSemaforos
+
+# Severidad textual del incidente -> prioridad (trigger_accident.py escribe "tipo=grave")
+SEVERIDADES = {"baja": 1, "leve": 1, "media": 2, "alta": 3, "grave": 3}
+
+
+@dataclass
+class Reclamo:
+    """Petición de verde de un vehículo de emergencia sobre un semáforo."""
+    vehiculo: str
+    tls_id: str
+    edge_aproximacion: str
+    eta: float
+    severidad: int
+    mascara: int              # Bits de los enlaces que salen del acceso
+
+
+class ArbitroPreempcion:
+    """
+    Árbitro de preempción por semáforo. Mantiene los reclamos activos de todos
+    los vehículos de emergencia, concede verde a la vez a los movimientos
+    compatibles y deja en espera los que chocan, por severidad y luego ETA.
+    Todo se resuelve en memoria: por paso hay como mucho una escritura TraCI
+    por semáforo cuyo estado concedido haya cambiado, con independencia del
+    número de reclamos.
+    """
+
+    def __init__(self, indice_tls: IndiceSemaforos):
+        self.indice = indice_tls
+        # tls_id -> {vehiculo: Reclamo}
+        self.reclamos: Dict[str, Dict[str, Reclamo]] = {}
+        # tls_id -> vehículos con verde concedido
+        self.concedidos: Dict[str, Set[str]] = {}
+        # tls_id -> estado concedido pendiente de escribir
+        self.estados: Dict[str, str] = {}
+        self.pendientes: Set[str] = set()
+        self._mascaras_fases: Dict[str, List[int]] = {}
+
+    def reclamar(self, vehiculo: str, tls_id: str, edge_aproximacion: str,
+                 eta: float, severidad: int = 1) -> bool:
+        """
+        Registra (o actualiza) el reclamo de un vehículo. Retorna False si el
+        acceso no existe en el índice.
+        """
+        indices = self.indice.enlaces_por_edge.get(tls_id, {}).get(edge_aproximacion)
+        if not indices:
+            return False
+
+        por_tls = self.reclamos.setdefault(tls_id, {})
+        previo = por_tls.get(vehiculo)
+        if previo and previo.edge_aproximacion == edge_aproximacion and previo.severidad == severidad:
+            # Solo cambia la ETA: reordenar solo si hay cola de espera
+            previo.eta = eta
+            if len(por_tls) > len(self.concedidos.get(tls_id, ())):
+                self.pendientes.add(tls_id)
+            return True
+
+        mascara = 0
+        for i in indices:
+            mascara |= 1 << i
+        por_tls[vehiculo] = Reclamo(vehiculo, tls_id, edge_aproximacion, eta, severidad, mascara)
+        self.pendientes.add(tls_id)
+        return True
+
+    def liberar(self, vehiculo: str, tls_id: str) -> bool:
+        """
+        Retira el reclamo de un vehículo. Retorna True si el semáforo quedó sin
+        reclamos (el controlador debe devolverlo a su programa).
+        """
+        por_tls = self.reclamos.get(tls_id)
+        if not por_tls or vehiculo not in por_tls:
+            return False
+        del por_tls[vehiculo]
+        if por_tls:
+            self.pendientes.add(tls_id)
+            return False
+
+        del self.reclamos[tls_id]
+        self.concedidos.pop(tls_id, None)
+        self.estados.pop(tls_id, None)
+        self.pendientes.discard(tls_id)
+        return True
+
+    def liberar_vehiculo(self, vehiculo: str) -> List[str]:
+        """Retira todos los reclamos de un vehículo. Retorna los semáforos que quedaron libres."""
+        libres = []
+        for tls_id in [t for t, r in self.reclamos.items() if vehiculo in r]:
+            if self.liberar(vehiculo, tls_id):
+                libres.append(tls_id)
+        return libres
+
+    def tiene_reclamos(self, tls_id: str) -> bool:
+        return bool(self.reclamos.get(tls_id))
+
+    def en_espera(self, tls_id: str) -> List[str]:
+        """Vehículos con reclamo en tls_id que aún no tienen verde."""
+        concedidos = self.concedidos.get(tls_id, set())
+        return [v for v in self.reclamos.get(tls_id, {}) if v not in concedidos]
+
+    def resolver(self) -> Dict[str, str]:
+        """
+        Recalcula los semáforos con cambios y retorna {tls_id: estado} solo para
+        aquellos cuyo estado concedido es distinto al anterior.
+        """
+        cambios = {}
+        for tls_id in self.pendientes:
+            por_tls = self.reclamos.get(tls_id)
+            if not por_tls:
+                continue
+            orden = sorted(por_tls.values(), key=lambda r: (-r.severidad, r.eta))
+
+            mascara = 0
+            concedidos = set()
+            for reclamo in orden:
+                union = mascara | reclamo.mascara
+                if not concedidos or self._compatible(tls_id, union, mascara, reclamo.mascara):
+                    mascara = union
+                    concedidos.add(reclamo.vehiculo)
+
+            self.concedidos[tls_id] = concedidos
+            estado = self._estado_desde_mascara(tls_id, mascara)
+            if estado != self.estados.get(tls_id):
+                self.estados[tls_id] = estado
+                cambios[tls_id] = estado
+        self.pendientes.clear()
+        return cambios
+
+    def _compatible(self, tls_id: str, union: int, mascara_a: int, mascara_b: int) -> bool:
+        """
+        Un movimiento es compatible con lo ya concedido si no añade enlaces nuevos
+        (mismo acceso) o si alguna fase del programa original tiene la unión en verde.
+        """
+        if mascara_b & ~mascara_a == 0:
+            return True
+        for mascara_fase in self._fases(tls_id):
+            if union & mascara_fase == union:
+                return True
+        return False
+
+    def _fases(self, tls_id: str) -> List[int]:
+        mascaras = self._mascaras_fases.get(tls_id)
+        if mascaras is None:
+            mascaras = []
+            for _duracion, estado in self.indice.fases.get(tls_id, []):
+                m = 0
+                for i, c in enumerate(estado):
+                    if c in "Gg":
+                        m |= 1 << i
+                mascaras.append(m)
+            self._mascaras_fases[tls_id] = mascaras
+        return mascaras
+
+    def _estado_desde_mascara(self, tls_id: str, mascara: int) -> str:
+        n = self.indice.num_enlaces.get(tls_id, 0)
+        return "".join("G" if mascara >> i & 1 else "r" for i in range(n))
+
+
+def severidad_numerica(severidad: Optional[str]) -> int:
+    """Traduce la severidad textual del evento ("baja"/"leve", "media", "alta"/"grave") a prioridad."""
+    return SEVERIDADES.get(str(severidad).lower(), 1) if severidad else 1
@@ -1,15 +1,60 @@
 import traceback
 import traci
-import time
+import traci.constants as tc
 from typing import List, Optional
-from config import ACTIVAR_PRIORIDAD_SEMAFORICA, DISTANCIA_DETECCION_SEMAFORO
+from config import (
+    ACTIVAR_PRIORIDAD_SEMAFORICA, DISTANCIA_DETECCION_SEMAFORO,
+    ACTIVAR_PLAN_PREDICTIVO, PERIODO_REFINAMIENTO_PLAN,
+    DURACION_AMARILLO_LIBERACION, FACTOR_COMPENSACION, MAX_COMPENSACION, MAX_MEDICION_DESCARGA
+)
+from traffic_control.tls_index import IndiceSemaforos
+from traffic_control.planner import PlanificadorOndaVerde, EntradaPlan
+from traffic_control.arbiter import ArbitroPreempcion
+from traffic_control.tls_state import EspejoSemaforos
+from sumo_interface.scheduler import PlanificadorEventos
+from structured_log import obtener_logger
+
+log = obtener_logger("CONTROLLER")
+log_corredor = obtener_logger("CORREDOR_VERDE")
+
+# Variables suscritas por ambulancia: las usa el plan y el stream de posiciones.
+# Una nueva llamada a subscribe() reemplaza la lista, por eso es una sola.
+VARIABLES_AMBULANCIA = [tc.VAR_ROUTE_INDEX, tc.VAR_LANEPOSITION, tc.VAR_SPEED,
+                        tc.VAR_POSITION, tc.VAR_ROAD_ID]
 
 class ControladorCorredorVerde:
-    def __init__(self):
+    def __init__(self, indice_tls: Optional[IndiceSemaforos] = None,
+                 eventos: Optional[PlanificadorEventos] = None):
+        self.indice_tls = indice_tls
         self.tls_original_programs = {}
         self.tls_modificados = set()
         self.semaforos_activos = {}
+        # Temporizadores en tiempo de simulación. Si no se comparte un planificador,
+        # el controlador usa uno propio y lo procesa en procesar_liberaciones().
+        self.eventos_propios = eventos is None
+        self.eventos = eventos if eventos is not None else PlanificadorEventos()
+        # tls_id -> id del evento programado para ese semáforo
         self.tiempos_cambio = {}
+        self.planificador = PlanificadorOndaVerde(indice_tls) if indice_tls is not None else None
+        # Árbitro compartido por todos los vehículos de emergencia (un reclamo por vehículo y semáforo)
+        self.arbitro = ArbitroPreempcion(indice_tls) if indice_tls is not None else None
+        # ambulancia_id -> {"ruta": [...], "entradas": [EntradaPlan], "t_refinado": float, "severidad": int}
+        self.planes = {}
+        # Ambulancias con suscripción VARIABLES_AMBULANCIA activa
+        self.vehiculos_suscritos = set()
+        # tls_id -> tiempo de simulación en que se forzó el estado
+        self.t_inicio_forzado = {}
+        # tls_id -> {"t_inicio": float, "bloqueo": float, "estado_forzado": str}
+        self.liberaciones = {}
+        # tls_id -> {"lanes": [...], "t_liberacion": float, "cola_inicial": int}
+        self.mediciones_descarga = {}
+        self.metricas_descarga = []
+        # Ventanas [t_inicio, t_fin] en que cada semáforo estuvo fuera de su programa
+        self.ventanas_override = []
+        # ambulancia_id -> último semáforo forzado en modo reactivo
+        self.ultimo_tls_reactivo = {}
+        # Estado escrito en cada semáforo: evita escrituras repetidas y audita los overrides
+        self.espejo = EspejoSemaforos()
     
     def initialize_green_wave(self, ruta: List[str]) -> bool:
         """
@@ -21,26 +66,29 @@ class ControladorCorredorVerde:
     def set_warning_phase(self, tls_id: str, duracion: int = 8) -> bool:
         """
         Establece fase de advertencia: ámbar parpadeante durante 8 segundos.
+        Al vencer (en tiempo de simulación) se devuelve el programa en curso.
         """
         try:
-            print(f"[CORREDOR_VERDE] Fase de advertencia para {tls_id}: {duracion}s ámbar")
+            log_corredor.info("Fase de advertencia para %s: %ss ámbar", tls_id, duracion)
             program_id = traci.trafficlight.getProgram(tls_id)
             current_phase = traci.trafficlight.getPhase(tls_id)
             
-            traci.trafficlight.setPhase(tls_id, (current_phase + 1) % traci.trafficlight.getCompleteRedYellowGreenDefinition(tls_id)[0].phases.__len__())
+            self.espejo.fijar_fase(tls_id, (current_phase + 1) % traci.trafficlight.getCompleteRedYellowGreenDefinition(tls_id)[0].phases.__len__(),
+                                   None, "advertencia")
             
-            self.tiempos_cambio[tls_id] = time.time() + duracion
+            self._programar_tls(tls_id, duracion, self._evento_restaurar_programa, program_id)
             return True
         except Exception as e:
-            print(f"[CORREDOR_VERDE] Error en fase de advertencia: {e}")
+            log_corredor.error("Error en fase de advertencia: %s", e)
             return False
     
     def set_priority_green(self, tls_id: str, duracion: int = 25) -> bool:
         """
         Establece verde prioritario absoluto para la ambulancia.
+        Al vencer se inicia la transición segura.
         """
         try:
-            print(f"[CORREDOR_VERDE] Verde prioritario para {tls_id}: {duracion}s")
+            log_corredor.info("Verde prioritario para %s: %ss", tls_id, duracion)
             
             fases = traci.trafficlight.getCompleteRedYellowGreenDefinition(tls_id)
             if not fases:
@@ -52,49 +100,385 @@ class ControladorCorredorVerde:
                     fase_verde = i
                     break
             
-            traci.trafficlight.setPhase(tls_id, fase_verde)
-            self.tiempos_cambio[tls_id] = time.time() + duracion
+            self.espejo.fijar_fase(tls_id, fase_verde, None, "verde_prioritario")
+            self._programar_tls(tls_id, duracion, self._evento_fin_verde)
             
             return True
         except Exception as e:
-            print(f"[CORREDOR_VERDE] Error en verde prioritario: {e}")
+            log_corredor.error("Error en verde prioritario: %s", e)
             return False
     
-    def safe_transition(self, tls_id: str, tiempo_transicion: int = 5) -> bool:
+    def safe_transition(self, tls_id: str, t_actual: float,
+                        tiempo_transicion: float = DURACION_AMARILLO_LIBERACION) -> bool:
         """
-        Realiza transición segura desde verde prioritario a estado normal.
+        Realiza transición segura desde verde prioritario a estado normal:
+        los verdes forzados pasan a ámbar y el programa se devuelve al terminar.
         """
         try:
-            print(f"[CORREDOR_VERDE] Transición segura para {tls_id}: {tiempo_transicion}s")
-            
-            programa = traci.trafficlight.getProgram(tls_id)
-            traci.trafficlight.setProgram(tls_id, programa)
-            
-            self.tiempos_cambio[tls_id] = time.time() + tiempo_transicion
+            estado_forzado = self.semaforos_activos.get(tls_id)
+            if estado_forzado:
+                amarillo = estado_forzado.replace("G", "y").replace("g", "y")
+                self.espejo.fijar_estado(tls_id, amarillo, t_actual, "ambar")
+                self.semaforos_activos[tls_id] = amarillo
+
+            bloqueo = t_actual - self.t_inicio_forzado.get(tls_id, t_actual)
+            self.liberaciones[tls_id] = {
+                "t_inicio": self.t_inicio_forzado.get(tls_id, t_actual),
+                "bloqueo": bloqueo,
+                "estado_forzado": estado_forzado,
+            }
+            self._programar_tls(tls_id, tiempo_transicion if estado_forzado else 0,
+                                self._evento_fin_amarillo)
             return True
         except Exception as e:
-            print(f"[CORREDOR_VERDE] Error en transición segura: {e}")
+            log_corredor.error("Error en transición segura: %s", e)
             return False
     
-    def post_recovery_balance(self, tls_id: str) -> bool:
+    def post_recovery_balance(self, tls_id: str, t_actual: float) -> bool:
         """
-        Recupera el balance de verdes secundarios después de la ambulancia.
+        Recupera el balance de verdes secundarios después de la ambulancia:
+        devuelve el programa original y arranca en la fase que más favorece a los
+        accesos que quedaron en rojo, alargada en proporción al bloqueo sufrido.
         """
+        liberacion = self.liberaciones.pop(tls_id, {})
+        self._cancelar_evento_tls(tls_id)
         try:
-            print(f"[CORREDOR_VERDE] Recuperación y balance para {tls_id}")
-            
-            programa = traci.trafficlight.getProgram(tls_id)
-            traci.trafficlight.setProgram(tls_id, programa)
-            
+            prog_original = self.tls_original_programs.pop(tls_id, "0")
+            self.espejo.fijar_programa(tls_id, prog_original, t_actual, "liberacion")
+            self.semaforos_activos.pop(tls_id, None)
+            self.t_inicio_forzado.pop(tls_id, None)
+            self.ventanas_override.append({
+                "tls_id": tls_id,
+                "t_inicio": liberacion.get("t_inicio", t_actual),
+                "t_fin": t_actual,
+            })
+
+            estado_forzado = liberacion.get("estado_forzado") or ""
+            relegados = {i for i, c in enumerate(estado_forzado) if c not in "Gg"}
+            compensacion = min(liberacion.get("bloqueo", 0.0) * FACTOR_COMPENSACION, MAX_COMPENSACION)
+
+            fases = self.indice_tls.fases.get(tls_id) if self.indice_tls is not None else None
+            if fases and relegados:
+                mejor_fase, mejor_puntaje = 0, -1
+                for i, (_duracion, estado) in enumerate(fases):
+                    puntaje = sum(1 for j in relegados if j < len(estado) and estado[j] in "Gg")
+                    if puntaje > mejor_puntaje:
+                        mejor_fase, mejor_puntaje = i, puntaje
+                if mejor_puntaje > 0:
+                    self.espejo.fijar_fase(tls_id, mejor_fase, t_actual, "compensacion",
+                                           fases[mejor_fase][0] + compensacion)
+
+            log_corredor.info("%s liberado tras %.0fs de bloqueo (compensación +%.0fs)",
+                              tls_id, liberacion.get('bloqueo', 0.0), compensacion)
+            self._iniciar_medicion_descarga(tls_id, relegados, t_actual, liberacion.get("bloqueo", 0.0),
+                                            compensacion)
             return True
         except Exception as e:
-            print(f"[CORREDOR_VERDE] Error en recuperación: {e}")
+            log_corredor.error("Error en recuperación: %s", e)
             return False
+
+    def liberar_semaforo(self, tls_id: str, t_actual: float) -> None:
+        """
+        Libera un semáforo en cuanto la ambulancia cruza su intersección.
+        No hace nada si otro vehículo de emergencia mantiene un reclamo sobre él.
+        """
+        if tls_id not in self.tls_original_programs or tls_id in self.liberaciones:
+            return
+        if self.arbitro is not None and self.arbitro.tiene_reclamos(tls_id):
+            return
+        self.safe_transition(tls_id, t_actual)
+
+    def procesar_liberaciones(self, t_actual: float) -> None:
+        """
+        Avanza la medición de descarga de colas (y los temporizadores si el
+        planificador es propio). Se llama en cada paso, haya o no ambulancia activa.
+        """
+        if self.eventos_propios:
+            self.eventos.procesar(t_actual)
+
+        if self.mediciones_descarga:
+            self._actualizar_mediciones_descarga(t_actual)
+
+    def _programar_tls(self, tls_id: str, retraso: float, callback, *args) -> None:
+        """Programa el próximo cambio de un semáforo, reemplazando el pendiente si lo hay."""
+        self._cancelar_evento_tls(tls_id)
+        self.tiempos_cambio[tls_id] = self.eventos.programar_en(retraso, callback, tls_id, *args)
+
+    def _cancelar_evento_tls(self, tls_id: str) -> None:
+        self.eventos.cancelar(self.tiempos_cambio.pop(tls_id, None))
+
+    def _evento_fin_amarillo(self, t_actual: float, tls_id: str) -> None:
+        self.tiempos_cambio.pop(tls_id, None)
+        self.post_recovery_balance(tls_id, t_actual)
+
+    def _evento_fin_verde(self, t_actual: float, tls_id: str) -> None:
+        self.tiempos_cambio.pop(tls_id, None)
+        self.safe_transition(tls_id, t_actual)
+
+    def _evento_restaurar_programa(self, t_actual: float, tls_id: str, program_id: str) -> None:
+        self.tiempos_cambio.pop(tls_id, None)
+        self.espejo.fijar_programa(tls_id, program_id, t_actual, "advertencia")
+
+    def resumen_descarga(self) -> dict:
+        """Resumen de las descargas de cola medidas tras cada liberación."""
+        medidas = [m for m in self.metricas_descarga if m["t_descarga"] is not None]
+        if not medidas:
+            return {"intersecciones": 0}
+        return {
+            "intersecciones": len(medidas),
+            "t_descarga_medio": sum(m["t_descarga"] for m in medidas) / len(medidas),
+            "t_descarga_max": max(m["t_descarga"] for m in medidas),
+            "vehiculos_descargados": sum(m["cola_inicial"] for m in medidas),
+            "bloqueo_total": sum(m["bloqueo"] for m in medidas),
+        }
+
+    def _iniciar_medicion_descarga(self, tls_id, relegados, t_actual, bloqueo, compensacion) -> None:
+        """
+        Suscribe los carriles de los accesos relegados para medir cuánto tardan
+        sus colas en vaciarse desde la liberación.
+        """
+        if self.indice_tls is None or not relegados:
+            return
+        lanes = []
+        for edge_id, indices in self.indice_tls.enlaces_por_edge.get(tls_id, {}).items():
+            if any(i in relegados for i in indices):
+                datos = self.indice_tls.datos_edge(edge_id)
+                if datos:
+                    lanes.extend(datos[2])
+        if not lanes:
+            return
+
+        # Una liberación anterior del mismo semáforo aún en medición (otra
+        # ambulancia lo volvió a bloquear): se cierra sin descarga, no se pisa
+        pendiente = self.mediciones_descarga.get(tls_id)
+        if pendiente is not None:
+            self._cerrar_medicion_descarga(tls_id, pendiente, None)
+
+        cola_inicial = 0
+        for lane in lanes:
+            try:
+                traci.lane.subscribe(lane, [tc.LAST_STEP_VEHICLE_HALTING_NUMBER])
+                cola_inicial += traci.lane.getSubscriptionResults(lane).get(tc.LAST_STEP_VEHICLE_HALTING_NUMBER, 0)
+            except Exception:
+                continue
+        if cola_inicial == 0:
+            # Sin cola transversal no hay descarga que medir (daría t ≈ 0)
+            self._desuscribir_lanes(lanes)
+            return
+
+        self.mediciones_descarga[tls_id] = {
+            "lanes": lanes,
+            "t_liberacion": t_actual,
+            "cola_inicial": cola_inicial,
+            "bloqueo": bloqueo,
+            "compensacion": compensacion,
+        }
+
+    def _actualizar_mediciones_descarga(self, t_actual: float) -> None:
+        for tls_id, medicion in list(self.mediciones_descarga.items()):
+            cola = 0
+            for lane in medicion["lanes"]:
+                try:
+                    cola += traci.lane.getSubscriptionResults(lane).get(tc.LAST_STEP_VEHICLE_HALTING_NUMBER, 0)
+                except Exception:
+                    continue
+
+            transcurrido = t_actual - medicion["t_liberacion"]
+            if cola == 0 or transcurrido >= MAX_MEDICION_DESCARGA:
+                t_descarga = transcurrido if cola == 0 else None
+                self._cerrar_medicion_descarga(tls_id, medicion, t_descarga)
+                if t_descarga is not None:
+                    log_corredor.info("Cola transversal de %s descargada en %.1fs (%s vehículos)",
+                                      tls_id, t_descarga, medicion['cola_inicial'])
+
+    def _cerrar_medicion_descarga(self, tls_id: str, medicion: dict, t_descarga: Optional[float]) -> None:
+        """Registra la medición (t_descarga None = no se descargó) y suelta sus carriles."""
+        self.metricas_descarga.append({
+            "tls_id": tls_id,
+            "t_liberacion": medicion["t_liberacion"],
+            "cola_inicial": medicion["cola_inicial"],
+            "bloqueo": medicion["bloqueo"],
+            "compensacion": medicion["compensacion"],
+            "t_descarga": t_descarga,
+        })
+        self._desuscribir_lanes(medicion["lanes"])
+        del self.mediciones_descarga[tls_id]
+
+    @staticmethod
+    def _desuscribir_lanes(lanes: List[str]) -> None:
+        for lane in lanes:
+            try: traci.lane.unsubscribe(lane)
+            except: pass
     
-    def execute_green_wave(self, ruta: List[str], ambulancia_id: str) -> bool:
+    def programar_onda_verde(self, ruta: List[str], ambulancia_id: str, t_actual: float,
+                             severidad: int = 1, semaforos: Optional[list] = None) -> bool:
+        """
+        Precalcula el plan de preempción de toda la ruta en el momento del despacho.
+        Con `semaforos` (secuencia de la tabla de despacho) el plan se siembra de
+        ella sin recorrer la ruta, y se refina en el primer paso de ejecutar_plan.
+        Retorna False si no hay plan (el llamador usará la detección reactiva).
+        """
+        if not ACTIVAR_PRIORIDAD_SEMAFORICA or not ACTIVAR_PLAN_PREDICTIVO or self.planificador is None:
+            return False
+
+        try:
+            if semaforos:
+                entradas = self.planificador.sembrar(ruta, semaforos, t_actual)
+                t_refinado = t_actual - PERIODO_REFINAMIENTO_PLAN
+            else:
+                entradas = self.planificador.planificar(ruta, t_actual)
+                t_refinado = t_actual
+            if not entradas:
+                return False
+
+            self.planes[ambulancia_id] = {
+                "ruta": list(ruta),
+                "entradas": entradas,
+                "t_refinado": t_refinado,
+                "severidad": severidad,
+            }
+            log.info("Plan de onda verde: %s semáforos en ruta", len(entradas))
+            for e in entradas:
+                log.info("  %s ETA [%.1f, %.1f] adelanto %.1fs -> activa T=%.1f",
+                         e.tls_id, e.eta_min, e.eta_max, e.adelanto, e.t_activacion)
+            return True
+        except Exception as e:
+            log.error("Error planificando onda verde: %s", e)
+            return False
+
+    def ejecutar_plan(self, ambulancia_id: str, t_actual: float) -> bool:
+        """
+        Ejecuta el plan programado: activa cada semáforo cuando llega su hora y lo
+        marca como superado cuando la ambulancia deja atrás el acceso.
+        La posición llega por suscripción, sin consultas TraCI adicionales por paso.
+        """
+        datos = self.planes.get(ambulancia_id)
+        if not datos:
+            return False
+
+        try:
+            self._suscribir_ambulancia(ambulancia_id)
+            resultados = traci.vehicle.getSubscriptionResults(ambulancia_id)
+            if not resultados:
+                return True
+            indice_ruta = resultados.get(tc.VAR_ROUTE_INDEX, 0)
+
+            if t_actual - datos["t_refinado"] >= PERIODO_REFINAMIENTO_PLAN:
+                self.planificador.refinar(
+                    datos["entradas"], indice_ruta,
+                    resultados.get(tc.VAR_LANEPOSITION, 0.0),
+                    resultados.get(tc.VAR_SPEED, 0.0),
+                    datos["ruta"], t_actual
+                )
+                datos["t_refinado"] = t_actual
+                # Actualizar la ETA de los reclamos vivos (solo memoria, sin TraCI)
+                for entrada in datos["entradas"]:
+                    if entrada.activo and not entrada.superado:
+                        self.arbitro.reclamar(ambulancia_id, entrada.tls_id, entrada.edge_aproximacion,
+                                              entrada.eta_min, datos["severidad"])
+
+            for entrada in datos["entradas"]:
+                if entrada.superado:
+                    continue
+                if indice_ruta > entrada.indice_ruta:
+                    entrada.superado = True
+                    if entrada.activo:
+                        self._retirar_reclamo(ambulancia_id, entrada.tls_id, t_actual)
+                    continue
+                if not entrada.activo and t_actual >= entrada.t_activacion:
+                    self._activar_entrada(entrada, ambulancia_id, datos["severidad"], t_actual)
+
+            return True
+        except Exception as e:
+            if "Connection" not in str(e):
+                log.error("Error ejecutando plan: %s", e)
+            return True
+
+    def muestra_ambulancia(self, ambulancia_id: str) -> Optional[dict]:
+        """
+        Últimos valores suscritos de la ambulancia (VARIABLES_AMBULANCIA). Se leen
+        de la caché de suscripciones, sin consultas TraCI adicionales.
+        """
+        try:
+            self._suscribir_ambulancia(ambulancia_id)
+            return traci.vehicle.getSubscriptionResults(ambulancia_id) or None
+        except Exception:
+            return None
+
+    def _suscribir_ambulancia(self, ambulancia_id: str) -> None:
+        if ambulancia_id not in self.vehiculos_suscritos:
+            traci.vehicle.subscribe(ambulancia_id, VARIABLES_AMBULANCIA)
+            self.vehiculos_suscritos.add(ambulancia_id)
+
+    def finalizar_plan(self, ambulancia_id: str, t_actual: Optional[float] = None) -> None:
+        """
+        Elimina el plan de la ambulancia, retira todos sus reclamos y libera sus
+        suscripciones. Los semáforos que queden sin reclamos inician su liberación.
+        """
+        datos = self.planes.pop(ambulancia_id, None)
+        if datos and self.planificador is not None:
+            self.planificador.liberar(datos["entradas"])
+        self.ultimo_tls_reactivo.pop(ambulancia_id, None)
+        self.vehiculos_suscritos.discard(ambulancia_id)
+
+        if self.arbitro is not None:
+            libres = self.arbitro.liberar_vehiculo(ambulancia_id)
+            if libres and t_actual is None:
+                t_actual = traci.simulation.getTime()
+            for tls_id in libres:
+                self.liberar_semaforo(tls_id, t_actual)
+
+    def aplicar_reclamos(self, t_actual: Optional[float] = None) -> int:
+        """
+        Resuelve el arbitraje y escribe en SUMO, en lote, los estados del paso
+        (reclamos, ámbar de liberación y verde reactivo) de los semáforos que
+        realmente cambian. Se llama una vez por paso, tras procesar todos los
+        vehículos. Retorna el número de escrituras realizadas.
+        """
+        if self.arbitro is not None:
+            for tls_id, estado in self.arbitro.resolver().items():
+                self.espejo.fijar_estado(tls_id, estado, t_actual, "reclamo")
+                self.semaforos_activos[tls_id] = estado
+        return self.espejo.aplicar()
+
+    def _activar_entrada(self, entrada: EntradaPlan, vehiculo: str, severidad: int, t_actual: float) -> None:
+        self._reclamar(vehiculo, entrada.tls_id, entrada.edge_aproximacion, entrada.eta_min, severidad, t_actual)
+        entrada.activo = True
+
+    def _reclamar(self, vehiculo: str, tls_id: str, edge_aproximacion: str,
+                  eta: float, severidad: int, t_actual: float) -> bool:
+        """
+        Registra el reclamo en el árbitro. Si el semáforo estaba en plena
+        liberación (ámbar o compensación pendiente), esta se cancela.
+        """
+        if not self.arbitro.reclamar(vehiculo, tls_id, edge_aproximacion, eta, severidad):
+            return False
+        self._guardar_programa_original(tls_id)
+        self.t_inicio_forzado.setdefault(tls_id, t_actual)
+        if self.liberaciones.pop(tls_id, None) is not None:
+            self._cancelar_evento_tls(tls_id)
+        return True
+
+    def _retirar_reclamo(self, vehiculo: str, tls_id: str, t_actual: float) -> None:
+        if self.arbitro is not None and self.arbitro.liberar(vehiculo, tls_id):
+            self.liberar_semaforo(tls_id, t_actual)
+
+    def _guardar_programa_original(self, tls_id: str) -> None:
+        # GUARDAR PROGRAMA ORIGINAL (SOLO LA PRIMERA VEZ)
+        if tls_id not in self.tls_original_programs:
+            try:
+                # Guardamos el ID del programa actual (ej: "0") ANTES de modificarlo
+                self.tls_original_programs[tls_id] = traci.trafficlight.getProgram(tls_id)
+            except:
+                # Si falla, asumimos "0" que es el default de SUMO
+                self.tls_original_programs[tls_id] = "0"
+
+    def execute_green_wave(self, ruta: List[str], ambulancia_id: str, t_actual: Optional[float] = None,
+                           severidad: int = 1) -> bool:
         """
         Ejecuta el corredor verde completo para una ambulancia a lo largo de la ruta.
         Gestiona la lógica de semáforos si el interruptor está activado.
+        `severidad` (arbiter.severidad_numerica) ordena el reclamo frente a otros vehículos.
         """
         if not ACTIVAR_PRIORIDAD_SEMAFORICA:
             return False
@@ -102,6 +486,17 @@ class ControladorCorredorVerde:
         try:
             # Obtener el siguiente semáforo
             next_tls_info = traci.vehicle.getNextTLS(ambulancia_id)
+
+            # Si el semáforo forzado anterior ya no es el siguiente, la ambulancia lo cruzó
+            tls_previo = self.ultimo_tls_reactivo.get(ambulancia_id)
+            if tls_previo and (not next_tls_info or next_tls_info[0][0] != tls_previo):
+                if t_actual is None:
+                    t_actual = traci.simulation.getTime()
+                if self.arbitro is not None and self.arbitro.tiene_reclamos(tls_previo):
+                    self._retirar_reclamo(ambulancia_id, tls_previo, t_actual)
+                else:
+                    self.liberar_semaforo(tls_previo, t_actual)
+                del self.ultimo_tls_reactivo[ambulancia_id]
             
             if not next_tls_info:
                 return False
@@ -109,30 +504,38 @@ class ControladorCorredorVerde:
             tls_id, tls_index, distancia, estado_actual = next_tls_info[0]
 
             if distancia <= DISTANCIA_DETECCION_SEMAFORO:
-                # GUARDAR PROGRAMA ORIGINAL (SOLO LA PRIMERA VEZ)
-                if tls_id not in self.tls_original_programs:
-                    try:
-                        # Guardamos el ID del programa actual (ej: "0") ANTES de modificarlo
-                        prog_original = traci.trafficlight.getProgram(tls_id)
-                        self.tls_original_programs[tls_id] = prog_original
-                    except:
-                        # Si falla, asumimos "0" que es el default de SUMO
-                        self.tls_original_programs[tls_id] = "0"
-
-                self._forzar_verde_para_vehiculo(tls_id, ambulancia_id)
+                if t_actual is None:
+                    t_actual = traci.simulation.getTime()
+                self.ultimo_tls_reactivo[ambulancia_id] = tls_id
+
+                # Camino rápido: el índice estático conoce el acceso; el árbitro
+                # decide el estado y aplicar_reclamos lo escribe una vez por paso
+                edge_acceso = None
+                if self.indice_tls is not None:
+                    edge_acceso = self.indice_tls.edge_por_enlace.get(tls_id, {}).get(tls_index)
+
+                if edge_acceso and self._reclamar(ambulancia_id, tls_id, edge_acceso, t_actual, severidad, t_actual):
+                    return True
+
+                self._guardar_programa_original(tls_id)
+                self.t_inicio_forzado.setdefault(tls_id, t_actual)
+                self._forzar_verde_para_vehiculo(tls_id, ambulancia_id, t_actual)
                 return True
             
             return False
 
         except Exception as e:
             if "Connection" not in str(e):
-                print(f"[CONTROLLER] Error en Green Wave: {e}")
+                log.error("Error en Green Wave: %s", e)
             return False
         
-    def _forzar_verde_para_vehiculo(self, tls_id, vehiculo_id):
+    def _forzar_verde_para_vehiculo(self, tls_id, vehiculo_id, t_actual: Optional[float] = None):
         """
         Calcula qué índices del semáforo corresponden a la calle de la ambulancia
         y construye un estado donde SOLO esos están en verde.
+        Ruta lenta (varias consultas TraCI); solo se usa si el semáforo no está
+        en el índice estático. El estado se escribe en aplicar_reclamos() y solo
+        si cambió.
         """
         try:
             # 1. Obtener en qué carril está la ambulancia
@@ -165,40 +568,51 @@ class ControladorCorredorVerde:
             
             if encontrado:
                 estado_final = "".join(nuevo_estado)
-                # Forzar el estado en SUMO
-                traci.trafficlight.setRedYellowGreenState(tls_id, estado_final)
+                # Forzar el estado en SUMO (al final del paso)
+                self.espejo.fijar_estado(tls_id, estado_final, t_actual, "reactivo")
+                self.semaforos_activos[tls_id] = estado_final
                 # print(f"[SEMAFORO] {tls_id} forzado a {estado_final} para {vehiculo_id}")
 
         except Exception as e:
-            print(f"[CONTROLLER] Error forzando luz verde: {e}")
+            log.error("Error forzando luz verde: %s", e)
             
-    def restaurar_todos_los_semaforos(self):
+    def restaurar_todos_los_semaforos(self, t_actual: Optional[float] = None):
         """
         Reinicia el programa automático de todos los semáforos modificados.
         """
         if not self.tls_original_programs:
             return
 
-        print(f"[CONTROLLER] 🔄 Restaurando {len(self.tls_original_programs)} semáforos a su ciclo normal...")
+        # Los semáforos con reclamos de otros vehículos siguen bajo arbitraje y los
+        # que ya están en transición segura terminan su ámbar y compensación
+        a_restaurar = {t: p for t, p in self.tls_original_programs.items()
+                       if t not in self.liberaciones
+                       and (self.arbitro is None or not self.arbitro.tiene_reclamos(t))}
+        if not a_restaurar:
+            return
+
+        log.info("🔄 Restaurando %s semáforos a su ciclo normal...", len(a_restaurar))
         
-        for tls_id, prog_original in list(self.tls_original_programs.items()):
-            try:
-                # Forzamos a SUMO a cargar el programa original ("0")
-                # Esto "rompe" el bloqueo manual de setRedYellowGreenState
-                traci.trafficlight.setProgram(tls_id, prog_original)
-                
-                # Opcional: Forzar fase 0 para reiniciar ciclo limpiamente
-                # traci.trafficlight.setPhase(tls_id, 0) 
-            except Exception as e:
-                print(f"[CONTROLLER] Error restaurando {tls_id} al programa '{prog_original}': {e}")
-                
+        for tls_id, prog_original in a_restaurar.items():
+            # Forzamos a SUMO a cargar el programa original ("0")
+            # Esto "rompe" el bloqueo manual de setRedYellowGreenState
+            if not self.espejo.fijar_programa(tls_id, prog_original, t_actual, "restauracion"):
                 # Fallback: Intentar forzar "0" si el original falló
-                try: traci.trafficlight.setProgram(tls_id, "0")
-                except: pass
+                self.espejo.fijar_programa(tls_id, "0", t_actual, "restauracion")
         
-        # Limpiamos el registro
-        self.tls_original_programs.clear()
-        print("[CONTROLLER] ✅ Semáforos desbloqueados.")
+        # Limpiamos el registro de los semáforos restaurados
+        for tls_id in a_restaurar:
+            self.ventanas_override.append({
+                "tls_id": tls_id,
+                "t_inicio": self.t_inicio_forzado.get(tls_id, t_actual),
+                "t_fin": t_actual,
+            })
+            self.tls_original_programs.pop(tls_id, None)
+            self.semaforos_activos.pop(tls_id, None)
+            self.t_inicio_forzado.pop(tls_id, None)
+            self.liberaciones.pop(tls_id, None)
+            self._cancelar_evento_tls(tls_id)
+        log.info("✅ Semáforos desbloqueados.")
 
     def _es_mismo_edge(self, lane1, lane2):
         """Ayuda a comparar si dos carriles pertenecen a la misma calle base."""
@@ -1,5 +1,6 @@
 from enum import Enum
 from dataclasses import dataclass
+from typing import Optional
 
 class FaseSemanaforo(Enum):
     ROJO = "r"
@@ -7,9 +8,24 @@ class FaseSemanaforo(Enum):
     VERDE = "g"
     DESACTIVADO = "o"
 
+    @classmethod
+    def desde_estado(cls, estado: str) -> "FaseSemanaforo":
+        """Fase dominante de una cadena de luces: verde si algún enlace lo está, luego ámbar, rojo."""
+        if any(c in "Gg" for c in estado):
+            return cls.VERDE
+        if any(c in "yY" for c in estado):
+            return cls.AMARILLO
+        if estado and all(c in "oO" for c in estado):
+            return cls.DESACTIVADO
+        return cls.ROJO
+
 @dataclass
 class EstadoSemanaforo:
+    # Una instancia por semáforo intervenido (traffic_control.tls_state): sin __dict__
+    __slots__ = ("id_semaforo", "fase_actual", "duracion_restante", "timestamp", "estado", "programa")
     id_semaforo: str
     fase_actual: FaseSemanaforo
     duracion_restante: int
     timestamp: float
+    estado: Optional[str]        # cadena escrita con setRedYellowGreenState (None = la decide el programa)
+    programa: Optional[str]      # programa fijado con setProgram (None = no se tocó)
@@ -0,0 +1,221 @@
+import traci
+import traci.constants as tc
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from config import (
+    FACTOR_VELOCIDAD_AMBULANCIA, VELOCIDAD_MINIMA_ETA, TIEMPO_PERDIDO_ARRANQUE,
+    HEADWAY_DESCARGA, MARGEN_PREEMPCION, RADIO_CONTEXTO_SEMAFORO
+)
+from structured_log import obtener_logger
+from traffic_control.tls_index import IndiceSemaforos
+
+log = obtener_logger("PLANNER")
+
+
+@dataclass
+class EntradaPlan:
+    """Preempción programada de un semáforo de la ruta."""
+    tls_id: str
+    edge_aproximacion: str
+    indice_ruta: int          # Posición de edge_aproximacion en la ruta
+    junction: str             # Junction al final del acceso (centro del contexto)
+    estado: str               # Cadena de estado prioritario a escribir
+    eta_min: float            # Llegada más temprana (tiempo de simulación)
+    eta_max: float            # Llegada más tardía (tiempo de simulación)
+    adelanto: float = 0.0     # Tiempo estimado para vaciar la cola del acceso
+    t_activacion: float = 0.0
+    activo: bool = False
+    superado: bool = False
+
+
+class PlanificadorOndaVerde:
+    """
+    Precalcula, al despachar, todos los semáforos de la ruta con su ventana de
+    llegada (ETA) y el adelanto necesario para vaciar la cola del acceso.
+    El controlador ejecuta luego el plan por tiempo en lugar de reaccionar a 50 m.
+    """
+
+    def __init__(self, indice_tls: IndiceSemaforos):
+        self.indice = indice_tls
+        self.junctions_suscritos = set()
+
+    def planificar(self, ruta_edges: List[str], t_actual: float,
+                   usar_velocidad_viva: bool = True) -> List[EntradaPlan]:
+        """
+        Recorre la ruta y construye una entrada por cada semáforo atravesado.
+        """
+        velocidades_vivas = self._velocidades_vivas(ruta_edges) if usar_velocidad_viva else {}
+        plan = self.secuencia_tls(ruta_edges, t_actual, velocidades_vivas)
+
+        for entrada in plan:
+            self._suscribir_contexto(entrada.junction)
+            self._recalcular_activacion(entrada, t_actual)
+
+        return plan
+
+    def sembrar(self, ruta_edges: List[str], semaforos: List[Tuple[str, int, float]],
+                t_inicio: float) -> List[EntradaPlan]:
+        """
+        Plan a partir de la secuencia precalculada de routing.dispatch_table
+        ([(tls_id, indice_ruta, desfase)]), con los desfases corridos a t_inicio.
+        La tabla solo guarda la llegada más temprana: eta_max parte igual a
+        eta_min y la corrige el primer refinar() con la posición real.
+        """
+        plan = []
+        for tls_id, indice_ruta, desfase in semaforos:
+            if indice_ruta >= len(ruta_edges):
+                continue
+            edge_id = ruta_edges[indice_ruta]
+            datos = self.indice.datos_edge(edge_id)
+            estado = self.indice.estado_para_edge(tls_id, edge_id)
+            if not datos or not estado:
+                continue
+            eta = t_inicio + desfase
+            plan.append(EntradaPlan(tls_id, edge_id, indice_ruta, datos[3], estado, eta, eta))
+
+        for entrada in plan:
+            self._suscribir_contexto(entrada.junction)
+            self._recalcular_activacion(entrada, t_inicio)
+
+        return plan
+
+    def secuencia_tls(self, ruta_edges: List[str], t_inicio: float = 0.0,
+                      velocidades: Optional[Dict[str, float]] = None) -> List[EntradaPlan]:
+        """
+        Semáforos atravesados por la ruta con su ventana de llegada desde
+        t_inicio. No usa TraCI: sin `velocidades` asume flujo libre, lo que
+        permite calcularla fuera de línea (ver routing.dispatch_table).
+        """
+        velocidades_vivas = velocidades or {}
+        plan = []
+        t_min = t_max = t_inicio
+        for i, edge_id in enumerate(ruta_edges):
+            datos = self.indice.datos_edge(edge_id)
+            if not datos:
+                continue
+            longitud, vmax, _lanes, junction = datos
+
+            v_rapida = max(vmax * FACTOR_VELOCIDAD_AMBULANCIA, VELOCIDAD_MINIMA_ETA)
+            v_lenta = max(velocidades_vivas.get(edge_id, vmax), VELOCIDAD_MINIMA_ETA)
+            t_min += longitud / v_rapida
+            t_max += longitud / min(v_lenta, v_rapida)
+
+            if i + 1 >= len(ruta_edges):
+                break
+            tls_id = self.indice.tls_en_movimiento(edge_id, ruta_edges[i + 1])
+            if not tls_id:
+                continue
+            estado = self.indice.estado_para_edge(tls_id, edge_id)
+            if not estado:
+                continue
+
+            plan.append(EntradaPlan(tls_id, edge_id, i, junction, estado, t_min, t_max))
+
+        return plan
+
+    def refinar(self, plan: List[EntradaPlan], indice_ruta: int, pos_en_edge: float,
+                velocidad: float, ruta_edges: List[str], t_actual: float) -> None:
+        """
+        Recalcula las ETA de las entradas pendientes desde la posición actual de
+        la ambulancia y actualiza los adelantos con los conteos de cola.
+        """
+        pendientes = [e for e in plan if not e.superado and e.indice_ruta >= indice_ruta]
+        if not pendientes:
+            return
+
+        t_min = t_max = t_actual
+        siguiente = 0
+        for i in range(indice_ruta, pendientes[-1].indice_ruta + 1):
+            datos = self.indice.datos_edge(ruta_edges[i])
+            if datos:
+                longitud, vmax, _lanes, _junction = datos
+                restante = longitud - pos_en_edge if i == indice_ruta else longitud
+                v_rapida = max(vmax * FACTOR_VELOCIDAD_AMBULANCIA, VELOCIDAD_MINIMA_ETA)
+                v_lenta = max(velocidad if i == indice_ruta else vmax, VELOCIDAD_MINIMA_ETA)
+                t_min += max(restante, 0.0) / v_rapida
+                t_max += max(restante, 0.0) / min(v_lenta, v_rapida)
+
+            while siguiente < len(pendientes) and pendientes[siguiente].indice_ruta == i:
+                entrada = pendientes[siguiente]
+                entrada.eta_min, entrada.eta_max = t_min, t_max
+                self._recalcular_activacion(entrada, t_actual)
+                siguiente += 1
+
+    def eta_restante(self, ruta_edges: List[str], indice_ruta: int, pos_en_edge: float) -> float:
+        """
+        Segundos estimados hasta el final de la ruta desde la posición actual, a
+        la velocidad de la ambulancia sobre cada calle (misma cota que eta_min).
+        """
+        eta = 0.0
+        for i in range(max(indice_ruta, 0), len(ruta_edges)):
+            datos = self.indice.datos_edge(ruta_edges[i])
+            if not datos:
+                continue
+            longitud, vmax, _lanes, _junction = datos
+            restante = longitud - pos_en_edge if i == indice_ruta else longitud
+            eta += max(restante, 0.0) / max(vmax * FACTOR_VELOCIDAD_AMBULANCIA, VELOCIDAD_MINIMA_ETA)
+        return eta
+
+    def liberar(self, plan: List[EntradaPlan]) -> None:
+        """Cancela las suscripciones de contexto abiertas por el plan."""
+        for entrada in plan:
+            if entrada.junction in self.junctions_suscritos:
+                try:
+                    traci.junction.unsubscribeContext(entrada.junction, tc.CMD_GET_VEHICLE_VARIABLE,
+                                                      RADIO_CONTEXTO_SEMAFORO)
+                except Exception:
+                    pass
+                self.junctions_suscritos.discard(entrada.junction)
+
+    def _recalcular_activacion(self, entrada: EntradaPlan, t_actual: float) -> None:
+        entrada.adelanto = self._estimar_adelanto(entrada)
+        entrada.t_activacion = max(t_actual, entrada.eta_min - entrada.adelanto - MARGEN_PREEMPCION)
+
+    def _estimar_adelanto(self, entrada: EntradaPlan) -> float:
+        """
+        Tiempo para vaciar la cola del acceso: pérdida de arranque + headway por
+        vehículo en el carril más cargado. Usa los resultados de la suscripción
+        de contexto, que llegan con cada simulationStep sin consultas extra.
+        """
+        datos = self.indice.datos_edge(entrada.edge_aproximacion)
+        if not datos:
+            return 0.0
+        lanes = datos[2]
+        try:
+            resultados = traci.junction.getContextSubscriptionResults(entrada.junction) or {}
+        except Exception:
+            return 0.0
+
+        por_carril: Dict[str, int] = {}
+        for variables in resultados.values():
+            lane = variables.get(tc.VAR_LANE_ID)
+            if lane in lanes:
+                por_carril[lane] = por_carril.get(lane, 0) + 1
+
+        cola = max(por_carril.values()) if por_carril else 0
+        if cola == 0:
+            return 0.0
+        return TIEMPO_PERDIDO_ARRANQUE + cola * HEADWAY_DESCARGA
+
+    def _suscribir_contexto(self, junction: str) -> None:
+        if junction in self.junctions_suscritos:
+            return
+        try:
+            traci.junction.subscribeContext(junction, tc.CMD_GET_VEHICLE_VARIABLE,
+                                            RADIO_CONTEXTO_SEMAFORO, [tc.VAR_LANE_ID])
+            self.junctions_suscritos.add(junction)
+        except Exception as e:
+            log.warning("No se pudo suscribir contexto en %s: %s", junction, e)
+
+    def _velocidades_vivas(self, ruta_edges: List[str]) -> Dict[str, float]:
+        """Velocidad media actual de cada calle de la ruta (una consulta por calle, solo al despachar)."""
+        velocidades = {}
+        for edge_id in ruta_edges:
+            try:
+                v = traci.edge.getLastStepMeanSpeed(edge_id)
+                if v > 0:
+                    velocidades[edge_id] = v
+            except Exception:
+                continue
+        return velocidades
@@ -0,0 +1,155 @@
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+class IndiceSemaforos:
+    """
+    Índice estático de la topología semafórica de la red.
+    Se construye una sola vez desde map.net.xml (<tlLogic> y <connection>)
+    para que el corredor verde no tenga que consultar a TraCI los enlaces
+    controlados en cada paso.
+    """
+
+    def __init__(self):
+        # tls_id -> número de enlaces (longitud de la cadena de estado)
+        self.num_enlaces: Dict[str, int] = {}
+        # tls_id -> programID del primer <tlLogic> encontrado
+        self.programas: Dict[str, str] = {}
+        # tls_id -> [(duracion, estado), ...] del programa por defecto
+        self.fases: Dict[str, List[Tuple[float, str]]] = {}
+        # tls_id -> {edge_entrada: (indices de enlace, ...)}
+        self.enlaces_por_edge: Dict[str, Dict[str, Tuple[int, ...]]] = {}
+        # tls_id -> {indice_enlace: edge_entrada}
+        self.edge_por_enlace: Dict[str, Dict[int, str]] = {}
+        # tls_id -> {edge_entrada: cadena de estado prioritario precalculada}
+        self.estados_prioridad: Dict[str, Dict[str, str]] = {}
+        # (edge_entrada, edge_salida) -> tls_id que controla ese giro
+        self.tls_por_movimiento: Dict[Tuple[str, str], str] = {}
+        # edge_id -> (longitud, velocidad_max, (lanes...), junction_destino)
+        self.edges: Dict[str, Tuple[float, float, Tuple[str, ...], str]] = {}
+
+    def __contains__(self, tls_id: str) -> bool:
+        return tls_id in self.num_enlaces
+
+    def __len__(self) -> int:
+        return len(self.num_enlaces)
+
+    def estado_para_edge(self, tls_id: str, edge_id: str) -> Optional[str]:
+        """
+        Retorna el estado donde SOLO los enlaces que salen de edge_id están en verde.
+        """
+        return self.estados_prioridad.get(tls_id, {}).get(edge_id)
+
+    def estado_para_enlace(self, tls_id: str, indice_enlace: int) -> Optional[str]:
+        """
+        Retorna el estado prioritario para la calle que controla indice_enlace.
+        Es el índice que devuelve traci.vehicle.getNextTLS, así que basta esa
+        única consulta para saber qué cadena escribir.
+        """
+        edge_id = self.edge_por_enlace.get(tls_id, {}).get(indice_enlace)
+        if edge_id is None:
+            return None
+        return self.estado_para_edge(tls_id, edge_id)
+
+    def tls_en_movimiento(self, edge_entrada: str, edge_salida: str) -> Optional[str]:
+        """Semáforo que controla el paso de edge_entrada a edge_salida (si existe)."""
+        return self.tls_por_movimiento.get((edge_entrada, edge_salida))
+
+    def datos_edge(self, edge_id: str) -> Optional[Tuple[float, float, Tuple[str, ...], str]]:
+        """(longitud, velocidad_max, lanes, junction_destino) de una calle."""
+        return self.edges.get(edge_id)
+
+    def edges_entrada(self, tls_id: str) -> List[str]:
+        """Lista de calles (edges) que entran al semáforo indicado."""
+        return list(self.enlaces_por_edge.get(tls_id, {}).keys())
+
+    def edges_semaforizados(self) -> set:
+        """Calles que terminan en un acceso semaforizado (las que el corredor verde preempta)."""
+        return {edge_id for por_edge in self.enlaces_por_edge.values() for edge_id in por_edge}
+
+    def _precalcular_estados(self) -> None:
+        for tls_id, por_edge in self.enlaces_por_edge.items():
+            n = self.num_enlaces.get(tls_id)
+            if not n:
+                continue
+            estados = {}
+            for edge_id, indices in por_edge.items():
+                estado = ["r"] * n
+                for i in indices:
+                    if i < n:
+                        estado[i] = "G"
+                estados[edge_id] = "".join(estado)
+            self.estados_prioridad[tls_id] = estados
+
+
+def cargar_indice_semaforos(ruta_net_xml: Path) -> IndiceSemaforos:
+    """
+    Carga map.net.xml y construye el índice de semáforos.
+    """
+    try:
+        return construir_indice_semaforos(ET.parse(ruta_net_xml).getroot())
+    except Exception as e:
+        print(f"[TLS_INDEX] Error cargando índice de semáforos: {e}")
+        return IndiceSemaforos()
+
+
+def construir_indice_semaforos(raiz: ET.Element) -> IndiceSemaforos:
+    """
+    Construye el índice desde la raíz ya parseada de map.net.xml.
+    """
+    indice = IndiceSemaforos()
+
+    try:
+        for tl_logic in raiz.findall("tlLogic"):
+            tls_id = tl_logic.get("id")
+            if tls_id in indice.num_enlaces:
+                # Programas adicionales del mismo semáforo: nos quedamos con el primero
+                continue
+            fases = [(float(f.get("duration", 0)), f.get("state", ""))
+                     for f in tl_logic.findall("phase")]
+            if not fases:
+                continue
+            indice.programas[tls_id] = tl_logic.get("programID", "0")
+            indice.fases[tls_id] = fases
+            indice.num_enlaces[tls_id] = len(fases[0][1])
+
+        for edge in raiz.findall("edge"):
+            if edge.get("function") == "internal":
+                continue
+            lanes = edge.findall("lane")
+            if not lanes:
+                continue
+            indice.edges[edge.get("id")] = (
+                float(lanes[0].get("length", 0)),
+                max(float(l.get("speed", 0)) for l in lanes),
+                tuple(l.get("id") for l in lanes),
+                edge.get("to"),
+            )
+
+        enlaces_tmp: Dict[str, Dict[str, set]] = {}
+        for conexion in raiz.findall("connection"):
+            tls_id = conexion.get("tl")
+            link_index = conexion.get("linkIndex")
+            if not tls_id or link_index is None:
+                continue
+            edge_entrada = conexion.get("from")
+            i = int(link_index)
+            enlaces_tmp.setdefault(tls_id, {}).setdefault(edge_entrada, set()).add(i)
+            indice.edge_por_enlace.setdefault(tls_id, {})[i] = edge_entrada
+            indice.tls_por_movimiento[(edge_entrada, conexion.get("to"))] = tls_id
+
+        for tls_id, por_edge in enlaces_tmp.items():
+            indice.enlaces_por_edge[tls_id] = {
+                edge_id: tuple(sorted(indices)) for edge_id, indices in por_edge.items()
+            }
+
+        indice._precalcular_estados()
+
+        print(f"[TLS_INDEX] Índice cargado: {len(indice)} semáforos, "
+              f"{sum(len(e) for e in indice.enlaces_por_edge.values())} accesos")
+        return indice
+
+    except Exception as e:
+        print(f"[TLS_INDEX] Error cargando índice de semáforos: {e}")
+        return IndiceSemaforos()
@@ -0,0 +1,131 @@
+"""
+Espejo local del estado de los semáforos intervenidos por el corredor verde.
+
+Todas las escrituras TraCI del controlador sobre semáforos pasan por aquí:
+
+- fijar_estado() no escribe: deja el estado pendiente para el paso. Si coincide
+  con lo que SUMO ya tiene (según el espejo) o con lo ya pendiente, se descarta
+  sin round trip. aplicar() escribe lo pendiente una vez por semáforo y paso.
+- fijar_programa() / fijar_fase() escriben al instante (devuelven el semáforo
+  a su programa) y descartan el estado pendiente, que lo volvería a bloquear.
+- Cada escritura queda en un registro de auditoría acotado de tuplas
+  (t, tls_id, tipo, valor, motivo), para verificar el corredor fuera de línea.
+
+El espejo solo es válido si nadie más escribe esos semáforos por TraCI.
+"""
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import traci
+
+from config import ESPEJO_MAX_AUDITORIA
+from traffic_control.phases import EstadoSemanaforo, FaseSemanaforo
+from structured_log import obtener_logger
+
+log = obtener_logger("TLS_STATE")
+
+# Tipos de registro de auditoría
+ESTADO, PROGRAMA, FASE = "estado", "programa", "fase"
+
+
+class EspejoSemaforos:
+    __slots__ = ("estados", "pendientes", "auditoria", "escrituras", "evitadas")
+
+    def __init__(self, max_auditoria: int = ESPEJO_MAX_AUDITORIA):
+        self.estados: Dict[str, EstadoSemanaforo] = {}
+        # tls_id -> (estado, t, motivo) a escribir en el próximo aplicar()
+        self.pendientes: Dict[str, Tuple[str, float, str]] = {}
+        self.auditoria: deque = deque(maxlen=max_auditoria)
+        self.escrituras = 0
+        self.evitadas = 0
+
+    def estado(self, tls_id: str) -> Optional[str]:
+        """Estado que tendrá el semáforo tras el paso (pendiente o ya escrito), None si lo decide su programa."""
+        pendiente = self.pendientes.get(tls_id)
+        if pendiente is not None:
+            return pendiente[0]
+        actual = self.estados.get(tls_id)
+        return actual.estado if actual is not None else None
+
+    def fijar_estado(self, tls_id: str, estado: str, t: float, motivo: str) -> bool:
+        """Deja `estado` pendiente para el paso. Retorna False si no cambia nada (escritura evitada)."""
+        if estado == self.estado(tls_id):
+            self.evitadas += 1
+            return False
+        self.pendientes[tls_id] = (estado, t, motivo)
+        return True
+
+    def aplicar(self) -> int:
+        """Escribe los estados pendientes (uno por semáforo). Retorna el número de escrituras."""
+        if not self.pendientes:
+            return 0
+        escrituras = 0
+        pendientes, self.pendientes = self.pendientes, {}
+        for tls_id, (estado, t, motivo) in pendientes.items():
+            actual = self.estados.get(tls_id)
+            if actual is not None and actual.estado == estado:
+                # Volvió al estado escrito dentro del mismo paso
+                self.evitadas += 1
+                continue
+            try:
+                traci.trafficlight.setRedYellowGreenState(tls_id, estado)
+            except Exception as e:
+                log.error("Error escribiendo estado de %s: %s", tls_id, e)
+                continue
+            if actual is None:
+                self.estados[tls_id] = EstadoSemanaforo(tls_id, FaseSemanaforo.desde_estado(estado), -1, t,
+                                                        estado, None)
+            else:
+                actual.fase_actual = FaseSemanaforo.desde_estado(estado)
+                actual.timestamp = t
+                actual.estado = estado
+            self.auditoria.append((t, tls_id, ESTADO, estado, motivo))
+            escrituras += 1
+        self.escrituras += escrituras
+        return escrituras
+
+    def fijar_programa(self, tls_id: str, programa: str, t: float, motivo: str) -> bool:
+        """setProgram inmediato: el semáforo vuelve a su ciclo y se olvida el estado forzado."""
+        self.pendientes.pop(tls_id, None)
+        try:
+            traci.trafficlight.setProgram(tls_id, programa)
+        except Exception as e:
+            log.error("Error fijando programa '%s' en %s: %s", programa, tls_id, e)
+            return False
+        self.estados[tls_id] = EstadoSemanaforo(tls_id, FaseSemanaforo.ROJO, -1, t, None, programa)
+        self.auditoria.append((t, tls_id, PROGRAMA, programa, motivo))
+        self.escrituras += 1
+        return True
+
+    def fijar_fase(self, tls_id: str, fase: int, t: float, motivo: str, duracion: Optional[float] = None) -> bool:
+        """setPhase (y setPhaseDuration) inmediato dentro del programa en curso."""
+        self.pendientes.pop(tls_id, None)
+        try:
+            traci.trafficlight.setPhase(tls_id, fase)
+            if duracion is not None:
+                traci.trafficlight.setPhaseDuration(tls_id, duracion)
+        except Exception as e:
+            log.error("Error fijando fase %s en %s: %s", fase, tls_id, e)
+            return False
+        actual = self.estados.get(tls_id)
+        if actual is not None:
+            actual.estado = None
+            actual.timestamp = t
+            if duracion is not None:
+                actual.duracion_restante = int(duracion)
+        self.auditoria.append((t, tls_id, FASE, fase if duracion is None else f"{fase}:{duracion:.0f}", motivo))
+        self.escrituras += 1 if duracion is None else 2
+        return True
+
+    def registros(self, desde: Optional[float] = None) -> List[list]:
+        """Auditoría como listas [t, tls_id, tipo, valor, motivo] (desde `desde`, inclusive)."""
+        return [list(r) for r in self.auditoria if desde is None or (r[0] is not None and r[0] >= desde)]
+
+    def resumen(self) -> dict:
+        total = self.escrituras + self.evitadas
+        return {
+            "escrituras": self.escrituras,
+            "evitadas": self.evitadas,
+            "fraccion_evitada": self.evitadas / total if total else 0.0,
+            "semaforos": len(self.estados),
+        }
@@ -1,19 +1,26 @@
 import time
 import os
+import sys
 from config import ARCHIVO_TRIGGER
 
-def generar_evento():
+def generar_evento(x: float = None, y: float = None):
     print("="*40)
     print(" 💥 GENERADOR DE EVENTOS DE ACCIDENTE")
     print("="*40)
     
     # Crear el archivo bandera
+    # Con coordenadas, la simulación ubica el accidente en el junction más cercano
+    ubicacion = f"{x},{y}" if x is not None and y is not None else "manual"
     with open(ARCHIVO_TRIGGER, "w") as f:
-        f.write(f"timestamp={time.time()}|tipo=grave|ubicacion=manual")
+        f.write(f"timestamp={time.time()}|tipo=grave|ubicacion={ubicacion}")
         
     print(f"[OK] Señal enviada.")
     print(f"Archivo '{ARCHIVO_TRIGGER}' creado exitosamente.")
     print("La simulación principal debería detectar el accidente en el próximo paso.")
 
 if __name__ == "__main__":
-    generar_evento()
\ No newline at end of file
+    # Uso: python trigger_accident.py [x y]
+    if len(sys.argv) >= 3:
+        generar_evento(float(sys.argv[1]), float(sys.argv[2]))
+    else:
+        generar_evento()
\ No newline at end of file